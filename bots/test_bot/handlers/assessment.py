@@ -1,3 +1,4 @@
+import asyncio
 import html
 import os
 import sys
@@ -41,6 +42,26 @@ class AssessmentState(StatesGroup):
     waiting_text_answer = State()  # Для текстовых вопросов
 
 
+# Повтор запроса ответа, пока core оценивает пакет ответов (HTTP 202, "evaluating")
+ANSWER_EVALUATION_POLL_INTERVAL = 2
+ANSWER_EVALUATION_POLL_ATTEMPTS = 30
+
+
+async def post_answer(url: str, payload: dict, context: dict):
+    """
+    Отправляет ответ в core. Если пакет ответов ещё на оценке, запрос повторяется:
+    ответ уже сохранён, повторный POST лишь возвращает следующий вопрос или итог теста.
+    Ожидание — asyncio.sleep, event loop бота не блокируется.
+    """
+    ok, response = await core_post(url=url, payload=payload, context=context)
+    for _ in range(ANSWER_EVALUATION_POLL_ATTEMPTS):
+        if not ok or not isinstance(response, dict) or not response.get("evaluating"):
+            break
+        await asyncio.sleep(ANSWER_EVALUATION_POLL_INTERVAL)
+        ok, response = await core_post(url=url, payload=payload, context=context)
+    return ok, response
+
+
 # --- helper для отправки вопроса ---
 async def send_question(
         event: Union[Message, CallbackQuery],
@@ -363,7 +384,7 @@ async def mcq_answer(callback: CallbackQuery, state: FSMContext, **kwargs):
         "answer_text": answer,
     }
 
-    ok, response = await core_post(
+    ok, response = await post_answer(
         url=f"/api/v1/assessment/session/{session_id}/{question_id}/answer/",
         payload=payload,
         context=context
@@ -546,7 +567,7 @@ async def process_text_answer(message: Message, state: FSMContext, **kwargs):
         "answer_text": message.text,
     }
 
-    ok, response = await core_post(
+    ok, response = await post_answer(
         url=f"/api/v1/assessment/session/{session_id}/{question['id']}/answer/",
         payload=payload,
         context=context
@@ -62,6 +62,11 @@ class LLMConfig(BaseSettings):
     # ─── Таймауты и надёжность ──────────────────────────────────────
     request_timeout: float = Field(default=60.0)
     max_retries: int = Field(default=3, ge=1)
+    max_concurrency: int = Field(
+        default=8,
+        ge=1,
+        description="Максимум одновременных запросов к провайдеру в одном процессе"
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
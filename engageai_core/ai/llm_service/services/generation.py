@@ -19,6 +19,7 @@ from __future__ import annotations
 import asyncio
 import json
 import time
+import weakref
 from typing import Any, Dict, List, Literal, Optional, Tuple, Type
 
 from pydantic import BaseModel, ValidationError
@@ -69,6 +70,22 @@ class GenerationService:
         self.fallback_enabled = config.use_fallback or False
         self.max_retries = config.max_retries or 3
 
+        # Лимитер одновременных запросов к провайдеру: свой семафор на каждый event loop
+        # (async_to_sync в Celery/Django может запускать разные циклы)
+        self.max_concurrency = getattr(config, "max_concurrency", None) or 8
+        self._limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _limiter(self) -> asyncio.Semaphore:
+        """Семафор провайдера для текущего event loop"""
+        loop = asyncio.get_running_loop()
+        limiter = self._limiters.get(loop)
+        if limiter is None:
+            limiter = asyncio.Semaphore(self.max_concurrency)
+            self._limiters[loop] = limiter
+        return limiter
+
     def _create_provider(self) -> LLMProvider:
         """Фабрика провайдеров — выбирает нужную реализацию"""
         if self.config.use_local_models:
@@ -191,7 +208,18 @@ class GenerationService:
     ) -> Tuple[str, GenerationMetrics]:
         """
         Пытается сгенерировать ответ, при ошибке — fallback на другую модель (если включено).
+        Одновременно к провайдеру уходит не больше config.max_concurrency запросов.
         """
+        async with self._limiter():
+            return await self._generate_unlimited(messages, temperature, max_tokens, response_format)
+
+    async def _generate_unlimited(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        response_format: Literal["text", "json_object"],
+    ) -> Tuple[str, GenerationMetrics]:
         primary_model = self.provider.model_name
 
         try:
@@ -0,0 +1,138 @@
+"""
+Нормализация аудио перед распознаванием: 16 кГц, моно, 16-bit PCM.
+
+Декодирование — через ffmpeg (settings.STT_FFMPEG_BINARY), если он установлен:
+так читаются ogg/opus голосовые Telegram, webm из браузера, mp3, m4a.
+Без ffmpeg WAV декодируется стандартным модулем wave и пересэмплируется в numpy;
+остальные форматы отправляются на сервер как есть (faster-whisper-server декодирует сам).
+"""
+from __future__ import annotations
+
+import io
+import logging
+import shutil
+import subprocess
+import wave
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TARGET_SAMPLE_RATE = 16000
+
+
+@dataclass
+class PcmAudio:
+    """Моно-сигнал 16 кГц, int16"""
+    samples: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / TARGET_SAMPLE_RATE
+
+    @classmethod
+    def silence(cls, seconds: float) -> "PcmAudio":
+        return cls(np.zeros(int(round(seconds * TARGET_SAMPLE_RATE)), dtype=np.int16))
+
+    @classmethod
+    def concat(cls, parts: Iterable["PcmAudio"]) -> "PcmAudio":
+        arrays = [part.samples for part in parts]
+        return cls(np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int16))
+
+    def slice(self, start: float, end: float) -> "PcmAudio":
+        """Фрагмент [start, end) в секундах"""
+        first = max(0, int(start * TARGET_SAMPLE_RATE))
+        last = min(len(self.samples), int(end * TARGET_SAMPLE_RATE))
+        return PcmAudio(self.samples[first:last])
+
+    def to_wav(self) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(TARGET_SAMPLE_RATE)
+            wf.writeframes(self.samples.astype("<i2").tobytes())
+        return buffer.getvalue()
+
+
+def normalize_audio(data: bytes) -> Optional[PcmAudio]:
+    """
+    Декодирует аудио в PcmAudio (16 кГц, моно).
+    None — формат не удалось декодировать локально.
+    """
+    ffmpeg = _ffmpeg_binary()
+    if ffmpeg:
+        pcm = _decode_with_ffmpeg(ffmpeg, data)
+        if pcm is not None:
+            return pcm
+    return decode_wav(data)
+
+
+def decode_wav(data: bytes) -> Optional[PcmAudio]:
+    """WAV (PCM 8/16/32 бит, любая частота и число каналов) → PcmAudio"""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            rate = wf.getframerate()
+            raw = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if sample_width == 1:
+        signal = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        signal = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 4:
+        signal = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        return None
+
+    if channels > 1:
+        signal = signal[: len(signal) - len(signal) % channels].reshape(-1, channels).mean(axis=1)
+
+    signal = _resample(signal, rate, TARGET_SAMPLE_RATE)
+    return PcmAudio(np.clip(signal * 32768.0, -32768, 32767).astype(np.int16))
+
+
+def _resample(signal: np.ndarray, rate: int, target: int) -> np.ndarray:
+    """Линейная интерполяция; при понижении частоты — сглаживание скользящим средним против алиасинга"""
+    if rate == target or not len(signal):
+        return signal
+    if rate > target:
+        width = int(np.ceil(rate / target))
+        if width > 1:
+            signal = np.convolve(signal, np.ones(width, dtype=np.float32) / width, mode="same")
+    positions = np.arange(int(len(signal) * target / rate)) * (rate / target)
+    return np.interp(positions, np.arange(len(signal)), signal).astype(np.float32)
+
+
+def _ffmpeg_binary() -> Optional[str]:
+    return shutil.which(settings.STT_FFMPEG_BINARY)
+
+
+def _decode_with_ffmpeg(ffmpeg: str, data: bytes) -> Optional[PcmAudio]:
+    command = [
+        ffmpeg, "-nostdin", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ac", "1", "-ar", str(TARGET_SAMPLE_RATE), "-f", "s16le", "pipe:1",
+    ]
+    try:
+        completed = subprocess.run(command, input=data, capture_output=True, timeout=60, check=True)
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"ffmpeg не смог декодировать аудио: {e}")
+        return None
+    return PcmAudio(np.frombuffer(completed.stdout, dtype="<i2").copy())
+
+
+def frame_energy(pcm: PcmAudio, frame_seconds: float = 0.02) -> List[float]:
+    """RMS по кадрам (0..1) — для детекции речи/тишины"""
+    frame = max(1, int(frame_seconds * TARGET_SAMPLE_RATE))
+    count = len(pcm.samples) // frame
+    if not count:
+        return []
+    frames = pcm.samples[: count * frame].astype(np.float32).reshape(count, frame) / 32768.0
+    return np.sqrt((frames ** 2).mean(axis=1)).tolist()
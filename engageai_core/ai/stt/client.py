@@ -0,0 +1,97 @@
+"""
+HTTP-клиент faster-whisper-server (OpenAI-совместимый /v1/audio/transcriptions,
+stt_service/compose.yaml).
+
+Клиент с пулом соединений создаётся лениво, один на процесс (после fork воркера
+пул создаётся заново) — так же, как engageai_core.redis_client.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from django.conf import settings
+
+
+class TranscriptionError(Exception):
+    """Сервер распознавания недоступен или вернул ошибку"""
+
+
+class WhisperClient:
+    """Синхронный клиент faster-whisper-server с keep-alive пулом соединений"""
+
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            model: Optional[str] = None,
+            language: Optional[str] = None,
+            timeout: Optional[float] = None,
+            max_connections: Optional[int] = None,
+    ):
+        self.base_url = (base_url or settings.STT_SERVER_URL).rstrip("/")
+        self.model = model or settings.STT_MODEL
+        self.language = language if language is not None else settings.STT_LANGUAGE
+        max_connections = max_connections or settings.STT_MAX_CONNECTIONS
+        self._http = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout or settings.STT_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def transcribe(
+            self,
+            audio: bytes,
+            filename: str = "audio.wav",
+            content_type: str = "audio/wav",
+            word_timestamps: bool = False,
+            prompt: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Распознаёт один файл. Возвращает JSON ответа сервера:
+        {"text": ...} или, при word_timestamps, verbose_json с "words": [{"word", "start", "end"}].
+        """
+        data: Dict[str, Any] = {
+            "model": self.model,
+            "response_format": "verbose_json" if word_timestamps else "json",
+            "temperature": "0.0",
+        }
+        if self.language:
+            data["language"] = self.language
+        if prompt:
+            data["prompt"] = prompt
+        if word_timestamps:
+            data["timestamp_granularities[]"] = "word"
+
+        try:
+            response = self._http.post(
+                "/v1/audio/transcriptions",
+                files={"file": (filename, audio, content_type)},
+                data=data,
+            )
+            response.raise_for_status()
+            return response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise TranscriptionError(f"Ошибка распознавания ({self.base_url}): {e}") from e
+
+    def close(self) -> None:
+        self._http.close()
+
+
+_client: Optional[WhisperClient] = None
+_client_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_whisper_client() -> WhisperClient:
+    """Возвращает WhisperClient текущего процесса"""
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = WhisperClient()
+                _client_pid = pid
+    return _client
@@ -0,0 +1,379 @@
+"""
+Сервис распознавания речи поверх faster-whisper-server.
+
+- Результаты кэшируются в общем кэше Django по SHA-256 содержимого файла
+  (плюс модель и язык): повторная отправка того же аудио сервер не нагружает.
+- Перед отправкой аудио нормализуется в 16 кГц моно WAV (ai.stt.audio), длинная тишина
+  вырезается VAD (ai.stt.vad); метки слов возвращаются на шкалу исходной записи.
+- Короткие клипы (до STT_BATCH_MAX_CLIP_SECONDS) склеиваются через паузы тишины
+  в один запрос до STT_BATCH_MAX_SECONDS; ответ с временными метками слов
+  разрезается обратно по клипам. У OpenAI-совместимого API нет пакетного
+  эндпоинта, поэтому пакет — это одна склеенная запись: число запросов к серверу
+  падает пропорционально размеру пакета.
+- Пакеты и одиночные файлы отправляются параллельно (до STT_MAX_CONNECTIONS).
+- Длинные ответы режутся на перекрывающиеся сегменты (STT_SEGMENT_SECONDS), которые
+  распознаются в том же пуле потоков (общий предел STT_MAX_CONNECTIONS, как у пула
+  соединений httpx) и сшиваются по меткам слов; по мере готовности сегментов
+  вызывающий получает частичный транскрипт (on_partial).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ai.stt.audio import PcmAudio, normalize_audio
+from ai.stt.client import TranscriptionError, WhisperClient, get_whisper_client
+from ai.stt.vad import TrimmedAudio, segment_bounds, split_segments, trim_silence
+
+logger = logging.getLogger(__name__)
+
+# (содержимое файла, имя файла)
+AudioInput = Tuple[bytes, str]
+# (индекс во входном списке, частичный транскрипт)
+PartialCallback = Callable[[int, str], None]
+
+
+@dataclass
+class TranscriptWord:
+    word: str
+    start: float
+    end: float
+
+
+@dataclass
+class Transcription:
+    text: str
+    words: List[TranscriptWord] = field(default_factory=list)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_cache(self) -> Dict[str, Any]:
+        return {"text": self.text, "words": [asdict(word) for word in self.words], "duration": self.duration}
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "Transcription":
+        return cls(
+            text=data["text"],
+            words=[TranscriptWord(**word) for word in data.get("words", [])],
+            duration=data.get("duration"),
+        )
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], duration: Optional[float] = None) -> "Transcription":
+        return cls(
+            text=(payload.get("text") or "").strip(),
+            words=parse_words(payload) or [],
+            duration=payload.get("duration", duration),
+        )
+
+
+def parse_words(payload: Dict[str, Any]) -> Optional[List[TranscriptWord]]:
+    """Слова с метками из verbose_json (на верхнем уровне или внутри segments); None — меток нет"""
+    raw_words = payload.get("words")
+    if raw_words is None and payload.get("segments"):
+        raw_words = [word for segment in payload["segments"] for word in segment.get("words") or []]
+    if raw_words is None:
+        return None
+    return [
+        TranscriptWord(word=item["word"], start=float(item["start"]), end=float(item["end"]))
+        for item in raw_words
+    ]
+
+
+def join_words(words: Sequence[TranscriptWord]) -> str:
+    """Whisper отдаёт слова с ведущими пробелами (" Hello")"""
+    return "".join(word.word for word in words).strip()
+
+
+class LongRecording:
+    """
+    Сшивание сегментов длинной записи по мере готовности.
+    Частичный транскрипт — сшитый префикс из сегментов, готовых подряд с начала записи.
+    """
+
+    def __init__(self, pcm: PcmAudio):
+        self.pcm = pcm
+        self.segments = split_segments(pcm.duration)
+        self.bounds = segment_bounds(self.segments)
+        self.segment_words: Dict[int, List[TranscriptWord]] = {}
+        self.stitched: List[TranscriptWord] = []
+        self.next_index = 0
+        self.error: Optional[str] = None
+
+    def add(self, index: int, payload: Dict[str, Any]) -> Optional[str]:
+        """Принимает ответ сервера по сегменту; возвращает новый частичный транскрипт или None"""
+        words = parse_words(payload)
+        if words is None:
+            raise TranscriptionError("Сервер не вернул метки слов — сегменты не сшить")
+        start = self.segments[index][0]
+        lower, upper = self.bounds[index]
+        self.segment_words[index] = [
+            TranscriptWord(word=word.word, start=word.start + start, end=word.end + start)
+            for word in words
+            if lower <= (word.start + word.end) / 2 + start < upper
+        ]
+
+        advanced = False
+        while self.next_index in self.segment_words:
+            self.stitched.extend(self.segment_words.pop(self.next_index))
+            self.next_index += 1
+            advanced = True
+        if advanced and self.next_index < len(self.segments):
+            return join_words(self.stitched)
+        return None
+
+    def result(self) -> Transcription:
+        if self.error is not None:
+            return Transcription(text="", error=self.error)
+        return Transcription(text=join_words(self.stitched), words=self.stitched, duration=self.pcm.duration)
+
+
+class TranscriptionService:
+    """Распознавание голосовых ответов: кэш → нормализация и VAD → микропакеты/сегменты → параллельные запросы"""
+
+    CACHE_PREFIX = "stt"
+
+    def __init__(self, client: Optional[WhisperClient] = None):
+        self.client = client or get_whisper_client()
+        self.max_clip_seconds = settings.STT_BATCH_MAX_CLIP_SECONDS
+        self.max_batch_seconds = settings.STT_BATCH_MAX_SECONDS
+        self.gap_seconds = settings.STT_BATCH_GAP_SECONDS
+
+    def transcribe(self, data: bytes, filename: str = "audio.wav") -> Transcription:
+        return self.transcribe_many([(data, filename)])[0]
+
+    def transcribe_many(
+            self,
+            items: Sequence[AudioInput],
+            on_partial: Optional[PartialCallback] = None,
+    ) -> List[Transcription]:
+        """
+        Результаты в порядке items; ошибки — Transcription.error (не кэшируются).
+        on_partial(индекс, текст) вызывается для длинных записей по мере готовности сегментов
+        (в потоке вызывающего).
+        """
+        keys = [self._cache_key(data) for data, _ in items]
+        results: Dict[str, Transcription] = {
+            key: Transcription.from_cache(value) for key, value in cache.get_many(list(set(keys))).items()
+        }
+
+        pending: Dict[str, AudioInput] = {}
+        for key, item in zip(keys, items):
+            if key not in results:
+                pending.setdefault(key, item)
+
+        if pending:
+            indices: Dict[str, List[int]] = {}
+            for index, key in enumerate(keys):
+                indices.setdefault(key, []).append(index)
+
+            def notify(key: str, text: str) -> None:
+                for index in indices[key]:
+                    on_partial(index, text)
+
+            fresh = self._transcribe_uncached(pending, notify if on_partial else None)
+            cache.set_many(
+                {key: result.to_cache() for key, result in fresh.items() if result.ok},
+                settings.STT_CACHE_TTL,
+            )
+            results.update(fresh)
+
+        logger.info(
+            f"Распознано {len(items)} аудио: из кэша {len(items) - len(pending)}, "
+            f"отправлено {len(pending)}"
+        )
+        return [results[key] for key in keys]
+
+    def _cache_key(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{self.CACHE_PREFIX}:{self.client.model}:{self.client.language}:{digest}"
+
+    # ------------------------------------------------------------------
+    # Распознавание без кэша
+    # ------------------------------------------------------------------
+
+    def _transcribe_uncached(
+            self,
+            pending: Dict[str, AudioInput],
+            on_partial: Optional[Callable[[str, str], None]] = None,
+    ) -> Dict[str, Transcription]:
+        results: Dict[str, Transcription] = {}
+        trimmed: Dict[str, TrimmedAudio] = {}
+        durations: Dict[str, float] = {}
+        raw: List[str] = []
+
+        for key, (data, _) in pending.items():
+            pcm = normalize_audio(data)
+            if pcm is None:
+                raw.append(key)
+                continue
+            durations[key] = pcm.duration
+            trimmed[key] = trim_silence(pcm)
+            if not trimmed[key].pieces:
+                # Речи нет — сервер не нужен
+                results[key] = Transcription(text="", duration=pcm.duration)
+                del trimmed[key]
+
+        short = [
+            (key, audio.pcm) for key, audio in trimmed.items()
+            if audio.pcm.duration <= self.max_clip_seconds
+        ]
+        long = [key for key, audio in trimmed.items() if audio.pcm.duration > self.max_clip_seconds]
+        batches = self._plan_batches(short)
+
+        # Один пул на всё: сегменты длинных записей не открывают вложенных пулов,
+        # поэтому одновременных запросов не больше лимита соединений httpx
+        with ThreadPoolExecutor(max_workers=settings.STT_MAX_CONNECTIONS) as pool:
+            futures = [pool.submit(self._transcribe_batch, batch) for batch in batches if len(batch) > 1]
+            futures += [
+                pool.submit(self._transcribe_single, batch[0][0], pending[batch[0][0]], batch[0][1])
+                for batch in batches if len(batch) == 1
+            ]
+            futures += [pool.submit(self._transcribe_single, key, pending[key], None) for key in raw]
+            recordings = {key: LongRecording(trimmed[key].pcm) for key in long}
+            self._transcribe_long(pool, recordings, on_partial)
+            for future in futures:
+                results.update(future.result())
+        results.update({key: recording.result() for key, recording in recordings.items()})
+
+        # Метки слов — на шкалу исходной записи (до вырезания тишины)
+        for key, audio in trimmed.items():
+            result = results[key]
+            result.duration = durations[key]
+            result.words = [
+                TranscriptWord(word=word.word, start=audio.to_original(word.start), end=audio.to_original(word.end))
+                for word in result.words
+            ]
+        return results
+
+    def _plan_batches(self, clips: List[Tuple[str, PcmAudio]]) -> List[List[Tuple[str, PcmAudio]]]:
+        """Жадная упаковка клипов в пакеты не длиннее STT_BATCH_MAX_SECONDS (с учётом пауз)"""
+        batches: List[List[Tuple[str, PcmAudio]]] = []
+        current: List[Tuple[str, PcmAudio]] = []
+        length = 0.0
+        for key, pcm in clips:
+            added = pcm.duration + (self.gap_seconds if current else 0.0)
+            if current and length + added > self.max_batch_seconds:
+                batches.append(current)
+                current, length, added = [], 0.0, pcm.duration
+            current.append((key, pcm))
+            length += added
+        if current:
+            batches.append(current)
+        return batches
+
+    def _transcribe_single(self, key: str, item: AudioInput, pcm: Optional[PcmAudio]) -> Dict[str, Transcription]:
+        data, filename = item
+        try:
+            if pcm is not None:
+                payload = self.client.transcribe(pcm.to_wav(), word_timestamps=True)
+                return {key: Transcription.from_payload(payload, duration=pcm.duration)}
+            # Не декодировано локально — сервер декодирует исходный файл сам
+            content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            payload = self.client.transcribe(data, filename=filename, content_type=content_type,
+                                             word_timestamps=True)
+            return {key: Transcription.from_payload(payload)}
+        except TranscriptionError as e:
+            logger.error(f"Ошибка распознавания {filename}: {e}")
+            return {key: Transcription(text="", error=str(e))}
+
+    def _transcribe_batch(self, batch: List[Tuple[str, PcmAudio]]) -> Dict[str, Transcription]:
+        """Один запрос на склейку клипов; слова раскладываются по клипам по времени"""
+        gap = PcmAudio.silence(self.gap_seconds)
+        parts: List[PcmAudio] = []
+        spans: List[Tuple[str, float, float]] = []
+        offset = 0.0
+        for index, (key, pcm) in enumerate(batch):
+            if index:
+                parts.append(gap)
+                offset += gap.duration
+            parts.append(pcm)
+            spans.append((key, offset, offset + pcm.duration))
+            offset += pcm.duration
+
+        try:
+            payload = self.client.transcribe(PcmAudio.concat(parts).to_wav(), word_timestamps=True)
+            words = parse_words(payload)
+        except TranscriptionError as e:
+            logger.warning(f"Пакет из {len(batch)} клипов не распознан ({e}), распознаём по одному")
+            payload, words = None, None
+
+        if words is None and (payload is None or (payload.get("text") or "").strip()):
+            # Нет меток слов — разрезать пакет нельзя
+            results: Dict[str, Transcription] = {}
+            for key, pcm in batch:
+                results.update(self._transcribe_single(key, (b"", "audio.wav"), pcm))
+            return results
+
+        per_clip: Dict[str, List[TranscriptWord]] = {key: [] for key, _, _ in spans}
+        margin = self.gap_seconds / 2
+        for word in words or []:
+            middle = (word.start + word.end) / 2
+            key, start, _ = min(
+                spans,
+                key=lambda span: 0.0 if span[1] - margin <= middle <= span[2] + margin
+                else min(abs(middle - span[1]), abs(middle - span[2]))
+            )
+            per_clip[key].append(TranscriptWord(
+                word=word.word,
+                start=max(0.0, word.start - start),
+                end=max(0.0, word.end - start),
+            ))
+
+        durations = {key: pcm.duration for key, pcm in batch}
+        return {
+            key: Transcription(text=join_words(clip_words), words=clip_words, duration=durations[key])
+            for key, clip_words in per_clip.items()
+        }
+
+    def _transcribe_long(
+            self,
+            pool: ThreadPoolExecutor,
+            recordings: Dict[str, LongRecording],
+            on_partial: Optional[Callable[[str, str], None]] = None,
+    ) -> None:
+        """
+        Длинные записи: сегменты распознаются в общем пуле и сшиваются по мере готовности.
+        Ошибка сегмента помечает запись (LongRecording.error), её оставшиеся сегменты отменяются.
+        """
+        futures = {
+            pool.submit(self._transcribe_segment, recording.pcm, start, end): (key, index)
+            for key, recording in recordings.items()
+            for index, (start, end) in enumerate(recording.segments)
+        }
+        for future in as_completed(futures):
+            key, index = futures[future]
+            recording = recordings[key]
+            if recording.error is not None:
+                continue
+            try:
+                partial = recording.add(index, future.result())
+            except TranscriptionError as e:
+                recording.error = str(e)
+                for pending_future, (pending_key, _) in futures.items():
+                    if pending_key == key:
+                        pending_future.cancel()
+                logger.error(f"Ошибка распознавания длинной записи ({len(recording.segments)} сегментов): {e}")
+                continue
+            if partial is not None and on_partial:
+                on_partial(key, partial)
+
+        for recording in recordings.values():
+            if recording.error is None:
+                logger.info(
+                    f"Длинная запись {recording.pcm.duration:.1f} с распознана по {len(recording.segments)} сегментам"
+                )
+
+    def _transcribe_segment(self, pcm: PcmAudio, start: float, end: float) -> Dict[str, Any]:
+        return self.client.transcribe(pcm.slice(start, end).to_wav(), word_timestamps=True)
@@ -0,0 +1,163 @@
+"""
+Детерминированная замена faster-whisper-server для тестов и локальной разработки.
+
+Сервер поднимается в потоке текущего процесса и отвечает на POST /v1/audio/transcriptions
+так же по форме, как настоящий (json / verbose_json с "words"). Вместо распознавания
+каждый участок речи (кадры с энергией выше порога, паузы короче STUB_MIN_PAUSE склеиваются)
+становится «словом» " w<хэш сэмплов участка>" с временными метками участка. Один и тот же
+звук всегда даёт один и тот же текст — и в отдельном запросе, и внутри склеенного пакета.
+
+    with StubWhisperServer() as stub:
+        service = TranscriptionService(client=WhisperClient(base_url=stub.url))
+        ...
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from ai.stt.audio import TARGET_SAMPLE_RATE, PcmAudio, decode_wav, frame_energy
+
+STUB_FRAME_SECONDS = 0.02
+STUB_ENERGY_THRESHOLD = 0.01
+STUB_MIN_PAUSE = 0.3
+
+
+def stub_words(pcm: PcmAudio) -> List[Dict]:
+    """Участки речи → «слова» с метками"""
+    energy = frame_energy(pcm, STUB_FRAME_SECONDS)
+    regions: List[Tuple[int, int]] = []
+    for index, value in enumerate(energy):
+        if value < STUB_ENERGY_THRESHOLD:
+            continue
+        if regions and (index - regions[-1][1]) * STUB_FRAME_SECONDS <= STUB_MIN_PAUSE:
+            regions[-1] = (regions[-1][0], index + 1)
+        else:
+            regions.append((index, index + 1))
+
+    frame = int(STUB_FRAME_SECONDS * TARGET_SAMPLE_RATE)
+    words = []
+    for first, last in regions:
+        samples = pcm.samples[first * frame:last * frame]
+        digest = hashlib.sha1(samples.tobytes()).hexdigest()[:8]
+        words.append({
+            "word": f" w{digest}",
+            "start": round(first * STUB_FRAME_SECONDS, 3),
+            "end": round(last * STUB_FRAME_SECONDS, 3),
+            "probability": 1.0,
+        })
+    return words
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server_version = "StubWhisper/1.0"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json({"status": "ok"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/v1/audio/transcriptions":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        fields, audio = self._parse_multipart(self.rfile.read(length))
+        if audio is None:
+            self._send_json({"detail": "file is required"}, status=422)
+            return
+
+        with self.server.counter_lock:
+            self.server.requests_count += 1
+        pcm = decode_wav(audio)
+        words = stub_words(pcm) if pcm is not None else []
+        text = "".join(word["word"] for word in words).strip()
+
+        if fields.get("response_format") == "verbose_json":
+            self._send_json({
+                "text": text,
+                "language": fields.get("language") or "en",
+                "duration": pcm.duration if pcm is not None else 0.0,
+                "words": words,
+                "segments": [],
+            })
+        else:
+            self._send_json({"text": text})
+
+    def _parse_multipart(self, body: bytes) -> Tuple[Dict[str, str], Optional[bytes]]:
+        """multipart/form-data → (текстовые поля, содержимое поля file)"""
+        match = re.search(r'boundary="?([^";]+)"?', self.headers.get("Content-Type", ""))
+        if not match:
+            return {}, None
+
+        fields: Dict[str, str] = {}
+        audio = None
+        for chunk in body.split(b"--" + match.group(1).encode())[1:]:
+            if chunk.startswith(b"--"):
+                break
+            head, _, value = chunk.lstrip(b"\r\n").partition(b"\r\n\r\n")
+            if value.endswith(b"\r\n"):
+                value = value[:-2]
+            name = re.search(rb'name="([^"]*)"', head)
+            if not name:
+                continue
+            if name.group(1) == b"file":
+                audio = value
+            else:
+                fields[name.group(1).decode()] = value.decode().strip()
+        return fields, audio
+
+    def _send_json(self, payload: Dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWhisperServer:
+    """Stub-сервер на 127.0.0.1 (порт 0 — свободный порт выбирает ОС)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), _StubHandler)
+        self._server.daemon_threads = True
+        self._server.requests_count = 0
+        self._server.counter_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests_count(self) -> int:
+        """Число обработанных запросов распознавания"""
+        return self._server.requests_count
+
+    def start(self) -> "StubWhisperServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-whisper", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "StubWhisperServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,115 @@
+"""
+Предобработка длинных ответов перед распознаванием.
+
+- detect_speech: энергетический VAD — порог между уровнем шума (10-й перцентиль
+  энергии кадров) и уровнем речи (95-й), паузы короче STT_VAD_MIN_SILENCE не режут речь;
+- trim_silence: участки речи склеиваются с короткими паузами STT_VAD_KEEP_PAUSE,
+  длинная тишина (раздумья, паузы в начале/конце) на сервер не отправляется;
+  TrimmedAudio.to_original переводит метки обратно на шкалу исходной записи;
+- split_segments / segment_bounds: запись режется на перекрывающиеся сегменты,
+  которые распознаются параллельно; слова из зоны перекрытия берутся из того сегмента,
+  на чьей половине перекрытия лежит их середина.
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from ai.stt.audio import PcmAudio, frame_energy
+
+VAD_FRAME_SECONDS = 0.03
+VAD_ENERGY_FLOOR = 0.005
+
+
+def detect_speech(pcm: PcmAudio) -> List[Tuple[float, float]]:
+    """Участки речи (start, end) в секундах, с отступами STT_VAD_PADDING"""
+    energy = np.asarray(frame_energy(pcm, VAD_FRAME_SECONDS))
+    if not len(energy):
+        return []
+
+    noise, peak = np.percentile(energy, 10), np.percentile(energy, 95)
+    threshold = max(VAD_ENERGY_FLOOR, noise + (peak - noise) * 0.1)
+    voiced = energy >= threshold
+
+    regions: List[List[float]] = []
+    for index in np.flatnonzero(voiced):
+        start, end = index * VAD_FRAME_SECONDS, (index + 1) * VAD_FRAME_SECONDS
+        if regions and start - regions[-1][1] < settings.STT_VAD_MIN_SILENCE:
+            regions[-1][1] = end
+        else:
+            regions.append([start, end])
+
+    padding = settings.STT_VAD_PADDING
+    padded: List[Tuple[float, float]] = []
+    for start, end in regions:
+        start, end = max(0.0, start - padding), min(pcm.duration, end + padding)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((start, end))
+    return padded
+
+
+@dataclass
+class TrimmedAudio:
+    """Запись без длинной тишины и карта фрагментов (начало в обрезанной записи, начало в исходной)"""
+    pcm: PcmAudio
+    pieces: List[Tuple[float, float]]
+
+    def to_original(self, seconds: float) -> float:
+        if not self.pieces:
+            return seconds
+        starts = [trimmed for trimmed, _ in self.pieces]
+        index = max(0, bisect.bisect_right(starts, seconds) - 1)
+        trimmed_start, original_start = self.pieces[index]
+        return original_start + (seconds - trimmed_start)
+
+
+def trim_silence(pcm: PcmAudio) -> TrimmedAudio:
+    regions = detect_speech(pcm)
+    if not regions:
+        return TrimmedAudio(pcm=PcmAudio.silence(0), pieces=[])
+
+    pause = PcmAudio.silence(settings.STT_VAD_KEEP_PAUSE)
+    parts: List[PcmAudio] = []
+    pieces: List[Tuple[float, float]] = []
+    position = 0.0
+    for index, (start, end) in enumerate(regions):
+        if index:
+            parts.append(pause)
+            position += pause.duration
+        fragment = pcm.slice(start, end)
+        parts.append(fragment)
+        pieces.append((position, start))
+        position += fragment.duration
+    return TrimmedAudio(pcm=PcmAudio.concat(parts), pieces=pieces)
+
+
+def split_segments(duration: float) -> List[Tuple[float, float]]:
+    """Сегменты по STT_SEGMENT_SECONDS с перекрытием STT_SEGMENT_OVERLAP"""
+    length, overlap = settings.STT_SEGMENT_SECONDS, settings.STT_SEGMENT_OVERLAP
+    if duration <= length:
+        return [(0.0, duration)]
+    segments = []
+    start = 0.0
+    while start < duration:
+        end = min(duration, start + length)
+        segments.append((start, end))
+        if end >= duration:
+            break
+        start = end - overlap
+    return segments
+
+
+def segment_bounds(segments: Sequence[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Для каждого сегмента — интервал [от, до), из которого берутся его слова"""
+    bounds = []
+    for index, (start, end) in enumerate(segments):
+        lower = (start + segments[index - 1][1]) / 2 if index else float("-inf")
+        upper = (segments[index + 1][0] + end) / 2 if index + 1 < len(segments) else float("inf")
+        bounds.append((lower, upper))
+    return bounds
@@ -0,0 +1,230 @@
+"""
+Бэкенды синтеза речи Piper (tts_service/docker-compose.yml).
+
+- WyomingPiperBackend — протокол Wyoming по TCP (rhasspy/wyoming-piper, порт 10200):
+  JSON-заголовок события строкой, затем data и бинарный payload. Соединения держатся
+  в пуле до TTS_MAX_CONNECTIONS и переиспользуются между запросами;
+- PiperHttpBackend — HTTP-сервер piper (POST /synthesize, ответ — WAV), пул httpx;
+- SilentWavBackend — детерминированная тишина длительностью по длине текста,
+  для тестов и локальной разработки без сервера.
+
+Бэкенд создаётся лениво, один на процесс (после fork воркера — заново),
+так же, как engageai_core.redis_client.
+"""
+from __future__ import annotations
+
+import io
+import json
+import os
+import queue
+import socket
+import threading
+import wave
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from django.conf import settings
+
+SILENT_SAMPLE_RATE = 22050
+SILENT_SECONDS_PER_CHAR = 0.06
+
+
+class SynthesisError(Exception):
+    """Сервер синтеза недоступен или вернул ошибку"""
+
+
+def pcm_to_wav(pcm: bytes, rate: int, width: int = 2, channels: int = 1) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(width)
+        wf.setframerate(rate)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class WyomingPiperBackend:
+    """
+    Клиент wyoming-piper с пулом TCP-соединений.
+    Скорость речи у wyoming-piper задаётся при запуске сервера (--length-scale),
+    поэтому speed передаётся только как часть ключа кэша.
+    """
+
+    name = "wyoming"
+
+    def __init__(
+            self,
+            host: Optional[str] = None,
+            port: Optional[int] = None,
+            timeout: Optional[float] = None,
+            max_connections: Optional[int] = None,
+    ):
+        self.host = host or settings.TTS_WYOMING_HOST
+        self.port = port or settings.TTS_WYOMING_PORT
+        self.timeout = timeout or settings.TTS_TIMEOUT
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections or settings.TTS_MAX_CONNECTIONS)
+
+    def synthesize(self, text: str, voice: str, speed: float = 1.0) -> bytes:
+        """Синтезирует фразу, возвращает WAV"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                conn, reused = self._connect(), False
+
+            try:
+                audio = self._request(conn, text, voice)
+            except (OSError, ValueError, SynthesisError) as e:
+                conn.close()
+                if not reused:
+                    raise SynthesisError(f"Ошибка синтеза ({self.host}:{self.port}): {e}") from e
+                # Сервер мог закрыть простаивавшее соединение — повторяем на новом
+                conn = self._connect()
+                try:
+                    audio = self._request(conn, text, voice)
+                except (OSError, ValueError, SynthesisError) as retry_error:
+                    conn.close()
+                    raise SynthesisError(
+                        f"Ошибка синтеза ({self.host}:{self.port}): {retry_error}"
+                    ) from retry_error
+
+            self._idle.put(conn)
+            return audio
+
+    def _connect(self) -> socket.socket:
+        try:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise SynthesisError(f"Сервер синтеза недоступен ({self.host}:{self.port}): {e}") from e
+
+    def _request(self, conn: socket.socket, text: str, voice: str) -> bytes:
+        self._write_event(conn, "synthesize", {"text": text, "voice": {"name": voice}})
+
+        reader = conn.makefile("rb")
+        try:
+            fmt: Dict[str, Any] = {}
+            chunks: List[bytes] = []
+            while True:
+                event_type, data, payload = self._read_event(reader)
+                if event_type == "audio-start":
+                    fmt = data
+                elif event_type == "audio-chunk":
+                    fmt = fmt or data
+                    chunks.append(payload)
+                elif event_type == "audio-stop":
+                    break
+                elif event_type == "error":
+                    raise SynthesisError(data.get("text") or "ошибка сервера")
+        finally:
+            reader.close()
+
+        if not fmt:
+            raise SynthesisError("сервер не вернул аудио")
+        return pcm_to_wav(b"".join(chunks), fmt["rate"], fmt.get("width", 2), fmt.get("channels", 1))
+
+    @staticmethod
+    def _write_event(conn: socket.socket, event_type: str, data: Dict[str, Any]) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        header = json.dumps({"type": event_type, "data_length": len(body)}).encode()
+        conn.sendall(header + b"\n" + body)
+
+    @staticmethod
+    def _read_event(reader) -> Tuple[str, Dict[str, Any], bytes]:
+        line = reader.readline()
+        if not line:
+            raise SynthesisError("соединение закрыто сервером")
+        header = json.loads(line)
+        data = header.get("data") or {}
+        if header.get("data_length"):
+            data.update(json.loads(reader.read(header["data_length"])))
+        payload = reader.read(header["payload_length"]) if header.get("payload_length") else b""
+        return header["type"], data, payload
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class PiperHttpBackend:
+    """HTTP-сервер piper: POST /synthesize {"text", "voice", "length_scale"} → WAV"""
+
+    name = "http"
+
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            timeout: Optional[float] = None,
+            max_connections: Optional[int] = None,
+    ):
+        self.base_url = (base_url or settings.TTS_SERVER_URL).rstrip("/")
+        max_connections = max_connections or settings.TTS_MAX_CONNECTIONS
+        self._http = httpx.Client(
+            base_url=self.base_url,
+            timeout=timeout or settings.TTS_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+    def synthesize(self, text: str, voice: str, speed: float = 1.0) -> bytes:
+        try:
+            response = self._http.post(
+                "/synthesize",
+                json={"text": text, "voice": voice, "length_scale": round(1.0 / speed, 3)},
+                headers={"Accept": "audio/wav"},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            raise SynthesisError(f"Ошибка синтеза ({self.base_url}): {e}") from e
+        return response.content
+
+    def close(self) -> None:
+        self._http.close()
+
+
+class SilentWavBackend:
+    """Тишина длительностью SILENT_SECONDS_PER_CHAR на символ (с учётом скорости)"""
+
+    name = "silent"
+
+    def __init__(self):
+        self.requests_count = 0
+        self._lock = threading.Lock()
+
+    def synthesize(self, text: str, voice: str, speed: float = 1.0) -> bytes:
+        with self._lock:
+            self.requests_count += 1
+        frames = int(SILENT_SAMPLE_RATE * SILENT_SECONDS_PER_CHAR * max(1, len(text)) / speed)
+        return pcm_to_wav(b"\x00\x00" * frames, SILENT_SAMPLE_RATE)
+
+    def close(self) -> None:
+        pass
+
+
+BACKENDS = {
+    WyomingPiperBackend.name: WyomingPiperBackend,
+    PiperHttpBackend.name: PiperHttpBackend,
+    SilentWavBackend.name: SilentWavBackend,
+}
+
+_backend = None
+_backend_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def get_tts_backend():
+    """Возвращает бэкенд settings.TTS_BACKEND текущего процесса"""
+    global _backend, _backend_pid
+
+    pid = os.getpid()
+    if _backend is None or _backend_pid != pid:
+        with _lock:
+            if _backend is None or _backend_pid != pid:
+                if settings.TTS_BACKEND not in BACKENDS:
+                    raise SynthesisError(f"Неизвестный TTS_BACKEND: {settings.TTS_BACKEND}")
+                _backend = BACKENDS[settings.TTS_BACKEND]()
+                _backend_pid = pid
+    return _backend
@@ -0,0 +1,130 @@
+"""
+Синтез речи с контентно-адресуемым кэшем.
+
+- Ключ фразы — SHA-256 от (нормализованный текст, голос, скорость); готовый WAV лежит
+  в хранилище по пути TTS_STORAGE_PREFIX/<ключ[:2]>/<ключ>.wav. Повторяющиеся фразы
+  (в разных уроках, заданиях, повторных запусках генерации) синтезируются один раз
+  и хранятся одним файлом.
+- В пределах пакета одинаковые фразы объединяются, недостающие синтезируются
+  параллельно (до TTS_MAX_CONNECTIONS).
+- Запись идемпотентна: если файл с ключом уже появился (параллельный воркер),
+  дубликат удаляется.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage, default_storage
+
+from ai.tts.backends import SynthesisError, get_tts_backend
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+@dataclass(frozen=True)
+class SpeechRequest:
+    text: str
+    voice: str
+    speed: float = 1.0
+
+    @classmethod
+    def build(cls, text: str, voice: Optional[str] = None, speed: Optional[float] = None) -> "SpeechRequest":
+        """Запрос с нормализованным текстом и голосом/скоростью по умолчанию из настроек"""
+        return cls(
+            text=normalize_text(text),
+            voice=voice or settings.TTS_VOICE,
+            speed=round(float(speed or settings.TTS_SPEED), 2),
+        )
+
+    @property
+    def key(self) -> str:
+        raw = json.dumps([self.text, self.voice, self.speed], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @property
+    def storage_name(self) -> str:
+        key = self.key
+        return f"{settings.TTS_STORAGE_PREFIX}/{key[:2]}/{key}.wav"
+
+
+@dataclass
+class SynthesizedSpeech:
+    request: SpeechRequest
+    storage_name: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def key(self) -> str:
+        return self.request.key
+
+
+class SpeechSynthesisService:
+    """Пакетный синтез фраз с кэшем в хранилище"""
+
+    def __init__(self, backend=None, storage: Optional[Storage] = None, max_workers: Optional[int] = None):
+        self.backend = backend or get_tts_backend()
+        self.storage = storage or default_storage
+        self.max_workers = max_workers or settings.TTS_MAX_CONNECTIONS
+
+    def synthesize(self, request: SpeechRequest) -> SynthesizedSpeech:
+        return self.synthesize_many([request])[0]
+
+    def synthesize_many(self, requests: Sequence[SpeechRequest]) -> List[SynthesizedSpeech]:
+        """Результаты в порядке запросов; ошибки синтеза не прерывают пакет"""
+        unique: Dict[str, SpeechRequest] = {}
+        for request in requests:
+            unique.setdefault(request.key, request)
+
+        results: Dict[str, SynthesizedSpeech] = {}
+        missing: List[SpeechRequest] = []
+        for key, request in unique.items():
+            if not request.text:
+                results[key] = SynthesizedSpeech(request=request, error="пустой текст")
+            elif self.storage.exists(request.storage_name):
+                results[key] = SynthesizedSpeech(request=request, storage_name=request.storage_name, cached=True)
+            else:
+                missing.append(request)
+
+        if missing:
+            workers = max(1, min(self.max_workers, len(missing)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+                for request, result in zip(missing, pool.map(self._synthesize_and_store, missing)):
+                    results[request.key] = result
+
+        logger.info(
+            f"TTS: {len(requests)} фраз, {len(unique)} уникальных, синтезировано {len(missing)}",
+            extra={"requested": len(requests), "unique": len(unique), "synthesized": len(missing)},
+        )
+        return [results[request.key] for request in requests]
+
+    def _synthesize_and_store(self, request: SpeechRequest) -> SynthesizedSpeech:
+        try:
+            audio = self.backend.synthesize(request.text, request.voice, request.speed)
+        except SynthesisError as e:
+            logger.error(f"Ошибка синтеза фразы {request.key[:12]}: {e}")
+            return SynthesizedSpeech(request=request, error=str(e))
+
+        name = request.storage_name
+        if not self.storage.exists(name):
+            saved = self.storage.save(name, ContentFile(audio))
+            if saved != name:
+                # Параллельный воркер успел сохранить ту же фразу — оставляем его файл
+                self.storage.delete(saved)
+        return SynthesizedSpeech(request=request, storage_name=name)
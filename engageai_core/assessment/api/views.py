@@ -2,6 +2,7 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.conf import settings
+from django.urls import reverse
 
 from engageai_core.mixins import BotAuthenticationMixin, TelegramUserResolverMixin
 
@@ -257,6 +258,18 @@ class AnswerAPIView(
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Пакет на оценке (chord): бот повторяет этот же запрос, пока не придёт вопрос или итог
+        if expired_flag == "evaluating":
+            return Response(
+                {
+                    "evaluating": True,
+                    "session_id": str(session.id),
+                    "progress_url": reverse("celery_progress:task_status",
+                                            kwargs={"task_id": session.evaluation_job_id}),
+                },
+                status=status.HTTP_202_ACCEPTED
+            )
+
         # Если следующего вопроса нет, завершаем тест
         if not question:
             protocol = finish_assessment(session)
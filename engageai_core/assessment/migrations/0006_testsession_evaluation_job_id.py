@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0005_testanswer_evaluation_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='evaluation_job_id',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='Evaluation Job ID'),
+        ),
+    ]
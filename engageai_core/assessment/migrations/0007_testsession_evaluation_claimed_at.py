@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessment', '0006_testsession_evaluation_job_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='evaluation_claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Evaluation claimed at'),
+        ),
+    ]
@@ -40,6 +40,11 @@ class TestSession(models.Model):
     estimated_level = models.CharField(max_length=2, choices=CEFRLevel.choices,
                                        null=True, blank=True, db_index=True)
     protocol_json = models.JSONField(null=True, blank=True)
+    # Callback chord'а оценки ответов текущего пакета; пока задан — клиент ждёт оценки
+    evaluation_job_id = models.CharField(max_length=255, null=True, blank=True,
+                                         verbose_name="Evaluation Job ID")
+    # Момент постановки оценки: заявка старше ASSESSMENT_EVALUATION_TIMEOUT считается брошенной
+    evaluation_claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Evaluation claimed at")
 
     objects = models.Manager()
 
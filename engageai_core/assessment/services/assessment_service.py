@@ -4,6 +4,13 @@
 Может использоваться как веб-вью, так и DRF или ботами.
 """
 
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from celery import chord
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 
 from curriculum.services.auto_assessment_adapter import AutoAssessorAdapter
@@ -20,7 +27,11 @@ from .test_flow import (
     finalize_session,
 )
 from .process_llm import task_generate_final_report
-from ..tasks import evaluate_answer_to_test_task
+from ..tasks import (
+    evaluate_answer_to_test_task,
+    complete_test_packet_evaluation,
+    release_test_packet_evaluation,
+)
 
 assessment_logger = setup_logger(name=__file__, log_dir="logs/core/assessment", log_file="assessment.log")
 
@@ -79,11 +90,12 @@ def get_next_question_for_session(session: TestSession, source_question_request:
     #     load_questions_for_range(session, low, high)
     #     next_question = get_next_unanswered_question(session)
 
-    if not next_question and can_generate_next_main_packet(session):
-        low, high = determine_range_from_diagnostic(session)
-        exclude_tasks = [qi.task_id for qi in session.questions.all() if qi.task]
-        load_questions_for_range(session, low, high, exclude_tasks)
-        next_question = get_next_unanswered_question(session)
+    # Пакет отвечен полностью: следующий пакет (или завершение) готовит callback chord'а оценки
+    if not next_question and not session.finished_at:
+        if evaluation_in_progress(session) or schedule_packet_evaluation(session):
+            assessment_logger.debug(f"TestSession {session.id} ожидает оценки пакета "
+                                    f"(job={session.evaluation_job_id})")
+            return None, "evaluating"
 
     assessment_logger.debug(f"TestSession {session.id} выдан вопрос {next_question}")
 
@@ -151,11 +163,8 @@ def submit_answer(
             answered_at=timezone.now()
         )
 
-        result = evaluate_answer_to_test_task.delay(
-            test_answer_id=test_answer.pk,
-            user_id=user.id,
-            test_session_id=session.id
-        )
+    # Ответы оцениваются одним chord'ом, когда отвечен весь пакет
+    schedule_packet_evaluation(session)
     #
     # if task.response_format in AutoAssessorAdapter.SUPPORTED_FORMATS:
     #     result = auto_adapter.assess_task(task, test_answer)
@@ -166,6 +175,102 @@ def submit_answer(
     return test_answer
 
 
+def schedule_packet_evaluation(session: TestSession) -> Optional[str]:
+    """
+    Ставит оценку ответов пакета одним chord'ом, когда в пакете не осталось вопросов без ответа.
+    Заголовок — evaluate_answer_to_test_task по каждому неоценённому ответу (выполняются
+    параллельно), callback — complete_test_packet_evaluation. Id callback'а сохраняется
+    в TestSession.evaluation_job_id до постановки chord'а, повторная постановка исключена
+    условным UPDATE. Возвращает id callback'а или None, если ставить нечего.
+
+    Заявка снимается callback'ом, errback'ом release_test_packet_evaluation (упало задание
+    заголовка или callback), здесь же — если chord не удалось отправить; заявка старше
+    ASSESSMENT_EVALUATION_TIMEOUT (потерянная задача) перехватывается заново.
+    """
+    if get_next_unanswered_question(session):
+        return None
+
+    job_id = str(uuid.uuid4())
+    now = timezone.now()
+    claimed = TestSession.objects.filter(
+        Q(evaluation_job_id__isnull=True) | Q(evaluation_claimed_at__lt=_stale_claim_before(now)) |
+        Q(evaluation_claimed_at__isnull=True),
+        pk=session.pk,
+        finished_at__isnull=True,
+    ).update(evaluation_job_id=job_id, evaluation_claimed_at=now)
+    if not claimed:
+        return None
+    session.evaluation_job_id = job_id
+    session.evaluation_claimed_at = now
+
+    answer_ids = TestAnswer.objects.filter(
+        question__session=session,
+        evaluation_status="pending",
+    ).values_list("pk", flat=True)
+    header = [
+        evaluate_answer_to_test_task.si(
+            test_answer_id=str(answer_id),
+            user_id=session.user_id,
+            test_session_id=str(session.id),
+        )
+        for answer_id in answer_ids
+    ]
+    callback = complete_test_packet_evaluation.si(test_session_id=str(session.id)).set(task_id=job_id)
+    callback.on_error(release_test_packet_evaluation.si(test_session_id=str(session.id), job_id=job_id))
+
+    try:
+        if header:
+            chord(header)(callback)
+        else:
+            callback.apply_async()
+    except Exception:
+        # Брокер недоступен: без снятия заявки сессия ждала бы оценки до истечения таймаута
+        TestSession.objects.filter(pk=session.pk, evaluation_job_id=job_id).update(
+            evaluation_job_id=None,
+            evaluation_claimed_at=None,
+        )
+        session.evaluation_job_id = None
+        session.evaluation_claimed_at = None
+        assessment_logger.exception(f"TestSession {session.id}: не удалось поставить оценку пакета")
+        raise
+
+    assessment_logger.info(f"TestSession {session.id}: оценка пакета из {len(header)} ответов, job={job_id}")
+    return job_id
+
+
+def evaluation_in_progress(session: TestSession) -> bool:
+    """Оценка пакета поставлена и заявка не устарела"""
+    return bool(session.evaluation_job_id) and (
+        session.evaluation_claimed_at is not None
+        and session.evaluation_claimed_at >= _stale_claim_before(timezone.now())
+    )
+
+
+def _stale_claim_before(now):
+    return now - timedelta(seconds=settings.ASSESSMENT_EVALUATION_TIMEOUT)
+
+
+def advance_session_after_evaluation(session_id) -> None:
+    """
+    Продвигает TestSession после оценки пакета (callback chord'а):
+    загружает следующий пакет по вилке уровней или завершает тест.
+    """
+    session = TestSession.objects.get(pk=session_id)
+    if not session.is_active():
+        return
+
+    if can_generate_next_main_packet(session):
+        low, high = determine_range_from_diagnostic(session)
+        exclude_tasks = list(
+            session.questions.filter(task__isnull=False).values_list("task_id", flat=True)
+        )
+        load_questions_for_range(session, low, high, exclude_tasks)
+        assessment_logger.info(f"TestSession {session.id}: загружен пакет [{low}-{high}]")
+    else:
+        finish_assessment(session)
+        assessment_logger.info(f"TestSession {session.id}: тест завершён после оценки ответов")
+
+
 def finish_assessment(session):
     """Финализирует сессию и генерирует рекомендации через LLM"""
     if not session.finished_at:
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from django.conf import settings
 from ai_assistant.models import AIAssistant
 from chat.models import Chat, ChatPlatform, Message, MessageSource
+from chat.services.interfaces.telegram_identity_service import TelegramIdentityService
 from utils.setup_logger import setup_logger
 
 core_api_logger = setup_logger(name=__name__, log_dir="logs/core_api", log_file="telegram_service.log")
@@ -35,11 +36,7 @@ class TelegramAssessmentService:
         if not incoming_message_id:
             return None
 
-        return Message.objects.filter(
-            source_type=MessageSource.TELEGRAM,
-            metadata__telegram__message_id=incoming_message_id,
-            chat=chat
-        ).first()
+        return TelegramIdentityService().find_message(chat, incoming_message_id)
 
     def create_question_message(self, user, session, question, incoming_message_id=None, bot=None):
         """Создает сообщение с вопросом в чате"""
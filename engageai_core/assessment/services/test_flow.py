@@ -1,5 +1,4 @@
 import logging
-import time
 import uuid
 from collections import defaultdict
 
@@ -8,6 +7,7 @@ import random
 
 from assessment.models import QuestionInstance, TestSession, TestAnswer, CEFRLevel
 from curriculum.models import Task
+from curriculum.services.task_sampling import TaskSampler
 from users.models import Student
 
 from utils.setup_logger import setup_logger
@@ -25,8 +25,6 @@ MAIN_QUESTIONS_ITERATION_COUNTER = 0
 # общий максимум вопросов
 MAIN_QUESTIONS_LIMIT = DIAGNOSTIC_COUNT + MAIN_QUESTIONS_PACKET_SIZE * MAIN_QUESTIONS_ITERATION_COUNTER
 
-EVALUATION_TIMEOUT_MAX_RETRIES = 10
-
 assessment_logger = setup_logger(name=__file__, log_dir="logs/core/assessment", log_file="assessment.log")
 
 
@@ -59,11 +57,13 @@ def create_diagnostic_questions(session):
     """
     bulk_container = []
 
+    used_task_ids = set()
     for level in DIAGNOSTIC_ORDER * 2:
         print(level)
-        task = pick_random_diagnostic_task(level)
+        task = pick_random_diagnostic_task(level, exclude_ids=used_task_ids)
         print(task)
         if task:
+            used_task_ids.add(task.pk)
             question_instance = QuestionInstance(
                 session=session,
                 task=task,
@@ -83,18 +83,15 @@ def create_diagnostic_questions(session):
     return False
 
 
-def pick_random_diagnostic_task(level: str) -> Task:
+def pick_random_diagnostic_task(level: str, exclude_ids=()) -> Task:
     """Выбор случайного диагностического задания по уровню"""
-    tasks = Task.objects.filter(
-        is_active=True,
-        difficulty_cefr=level
-    ).order_by('?')[:1]  # random
-
-    return tasks.first()
+    return TaskSampler.pick_one([level], exclude_ids=exclude_ids)
 
 
 def determine_range_from_diagnostic(session):
-    """Определяет по оценкам теста примерный уровень пользователя
+    """Определяет по оценкам теста примерный уровень пользователя.
+    Вызывается из callback'а chord'а оценки (assessment.tasks.complete_test_packet_evaluation),
+    когда все ответы пакета уже оценены, — ожидания оценок здесь нет.
     """
     # TODO УРОВНИ ПРИМЕРНЫЕ НУЖНА ПОДСТРОЙКА СПЕЦИАЛИСТОМ или вызов LLM
     NORMALIZED_RANGES = [
@@ -106,19 +103,6 @@ def determine_range_from_diagnostic(session):
     DIAGNOSTIC_ORDER = ["A2", "B1", "B2", "C1"]
 
     answers = TestAnswer.objects.select_related("question__task").filter(question__session=session)
-    for retry in range(EVALUATION_TIMEOUT_MAX_RETRIES):
-        if not answers.filter(evaluation_status="pending").exists():
-            break
-        time.sleep(1)
-    else:
-        # сюда попадаем, если break НЕ сработал
-        logger.warning(
-            "Timeout while waiting for answer evaluation",
-            extra={"session_id": session.id}
-        )
-
-    for ans in answers:
-        print(ans.__dict__)
 
     level_results = defaultdict(list)
 
@@ -165,13 +149,15 @@ def load_questions_for_range(session, low_level: str, high_level: str, exclude_t
     used_skills = set()
     selected_tasks = []
 
-    available_tasks = Task.objects.filter(
-        is_active=True,
-        difficulty_cefr__in=[low_level, high_level],
-    ).exclude(id__in=exclude_tasks).select_related('lesson').distinct()
+    # Случайная выборка с запасом из пулов TaskSampler (без ORDER BY RANDOM())
+    candidates = TaskSampler.sample_tasks(
+        [low_level, high_level],
+        MAIN_QUESTIONS_PACKET_SIZE * 4,
+        exclude_ids=exclude_tasks,
+    )
 
     # Группируем по skillfocus для разнообразия
-    for task in available_tasks.order_by('?'):
+    for task in candidates:
         task_skills = set(task.lesson.skill_focus) if task.lesson else set()
 
         # Если есть непокрытые skills или первый выбор
@@ -182,14 +168,14 @@ def load_questions_for_range(session, low_level: str, high_level: str, exclude_t
             if len(selected_tasks) >= MAIN_QUESTIONS_PACKET_SIZE:
                 break
 
-    # Если не хватило с разными skills - добираем любые
-    while len(selected_tasks) < MAIN_QUESTIONS_PACKET_SIZE:
-        remaining = available_tasks.exclude(
-            id__in=[t.id for t in selected_tasks]
-        ).order_by('?')[:1]
-        if not remaining.exists():
+    # Если не хватило с разными skills - добираем любые из той же выборки
+    selected_ids = {task.id for task in selected_tasks}
+    for task in candidates:
+        if len(selected_tasks) >= MAIN_QUESTIONS_PACKET_SIZE:
             break
-        selected_tasks.append(remaining.first())
+        if task.id not in selected_ids:
+            selected_tasks.append(task)
+            selected_ids.add(task.id)
 
     # Создаем QuestionInstance
     bulk_container = []
@@ -1,32 +1,36 @@
 from celery import shared_task
 
-from assessment.models import TestAnswer
+from assessment.models import TestAnswer, TestSession
 from curriculum.services.auto_assessment_adapter import AutoAssessorAdapter
 from curriculum.services.llm_assessment_adapter import LLMAssessmentAdapter
+from utils.setup_logger import setup_logger
+
+assessment_logger = setup_logger(name=__file__, log_dir="logs/core/assessment", log_file="assessment.log")
 
 
 @shared_task(bind=True)
 def evaluate_answer_to_test_task(
         self,
-        test_answer_id: int,
+        test_answer_id: str,
         user_id: int,
-        test_session_id: int
+        test_session_id: str
 ):
-    """Оценка задания для тестовой сессии"""
-    test_answer = TestAnswer.objects.select_related("question__session", "question__task").get(id=test_answer_id)
-    test_question = test_answer.question
-    task = test_question.task
-
-    auto_adapter = AutoAssessorAdapter()
-    llm_adapter = LLMAssessmentAdapter()
-
+    """
+    Оценка задания для тестовой сессии.
+    Выполняется в заголовке chord'а оценки пакета, поэтому ошибка оценки не пробрасывается:
+    ответ помечается failed, а callback chord'а всё равно запускается.
+    """
+    test_answer = None
     try:
-        print(test_answer)
-        if task.response_format in AutoAssessorAdapter.SUPPORTED_FORMATS:
+        test_answer = TestAnswer.objects.select_related("question__session", "question__task").get(id=test_answer_id)
+        task = test_answer.question.task
+
+        auto_adapter = AutoAssessorAdapter()
+        result = None
+        if AutoAssessorAdapter.can_assess(task):
             result = auto_adapter.assess_task(task, test_answer)
-        else:
-            result = llm_adapter.assess_task(task, test_answer)
-        print(result)
+        if result is None or auto_adapter.needs_escalation(result):
+            result = LLMAssessmentAdapter().assess_task(task, test_answer)
         test_answer.ai_feedback = {
             "task_id": result.task_id,
             "is_correct": result.is_correct,
@@ -39,7 +43,46 @@ def evaluate_answer_to_test_task(
         test_answer.evaluation_status = "success"
 
     except Exception:
+        assessment_logger.exception(
+            f"Ошибка оценки TestAnswer {test_answer_id} (TestSession {test_session_id})"
+        )
+        if test_answer is None:
+            return "failed"
         test_answer.evaluation_status = "failed"
-        raise
-    finally:
+
+    try:
         test_answer.save()
+    except Exception:
+        assessment_logger.exception(f"Не удалось сохранить оценку TestAnswer {test_answer_id}")
+        return "failed"
+
+    return test_answer.evaluation_status
+
+
+@shared_task(bind=True)
+def complete_test_packet_evaluation(self, test_session_id: str):
+    """
+    Callback chord'а оценки пакета ответов TestSession.
+    Все ответы пакета уже оценены: определяет вилку уровней и загружает следующий пакет
+    либо завершает тест. В конце снимает TestSession.evaluation_job_id — клиент,
+    опрашивающий celery_progress:task_status этой задачи, переходит к следующему вопросу.
+    """
+    from assessment.services.assessment_service import advance_session_after_evaluation
+
+    try:
+        advance_session_after_evaluation(test_session_id)
+    finally:
+        release_test_packet_evaluation(test_session_id, self.request.id)
+
+
+@shared_task
+def release_test_packet_evaluation(test_session_id: str, job_id: str) -> int:
+    """
+    Снимает заявку job_id на оценку пакета (errback chord'а: упало задание заголовка
+    или сам callback). Следующий запрос вопроса поставит оценку заново —
+    ответы, оставшиеся pending, будут оценены повторно.
+    """
+    return TestSession.objects.filter(
+        pk=test_session_id,
+        evaluation_job_id=job_id
+    ).update(evaluation_job_id=None, evaluation_claimed_at=None)
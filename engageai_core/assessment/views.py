@@ -13,10 +13,9 @@ from utils.setup_logger import setup_logger
 from .forms import QuestionAnswerForm
 from .models import TestSession, SessionSourceType, QuestionInstance, TestAnswer, TestAnswerMedia
 from .services.assessment_service import start_assessment_for_user, get_next_question_for_session, submit_answer, \
-    finish_assessment
+    finish_assessment, schedule_packet_evaluation
 from .services.presentation_service import AssessmentProgressService
 from .services.test_flow import MAIN_QUESTIONS_LIMIT
-from .tasks import evaluate_answer_to_test_task
 
 assessment_logger = setup_logger(name=__file__, log_dir="logs/core/assessment", log_file="assessment.log")
 
@@ -52,6 +51,12 @@ class QuestionView(LoginRequiredMixin, View):
         )
         if status == "expired":
             return redirect(reverse("assessment:start_test"))
+        if status == "evaluating":
+            # Клиент опрашивает celery_progress:task_status callback'а chord'а оценки
+            return render(request, "assessment/evaluation_pending.html", {
+                "session": session,
+                "task_id": session.evaluation_job_id,
+            })
         if not next_question:
             return redirect(reverse("assessment:finish_view", args=[str(session.id)]))
 
@@ -110,7 +115,7 @@ class QuestionView(LoginRequiredMixin, View):
             task = qinst.task
             if task.response_format == "audio":
                 audio_file = form.cleaned_data["answer"]  # UploadedFile
-                test_answer = TestAnswer.objects.create(
+                TestAnswer.objects.create(
                     question=qinst,
                     audio_file=audio_file,
                 )
@@ -123,17 +128,14 @@ class QuestionView(LoginRequiredMixin, View):
                     answer = json.dumps(form.cleaned_data["answer"])
                 else:
                     answer = form.cleaned_data["answer"].strip()
-                test_answer = TestAnswer.objects.create(
+                TestAnswer.objects.create(
                     question=qinst,
                     response_text=answer,
                     answered_at=timezone.now()
                 )
 
-                result = evaluate_answer_to_test_task.delay(
-                    test_answer_id=test_answer.pk,
-                    user_id=request.user.id,
-                    test_session_id=session.id
-                )
+            # Ответы оцениваются одним chord'ом, когда отвечен весь пакет
+            schedule_packet_evaluation(session)
 
         return redirect(
             reverse("assessment:question_view", args=[str(session_id)])
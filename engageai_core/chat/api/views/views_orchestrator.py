@@ -1,4 +1,3 @@
-import random
 from multiprocessing import AuthenticationError
 from typing import Dict, Any, Optional
 
@@ -16,6 +15,9 @@ from ai_assistant.models import AIAssistant
 from chat.models import ChatPlatform, Chat, Message, ChatScope
 from chat.services.interfaces.chat_service import ChatService
 from chat.services.interfaces.message_service import MessageService
+from curriculum.models.content.response_format import ResponseFormat
+from curriculum.services.task_sampling import TaskSampler
+from users.models import CEFRLevel
 from utils.setup_logger import setup_logger
 
 User = get_user_model()
@@ -121,32 +123,34 @@ class OrchestratorProcessAPIView(BotAuthenticationMixin, TelegramUserResolverMix
         )
         try:
 
-            reply_to_msg = Message.objects.filter(
-                source_type=platform,
-                metadata__telegram__message_id=str(reply_to_message_id),
-                chat=chat
-            ).first()
+            reply_to_msg = None
+            if reply_to_message_id:
+                reply_to_msg = self.message_service.find_message_by_telegram_id(chat, reply_to_message_id)
 
             """Выбор случайного вопроса из уровня"""
-            qs = CEFRQuestion.objects.values_list("id", flat=True)
-            if not qs:
-                return None
-            qid = random.choice(list(qs))
-            task = CEFRQuestion.objects.get(id=qid)
+            task = TaskSampler.pick_one(
+                CEFRLevel.values,
+                formats=[ResponseFormat.SINGLE_CHOICE, ResponseFormat.MULTIPLE_CHOICE],
+            )
+            if task is None:
+                return Response({"error": "No tasks available"}, status=status.HTTP_404_NOT_FOUND)
 
+            options = task.content.get("options") or []
             keyboard_config = None
-            if task.options:
+            if options:
                 keyboard_config = {
                     "type": "inline",
-                    "buttons": [{"text": opt} for opt in task.options],
-                    "layout": [1] * len(task.options)  # одна кнопка в строке
-                    # "layout": [2] * ((len(task.options) + 1) // 2) #  две кнопки в строке
+                    "buttons": [{"text": opt} for opt in options],
+                    "layout": [1] * len(options)  # одна кнопка в строке
+                    # "layout": [2] * ((len(options) + 1) // 2) #  две кнопки в строке
                 }
 
             text = ""
-            if task.type == QuestionType.MCQ:
+            if task.response_format == ResponseFormat.SINGLE_CHOICE:
                 text = "Выберите правильный вариант ответа\n\n"
-            text += task.question_text
+            elif task.response_format == ResponseFormat.MULTIPLE_CHOICE:
+                text = "Выберите правильные варианты ответа\n\n"
+            text += task.content.get("prompt", "")
 
             ai_message = Message.objects.create(
                 chat=chat,
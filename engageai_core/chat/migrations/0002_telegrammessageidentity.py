@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def backfill_telegram_identities(apps, schema_editor):
+    """Переносит message_id / update_id / media_group_id из Message.metadata['telegram'] в колонки"""
+    Message = apps.get_model('chat', 'Message')
+    TelegramMessageIdentity = apps.get_model('chat', 'TelegramMessageIdentity')
+
+    rows = (
+        Message.objects.filter(source_type='telegram')
+        .order_by('pk')
+        .values('pk', 'chat_id', 'external_id', 'metadata')
+        .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    )
+
+    batch = []
+    for row in rows:
+        telegram = (row['metadata'] or {}).get('telegram') or {}
+        raw = telegram.get('raw') or {}
+        if 'callback' in telegram:
+            raw = telegram['callback'].get('message') or {}
+
+        update_id = _to_int(telegram.get('update_id') or telegram.get('first_update_id') or row['external_id'])
+        # callback не получает message_id: он принадлежит исходному сообщению бота
+        telegram_message_id = None if 'callback' in telegram else _to_int(telegram.get('message_id'))
+        media_group_id = telegram.get('media_group_id')
+
+        if update_id is None and telegram_message_id is None and not media_group_id:
+            continue
+
+        batch.append(TelegramMessageIdentity(
+            chat_id=row['chat_id'],
+            message_id=row['pk'],
+            telegram_chat_id=_to_int((raw.get('chat') or {}).get('id')),
+            telegram_message_id=telegram_message_id,
+            update_id=update_id,
+            media_group_id=str(media_group_id) if media_group_id else None,
+        ))
+
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            TelegramMessageIdentity.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+
+    if batch:
+        TelegramMessageIdentity.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramMessageIdentity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telegram_chat_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID чата в Telegram')),
+                ('telegram_message_id', models.BigIntegerField(blank=True, null=True, verbose_name='message_id в Telegram')),
+                ('update_id', models.BigIntegerField(blank=True, null=True, verbose_name='update_id в Telegram')),
+                ('media_group_id', models.CharField(blank=True, max_length=64, null=True, verbose_name='ID альбома в Telegram')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telegram_identities', to='chat.chat', verbose_name='Чат')),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='telegram_identities', to='chat.message', verbose_name='Сообщение')),
+            ],
+            options={
+                'verbose_name': 'Идентификатор Telegram',
+                'verbose_name_plural': 'Идентификаторы Telegram',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='telegrammessageidentity',
+            constraint=models.UniqueConstraint(fields=('chat', 'update_id'), name='unique_telegram_update_per_chat'),
+        ),
+        migrations.AddConstraint(
+            model_name='telegrammessageidentity',
+            constraint=models.UniqueConstraint(fields=('chat', 'telegram_message_id'), name='unique_telegram_message_per_chat'),
+        ),
+        migrations.AddIndex(
+            model_name='telegrammessageidentity',
+            index=models.Index(condition=models.Q(('media_group_id__isnull', False)), fields=['chat', 'media_group_id'], name='telegram_identity_album_idx'),
+        ),
+        migrations.RunPython(backfill_telegram_identities, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_telegrammessageidentity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='Одинаковые файлы разных пользователей хранятся один раз', max_length=64, null=True, verbose_name='SHA-256 содержимого'),
+        ),
+    ]
@@ -9,8 +9,9 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db.models import Q
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
+from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -279,6 +280,14 @@ class MediaFile(models.Model):
 
         return f'chat_media/thumbnails/{instance.message.chat_id}/{timezone.now().strftime("%Y/%m/%d")}/{file_name}'
 
+    def variants_dir(content_hash):
+        """Каталог производных изображений содержимого (общий для дубликатов файла)"""
+        return f'chat_media/variants/{content_hash[:2]}/{content_hash}'
+
+    def variant_path(content_hash, name, extension):
+        """Детерминированный путь производного изображения: миниатюра, превью или размер по запросу"""
+        return f'{MediaFile.variants_dir(content_hash)}/{name}.{extension}'
+
     message = models.ForeignKey('Message', related_name='media_files', on_delete=models.CASCADE)
     file = models.FileField(upload_to=media_upload_path)
     thumbnail = models.ImageField(
@@ -300,11 +309,27 @@ class MediaFile(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     ai_generated = models.BooleanField(default=False)
     thumbnail_generated = models.BooleanField(default=False, verbose_name=_('Миниатюра сгенерирована'))
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name=_('SHA-256 содержимого'),
+        help_text=_('Одинаковые файлы разных пользователей хранятся один раз')
+    )
 
 
     def get_absolute_url(self):
         return self.file.url
 
+    def get_thumbnail_url(self):
+        """Миниатюра: сохранённая или рендерящаяся при первом обращении (chat:media-variant)"""
+        if self.thumbnail:
+            return self.thumbnail.url
+        if self.pk and self.should_generate_thumbnail():
+            return reverse('chat:media-variant', kwargs={'pk': self.pk, 'variant': 'thumb'})
+        return None
+
     def should_generate_thumbnail(self):
         """Проверяет, нужно ли генерировать миниатюру для этого файла"""
         supported_types = ['image', 'photo']
@@ -347,49 +372,21 @@ class MediaFile(models.Model):
         verbose_name_plural = _('Медиафайлы')
 
 
-@receiver(post_save, sender=MediaFile)
-def handle_thumbnail_generation(sender, instance, created, **kwargs):
-    """
-    Обрабатывает генерацию миниатюр асинхронно через Celery
-    """
-    from .tasks import generate_thumbnail_async
-    # Пропускаем если:
-    # 1. Это не новое создание и миниатюра уже есть
-    # 2. Модель уже имеет флаг thumbnail_generated
-    if not created and (instance.thumbnail_generated or instance.thumbnail):
-        return
-
-    # Проверяем, нужно ли генерировать миниатюру
-    if not instance.should_generate_thumbnail():
-        # Атомарно обновляем флаг
-        MediaFile.objects.filter(pk=instance.pk).update(thumbnail_generated=True)
-        return
-
-    # Ставим задачу в очередь Celery
-    try:
-        generate_thumbnail_async.delay(instance.pk)
-        logger.info(f"Задача генерации миниатюры поставлена в очередь для MediaFile ID {instance.pk}")
-    except Exception as e:
-        logger.error(f"Ошибка постановки задачи генерации миниатюры для MediaFile ID {instance.pk}: {str(e)}")
-        # В случае ошибки ставим задачу синхронно (fallback)
-        try:
-
-            generate_thumbnail_async(instance.pk)
-        except Exception as sync_e:
-            logger.error(f"Синхронная генерация миниатюры также не удалась: {str(sync_e)}")
-
-
 @receiver(post_delete, sender=MediaFile)
 def delete_media_files_on_delete(sender, instance, **kwargs):
     """
     Удаляет физические файлы при удалении объекта MediaFile
     """
 
-    def safe_delete(file_field):
+    def safe_delete(file_field, field_name):
         """Безопасное удаление файла"""
         if not file_field:
             return
 
+        # Файл мог быть дедуплицирован по content_hash и используется другими записями
+        if MediaFile.objects.filter(**{field_name: file_field.name}).exists():
+            return
+
         file_path = file_field.path
         if os.path.exists(file_path):
             try:
@@ -399,10 +396,18 @@ def delete_media_files_on_delete(sender, instance, **kwargs):
                 logger.error(f"Ошибка удаления файла {file_path}: {str(e)}")
 
     # Удаляем основной файл
-    safe_delete(instance.file)
+    safe_delete(instance.file, 'file')
 
     # Удаляем миниатюру
-    safe_delete(instance.thumbnail)
+    safe_delete(instance.thumbnail, 'thumbnail')
+
+    # Удаляем производные изображения, если содержимое больше никем не используется
+    if instance.content_hash and not MediaFile.objects.filter(content_hash=instance.content_hash).exists():
+        from chat.services.image_variant_service import ImageVariantService
+        try:
+            ImageVariantService.delete_variants(instance.content_hash, instance.file.storage)
+        except Exception as e:
+            logger.error(f"Ошибка удаления вариантов изображения {instance.content_hash}: {str(e)}")
 
 
 class Message(models.Model):
@@ -560,3 +565,76 @@ class Message(models.Model):
 
         self.metadata['edit_history'] = history
         return history
+
+
+class TelegramMessageIdentity(models.Model):
+    """
+    Идентичность сообщения/апдейта Telegram в типизированных колонках.
+
+    Заменяет поиск по metadata__telegram__* (JSON) для дедупликации апдейтов,
+    поиска сообщения при редактировании, ответах и callback, а также для альбомов.
+    Одна строка — один апдейт (входящий) или одно отправленное ботом сообщение (AI).
+    Альбом — несколько строк с общим media_group_id, ссылающихся на одно Message.
+    """
+    chat = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='telegram_identities',
+        verbose_name=_('Чат')
+    )
+    message = models.ForeignKey(
+        Message,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='telegram_identities',
+        verbose_name=_('Сообщение')
+    )
+    telegram_chat_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('ID чата в Telegram')
+    )
+    telegram_message_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('message_id в Telegram')
+    )
+    update_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('update_id в Telegram')
+    )
+    media_group_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        verbose_name=_('ID альбома в Telegram')
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Идентификатор Telegram')
+        verbose_name_plural = _('Идентификаторы Telegram')
+        constraints = [
+            # NULL не конфликтуют между собой: правки и callback хранятся без telegram_message_id,
+            # AI-сообщения — без update_id
+            models.UniqueConstraint(
+                fields=['chat', 'update_id'],
+                name='unique_telegram_update_per_chat'
+            ),
+            models.UniqueConstraint(
+                fields=['chat', 'telegram_message_id'],
+                name='unique_telegram_message_per_chat'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['chat', 'media_group_id'],
+                name='telegram_identity_album_idx',
+                condition=Q(media_group_id__isnull=False)
+            ),
+        ]
+
+    def __str__(self):
+        return f"Telegram chat={self.telegram_chat_id} message={self.telegram_message_id} update={self.update_id}"
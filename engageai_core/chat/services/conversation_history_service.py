@@ -0,0 +1,177 @@
+import base64
+import csv
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q, QuerySet
+from django.utils import timezone
+
+from chat.models import Message, MessageSource
+
+
+class ConversationHistoryService:
+    """
+    История переписки пользователя с AI-ассистентом для AIConversationHistoryView.
+
+    - Keyset-пагинация (курсор = timestamp + id) по индексу (chat, -timestamp):
+      стоимость страницы не зависит от её номера, OFFSET и COUNT не нужны.
+    - Статистика (всего / AI / первое и последнее обращение) — один агрегирующий
+      запрос, результат кэшируется на STATS_TTL секунд (приблизительное значение).
+    - Экспорт — генераторы строк для StreamingHttpResponse поверх iterator(chunk_size=...),
+      память воркера не зависит от длины переписки.
+    """
+
+    STATS_TTL = 300
+    EXPORT_CHUNK_SIZE = 2000
+    EXPORT_FORMATS = ("json", "jsonl", "csv")
+    CSV_COLUMNS = ("timestamp", "sender", "content", "platform", "metadata")
+
+    # ------------------------------------------------------------------
+    # Курсоры
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def encode_cursor(message: Message) -> str:
+        raw = f"{message.timestamp.isoformat()}|{message.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+        """Возвращает (timestamp, id) или None для пустого/повреждённого курсора"""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            timestamp, pk = raw.rsplit("|", 1)
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    # ------------------------------------------------------------------
+    # Страницы
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_page(
+            cls,
+            queryset: QuerySet,
+            page_size: int,
+            after: Optional[str] = None,
+            before: Optional[str] = None,
+    ) -> dict:
+        """
+        Страница сообщений в хронологическом порядке.
+
+        after  — сообщения строго позже курсора (переход вперёд);
+        before — сообщения строго раньше курсора (переход назад).
+        Без курсоров возвращается первая страница.
+        """
+        after_key = cls.decode_cursor(after)
+        before_key = cls.decode_cursor(before)
+
+        if before_key:
+            ts, pk = before_key
+            qs = queryset.filter(
+                Q(timestamp__lt=ts) | Q(timestamp=ts, pk__lt=pk)
+            ).order_by("-timestamp", "-pk")
+            rows: List[Message] = list(qs[:page_size + 1])
+            has_more = len(rows) > page_size
+            rows = list(reversed(rows[:page_size]))
+            has_previous, has_next = has_more, True
+        else:
+            qs = queryset
+            if after_key:
+                ts, pk = after_key
+                qs = qs.filter(Q(timestamp__gt=ts) | Q(timestamp=ts, pk__gt=pk))
+            qs = qs.order_by("timestamp", "pk")
+            rows = list(qs[:page_size + 1])
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            has_previous = after_key is not None
+
+        return {
+            "messages": rows,
+            "has_next": bool(rows) and has_next,
+            "has_previous": bool(rows) and has_previous,
+            "next_cursor": cls.encode_cursor(rows[-1]) if rows and has_next else None,
+            "previous_cursor": cls.encode_cursor(rows[0]) if rows and has_previous else None,
+        }
+
+    # ------------------------------------------------------------------
+    # Статистика
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_stats(cls, user_id: int, assistant_id: int, chat_ids: Iterable[int]) -> dict:
+        """Статистика переписки одним запросом, с кэшем на STATS_TTL секунд"""
+        cache_key = f"chat:history_stats:{user_id}:{assistant_id}"
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = Message.objects.filter(chat_id__in=list(chat_ids)).aggregate(
+                total_messages=Count("id"),
+                ai_messages=Count("id", filter=Q(is_ai=True)),
+                first_interaction=Min("timestamp"),
+                last_interaction=Max("timestamp"),
+            )
+            stats["user_messages"] = stats["total_messages"] - stats["ai_messages"]
+            cache.set(cache_key, stats, cls.STATS_TTL)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Потоковый экспорт
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _iter_export_rows(cls, queryset: QuerySet, username: str) -> Iterator[dict]:
+        platforms = dict(MessageSource.choices)
+        rows = (
+            queryset.order_by("timestamp", "pk")
+            .values("timestamp", "is_ai", "content", "source_type", "metadata")
+            .iterator(chunk_size=cls.EXPORT_CHUNK_SIZE)
+        )
+        for row in rows:
+            yield {
+                "timestamp": row["timestamp"].isoformat(),
+                "sender": "AI" if row["is_ai"] else username,
+                "content": row["content"],
+                "platform": str(platforms.get(row["source_type"], row["source_type"])),
+                "metadata": row["metadata"],
+            }
+
+    @classmethod
+    def stream_json(cls, queryset: QuerySet, username: str, header: dict) -> Iterator[str]:
+        """JSON того же вида, что и прежний экспорт, но собираемый по частям"""
+        header = dict(header, export_date=timezone.now().isoformat())
+        head = json.dumps(header, ensure_ascii=False, indent=2)
+        yield head[:-2] + ',\n  "conversation": ['
+
+        first = True
+        for row in cls._iter_export_rows(queryset, username):
+            prefix = "\n    " if first else ",\n    "
+            first = False
+            yield prefix + json.dumps(row, ensure_ascii=False)
+
+        yield "\n  ]\n}\n"
+
+    @classmethod
+    def stream_jsonl(cls, queryset: QuerySet, username: str) -> Iterator[str]:
+        """JSON Lines: одно сообщение — одна строка"""
+        for row in cls._iter_export_rows(queryset, username):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    @classmethod
+    def stream_csv(cls, queryset: QuerySet, username: str) -> Iterator[str]:
+        """CSV с заголовком; metadata сериализуется в JSON"""
+
+        class _Echo:
+            def write(self, value):
+                return value
+
+        writer = csv.writer(_Echo())
+        yield "\ufeff"  # BOM для корректного открытия в Excel
+        yield writer.writerow(cls.CSV_COLUMNS)
+        for row in cls._iter_export_rows(queryset, username):
+            row["metadata"] = json.dumps(row["metadata"], ensure_ascii=False)
+            yield writer.writerow([row[column] for column in cls.CSV_COLUMNS])
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+from io import BytesIO
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from redis.exceptions import LockError, RedisError
+
+from chat.models import MediaFile
+from engageai_core.redis_client import get_redis
+
+
+class ImageVariant(NamedTuple):
+    name: str
+    size: Tuple[int, int]
+    format: str
+    quality: int
+    extension: str
+
+
+class ImageVariantService:
+    """
+    Производные изображения (миниатюра, превью, WebP) для MediaFile.
+
+    - Все варианты строятся из одного декодирования исходника: JPEG декодируется
+      сразу в уменьшенном масштабе (Image.draft), остальные форматы грубо
+      уменьшаются Image.reduce до точного ресайза.
+    - Пути вариантов детерминированы и зависят только от SHA-256 содержимого
+      (MediaFile.variant_path: chat_media/variants/ab/abcdef.../thumb.jpg): повторный
+      запуск ничего не пересчитывает, дубликаты файлов разделяют варианты.
+    - Варианты рендерятся при первом обращении (chat:media-variant) либо заранее
+      задачей chat.tasks.generate_image_variants.
+    """
+
+    HASH_CHUNK_SIZE = 256 * 1024
+    SUPPORTED_FORMATS = ("JPEG", "PNG", "GIF", "BMP", "WEBP", "TIFF")
+
+    VARIANTS: Dict[str, ImageVariant] = {
+        "preview": ImageVariant("preview", (1280, 1280), "JPEG", 85, "jpg"),
+        "webp": ImageVariant("webp", (1280, 1280), "WEBP", 80, "webp"),
+        "thumb": ImageVariant("thumb", MediaFile.THUMBNAIL_SIZE, "JPEG", 85, "jpg"),
+    }
+
+    # Форматы вариантов по запросу: расширение -> (формат PIL, качество)
+    FORMATS = {
+        "jpg": ("JPEG", 85),
+        "webp": ("WEBP", 80),
+        "png": ("PNG", 0),
+    }
+    LOCK_TIMEOUT = 60
+    LOCK_WAIT = 30
+
+    # ------------------------------------------------------------------
+    # Варианты и пути
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_variant(cls, spec: str) -> Optional[ImageVariant]:
+        """
+        Вариант по имени ("thumb", "preview", "webp") или по размеру "640x640.webp".
+        Размеры ограничены settings.IMAGE_VARIANT_SIZES, чтобы запросы не порождали
+        произвольное число файлов и рендеров.
+        """
+        if spec in cls.VARIANTS:
+            return cls.VARIANTS[spec]
+
+        match = re.fullmatch(r"(\d+)x(\d+)\.(\w+)", spec)
+        if not match:
+            return None
+        width, height, extension = int(match.group(1)), int(match.group(2)), match.group(3).lower()
+        if extension not in cls.FORMATS:
+            return None
+        if width not in settings.IMAGE_VARIANT_SIZES or height not in settings.IMAGE_VARIANT_SIZES:
+            return None
+        image_format, quality = cls.FORMATS[extension]
+        return ImageVariant(f"{width}x{height}", (width, height), image_format, quality, extension)
+
+    @staticmethod
+    def variant_name(content_hash: str, variant: ImageVariant) -> str:
+        return MediaFile.variant_path(content_hash, variant.name, variant.extension)
+
+    # ------------------------------------------------------------------
+    # Хэш содержимого
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def ensure_content_hash(cls, media_file: MediaFile) -> str:
+        """Считает SHA-256 файла потоково, если он ещё не известен (веб-загрузки, AI-медиа)"""
+        if media_file.content_hash:
+            return media_file.content_hash
+
+        hasher = hashlib.sha256()
+        with media_file.file.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(cls.HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+
+        media_file.content_hash = hasher.hexdigest()
+        MediaFile.objects.filter(pk=media_file.pk).update(content_hash=media_file.content_hash)
+        return media_file.content_hash
+
+    # ------------------------------------------------------------------
+    # Рендер
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _decode(cls, fh, target_size: Tuple[int, int]) -> Image.Image:
+        """Открывает изображение, декодируя его как можно ближе к target_size"""
+        img = Image.open(fh)
+        if img.format not in cls.SUPPORTED_FORMATS:
+            raise ValueError(f"Неподдерживаемый формат изображения {img.format}")
+
+        # Защита от «бомб»: размеры известны до декодирования
+        max_w, max_h = MediaFile.MAX_PROCESSING_SIZE
+        if img.width * img.height > max_w * max_h * 4:
+            raise ValueError(f"Изображение {img.width}x{img.height} слишком велико для обработки")
+
+        # JPEG: декодирование сразу в масштабе 1/2, 1/4 или 1/8 (не меньше target_size)
+        img.draft("RGB", target_size)
+
+        # Остальные форматы: быстрое целочисленное уменьшение перед точным ресайзом
+        factor = min(img.width // (target_size[0] * 2), img.height // (target_size[1] * 2))
+        if factor > 1:
+            img = img.reduce(factor)
+
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        return img
+
+    @classmethod
+    def _encode(cls, img: Image.Image, variant: ImageVariant) -> ContentFile:
+        if variant.format == "JPEG" and img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format=variant.format, quality=variant.quality, optimize=True)
+        return ContentFile(buffer.getvalue())
+
+    @classmethod
+    def render(cls, media_file: MediaFile, variants: Optional[Iterable[ImageVariant]] = None) -> Dict[str, str]:
+        """
+        Строит недостающие варианты за одно декодирование исходника.
+        Возвращает {имя варианта: путь в storage}.
+        """
+        variants = list(variants or cls.VARIANTS.values())
+        content_hash = cls.ensure_content_hash(media_file)
+        storage = media_file.file.storage
+
+        names = {variant.name: cls.variant_name(content_hash, variant) for variant in variants}
+        pending = [variant for variant in variants if not storage.exists(names[variant.name])]
+        if not pending:
+            return names
+
+        # От большего к меньшему: каждый следующий вариант уменьшается из предыдущего
+        pending.sort(key=lambda v: v.size[0] * v.size[1], reverse=True)
+        with media_file.file.open("rb") as fh:
+            current = cls._decode(fh, pending[0].size)
+            for variant in pending:
+                current = current.copy()
+                current.thumbnail(variant.size, Image.LANCZOS)
+                if not storage.exists(names[variant.name]):
+                    storage.save(names[variant.name], cls._encode(current, variant))
+
+        return names
+
+    @classmethod
+    def render_locked(cls, media_file: MediaFile, variant: ImageVariant) -> str:
+        """
+        Рендер одного варианта под Redis-блокировкой: параллельные запросы одного
+        и того же варианта ждут первый рендер, а не повторяют его.
+        Raises redis.exceptions.LockError, если блокировку не удалось получить за LOCK_WAIT.
+        """
+        content_hash = cls.ensure_content_hash(media_file)
+        name = cls.variant_name(content_hash, variant)
+        if media_file.file.storage.exists(name):
+            return name
+
+        try:
+            lock = get_redis().lock(
+                f"chat:image_variant:{content_hash}:{variant.name}.{variant.extension}",
+                timeout=cls.LOCK_TIMEOUT,
+                blocking_timeout=cls.LOCK_WAIT,
+            )
+            acquired = lock.acquire()
+        except RedisError:
+            # Redis недоступен — рендерим без блокировки (результат идемпотентен)
+            return cls.render(media_file, [variant])[variant.name]
+
+        if not acquired:
+            raise LockError(f"Вариант {name} рендерится дольше {cls.LOCK_WAIT} с")
+
+        try:
+            return cls.render(media_file, [variant])[variant.name]
+        finally:
+            try:
+                lock.release()
+            except (LockError, RedisError):
+                pass
+
+    @classmethod
+    def delete_variants(cls, content_hash: str, storage) -> None:
+        """Удаляет все варианты содержимого (когда на него больше не ссылается ни один MediaFile)"""
+        directory = MediaFile.variants_dir(content_hash)
+        try:
+            _, files = storage.listdir(directory)
+        except (FileNotFoundError, NotImplementedError):
+            return
+        for file_name in files:
+            storage.delete(os.path.join(directory, file_name))
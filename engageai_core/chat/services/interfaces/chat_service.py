@@ -1,13 +1,19 @@
 from datetime import datetime
 from typing import Optional, List
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from ai_assistant.models import AIAssistant
 from chat.services.interfaces.base_service import BaseService
 from chat.services.interfaces.exceptions import AssistantNotFoundError, ChatCreationError
 from chat.models import Chat, ChatPlatform, ChatScope, Message
+from engageai_core.local_cache import ProcessLocalTTLCache
 
 User = get_user_model()
 
+# Кэши горячего пути get_or_create_chat; инвалидируются сигналами в chat/signals.py
+assistant_cache = ProcessLocalTTLCache("ai_assistant", ttl=settings.RESOLUTION_CACHE_TTL)
+chat_cache = ProcessLocalTTLCache("chat", ttl=settings.RESOLUTION_CACHE_TTL)
+
 
 class ChatService(BaseService):
     """
@@ -96,6 +102,18 @@ class ChatService(BaseService):
     #         self.logger.exception(f"{api_tag} Ошибка при получении/создании чата: {str(e)}")
     #         raise ChatCreationError(str(e))
 
+    def get_assistant(self, assistant_slug: str, context: str = "") -> AIAssistant:
+        """Активный AI-ассистент по slug (с кэшем в памяти процесса)"""
+        assistant = assistant_cache.get(assistant_slug)
+        if assistant is None:
+            try:
+                assistant = AIAssistant.objects.get(slug=assistant_slug, is_active=True)
+            except AIAssistant.DoesNotExist:
+                self.logger.error(f"{context} Ассистент с slug {assistant_slug} не найден")
+                raise AssistantNotFoundError(assistant_slug)
+            assistant_cache.set(assistant_slug, assistant)
+        return assistant
+
     def get_or_create_chat(
             self,
             user: User,
@@ -113,13 +131,14 @@ class ChatService(BaseService):
         context += f"user={user.id}, platform={platform.value}"
 
         try:
+            chat_cache_key = (user.id, str(platform), str(scope), assistant_slug)
+            chat = chat_cache.get(chat_cache_key)
+            if chat:
+                return chat
+
             assistant = None
             if assistant_slug:
-                try:
-                    assistant = AIAssistant.objects.get(slug=assistant_slug, is_active=True)
-                except AIAssistant.DoesNotExist:
-                    self.logger.error(f"{context} Ассистент с slug {assistant_slug} не найден")
-                    raise AssistantNotFoundError(assistant_slug)
+                assistant = self.get_assistant(assistant_slug, context=context)
 
             # Поиск существующего чата
             chat_query = Chat.objects.filter(
@@ -135,6 +154,7 @@ class ChatService(BaseService):
             chat = chat_query.first()
             if chat:
                 self.logger.debug(f"{context} Найден существующий чат {chat.id}")
+                chat_cache.set(chat_cache_key, chat)
                 return chat
 
             chat_params = {
@@ -151,6 +171,7 @@ class ChatService(BaseService):
 
             chat = Chat.objects.create(**chat_params)
             chat.participants.add(user)
+            chat_cache.set(chat_cache_key, chat)
 
             action = "Создан" if not assistant else f"Создан AI-чат с {assistant.name}"
             self.logger.info(
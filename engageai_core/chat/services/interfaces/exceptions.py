@@ -287,6 +287,15 @@ class MediaProcessingError(ServiceError):
         return context
 
 
+class MediaTooLargeError(MediaProcessingError):
+    """Файл превышает допустимый размер загрузки; повтор не поможет"""
+
+    def __init__(self, size, max_size, media_info=None):
+        self.size = size
+        self.max_size = max_size
+        super().__init__(f"размер {size} байт превышает лимит {max_size} байт", media_info=media_info)
+
+
 class TelegramAPIException(ServiceError):
     """Исключение для ошибок Telegram API"""
 
@@ -0,0 +1,173 @@
+import hashlib
+import mimetypes
+import os
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from requests.exceptions import RequestException
+
+from chat.models import MediaFile, Message
+from chat.services.interfaces.base_service import BaseService
+from chat.services.interfaces.exceptions import MediaTooLargeError
+from chat.services.telegram_bot_services import TelegramBotService
+
+
+class _PartialFile(File):
+    """
+    Докачанный файл для storage.save().
+    FileSystemStorage перемещает файл по temporary_file_path() вместо копирования,
+    остальные хранилища читают его через chunks() — в обоих случаях без загрузки в память.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class MediaIngestionService(BaseService):
+    """
+    Загрузка медиа из Telegram в MediaFile с ограниченным потреблением памяти.
+
+    - размер проверяется до загрузки (по данным апдейта и getFile) и во время потока;
+    - файл читается кусками TELEGRAM_MEDIA_CHUNK_SIZE в settings.MEDIA_PARTIAL_ROOT,
+      SHA-256 считается по ходу загрузки;
+    - при повторе задачи загрузка продолжается с места обрыва (HTTP Range);
+    - файл с уже известным хэшем не сохраняется повторно: новая запись MediaFile
+      ссылается на существующий файл; производные изображения общие по хэшу.
+    """
+
+    def __init__(self, bot_token: str):
+        super().__init__()
+        self.bot_service = TelegramBotService(bot_token)
+        self.max_size = settings.TELEGRAM_MEDIA_MAX_SIZE
+        self.chunk_size = settings.TELEGRAM_MEDIA_CHUNK_SIZE
+
+    def ingest(self, message: Message, file_data: dict) -> MediaFile:
+        """Загружает файл из Telegram и создаёт MediaFile для сообщения (идемпотентно)"""
+        file_id = file_data['file_id']
+
+        existing = MediaFile.objects.filter(message=message, external_id=file_id).first()
+        if existing:
+            return existing
+
+        self._check_size(file_data.get('file_size'), file_data)
+
+        file_info = self.bot_service.get_file(file_id)
+        expected_size = file_info.get('file_size')
+        self._check_size(expected_size, file_data)
+
+        file_path = file_info['file_path']
+        partial_path = self.get_partial_path(message.pk, file_data)
+        content_hash, size = self._download(
+            self.bot_service.get_file_url(file_path),
+            partial_path,
+            expected_size,
+            file_data
+        )
+
+        file_name = os.path.basename(file_path)
+        mime_type = file_data.get('mime_type') or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+
+        media_file = MediaFile(
+            message=message,
+            file_type=file_data['file_type'],
+            mime_type=mime_type,
+            size=size,
+            external_id=file_id,
+            content_hash=content_hash,
+            created_by=message.sender,
+            ai_generated=False,
+            thumbnail_generated=False
+        )
+
+        with transaction.atomic():
+            duplicate = (
+                MediaFile.objects.filter(content_hash=content_hash)
+                .exclude(file='')
+                .order_by('pk')
+                .first()
+            )
+            if duplicate and duplicate.file.storage.exists(duplicate.file.name):
+                media_file.file.name = duplicate.file.name
+                if duplicate.thumbnail:
+                    media_file.thumbnail.name = duplicate.thumbnail.name
+                media_file.thumbnail_generated = duplicate.thumbnail_generated
+                media_file.save()
+                self.logger.info(
+                    f"Медиафайл {file_id} совпадает с MediaFile {duplicate.pk} (sha256={content_hash}), "
+                    f"файл переиспользован"
+                )
+            else:
+                with open(partial_path, 'rb') as fh:
+                    media_file.file.save(file_name, _PartialFile(fh, name=file_name), save=True)
+
+        self.discard_partial(message.pk, file_data)
+        return media_file
+
+    def _check_size(self, size: Optional[int], file_data: dict) -> None:
+        if size and size > self.max_size:
+            raise MediaTooLargeError(size, self.max_size, media_info=file_data)
+
+    def _download(self, url: str, partial_path: str, expected_size: Optional[int],
+                  file_data: dict) -> Tuple[str, int]:
+        """Потоковая загрузка в partial_path с докачкой. Возвращает (sha256, размер)"""
+        hasher = hashlib.sha256()
+        offset = 0
+
+        # Докачка: восстанавливаем хэш по уже загруженной части
+        if os.path.exists(partial_path):
+            with open(partial_path, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(self.chunk_size), b''):
+                    hasher.update(chunk)
+                    offset += len(chunk)
+
+        if expected_size and offset == expected_size:
+            return hasher.hexdigest(), offset
+
+        if expected_size and offset > expected_size:
+            # Частичный файл не соответствует текущему — начинаем заново
+            hasher, offset = hashlib.sha256(), 0
+
+        with self.bot_service.stream_file(url, offset=offset) as response:
+            if offset and response.status_code != 206:
+                # Сервер не поддержал Range — загружаем целиком
+                self.logger.info(f"Range не поддержан для {file_data.get('file_id')}, загрузка с начала")
+                hasher, offset = hashlib.sha256(), 0
+
+            content_length = response.headers.get('Content-Length')
+            if content_length:
+                self._check_size(offset + int(content_length), file_data)
+
+            with open(partial_path, 'ab' if offset else 'wb') as fh:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if not chunk:
+                        continue
+                    offset += len(chunk)
+                    if offset > self.max_size:
+                        fh.close()
+                        os.remove(partial_path)
+                        raise MediaTooLargeError(offset, self.max_size, media_info=file_data)
+                    fh.write(chunk)
+                    hasher.update(chunk)
+
+        if expected_size and offset != expected_size:
+            raise RequestException(
+                f"Неполная загрузка {file_data.get('file_id')}: {offset} из {expected_size} байт"
+            )
+
+        return hasher.hexdigest(), offset
+
+    @staticmethod
+    def get_partial_path(message_id: int, file_data: dict) -> str:
+        """Путь недокачанного файла: стабилен между повторами задачи для одного сообщения"""
+        key = file_data.get('file_unique_id') or hashlib.sha1(file_data['file_id'].encode()).hexdigest()
+        os.makedirs(settings.MEDIA_PARTIAL_ROOT, exist_ok=True)
+        return os.path.join(settings.MEDIA_PARTIAL_ROOT, f"{message_id}_{key}.part")
+
+    @classmethod
+    def discard_partial(cls, message_id: int, file_data: dict) -> None:
+        try:
+            os.remove(cls.get_partial_path(message_id, file_data))
+        except FileNotFoundError:
+            pass
@@ -43,6 +43,8 @@ class MediaService(BaseService):
         """Подготавливает данные для обработки фото"""
         return {
             "file_id": photo_size["file_id"],
+            "file_unique_id": photo_size.get("file_unique_id"),
+            "file_size": photo_size.get("file_size"),
             "file_type": "image",
             "width": photo_size.get("width"),
             "height": photo_size.get("height"),
@@ -61,6 +63,8 @@ class MediaService(BaseService):
 
         return {
             "file_id": document["file_id"],
+            "file_unique_id": document.get("file_unique_id"),
+            "file_size": document.get("file_size"),
             "file_type": file_type,
             "mime_type": mime_type,
             "file_name": file_name,
@@ -71,6 +75,8 @@ class MediaService(BaseService):
         """Подготавливает данные для обработки аудио"""
         return {
             "file_id": audio["file_id"],
+            "file_unique_id": audio.get("file_unique_id"),
+            "file_size": audio.get("file_size"),
             "file_type": "audio",
             "mime_type": audio.get("mime_type", "audio/mpeg"),
             "file_name": audio.get("file_name", "audio"),
@@ -82,6 +88,8 @@ class MediaService(BaseService):
         """Подготавливает данные для обработки видео"""
         return {
             "file_id": video["file_id"],
+            "file_unique_id": video.get("file_unique_id"),
+            "file_size": video.get("file_size"),
             "file_type": "video",
             "mime_type": video.get("mime_type", "video/mp4"),
             "file_name": video.get("file_name", "video"),
@@ -95,6 +103,8 @@ class MediaService(BaseService):
         """Подготавливает данные для обработки стикера"""
         return {
             "file_id": sticker["file_id"],
+            "file_unique_id": sticker.get("file_unique_id"),
+            "file_size": sticker.get("file_size"),
             "file_type": "image",
             "mime_type": "image/webp",
             "file_name": "sticker.webp",
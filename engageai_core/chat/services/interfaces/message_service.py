@@ -5,11 +5,12 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.db.models import F
 from django.http import JsonResponse
-from django.urls import reverse_lazy
+from django.urls import reverse
 from django.utils import timezone
 from chat.models import Message, MessageSource, MessageType, Chat
 from chat.services.interfaces.base_service import BaseService
 from chat.services.interfaces.exceptions import MessageCreationError, MessageException, MessageNotFoundError
+from chat.services.interfaces.telegram_identity_service import TelegramIdentityService
 
 User = get_user_model()
 
@@ -17,6 +18,10 @@ User = get_user_model()
 class MessageService(BaseService):
     """Сервис для работы с сообщениями"""
 
+    def __init__(self):
+        super().__init__()
+        self.identity_service = TelegramIdentityService()
+
     @transaction.atomic
     def create_user_message(
             self,
@@ -94,9 +99,10 @@ class MessageService(BaseService):
             message.save(update_fields=['message_type'])
             self.logger.debug(f"Обновлен тип сообщения {message.pk} на {message.message_type}")
 
-    def get_ajax_response(self, user_message: Message, ai_message: Message) -> JsonResponse:
+    def get_ajax_payload(self, user_message: Message, ai_message: Message) -> dict:
         """
-        Формирует AJAX-ответ для чата с поддержкой медиа
+        Формирует данные AJAX-ответа для чата с поддержкой медиа.
+        Результат JSON-сериализуем (возвращается и из Celery-задачи фонового режима чата).
         """
 
         def serialize_media(media_files):
@@ -106,11 +112,11 @@ class MessageService(BaseService):
                 "type": media.file_type,
                 "mime_type": media.mime_type,
                 "name": os.path.basename(media.file.name),
-                "thumbnail": media.thumbnail.url if media.thumbnail else None,
+                "thumbnail": media.get_thumbnail_url(),
                 "size": media.size
             } for media in media_files.all()]
 
-        response_data = {
+        return {
             'user_message': {
                 "id": user_message.pk,
                 "text": user_message.content,
@@ -120,13 +126,18 @@ class MessageService(BaseService):
             'ai_response': {
                 "id": ai_message.pk,
                 "score": ai_message.score,
-                "request_url": reverse_lazy("chat:ai-message-score", kwargs={"message_pk": ai_message.pk}),
+                "request_url": reverse("chat:ai-message-score", kwargs={"message_pk": ai_message.pk}),
                 "text": ai_message.content,
                 "message_type": ai_message.message_type,
                 "media_files": serialize_media(ai_message.media_files)
             },
         }
-        return JsonResponse(response_data)
+
+    def get_ajax_response(self, user_message: Message, ai_message: Message) -> JsonResponse:
+        """
+        Формирует AJAX-ответ для чата с поддержкой медиа
+        """
+        return JsonResponse(self.get_ajax_payload(user_message, ai_message))
 
     @transaction.atomic
     def update_ai_message_metadata(
@@ -153,6 +164,7 @@ class MessageService(BaseService):
         fields_to_update = ["content", "metadata", "timestamp"] if message.content != content else ["metadata",
                                                                                                     "timestamp"]
         message.save(update_fields=fields_to_update)
+        self.identity_service.register_message(message.chat, message, telegram_message_id)
 
         return message
 
@@ -215,11 +227,7 @@ class MessageService(BaseService):
             telegram_message_id: Union[str, int]
     ) -> Optional[Message]:
         """Находит сообщение по Telegram message_id в указанном чате"""
-        return Message.objects.filter(
-            source_type=MessageSource.TELEGRAM,
-            metadata__telegram__message_id=str(telegram_message_id),
-            chat=chat
-        ).first()
+        return self.identity_service.find_message(chat, telegram_message_id)
 
     @transaction.atomic
     def create_telegram_ai_message(
@@ -237,7 +245,7 @@ class MessageService(BaseService):
             "raw": metadata or {}
         }
 
-        return Message.objects.create(
+        message = Message.objects.create(
             chat=chat,
             content=content,
             is_ai=True,
@@ -246,6 +254,8 @@ class MessageService(BaseService):
             reply_to=reply_to,
             metadata={"telegram": telegram_metadata}
         )
+        self.identity_service.register_message(chat, message, telegram_message_id)
+        return message
 
     def find_message_by_telegram_id(self, chat: Chat, telegram_message_id: str) -> Optional[Message]:
         """
@@ -254,11 +264,7 @@ class MessageService(BaseService):
         Returns:
             Message или None, если не найдено
         """
-        return Message.objects.filter(
-            chat=chat,
-            source_type=MessageSource.TELEGRAM,
-            metadata__telegram__message_id=str(telegram_message_id)
-        ).first()
+        return self.identity_service.find_message(chat, telegram_message_id)
 
     def get_album_message(self, chat: Chat, media_group_id: str) -> Optional[Message]:
         """
@@ -267,12 +273,7 @@ class MessageService(BaseService):
         Returns:
             Message или None, если не найдено
         """
-        return Message.objects.filter(
-            chat=chat,
-            source_type=MessageSource.TELEGRAM,
-            metadata__telegram__media_group_id=str(media_group_id),
-            external_id__startswith="album_"
-        ).first()
+        return self.identity_service.find_album_message(chat, media_group_id)
 
     def create_album_message(
             self,
@@ -0,0 +1,101 @@
+from typing import Optional, Union
+
+from django.db import connection
+from django.utils import timezone
+
+from chat.models import Chat, Message, TelegramMessageIdentity
+from chat.services.interfaces.base_service import BaseService
+
+
+class TelegramIdentityService(BaseService):
+    """
+    Идентичность сообщений Telegram (update_id / message_id / media_group_id).
+
+    Все поиски идут по уникальным индексам TelegramMessageIdentity
+    (chat, update_id) и (chat, telegram_message_id), без обращения к JSON metadata.
+    Приём апдейта — INSERT ... ON CONFLICT DO NOTHING: повторная доставка того же
+    update_id (или message_id) не создаёт строку, и это единственная проверка дубликата.
+    """
+
+    _CLAIM_SQL = """
+        INSERT INTO {table} (chat_id, update_id, telegram_chat_id, telegram_message_id, media_group_id, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """
+
+    @staticmethod
+    def _to_int(value) -> Optional[int]:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def claim_update(
+            self,
+            chat: Chat,
+            update_id: Union[str, int],
+            telegram_chat_id: Optional[Union[str, int]] = None,
+            telegram_message_id: Optional[Union[str, int]] = None,
+            media_group_id: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Регистрирует апдейт. Возвращает id новой записи или None, если апдейт
+        (или входящее сообщение с тем же message_id) уже был принят.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                self._CLAIM_SQL.format(table=TelegramMessageIdentity._meta.db_table),
+                [
+                    chat.pk,
+                    self._to_int(update_id),
+                    self._to_int(telegram_chat_id),
+                    self._to_int(telegram_message_id),
+                    str(media_group_id) if media_group_id else None,
+                    timezone.now(),
+                ]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def attach(identity_id: int, message: Union[Message, int]) -> None:
+        """Связывает принятый апдейт с созданным (или найденным) сообщением"""
+        message_pk = message.pk if isinstance(message, Message) else message
+        TelegramMessageIdentity.objects.filter(pk=identity_id).update(message_id=message_pk)
+
+    def register_message(self, chat: Chat, message: Message, telegram_message_id: Union[str, int]) -> None:
+        """Фиксирует message_id, полученный ботом при отправке сообщения (AI-ответы)"""
+        telegram_message_id = self._to_int(telegram_message_id)
+        if telegram_message_id is None:
+            return
+        TelegramMessageIdentity.objects.bulk_create(
+            [TelegramMessageIdentity(chat=chat, message=message, telegram_message_id=telegram_message_id)],
+            ignore_conflicts=True
+        )
+
+    def find_message(
+            self,
+            chat: Chat,
+            telegram_message_id: Union[str, int],
+            is_ai: Optional[bool] = None
+    ) -> Optional[Message]:
+        """Находит сообщение по Telegram message_id в чате"""
+        telegram_message_id = self._to_int(telegram_message_id)
+        if telegram_message_id is None:
+            return None
+        queryset = Message.objects.filter(
+            telegram_identities__chat=chat,
+            telegram_identities__telegram_message_id=telegram_message_id
+        )
+        if is_ai is not None:
+            queryset = queryset.filter(is_ai=is_ai)
+        return queryset.first()
+
+    @staticmethod
+    def find_album_message(chat: Chat, media_group_id: str) -> Optional[Message]:
+        """Находит сообщение, в которое собирается альбом"""
+        return Message.objects.filter(
+            telegram_identities__chat=chat,
+            telegram_identities__media_group_id=str(media_group_id)
+        ).first()
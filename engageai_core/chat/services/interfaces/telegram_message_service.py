@@ -164,12 +164,9 @@ class TelegramMessageService(BaseService):
             )
 
             # 2. Проверяем на дубликаты
-            existing_message = Message.objects.filter(
-                source_type=MessageSource.TELEGRAM,
-                metadata__telegram__message_id=str(telegram_message_id),
-                chat=chat,
-                is_ai=True
-            ).first()
+            existing_message = self.message_service.identity_service.find_message(
+                chat, telegram_message_id, is_ai=True
+            )
 
             if existing_message:
                 self.logger.info(
@@ -15,10 +15,13 @@ User = get_user_model()
 class TelegramUpdateService(BaseService):
     """Сервис для обработки Telegram-апдейтов"""
 
+    SUPPORTED_UPDATE_TYPES = ("message", "edited_message", "callback_query")
+
     def __init__(self):
         super().__init__()
         self.chat_service = ChatService()
         self.message_service = MessageService()
+        self.identity_service = self.message_service.identity_service
         self.media_service = MediaService()
         self.callback_service = CallbackService()
 
@@ -50,39 +53,57 @@ class TelegramUpdateService(BaseService):
             self.logger.warning(f"{bot_tag} Отсутствует 'update_id' в апдейте")
             raise TelegramAPIException("Missing update data", status_code=400)
 
-        # Проверка дубликата
-        if Message.objects.filter(external_id=str(update_id), source_type=MessageSource.TELEGRAM).exists():
-            self.logger.info(f"{bot_tag} Апдейт {update_id} уже обработан")
-            return {"core_message_id": None, "duplicate": True}
+        if not any(key in update_data for key in self.SUPPORTED_UPDATE_TYPES):
+            raise TelegramAPIException(f"Unsupported update type: {list(update_data.keys())}")
 
         try:
             self.logger.debug(f"{bot_tag} Начало обработки апдейта {update_id}, типы: {list(update_data.keys())}")
 
+            # Получаем чат через сервис
+            chat = self.chat_service.get_or_create_chat(
+                user=user,
+                platform=ChatPlatform.TELEGRAM,
+                scope=ChatScope.PRIVATE,
+                assistant_slug=assistant_slug,
+                api_tag=bot_tag
+            )
+
+            # Проверка дубликата: INSERT ... ON CONFLICT DO NOTHING по (chat, update_id)
+            identity_id = self.identity_service.claim_update(
+                chat,
+                update_id,
+                **self._extract_identity(update_data)
+            )
+            if identity_id is None:
+                self.logger.info(f"{bot_tag} Апдейт {update_id} уже обработан")
+                return {"core_message_id": None, "duplicate": True}
+
             if "message" in update_data:
-                return self._process_message(
+                result = self._process_message(
+                    chat,
                     update_data["message"],
                     update_id,
                     bot_tag,
-                    assistant_slug,
                     user
                 )
             elif "edited_message" in update_data:
-                return self._process_edited_message(
+                result = self._process_edited_message(
+                    chat,
                     update_data["edited_message"],
                     bot_tag,
-                    assistant_slug,
                     user
                 )
-            elif "callback_query" in update_data:
-                return self._process_callback(
+            else:
+                result = self._process_callback(
+                    chat,
                     update_data["callback_query"],
                     update_id,
                     bot_tag,
-                    assistant_slug,
                     user
                 )
-            else:
-                raise TelegramAPIException(f"Unsupported update type: {list(update_data.keys())}")
+
+            self.identity_service.attach(identity_id, result["core_answer"]["core_message_id"])
+            return result
 
         except ServiceError:
             # Пробрасываем кастомные исключения дальше
@@ -91,21 +112,32 @@ class TelegramUpdateService(BaseService):
             self.logger.exception(f"{bot_tag} Непредвиденная ошибка при обработке апдейта {update_id}: {str(e)}")
             raise TelegramAPIException(f"Internal server error: {str(e)}")
 
-    def _process_message(self, message_data: dict, update_id: int, bot_tag: str, assistant_slug: str,
-                         user: User) -> dict:
+    @staticmethod
+    def _extract_identity(update_data: dict) -> dict:
+        """
+        Типизированные идентификаторы апдейта для TelegramMessageIdentity.
+
+        message_id фиксируется только для новых сообщений: у правки он совпадает
+        с исходным сообщением, у callback принадлежит сообщению бота.
+        """
+        if "message" in update_data:
+            message_data = update_data["message"]
+            return {
+                "telegram_chat_id": message_data.get("chat", {}).get("id"),
+                "telegram_message_id": message_data.get("message_id"),
+                "media_group_id": message_data.get("media_group_id"),
+            }
+        if "edited_message" in update_data:
+            message_data = update_data["edited_message"]
+        else:
+            message_data = update_data["callback_query"].get("message", {})
+        return {"telegram_chat_id": message_data.get("chat", {}).get("id")}
+
+    def _process_message(self, chat: Chat, message_data: dict, update_id: int, bot_tag: str, user: User) -> dict:
         """Обработка обычного сообщения с поддержкой альбомов"""
         try:
             media_group_id = message_data.get("media_group_id")
 
-            # Получаем чат через сервис
-            chat = self.chat_service.get_or_create_chat(
-                user=user,
-                platform=ChatPlatform.TELEGRAM,
-                scope=ChatScope.PRIVATE,
-                assistant_slug=assistant_slug,
-                api_tag=bot_tag
-            )
-
             message = None
             if media_group_id:
                 # Обработка альбома
@@ -219,20 +251,11 @@ class TelegramUpdateService(BaseService):
             self.logger.exception(f"Ошибка обработки обычного сообщения: {str(e)}")
             raise
 
-    def _process_edited_message(self, edited_data: dict, bot_tag: str, assistant_slug: str, user: 'User') -> dict:
+    def _process_edited_message(self, chat: Chat, edited_data: dict, bot_tag: str, user: 'User') -> dict:
         """Обработка отредактированного сообщения"""
         message_id = str(edited_data.get("message_id", ""))
         new_text = edited_data.get("text", "")
 
-        # Получаем чат через сервис
-        chat = self.chat_service.get_or_create_chat(
-            user=user,
-            assistant_slug=assistant_slug,
-            platform=ChatPlatform.TELEGRAM,
-            scope=ChatScope.PRIVATE,
-            api_tag=bot_tag
-        )
-
         # Находим сообщение по Telegram ID
         message = self.message_service.find_message_by_telegram_id(chat, message_id)
         if not message:
@@ -266,18 +289,9 @@ class TelegramUpdateService(BaseService):
             }
         }
 
-    def _process_callback(self, callback_data: dict, update_id: int, bot_tag: str, assistant_slug: str,
+    def _process_callback(self, chat: Chat, callback_data: dict, update_id: int, bot_tag: str,
                           user: 'User') -> dict:
         """Обработка callback query от inline-кнопок"""
-        # Получаем чат через сервис
-        chat = self.chat_service.get_or_create_chat(
-            user=user,
-            platform=ChatPlatform.TELEGRAM,
-            scope=ChatScope.PRIVATE,
-            assistant_slug=assistant_slug,
-            api_tag=bot_tag
-        )
-
         # Поиск исходного сообщения
         original_message = None
         message_data = callback_data.get("message", {})
@@ -0,0 +1,80 @@
+import markdown
+from django.db import transaction
+
+from ai.llm_service.dtos import GenerationResult
+from ai.orchestrator_v1.orchestrator import UniversalOrchestrator
+from chat.models import Chat, Message, MessageSource
+from chat.services.interfaces.ai_message_service import AiMediaService
+from chat.services.interfaces.base_service import BaseService
+from chat.services.interfaces.message_service import MessageService
+from llm_logger.models import LLMRequestType
+
+
+class WebChatService(BaseService):
+    """
+    Генерация и сохранение ответа AI для веб-чата.
+
+    Используется как синхронно из AiChatView, так и в фоновом режиме
+    из Celery-задачи chat.tasks.process_chat_message_job (settings.CHAT_JOB_MODE).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.message_service = MessageService()
+
+    async def generate_ai_reply(
+            self,
+            user_id: int,
+            user_message: str,
+            message_media: list,
+            message_context: dict
+    ) -> dict:
+        """Обрабатывает запрос к AI и возвращает ответ"""
+        try:
+            o = UniversalOrchestrator()
+            ai_response = await o.route_message(
+                user_id=user_id,
+                user_message=user_message,
+                message_media=message_media,
+                message_context=message_context,
+                request_type=LLMRequestType.CHAT
+            )
+            if isinstance(ai_response, GenerationResult):
+                ai_message = ai_response.response.message
+                ai_message = markdown.markdown(ai_message)
+            else:
+                ai_message = ai_response
+
+            return {
+                'text': ai_message,
+                # 'media': ai_response.get('media_files', [])
+            }
+
+        except Exception as e:
+            self.logger.exception(f"Ошибка при работе с AI: {str(e)}")
+            return {
+                'text': "Извините, сейчас не могу обработать ваш запрос.",
+                'media': []
+            }
+
+    def save_ai_message(self, chat: Chat, user_message: Message, ai_response: dict) -> Message:
+        """Короткая транзакция после вызова LLM: ответ AI и его медиа"""
+        ai_message_text = ai_response['text']
+        # ai_media_data = ai_response['media']
+        ai_media_data = None
+
+        with transaction.atomic():
+            # Создаем сообщение AI
+            ai_message = self.message_service.create_ai_message(
+                chat=chat,
+                content=ai_message_text,
+                reply_to=user_message,
+                source_type=MessageSource.WEB
+            )
+
+            # Асинхронно обрабатываем AI-сгенерированные медиа
+            if ai_media_data:
+                ai_media_service = AiMediaService(chat)
+                ai_media_service.process_ai_media(ai_media_data, ai_message)
+
+        return ai_message
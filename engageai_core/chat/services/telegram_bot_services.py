@@ -1,9 +1,46 @@
+import os
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
 import requests
 from django.conf import settings
 from dotenv import dotenv_values
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    HTTP-сессия к Telegram Bot API, одна на процесс.
+
+    Keep-alive соединения переиспользуются между задачами воркера; getFile и
+    обрывы соединения повторяются адаптером с backoff.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                retry = Retry(
+                    total=3,
+                    backoff_factor=0.5,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=frozenset({"GET"}),
+                    respect_retry_after_header=True,
+                )
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                _session_pid = pid
+    return _session
 
 
 class TelegramBotService:
@@ -12,12 +49,15 @@ class TelegramBotService:
     def __init__(self, bot_token: str):
         self.bot_token = bot_token
         self.base_url = f"https://api.telegram.org/bot{bot_token}"
+        self.session = get_http_session()
+        self.timeout = (settings.TELEGRAM_API_CONNECT_TIMEOUT, settings.TELEGRAM_API_READ_TIMEOUT)
 
     def get_file(self, file_id: str) -> dict:
-        """Получает информацию о файле"""
-        response = requests.get(
+        """Получает информацию о файле (file_path, file_size)"""
+        response = self.session.get(
             f"{self.base_url}/getFile",
-            params={"file_id": file_id}
+            params={"file_id": file_id},
+            timeout=self.timeout
         )
         response.raise_for_status()
         return response.json()["result"]
@@ -26,9 +66,19 @@ class TelegramBotService:
         """Формирует URL для загрузки файла"""
         return f"https://api.telegram.org/file/bot{self.bot_token}/{file_path}"
 
+    def stream_file(self, url: str, offset: int = 0) -> requests.Response:
+        """
+        Открывает потоковую загрузку файла (использовать как контекстный менеджер).
+        offset > 0 — докачка с указанной позиции через заголовок Range.
+        """
+        headers: Optional[dict] = {"Range": f"bytes={offset}-"} if offset else None
+        response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
     def download_file(self, url: str) -> bytes:
-        """Скачивает файл по URL"""
-        response = requests.get(url)
+        """Скачивает файл по URL целиком (только для небольших файлов)"""
+        response = self.session.get(url, timeout=self.timeout)
         response.raise_for_status()
         return response.content
 
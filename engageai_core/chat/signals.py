@@ -0,0 +1,27 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from ai_assistant.models import AIAssistant
+from chat.models import Chat
+from chat.services.interfaces.chat_service import assistant_cache, chat_cache
+
+
+@receiver(post_save, sender=AIAssistant)
+@receiver(post_delete, sender=AIAssistant)
+def invalidate_assistant_cache(sender, instance, **kwargs):
+    # После коммита: иначе другой процесс успеет перечитать и закэшировать старую строку
+    transaction.on_commit(partial(assistant_cache.invalidate, instance.slug))
+    # В закэшированных чатах мог остаться деактивированный ассистент
+    transaction.on_commit(chat_cache.invalidate)
+
+
+@receiver(post_save, sender=Chat)
+@receiver(post_delete, sender=Chat)
+def invalidate_chat_cache(sender, instance, created=False, **kwargs):
+    if created:
+        # Новый чат кладётся в кэш самим ChatService, устаревших записей нет
+        return
+    transaction.on_commit(chat_cache.invalidate)
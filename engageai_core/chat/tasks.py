@@ -1,76 +1,48 @@
-import mimetypes
-import os
-import tempfile
-from io import BytesIO
-from django.core.files import File
-from PIL import Image
-from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+from asgiref.sync import async_to_sync
+from django.conf import settings
 from requests.exceptions import RequestException
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from celery_progress.backend import ProgressRecorder
 from .models import MediaFile
 from chat.services.interfaces.ai_message_service import AiMediaService
-from .services.telegram_bot_services import TelegramBotService
+from chat.services.interfaces.exceptions import MediaTooLargeError
+from chat.services.interfaces.media_ingestion_service import MediaIngestionService
+from chat.services.image_variant_service import ImageVariantService
 
 logger = get_task_logger(__name__)
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
 def process_telegram_media(self, message_id, file_data, bot_token):
     """
-    Фоновая задача для загрузки медиа из Telegram
-    Генерация миниатюр теперь полностью асинхронна через post_save сигнал
+    Фоновая задача для загрузки медиа из Telegram (потоково, с докачкой при повторе)
+    Миниатюры и другие варианты рендерятся при первом обращении (chat:media-variant)
     """
-    try:
-        from .models import Message
-
-        message = Message.objects.get(id=message_id)
-        bot_service = TelegramBotService(bot_token)
+    from .models import Message
 
-        # 1. Получаем информацию о файле от Telegram
-        file_info = bot_service.get_file(file_data['file_id'])
-        file_path = file_info['file_path']
-        file_url = bot_service.get_file_url(file_path)
+    try:
+        message = Message.objects.select_related('sender').get(id=message_id)
+        media_file = MediaIngestionService(bot_token).ingest(message, file_data)
 
-        # 2. Скачиваем файл
-        try:
-            file_content = bot_service.download_file(file_url)
-        except RequestException as e:
-            logger.error(f"Ошибка загрузки файла {file_path}: {str(e)}")
-            raise self.retry(exc=e)
-
-        # 3. Определяем параметры файла
-        file_name = os.path.basename(file_path)
-        mime_type = file_data.get('mime_type') or mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
-        file_size = len(file_content)
-
-        # 4. Создаем запись в БД
-        media_file = MediaFile.objects.create(
-            message=message,
-            file_type=file_data['file_type'],
-            mime_type=mime_type,
-            size=file_size,
-            external_id=file_data['file_id'],
-            created_by=message.sender,
-            ai_generated=False,
-            thumbnail_generated=False  # Явно указываем, что миниатюра не сгенерирована
-        )
-
-        # 5. Сохраняем основной файл
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file_content)
-            temp_file.flush()
-            # Важно: save=True для триггера post_save сигнала
-            media_file.file.save(file_name, File(temp_file), save=True)
-
-        # 6. Генерация миниатюры произойдет автоматически через post_save сигнал
         logger.info(f"Успешно обработан медиафайл {media_file.id} для сообщения {message_id}")
         return media_file.id
 
     except Message.DoesNotExist:
         logger.error(f"Сообщение {message_id} не найдено")
+    except MediaTooLargeError as e:
+        logger.warning(f"Медиафайл {file_data.get('file_id')} сообщения {message_id} не загружен: {str(e)}")
+    except RequestException as e:
+        logger.error(f"Ошибка загрузки файла {file_data.get('file_id')}: {str(e)}")
+        if self.request.retries >= self.max_retries:
+            MediaIngestionService.discard_partial(message_id, file_data)
+        # Недокачанная часть сохраняется — повтор продолжит загрузку с места обрыва
+        raise self.retry(exc=e, countdown=min(30 * 2 ** self.request.retries, 600))
     except Exception as e:
         logger.exception(f"Критическая ошибка обработки медиа: {str(e)}")
+        if self.request.retries >= self.max_retries:
+            MediaIngestionService.discard_partial(message_id, file_data)
         raise self.retry(exc=e)
 
 #
@@ -178,18 +150,20 @@ def process_telegram_media(self, message_id, file_data, bot_token):
 #         logger.error(f"Ошибка при генерации миниатюры: {str(e)}")
 #         return False
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=10)
-def generate_thumbnail_async(self, media_file_id):
+@shared_task(bind=True, max_retries=3, default_retry_delay=10, acks_late=True)
+def generate_image_variants(self, media_file_id):
     """
-    Асинхронная задача для генерации миниатюры изображения
+    Предварительная генерация миниатюры, превью и WebP за одно декодирование
+    (очередь settings.IMAGE_PIPELINE_QUEUE); по умолчанию варианты рендерятся лениво в chat:media-variant.
+    Результаты адресуются хэшем содержимого, поэтому повтор задачи безопасен;
+    acks_late возвращает задачу в очередь при падении воркера.
     """
     try:
-        # Получаем объект MediaFile
         media_file = MediaFile.objects.get(pk=media_file_id)
 
         # Проверяем, нужно ли вообще генерировать миниатюру
-        if media_file.thumbnail_generated or media_file.thumbnail:
-            logger.info(f"Миниатюра для MediaFile ID {media_file_id} уже существует")
+        if media_file.thumbnail_generated:
+            logger.info(f"Варианты для MediaFile ID {media_file_id} уже существуют")
             return
 
         # Проверяем, подходит ли файл для генерации миниатюры
@@ -199,8 +173,8 @@ def generate_thumbnail_async(self, media_file_id):
             return
 
         # Проверяем существование файла
-        if not media_file.file or not os.path.exists(media_file.file.path):
-            logger.warning(f"Файл не существует для MediaFile ID {media_file_id}: {media_file.file.path}")
+        if not media_file.file or not media_file.file.storage.exists(media_file.file.name):
+            logger.warning(f"Файл не существует для MediaFile ID {media_file_id}: {media_file.file.name}")
 
             # Повторяем попытку через некоторое время (файл может еще записываться)
             if self.request.retries < self.max_retries:
@@ -210,115 +184,29 @@ def generate_thumbnail_async(self, media_file_id):
             MediaFile.objects.filter(pk=media_file_id).update(thumbnail_generated=True)
             return
 
-        # Читаем содержимое файла
         try:
-            with open(media_file.file.path, 'rb') as f:
-                file_content = f.read()
-        except IOError as e:
-            logger.error(f"Ошибка чтения файла для MediaFile ID {media_file_id}: {str(e)}")
-            raise self.retry(exc=e)
-
-        # Генерируем миниатюру
-        result = _generate_thumbnail_for_file(media_file, file_content)
-
-        if result:
-            # Обновляем статус в БД
+            variants = ImageVariantService.render(media_file)
+        except (UnidentifiedImageError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Не удалось сгенерировать варианты для MediaFile ID {media_file_id}: {str(e)}")
             MediaFile.objects.filter(pk=media_file_id).update(thumbnail_generated=True)
-            logger.info(f"Миниатюра успешно сгенерирована для MediaFile ID {media_file_id}")
-        else:
-            logger.warning(f"Не удалось сгенерировать миниатюру для MediaFile ID {media_file_id}")
+            return
+
+        MediaFile.objects.filter(pk=media_file_id).update(thumbnail=variants["thumb"], thumbnail_generated=True)
+        logger.info(f"Варианты изображения сгенерированы для MediaFile ID {media_file_id}")
 
     except MediaFile.DoesNotExist:
         logger.error(f"MediaFile с ID {media_file_id} не найден")
     except Exception as e:
-        logger.exception(f"Критическая ошибка генерации миниатюры для MediaFile ID {media_file_id}: {str(e)}")
+        logger.exception(f"Критическая ошибка генерации вариантов для MediaFile ID {media_file_id}: {str(e)}")
         raise self.retry(exc=e)
 
-def _generate_thumbnail_for_file(media_file, original_content):
-    """Внутренняя функция генерации миниатюры с обработкой ошибок"""
-    try:
-
-
-        img = Image.open(BytesIO(original_content))
-
-        # Проверяем формат изображения
-        supported_formats = ['JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF']
-        if img.format not in supported_formats:
-            logger.warning(f"Неподдерживаемый формат изображения {img.format} для MediaFile ID {media_file.id}")
-            return False
-
-        # Обработка больших изображений
-        if img.width > MediaFile.MAX_PROCESSING_SIZE[0] or img.height > MediaFile.MAX_PROCESSING_SIZE[1]:
-            img.thumbnail(MediaFile.MAX_PROCESSING_SIZE)
-
-        # Конвертация в RGB для совместимости
-        if img.mode in ('RGBA', 'LA', 'P'):
-            img = img.convert('RGB')
-
-        # Создание миниатюры
-        img.thumbnail(MediaFile.THUMBNAIL_SIZE)
-
-        # Сохранение в буфер
-        thumb_io = BytesIO()
-        img.save(thumb_io, format='JPEG', quality=85)
-        thumb_io.seek(0)
-
-        # Формирование имени файла
-        original_name = os.path.splitext(os.path.basename(media_file.file.name))[0]
-        thumb_name = f"{original_name}_thumb.jpg"
-
-        # Атомарное сохранение миниатюры
-        with transaction.atomic():
-            # Сохраняем миниатюру
-            media_file.thumbnail.save(thumb_name, File(thumb_io), save=False)
-            media_file.save(update_fields=['thumbnail'])
-
-        return True
-
-    except Exception as e:
-        logger.error(f"Ошибка при генерации миниатюры: {str(e)}")
-        return False
-
 
 @shared_task
-def cleanup_stale_thumbnail_tasks():
-    """
-    Очищает записи, где генерация миниатюр зависла более чем на 1 час
-    """
-    from django.utils import timezone
-    from datetime import timedelta
-
-    one_hour_ago = timezone.now() - timedelta(hours=1)
-
-    # Находим записи, где thumbnail_generated=False, но файл существует более часа
-    stale_records = MediaFile.objects.filter(
-        thumbnail_generated=False,
-        created_at__lt=one_hour_ago,
-        file__isnull=False
-    ).exclude(
-        file=''  # Исключаем пустые файлы
-    )[:100]  # Ограничиваем количество для одной задачи
-
-    updated_count = 0
-    for record in stale_records:
-        try:
-            # Проверяем существование файла
-            if os.path.exists(record.file.path):
-                # Принудительно запускаем генерацию миниатюры
-                generate_thumbnail_async.delay(record.pk)
-                updated_count += 1
-            else:
-                # Если файла нет, помечаем как обработанный
-                record.thumbnail_generated = True
-                record.save(update_fields=['thumbnail_generated'])
-        except Exception as e:
-            logger.error(f"Ошибка при очистке зависшей записи ID {record.pk}: {str(e)}")
-
-    logger.info(f"Обработано {updated_count} зависших записей для генерации миниатюр")
+def generate_thumbnail_async(media_file_id):
+    """Совместимость с задачами, поставленными до перехода на generate_image_variants"""
+    generate_image_variants.delay(media_file_id)
 
 
-# chat/tasks.py
-
 @shared_task(bind=True, max_retries=3, default_retry_delay=30)
 def process_ai_generated_media_async(self, ai_message_id, media_data, user_id=None):
     """
@@ -357,3 +245,47 @@ def process_ai_generated_media_async(self, ai_message_id, media_data, user_id=No
         raise self.retry(exc=e)
 
 
+def _get_chat_job_progress_recorder(task):
+    """
+    Пуш статуса через WebSocket (django-celery-progress + Channels), если Channels подключён,
+    иначе обычный ProgressRecorder — клиент опрашивает celery_progress:task_status.
+    """
+    if getattr(settings, "CHANNEL_LAYERS", None):
+        from celery_progress.websockets.backend import WebSocketProgressRecorder
+        return WebSocketProgressRecorder(task)
+    return ProgressRecorder(task)
+
+
+@shared_task(bind=True, soft_time_limit=180, time_limit=240)
+def process_chat_message_job(self, chat_id, user_message_id, message_context, message_media):
+    """
+    Фоновый режим веб-чата (settings.CHAT_JOB_MODE): оркестрация ответа AI
+    на сообщение пользователя. Маршрутизируется на очередь settings.CHAT_JOBS_QUEUE.
+
+    Возвращает те же данные, что и синхронный AJAX-ответ AiChatView
+    (MessageService.get_ajax_payload), — клиент получает их в поле result статуса задачи.
+    """
+    from .models import Message
+    from .services.interfaces.message_service import MessageService
+    from .services.interfaces.web_chat_service import WebChatService
+
+    progress_recorder = _get_chat_job_progress_recorder(self)
+    progress_recorder.set_progress(0, 2, description="Генерация ответа")
+
+    user_message = Message.objects.select_related("chat").get(pk=user_message_id, chat_id=chat_id)
+
+    web_chat_service = WebChatService()
+    ai_response = async_to_sync(web_chat_service.generate_ai_reply)(
+        user_id=user_message.sender_id,
+        user_message=user_message.content,
+        message_media=message_media,
+        message_context=message_context,
+    )
+    progress_recorder.set_progress(1, 2, description="Сохранение ответа")
+
+    ai_message = web_chat_service.save_ai_message(user_message.chat, user_message, ai_response)
+    payload = MessageService().get_ajax_payload(user_message, ai_message)
+
+    progress_recorder.set_progress(2, 2, description="Ответ готов")
+    logger.info(f"Ответ AI {ai_message.pk} на сообщение {user_message_id} сформирован в фоне")
+    return payload
@@ -1,6 +1,6 @@
 from django.urls import path, include
 
-from .views import AiChatView, ChatClearView, AIMessageScoreView, AIConversationHistoryView
+from .views import AiChatView, ChatClearView, AIMessageScoreView, AIConversationHistoryView, MediaVariantView
 
 app_name = 'chat'
 
@@ -9,4 +9,5 @@ urlpatterns = [
     path("ai/<str:slug>/history", AIConversationHistoryView.as_view(), name="ai-chat-conversation"),
     path("<int:pk>/clear", ChatClearView.as_view(), name="web-chat-clear"),
     path('ai_message/<int:message_pk>/score', AIMessageScoreView.as_view(), name='ai-message-score'),
+    path('media/<int:pk>/<str:variant>', MediaVariantView.as_view(), name='media-variant'),
 ]
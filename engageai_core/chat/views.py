@@ -1,29 +1,34 @@
 import json
 import logging
-import markdown
 
-from asgiref.sync import async_to_sync
+from PIL import Image, UnidentifiedImageError
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.conf import settings
 from django.db import transaction
-from django.http import JsonResponse, Http404
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import reverse
 from django.utils import timezone
 
 from django.views import View
 from django.views.generic import ListView
+from redis.exceptions import LockError
 
-from ai.llm_service.dtos import GenerationResult
-from ai.orchestrator_v1.orchestrator import UniversalOrchestrator
 from ai_assistant.models import AIAssistant
-from llm_logger.models import LLMRequestType
-from .models import Chat, Message, MessageSource, ChatPlatform, MessageType, ChatScope
-from chat.services.interfaces.ai_message_service import AiMediaService
+from engageai_core.mixins import AsyncLoginRequiredMixin
+from .models import Chat, Message, ChatPlatform, MessageType, ChatScope, MediaFile
+from .services.conversation_history_service import ConversationHistoryService
+from .services.image_variant_service import ImageVariantService
 from .services.interfaces.chat_service import ChatService
 from .services.interfaces.exceptions import AssistantNotFoundError, ChatCreationError, MediaProcessingError
 from .services.interfaces.message_service import MessageService
+from .services.interfaces.web_chat_service import WebChatService
 from .services.page_context_service import PageContextService
 from .services.user_media_service import UserMediaService
+from .tasks import process_chat_message_job
 
 logger = logging.getLogger(__name__)
 
@@ -822,8 +827,8 @@ class ChatContextMixin:
 
         # Получаем ассистента
         try:
-            assistant = AIAssistant.objects.get(slug=slug, is_active=True)
-        except AIAssistant.DoesNotExist:
+            assistant = chat_service.get_assistant(slug)
+        except AssistantNotFoundError:
             logger.error(f"AI-ассистент с slug {slug} не найден")
             raise Http404("AI-ассистент не найден или неактивен")
 
@@ -861,8 +866,18 @@ class ChatContextMixin:
         return context
 
 
-class AiChatView(LoginRequiredMixin, View):
-    """Чат с AI с полной поддержкой медиафайлов"""
+class AiChatView(AsyncLoginRequiredMixin, View):
+    """
+    Чат с AI с полной поддержкой медиафайлов.
+
+    Нативное async-представление: под ASGI (gunicorn + UvicornWorker, см.
+    supervisor_configs/gunicorn_conf_future.py) ожидание ответа LLM не занимает
+    поток воркера. Работа с БД вынесена в две короткие транзакции — до и после
+    вызова оркестратора, — чтобы транзакция не оставалась открытой всё время генерации.
+
+    При settings.CHAT_JOB_MODE оркестрация выполняется Celery-задачей
+    process_chat_message_job на очереди chat_jobs, а POST сразу возвращает job id.
+    """
     template_name = "chat/ai_chat.html"
 
     def setup(self, request, *args, **kwargs):
@@ -871,6 +886,7 @@ class AiChatView(LoginRequiredMixin, View):
         # Инициализация сервисов
         self.chat_service = ChatService()
         self.message_service = MessageService()
+        self.web_chat_service = WebChatService()
         self.user_media_service = UserMediaService(request.user)
 
     def _get_assistant_and_chat(self, request, slug):
@@ -880,8 +896,8 @@ class AiChatView(LoginRequiredMixin, View):
         """
         try:
             # Получаем ассистента
-            assistant = AIAssistant.objects.get(slug=slug, is_active=True)
-        except AIAssistant.DoesNotExist:
+            assistant = self.chat_service.get_assistant(slug)
+        except AssistantNotFoundError:
             logger.error(f"AI-ассистент с slug {slug} не найден")
             raise Http404("AI-ассистент не найден или неактивен")
 
@@ -909,45 +925,8 @@ class AiChatView(LoginRequiredMixin, View):
         """Формирует AJAX-ответ для чата с поддержкой медиа"""
         return self.message_service.get_ajax_response(user_message, ai_message)
 
-    def _process_ai_response(self, user_id:int, user_message: str, message_media: list, message_context: dict):
-        """Обрабатывает запрос к AI и возвращает ответ"""
-        try:
-            o = UniversalOrchestrator()
-            ai_response = async_to_sync(o.route_message)(
-                user_id=user_id,
-                user_message=user_message,
-                message_media=message_media,
-                message_context=message_context,
-                request_type=LLMRequestType.CHAT
-            )
-            print(ai_response)
-            if isinstance(ai_response, GenerationResult):
-                ai_message = ai_response.response.message
-                ai_message = markdown.markdown(ai_message)
-            else:
-                ai_message = ai_response
-
-            # if not ai_response.get('success', False):
-            #     logger.warning(f"AI вернул неуспешный ответ: {ai_response}")
-            #     return {
-            #         'text': "Извините, произошла ошибка при генерации ответа.",
-            #         'media': []
-            #     }
-
-            return {
-                'text': ai_message,
-                # 'media': ai_response.get('media_files', [])
-            }
-
-        except Exception as e:
-            logger.exception(f"Ошибка при работе с AI: {str(e)}")
-            return {
-                'text': "Извините, сейчас не могу обработать ваш запрос.",
-                'media': []
-            }
-
-    def get(self, request, slug, *args, **kwargs):
-        """Отображает интерфейс чата с историей сообщений"""
+    def _render_chat(self, request, slug):
+        """Синхронная часть GET: загрузка чата, истории и рендер шаблона"""
         try:
             assistant, chat = self._get_assistant_and_chat(request, slug)
             chat_history = self._get_chat_history(chat)
@@ -964,27 +943,15 @@ class AiChatView(LoginRequiredMixin, View):
         }
         return render(request, self.template_name, context)
 
-    def post(self, request, slug, *args, **kwargs):
-        """Обрабатывает отправку сообщения в чат с поддержкой медиа"""
-        user_message_text = request.POST.get('message', '').strip()
-        has_file = 'file' in request.FILES
-
-        # Валидация: должно быть либо текст, либо файл
-        if not user_message_text and not has_file:
-            error_msg = "Сообщение или файл отсутствуют"
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({"error": error_msg}, status=400)
-            messages.error(request, error_msg)
-            return redirect('chat:ai-chat', slug=slug)
-
-        # Получаем ассистента и чат
-        try:
-            assistant, chat = self._get_assistant_and_chat(request, slug)
-        except Http404 as e:
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({"error": str(e)}, status=404)
-            return render(request, "chat/assistant_not_found.html", {"error": str(e)}, status=404)
+    async def get(self, request, slug, *args, **kwargs):
+        """Отображает интерфейс чата с историей сообщений"""
+        return await sync_to_async(self._render_chat)(request, slug)
 
+    def _save_user_message(self, request, chat, user_message_text: str, has_file: bool):
+        """
+        Транзакция №1 (до вызова LLM): сообщение пользователя и вложение.
+        Возвращает (user_message, message_context, message_media).
+        """
         # получаем контекст страницы с которой пришло сообщение, на странице должен быть блок с
         # id="page-environment-context-for-message" (который обработает JS) вида:
         # .. <div id="page-info-for-chat" class="Lesson"
@@ -1002,90 +969,134 @@ class AiChatView(LoginRequiredMixin, View):
         }
         message_context = PageContextService.validate_data(raw_message_context=raw_message_context, user=request.user)
 
+        with transaction.atomic():
+            # Создаем сообщение пользователя
+            user_message = self.message_service.create_user_message(
+                chat=chat,
+                sender=request.user,
+                content=user_message_text,
+                message_type=MessageType.TEXT if not has_file else MessageType.DOCUMENT,
+                metadata={
+                    "message_context": message_context,
+                }
+            )
+
+            # Обрабатываем загруженный файл
+            if has_file:
+                try:
+                    # Обработка файла через сервис
+                    self.user_media_service.handle_uploaded_file(
+                        request.FILES['file'],
+                        user_message
+                    )
+
+                    # Обновляем тип сообщения на основе медиа
+                    self.message_service.update_message_type_from_media(user_message)
+
+                except ValueError as e:
+                    # Обработка ошибок валидации файла
+                    logger.warning(f"Ошибка валидации файла: {str(e)}")
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка при обработке файла: {str(e)}")
+                    raise MediaProcessingError(f"Ошибка при загрузке файла: {str(e)}")
+
+        # Подготавливаем контекст для AI
+        message_media = [{
+            'url': media.get_absolute_url(),
+            'type': media.file_type,
+            'mime_type': media.mime_type,
+            'path': media.file.path if hasattr(media.file, 'path') else None
+        } for media in user_message.media_files.all()]
+
+        return user_message, message_context, message_media
+
+    def _enqueue_chat_job(self, chat, user_message, message_context: dict, message_media: list) -> dict:
+        """
+        Фоновый режим (settings.CHAT_JOB_MODE): ставит оркестрацию в очередь Celery
+        и возвращает данные для клиента — job id и URL статуса django-celery-progress.
+        """
+        job = process_chat_message_job.delay(
+            chat_id=chat.pk,
+            user_message_id=user_message.pk,
+            message_context=message_context,
+            message_media=message_media,
+        )
+        return {
+            "job_id": job.id,
+            "progress_url": reverse("celery_progress:task_status", kwargs={"task_id": job.id}),
+            "user_message": {
+                "id": user_message.pk,
+                "text": user_message.content,
+                "message_type": user_message.message_type,
+            },
+        }
+
+    async def post(self, request, slug, *args, **kwargs):
+        """Обрабатывает отправку сообщения в чат с поддержкой медиа"""
+        is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+        user_message_text = request.POST.get('message', '').strip()
+        has_file = 'file' in request.FILES
+
+        # Валидация: должно быть либо текст, либо файл
+        if not user_message_text and not has_file:
+            error_msg = "Сообщение или файл отсутствуют"
+            if is_ajax:
+                return JsonResponse({"error": error_msg}, status=400)
+            messages.error(request, error_msg)
+            return redirect('chat:ai-chat', slug=slug)
+
+        # Получаем ассистента и чат
         try:
-            with transaction.atomic():
-                # Создаем сообщение пользователя
-                user_message = self.message_service.create_user_message(
-                    chat=chat,
-                    sender=request.user,
-                    content=user_message_text,
-                    message_type=MessageType.TEXT if not has_file else MessageType.DOCUMENT,
-                    metadata={
-                        "message_context": message_context,
-                    }
-                )
+            assistant, chat = await sync_to_async(self._get_assistant_and_chat)(request, slug)
+        except Http404 as e:
+            if is_ajax:
+                return JsonResponse({"error": str(e)}, status=404)
+            return await sync_to_async(render)(
+                request, "chat/assistant_not_found.html", {"error": str(e)}, status=404
+            )
 
-                # Обрабатываем загруженный файл
-                if has_file:
-                    try:
-                        # Обработка файла через сервис
-                        media_obj = self.user_media_service.handle_uploaded_file(
-                            request.FILES['file'],
-                            user_message
-                        )
-
-                        # Обновляем тип сообщения на основе медиа
-                        self.message_service.update_message_type_from_media(user_message)
-
-                    except ValueError as e:
-                        # Обработка ошибок валидации файла
-                        logger.warning(f"Ошибка валидации файла: {str(e)}")
-                        raise
-                    except Exception as e:
-                        logger.error(f"Ошибка при обработке файла: {str(e)}")
-                        raise MediaProcessingError(f"Ошибка при загрузке файла: {str(e)}")
-
-
-                # Подготавливаем контекст для AI
-                message_media = [{
-                        'url': media.get_absolute_url(),
-                        'type': media.file_type,
-                        'mime_type': media.mime_type,
-                        'path': media.file.path if hasattr(media.file, 'path') else None
-                    } for media in user_message.media_files.all()]
-
-                # Получаем ответ от AI
-                ai_response = self._process_ai_response(
-                    user_id=request.user.id,
-                    user_message=user_message_text,
-                    message_media=message_media,
-                    message_context=message_context
-                )
-                print(ai_response)
-                ai_message_text = ai_response['text']
-                # ai_media_data = ai_response['media']
-                ai_media_data = None
-
-                # Создаем сообщение AI
-                ai_message = self.message_service.create_ai_message(
-                    chat=chat,
-                    content=ai_message_text,
-                    reply_to=user_message,
-                    source_type=MessageSource.WEB
+        try:
+            user_message, message_context, message_media = await sync_to_async(self._save_user_message)(
+                request, chat, user_message_text, has_file
+            )
+
+            if settings.CHAT_JOB_MODE:
+                # Ответ придёт из Celery-задачи: клиент опрашивает progress_url
+                job_data = await sync_to_async(self._enqueue_chat_job)(
+                    chat, user_message, message_context, message_media
                 )
+                if is_ajax:
+                    return JsonResponse(job_data, status=202)
+                return redirect('chat:ai-chat', slug=slug)
 
-                # Асинхронно обрабатываем AI-сгенерированные медиа
-                if ai_media_data:
-                    ai_media_service = AiMediaService(chat)
-                    ai_media_service.process_ai_media(ai_media_data, ai_message)
+            # Получаем ответ от AI вне транзакции
+            ai_response = await self.web_chat_service.generate_ai_reply(
+                user_id=request.user.id,
+                user_message=user_message_text,
+                message_media=message_media,
+                message_context=message_context
+            )
+
+            ai_message = await sync_to_async(self.web_chat_service.save_ai_message)(chat, user_message, ai_response)
 
         except ValueError as e:
             # Обработка ошибок валидации
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            if is_ajax:
                 return JsonResponse({"error": str(e)}, status=400)
             messages.error(request, str(e))
             return redirect('chat:ai-chat', slug=slug)
         except MediaProcessingError as e:
             # Специфическая обработка ошибок медиа
             logger.error(f"Ошибка обработки медиа: {str(e)}")
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            if is_ajax:
                 return JsonResponse({"error": str(e)}, status=500)
             messages.error(request, "Ошибка при обработке медиафайла. Пожалуйста, попробуйте еще раз.")
             return redirect('chat:ai-chat', slug=slug)
         except Exception as e:
             # Обработка всех остальных ошибок
             logger.exception(f"Критическая ошибка при обработке сообщения: {str(e)}")
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            if is_ajax:
                 return JsonResponse({
                     "error": "Произошла внутренняя ошибка сервера. Попробуйте позже."
                 }, status=500)
@@ -1093,8 +1104,8 @@ class AiChatView(LoginRequiredMixin, View):
             return redirect('chat:ai-chat', slug=slug)
 
         # Обрабатываем AJAX-запрос
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return self._get_ajax_response(user_message, ai_message)
+        if is_ajax:
+            return await sync_to_async(self._get_ajax_response)(user_message, ai_message)
 
         return redirect('chat:ai-chat', slug=slug)
 
@@ -1125,9 +1136,69 @@ class AIMessageScoreView(LoginRequiredMixin, View):
                              })
 
 
+class MediaVariantView(LoginRequiredMixin, View):
+    """
+    Производное изображение MediaFile (миниатюра, превью, размер по запросу).
+
+    Вариант рендерится при первом обращении и сохраняется по детерминированному
+    пути (MediaFile.variant_path); повторные запросы отдаются nginx через
+    X-Accel-Redirect (settings.MEDIA_ACCEL_REDIRECT) или FileResponse.
+    ETag строгий: путь и содержимое варианта определяются хэшем исходника.
+    """
+
+    def get(self, request, pk, variant):
+        media_file = get_object_or_404(MediaFile.objects.select_related('message__chat'), pk=pk)
+        chat = media_file.message.chat
+        if not (
+                request.user.is_staff
+                or chat.owner_id == request.user.id
+                or chat.participants.filter(pk=request.user.pk).exists()
+        ):
+            raise Http404
+
+        spec = ImageVariantService.get_variant(variant)
+        if spec is None or not media_file.file or not media_file.should_generate_thumbnail():
+            raise Http404
+
+        try:
+            content_hash = ImageVariantService.ensure_content_hash(media_file)
+        except (FileNotFoundError, OSError):
+            raise Http404
+
+        etag = f'"{content_hash}-{spec.name}.{spec.extension}"'
+        cache_control = "private, max-age=31536000, immutable"
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            response["Cache-Control"] = cache_control
+            return response
+
+        try:
+            name = ImageVariantService.render_locked(media_file, spec)
+        except (UnidentifiedImageError, ValueError, Image.DecompressionBombError) as e:
+            logger.warning(f"Вариант {variant} для MediaFile {pk} не построен: {str(e)}")
+            return redirect(media_file.file.url)
+        except LockError:
+            response = HttpResponse(status=503)
+            response["Retry-After"] = "1"
+            return response
+
+        content_type = Image.MIME.get(spec.format, "application/octet-stream")
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{name}"
+        else:
+            response = FileResponse(media_file.file.storage.open(name, "rb"), content_type=content_type)
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+
 class AIConversationHistoryView(LoginRequiredMixin, ListView):
     """Просмотр всей истории переписки пользователя с заданным AI-ассистентом
-    JSON при ?export=json
+
+    Пагинация — keyset (?after=<курсор> / ?before=<курсор>), см. ConversationHistoryService.
+    Потоковый экспорт при ?export=json | jsonl | csv
     """
     model = Message
     template_name = "chat/ai_conversation_history.html"
@@ -1143,80 +1214,96 @@ class AIConversationHistoryView(LoginRequiredMixin, ListView):
             )
         return self._ai_assistant
 
-    def get_queryset(self):
-        """Возвращает queryset сообщений, уже с select_related для sender"""
-        user = self.request.user
-        ai_assistant = self.get_ai_assistant()
-
+    def get_chat_ids(self):
         # Кэшируем chat_ids один раз
         if not hasattr(self, "_chat_ids"):
             self._chat_ids = list(
-                Chat.objects.filter(owner=user, ai_assistant=ai_assistant)
+                Chat.objects.filter(owner=self.request.user, ai_assistant=self.get_ai_assistant())
                 .values_list("id", flat=True)
             )
+        return self._chat_ids
 
+    def get_base_queryset(self):
+        """Все сообщения переписки, без сортировки и подгрузки связей"""
+        return Message.objects.filter(chat_id__in=self.get_chat_ids())
+
+    def get_queryset(self):
+        """Возвращает текущую keyset-страницу сообщений, уже с select_related для sender"""
         qs = (
-            Message.objects.filter(chat_id__in=self._chat_ids)
+            self.get_base_queryset()
             .select_related("sender", "chat", "reply_to", )
             .prefetch_related("answers", "media_files")
-            .order_by("timestamp")
         )
-        return qs
+        self._page = ConversationHistoryService.get_page(
+            qs,
+            page_size=self.paginate_by,
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        return self._page["messages"]
+
+    def paginate_queryset(self, queryset, page_size):
+        # Пагинация уже выполнена в get_queryset (keyset вместо OFFSET/COUNT)
+        return None, None, queryset, self._page["has_next"] or self._page["has_previous"]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        qs = self.object_list  # queryset, который использует пагинатор
-
-        # Статистика
-        total_messages = qs.count()
-        ai_messages = qs.filter(is_ai=True).count()
-        user_messages = total_messages - ai_messages
-
-        try:
-            first_msg = qs.earliest("timestamp")
-        except qs.model.DoesNotExist:
-            first_msg = None
 
-        try:
-            last_msg = qs.latest("timestamp")
-        except qs.model.DoesNotExist:
-            last_msg = None
+        # Статистика: один агрегирующий запрос с кэшем
+        stats = ConversationHistoryService.get_stats(
+            user_id=self.request.user.pk,
+            assistant_id=self.get_ai_assistant().pk,
+            chat_ids=self.get_chat_ids(),
+        )
 
         context.update({
             "ai_assistant": self.get_ai_assistant(),
-            "total_messages": total_messages,
-            "ai_messages": ai_messages,
-            "user_messages": user_messages,
-            "first_interaction": first_msg.timestamp if first_msg else None,
-            "last_interaction": last_msg.timestamp if last_msg else None,
+            "total_messages": stats["total_messages"],
+            "ai_messages": stats["ai_messages"],
+            "user_messages": stats["user_messages"],
+            "first_interaction": stats["first_interaction"],
+            "last_interaction": stats["last_interaction"],
+            "has_next": self._page["has_next"],
+            "has_previous": self._page["has_previous"],
+            "next_cursor": self._page["next_cursor"],
+            "previous_cursor": self._page["previous_cursor"],
         })
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        """Возвращаем JSON при ?export=json, иначе стандартный HTML"""
-        if self.request.GET.get("export") == "json":
-            messages = self.get_queryset().order_by("timestamp")  # по возрастанию для JSON
-            export_data = {
-                "assistant_name": self.get_ai_assistant().name,
-                "assistant_type": self.get_ai_assistant().get_assistant_type_display(),
-                "user": self.request.user.username,
-                "total_messages": messages.count(),
-                "export_date": timezone.now().isoformat(),
-                "conversation": [
-                    {
-                        "timestamp": msg.timestamp.isoformat(),
-                        "sender": "AI" if msg.is_ai else self.request.user.username,
-                        "content": msg.content,
-                        "platform": msg.get_source_type_display(),
-                        "metadata": msg.metadata,
-                    }
-                    for msg in messages.iterator()
-                ]
-            }
-            response = JsonResponse(export_data, json_dumps_params={'ensure_ascii': False, 'indent': 2})
-            response[
-                'Content-Disposition'] = (f'attachment; filename="ai_conversation_{self.get_ai_assistant().slug}'
-                                          f'_{timezone.now().strftime("%Y%m%d_%H%M")}.json"')
-            return response
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get("export")
+        if export_format in ConversationHistoryService.EXPORT_FORMATS:
+            return self.export(export_format)
+        return super().get(request, *args, **kwargs)
+
+    def export(self, export_format: str):
+        """Потоковый экспорт переписки: память не зависит от числа сообщений"""
+        ai_assistant = self.get_ai_assistant()
+        username = self.request.user.username
+        qs = self.get_base_queryset()
+
+        if export_format == "csv":
+            content = ConversationHistoryService.stream_csv(qs, username)
+            content_type = "text/csv; charset=utf-8"
+        elif export_format == "jsonl":
+            content = ConversationHistoryService.stream_jsonl(qs, username)
+            content_type = "application/x-ndjson; charset=utf-8"
         else:
-            return super().render_to_response(context, **response_kwargs)
+            stats = ConversationHistoryService.get_stats(
+                user_id=self.request.user.pk,
+                assistant_id=ai_assistant.pk,
+                chat_ids=self.get_chat_ids(),
+            )
+            content = ConversationHistoryService.stream_json(qs, username, header={
+                "assistant_name": ai_assistant.name,
+                "assistant_type": ai_assistant.get_assistant_type_display(),
+                "user": username,
+                "total_messages": stats["total_messages"],
+            })
+            content_type = "application/json; charset=utf-8"
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response[
+            'Content-Disposition'] = (f'attachment; filename="ai_conversation_{ai_assistant.slug}'
+                                      f'_{timezone.now().strftime("%Y%m%d_%H%M")}.{export_format}"')
+        return response
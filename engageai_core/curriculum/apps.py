@@ -11,3 +11,7 @@ class CurriculumConfig(AppConfig):
         """
         # Импортируем models для регистрации в Django
         import curriculum.models
+        import curriculum.signals
+
+        # Компиляция схем контента заданий один раз при старте
+        import curriculum.validation.schema_registry
@@ -0,0 +1,46 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from curriculum.models.content.course import Course
+from curriculum.models.content.generation_step import GenerationStepStatus
+
+
+class Command(BaseCommand):
+    help = "Генерация курса через LLM графом шагов; --resume продолжает генерацию с чекпоинтов"
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument("--theme", type=str, help="Тема нового курса")
+        target.add_argument("--resume", type=int, metavar="COURSE_ID", help="ID курса, генерацию которого продолжить")
+        parser.add_argument("--tasks-per-lesson", type=int, default=None)
+        parser.add_argument("--max-lessons", type=int, default=None, help="Ограничить число уроков (для проверки)")
+        parser.add_argument("--no-media", action="store_true", help="Не синтезировать аудио listening-заданий")
+        parser.add_argument("--user-id", type=int, default=None, help="Пользователь для логов LLM")
+
+    def handle(self, *args, **options):
+        from curriculum.services.content_generation.content_orchestrator_v2 import ContentOrchestrator
+
+        orchestrator = ContentOrchestrator()
+        params = {
+            "tasks_per_lesson": options["tasks_per_lesson"],
+            "include_media": not options["no_media"],
+            "user_id": options["user_id"],
+            "max_lessons": options["max_lessons"],
+        }
+
+        if options["resume"]:
+            course = Course.objects.filter(pk=options["resume"]).first()
+            if course is None:
+                raise CommandError(f"Курс не найден: {options['resume']}")
+            course = asyncio.run(orchestrator.resume_course(course=course, **params))
+        else:
+            course = asyncio.run(orchestrator.generate_full_course(theme=options["theme"], **params))
+
+        failed = list(course.generation_steps.filter(status=GenerationStepStatus.FAILED).values_list("key", flat=True))
+        if failed:
+            self.stdout.write(self.style.WARNING(
+                f"Курс {course.pk}: шаги с ошибками {failed} — повторите с --resume {course.pk}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Курс: {course} (ID: {course.pk})"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Помесячные секции LessonEventLog: --convert переводит таблицу на секционирование "
+        "(блокирует таблицу на время переноса), без флага — создаёт секции на месяцы вперёд"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convert", action="store_true", help="Перевести таблицу на помесячные секции")
+        parser.add_argument("--ahead", type=int, default=None, help="Месяцев вперёд (по умолчанию LESSON_EVENT_PARTITIONS_AHEAD)")
+        parser.add_argument("--flush", action="store_true", help="Перед конвертацией записать события из очереди")
+
+    def handle(self, *args, **options):
+        from curriculum.services.lesson_event_buffer import LessonEventBuffer
+        from curriculum.services.lesson_event_partitions import LessonEventPartitions
+
+        ahead = options["ahead"]
+        if ahead is not None and ahead < 0:
+            raise CommandError("--ahead не может быть отрицательным")
+
+        if options["flush"]:
+            self.stdout.write(f"Записано событий из очереди: {LessonEventBuffer.flush()}")
+
+        if options["convert"]:
+            created = LessonEventPartitions.convert(ahead)
+        elif not LessonEventPartitions.is_partitioned():
+            raise CommandError(f"{LessonEventPartitions.table()} не секционирована — запустите с --convert")
+        else:
+            created = LessonEventPartitions.ensure(ahead)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано секций: {len(created)}" + (f" ({', '.join(created)})" if created else "")
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from curriculum.models.student.enrollment import Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчёт SkillState и истории навыков по всем оценкам заданий (backfill); "
+        "--compact сжимает старую историю"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enrollment", type=int, action="append", dest="enrollments", help="ID зачисления (можно несколько)")
+        parser.add_argument("--course", type=int, default=None, help="Все зачисления курса")
+        parser.add_argument("--batch-size", type=int, default=200, help="Зачислений за один векторный проход")
+        parser.add_argument("--compact", action="store_true", help="После пересчёта сжать RAW-историю старше SKILL_TRAJECTORY_COMPACT_AFTER_DAYS")
+
+    def handle(self, *args, **options):
+        from curriculum.services.skill_engine import SkillEngine
+
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным")
+
+        enrollments = Enrollment.objects.all()
+        if options["enrollments"]:
+            enrollments = enrollments.filter(pk__in=options["enrollments"])
+        if options["course"]:
+            enrollments = enrollments.filter(course_id=options["course"])
+        enrollment_ids = list(enrollments.order_by("pk").values_list("pk", flat=True))
+
+        assessments = 0
+        for start in range(0, len(enrollment_ids), batch_size):
+            batch = enrollment_ids[start:start + batch_size]
+            assessments += SkillEngine.recompute(batch)
+            self.stdout.write(f"Зачислений: {min(start + batch_size, len(enrollment_ids))}/{len(enrollment_ids)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано зачислений: {len(enrollment_ids)}, учтено оценок заданий: {assessments}"
+        ))
+
+        if options["compact"]:
+            before, after = SkillEngine.compact()
+            self.stdout.write(self.style.SUCCESS(f"История сжата: {before} → {after} точек"))
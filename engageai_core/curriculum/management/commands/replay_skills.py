@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from curriculum.models.student.enrollment import Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчёт навыков когорты параллельными воркерами: сначала отчёт о расхождениях "
+        "с текущими SkillState/SkillSnapshot, с --commit — применение одной транзакцией"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--enrollment", type=int, action="append", dest="enrollments", help="ID зачисления (можно несколько)")
+        parser.add_argument("--course", type=int, default=None, help="Все зачисления курса")
+        parser.add_argument("--alpha", type=float, default=None, help="Шаг EMA на задание (по умолчанию SKILL_TASK_ALPHA)")
+        parser.add_argument("--workers", type=int, default=None, help="Процессов-воркеров (по умолчанию SKILL_REPLAY_WORKERS)")
+        parser.add_argument("--batch-size", type=int, default=200, help="Зачислений за один векторный проход воркера")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Строк за одно чтение TaskAssessmentResult/LessonEventLog")
+        parser.add_argument("--commit", action="store_true", help="Применить результат (без флага — только отчёт)")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive", help="Не спрашивать подтверждение перед --commit")
+
+    def handle(self, *args, **options):
+        from curriculum.services.skill_replay import SkillReplay
+
+        alpha = options["alpha"]
+        if alpha is not None and not 0 < alpha <= 1:
+            raise CommandError("--alpha должен быть в (0, 1]")
+        for name in ("workers", "batch_size", "chunk_size"):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} должен быть положительным")
+
+        enrollments = Enrollment.objects.all()
+        if options["enrollments"]:
+            enrollments = enrollments.filter(pk__in=options["enrollments"])
+        if options["course"]:
+            enrollments = enrollments.filter(course_id=options["course"])
+        enrollment_ids = list(enrollments.values_list("pk", flat=True))
+        if not enrollment_ids:
+            raise CommandError("Нет зачислений для пересчёта")
+
+        replay = SkillReplay(
+            enrollment_ids,
+            alpha=alpha,
+            workers=options["workers"],
+            batch_size=options["batch_size"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(
+            f"Пересчёт {len(enrollment_ids)} зачислений: alpha={replay.alpha}, воркеров {replay.workers}"
+            f" (SKILL_TASK_ALPHA={settings.SKILL_TASK_ALPHA})"
+        )
+        report = replay.run()
+        self._print_report(report)
+
+        if not options["commit"]:
+            replay.discard()
+            self.stdout.write("Пробный прогон: изменения не применены (добавьте --commit)")
+            return
+
+        if options["interactive"]:
+            answer = input("Применить пересчёт? [y/N] ")
+            if answer.strip().lower() not in ("y", "yes", "д", "да"):
+                replay.discard()
+                self.stdout.write("Отменено")
+                return
+
+        applied, skipped = replay.commit()
+        self.stdout.write(self.style.SUCCESS(f"Применено зачислений: {applied}"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Пропущено зачислений с новыми оценками во время пересчёта: {skipped} — запустите повторно"
+            ))
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"Оценок заданий: {report.assessments}, событий завершения оценки: {report.events}\n"
+            f"Состояний изменится: {report.states_changed}/{report.enrollments}\n"
+            f"Снимков уроков изменится: {report.snapshots_changed}/{report.snapshots_compared}, "
+            f"новых: {report.snapshots_new}"
+        )
+        self.stdout.write(f"{'навык':<12}{'ср. |Δ| снимков':>18}{'макс. |Δ|':>12}{'ср. сдвиг':>12}")
+        for skill, mean_abs, max_abs, shift in report.skill_rows():
+            self.stdout.write(f"{skill:<12}{mean_abs:>18.4f}{max_abs:>12.4f}{shift:>+12.4f}")
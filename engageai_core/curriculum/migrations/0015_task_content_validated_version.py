@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0014_alter_skillsnapshot_grammar_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='content_validated_version',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Content validated at schema version'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0015_task_content_validated_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmedia',
+            name='synthesis_key',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 текста, голоса и скорости синтезированного аудио', max_length=64, verbose_name='TTS cache key'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0016_taskmedia_synthesis_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentGenerationStep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, verbose_name='Step key')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('lesson', 'Lesson'), ('tasks', 'Tasks'), ('media', 'Media')], max_length=20, verbose_name='Step kind')),
+                ('status', models.CharField(choices=[('done', 'Done'), ('failed', 'Failed')], max_length=10, verbose_name='Status')),
+                ('result', models.JSONField(blank=True, default=dict, verbose_name='Result')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generation_steps', to='curriculum.course', verbose_name='Course')),
+            ],
+            options={
+                'verbose_name': 'Content generation step',
+                'verbose_name_plural': 'Content generation steps',
+                'indexes': [models.Index(fields=['course', 'status'], name='curriculum__course__0a3017_idx')],
+                'constraints': [models.UniqueConstraint(fields=('course', 'key'), name='unique_generation_step_per_course')],
+            },
+        ),
+    ]
@@ -0,0 +1,178 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils.dateparse import parse_datetime
+
+COLUMN_KEYS = (
+    "node_id", "lesson_id", "learning_objective", "title", "type", "status",
+    "prerequisites", "triggers", "created_at", "completed_at", "metadata",
+)
+
+
+def _parse(value):
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return None
+
+
+def nodes_to_rows(apps, schema_editor):
+    """Переносит LearningPath.nodes в LearningPathNode и считает LearningPathProgress"""
+    LearningPath = apps.get_model("curriculum", "LearningPath")
+    LearningPathNode = apps.get_model("curriculum", "LearningPathNode")
+    LearningPathProgress = apps.get_model("curriculum", "LearningPathProgress")
+    Lesson = apps.get_model("curriculum", "Lesson")
+
+    lesson_ids = set(Lesson.objects.values_list("pk", flat=True))
+
+    for path in LearningPath.objects.only("pk", "nodes", "current_node_index").iterator(chunk_size=500):
+        rows, seen = [], set()
+        for position, data in enumerate(path.nodes or []):
+            node_id = str(data.get("node_id") or f"node-{position}")
+            if node_id in seen:
+                node_id = f"{node_id}-{position}"
+            seen.add(node_id)
+
+            extra = {key: value for key, value in data.items() if key not in COLUMN_KEYS}
+            lesson_id = data.get("lesson_id")
+            if lesson_id is not None and lesson_id not in lesson_ids:
+                # Урок удалён — сохраняем ссылку, чтобы экспорт не терял данные
+                extra["missing_lesson_id"] = lesson_id
+                lesson_id = None
+
+            rows.append(LearningPathNode(
+                learning_path_id=path.pk,
+                position=position,
+                node_id=node_id,
+                lesson_id=lesson_id,
+                learning_objective=data.get("learning_objective") or "",
+                title=(data.get("title") or "")[:255],
+                node_type=data.get("type") or "core",
+                status=data.get("status") or "locked",
+                prerequisites=data.get("prerequisites") or [],
+                triggers=data.get("triggers") or [],
+                metadata=data.get("metadata") or {},
+                extra=extra,
+                created_at=_parse(data.get("created_at")) or django.utils.timezone.now(),
+                completed_at=_parse(data.get("completed_at")),
+            ))
+        LearningPathNode.objects.bulk_create(rows, batch_size=1000)
+
+        by_type = {}
+        for row in rows:
+            stats = by_type.setdefault(row.node_type, {"total": 0, "completed": 0})
+            stats["total"] += 1
+            stats["completed"] += row.status == "completed"
+        core = by_type.get("core", {"total": 0, "completed": 0})
+        core_rows = [row for row in rows if row.node_type == "core"]
+        current_core = next(
+            (number for number, row in enumerate(core_rows, start=1) if row.status == "in_progress"),
+            None,
+        )
+        LearningPathProgress.objects.create(
+            learning_path_id=path.pk,
+            total_nodes=len(rows),
+            completed_nodes=sum(stats["completed"] for stats in by_type.values()),
+            core_total=core["total"],
+            core_completed=core["completed"],
+            current_position=path.current_node_index if path.current_node_index < len(rows) else None,
+            current_core_number=current_core,
+            by_type=by_type,
+        )
+
+
+def rows_to_nodes(apps, schema_editor):
+    """Обратный перенос: собирает LearningPath.nodes из LearningPathNode"""
+    LearningPath = apps.get_model("curriculum", "LearningPath")
+    LearningPathNode = apps.get_model("curriculum", "LearningPathNode")
+
+    for path in LearningPath.objects.only("pk").iterator(chunk_size=500):
+        nodes = []
+        for node in LearningPathNode.objects.filter(learning_path_id=path.pk).order_by("position"):
+            extra = dict(node.extra)
+            missing_lesson_id = extra.pop("missing_lesson_id", None)
+            nodes.append({
+                **extra,
+                "node_id": node.node_id,
+                "lesson_id": node.lesson_id or missing_lesson_id,
+                "learning_objective": node.learning_objective or None,
+                "title": node.title,
+                "type": node.node_type,
+                "status": node.status,
+                "prerequisites": node.prerequisites,
+                "triggers": node.triggers,
+                "created_at": node.created_at.isoformat() if node.created_at else None,
+                "completed_at": node.completed_at.isoformat() if node.completed_at else None,
+                "metadata": node.metadata,
+            })
+        LearningPath.objects.filter(pk=path.pk).update(nodes=nodes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0017_contentgenerationstep'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningPathNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(verbose_name='Позиция в пути')),
+                ('node_id', models.CharField(max_length=255, verbose_name='Идентификатор узла')),
+                ('learning_objective', models.CharField(blank=True, default='', max_length=100, verbose_name='Учебная цель')),
+                ('title', models.CharField(blank=True, default='', max_length=255, verbose_name='Название')),
+                ('node_type', models.CharField(choices=[('core', 'Основной урок курса'), ('remedial', 'Повтор / восстановление'), ('diagnostic', 'Проверка уровня'), ('practice', 'Практика без теории')], default='core', max_length=20, verbose_name='Тип узла')),
+                ('status', models.CharField(choices=[('locked', 'Недоступен'), ('unlocked', 'Доступен'), ('in_progress', 'Текущий активный узел'), ('completed', 'Завершён'), ('skipped', 'Пропущен'), ('recommended', 'Рекомендован')], default='locked', max_length=20, verbose_name='Статус')),
+                ('prerequisites', models.JSONField(blank=True, default=list, verbose_name='Предусловия (node_id)')),
+                ('triggers', models.JSONField(blank=True, default=list, verbose_name='Триггеры')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='Метаданные')),
+                ('extra', models.JSONField(blank=True, default=dict, help_text='Ключи узла без отдельной колонки: reason, estimated_minutes, submitted_at и т.п.', verbose_name='Дополнительные поля')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Добавлен в путь')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершён')),
+                ('learning_path', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='path_nodes', to='curriculum.learningpath', verbose_name='Учебный путь')),
+                ('lesson', models.ForeignKey(blank=True, help_text='Пусто для виртуальных узлов (remedial, diagnostic, practice)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='path_nodes', to='curriculum.lesson', verbose_name='Урок')),
+            ],
+            options={
+                'verbose_name': 'Узел учебного пути',
+                'verbose_name_plural': 'Узлы учебного пути',
+                'ordering': ['learning_path', 'position'],
+                'indexes': [
+                    models.Index(fields=['learning_path', 'position'], name='curriculum__learnin_0de742_idx'),
+                    models.Index(fields=['learning_path', 'status'], name='curriculum__learnin_96465d_idx'),
+                    models.Index(fields=['learning_path', 'node_type', 'status'], name='curriculum__learnin_a5599b_idx'),
+                ],
+                'constraints': [models.UniqueConstraint(fields=('learning_path', 'node_id'), name='unique_node_id_per_learning_path')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LearningPathProgress',
+            fields=[
+                ('learning_path', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='progress', serialize=False, to='curriculum.learningpath', verbose_name='Учебный путь')),
+                ('total_nodes', models.PositiveIntegerField(default=0, verbose_name='Всего узлов')),
+                ('completed_nodes', models.PositiveIntegerField(default=0, verbose_name='Завершено узлов')),
+                ('core_total', models.PositiveIntegerField(default=0, verbose_name='Всего core-уроков')),
+                ('core_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено core-уроков')),
+                ('current_position', models.PositiveIntegerField(blank=True, null=True, verbose_name='Позиция текущего узла')),
+                ('current_core_number', models.PositiveIntegerField(blank=True, help_text='Номер (с 1) первого core-узла в статусе in_progress среди core-узлов', null=True, verbose_name='Номер текущего core-урока')),
+                ('by_type', models.JSONField(blank=True, default=dict, help_text="{'remedial': {'total': 2, 'completed': 1}, ...}", verbose_name='По типам узлов')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Прогресс учебного пути',
+                'verbose_name_plural': 'Прогресс учебных путей',
+            },
+        ),
+        migrations.RunPython(nodes_to_rows, rows_to_nodes),
+        migrations.AlterField(
+            model_name='learningpath',
+            name='current_node_index',
+            field=models.PositiveIntegerField(default=0, help_text='Позиция (position) текущего узла в path_nodes', verbose_name='Индекс текущего узла'),
+        ),
+        migrations.RemoveField(
+            model_name='learningpath',
+            name='nodes',
+        ),
+    ]
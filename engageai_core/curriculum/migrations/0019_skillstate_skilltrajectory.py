@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('curriculum', '0018_learningpathnode_learningpathprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillState',
+            fields=[
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='skill_state', serialize=False, to='curriculum.enrollment', verbose_name='Зачисление')),
+                ('vector', models.BinaryField(help_text='float32[6] в порядке SkillDomain', verbose_name='Вектор навыков')),
+                ('observations', models.PositiveIntegerField(default=0, verbose_name='Учтено оценок заданий')),
+                ('last_assessment_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Последний учтённый TaskAssessmentResult')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Состояние навыков',
+                'verbose_name_plural': 'Состояния навыков',
+            },
+        ),
+        migrations.CreateModel(
+            name='SkillTrajectory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('raw', 'Каждое задание'), ('daily', 'Последнее значение за день')], default='raw', max_length=10, verbose_name='Детализация')),
+                ('started_at', models.DateTimeField(verbose_name='Первая точка')),
+                ('ended_at', models.DateTimeField(verbose_name='Последняя точка')),
+                ('points', models.PositiveIntegerField(default=0, verbose_name='Число точек')),
+                ('timestamps', models.BinaryField(help_text='int64[points], секунды Unix', verbose_name='Время точек')),
+                ('vectors', models.BinaryField(help_text='float32[points, 6]', verbose_name='Векторы навыков')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skill_trajectory', to='curriculum.enrollment', verbose_name='Зачисление')),
+            ],
+            options={
+                'verbose_name': 'История навыков',
+                'verbose_name_plural': 'История навыков',
+                'indexes': [
+                    models.Index(fields=['enrollment', 'started_at'], name='curriculum__enrollm_23495c_idx'),
+                    models.Index(fields=['resolution', 'ended_at'], name='curriculum__resolut_8bca0e_idx'),
+                ],
+            },
+        ),
+    ]
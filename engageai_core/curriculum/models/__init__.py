@@ -6,6 +6,7 @@ from .assessment.task_assessment import TaskAssessmentResult
 # Content models
 from .content.balance import CourseBalance
 from .content.course import Course
+from .content.generation_step import ContentGenerationStep
 from .content.lesson import Lesson
 from .content.methodological_plan import MethodologicalPlan
 from .content.task import Task
@@ -14,6 +15,7 @@ from .content.task_media import TaskMedia
 # learning process
 # from .learning_process.decision_service import DecisionService
 from .learning_process.learning_path import LearningPath
+from .learning_process.learning_path_node import LearningPathNode, LearningPathProgress
 from .learning_process.lesson_event_log import LessonEventLog
 
 
@@ -21,6 +23,7 @@ from .learning_process.lesson_event_log import LessonEventLog
 from .student.enrollment import Enrollment
 from .student.skill_delta import SkillDelta
 from .student.skill_snapshot import SkillSnapshot
+from .student.skill_state import SkillState, SkillTrajectory
 from .student.student_response import StudentTaskResponse
 
 # Systematization models
@@ -0,0 +1,59 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from curriculum.models.content.course import Course
+
+
+class GenerationStepKind(models.TextChoices):
+    """Тип шага генерации курса"""
+    COURSE = ('course', _('Course'))
+    LESSON = ('lesson', _('Lesson'))
+    TASKS = ('tasks', _('Tasks'))
+    MEDIA = ('media', _('Media'))
+
+
+class GenerationStepStatus(models.TextChoices):
+    DONE = ('done', _('Done'))
+    FAILED = ('failed', _('Failed'))
+
+
+class ContentGenerationStep(models.Model):
+    """
+    Чекпоинт шага графа генерации курса (content_generation/generation_scheduler.py).
+
+    Назначение:
+    - завершённые шаги при повторном запуске не выполняются, их результат
+      (id урока, id заданий, скрипты аудио) передаётся зависимым шагам;
+    - упавшие шаги и всё, что от них зависит, выполняются заново.
+
+    Поля:
+    - key: ключ узла графа ("course", "lesson:12", "tasks:12", "media:12")
+    - result: результат шага для зависимых узлов
+    - attempts: число запусков шага
+    """
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='generation_steps',
+        verbose_name=_("Course")
+    )
+    key = models.CharField(max_length=100, verbose_name=_("Step key"))
+    kind = models.CharField(max_length=20, choices=GenerationStepKind, verbose_name=_("Step kind"))
+    status = models.CharField(max_length=10, choices=GenerationStepStatus, verbose_name=_("Status"))
+    result = models.JSONField(default=dict, blank=True, verbose_name=_("Result"))
+    error = models.TextField(blank=True, default="", verbose_name=_("Error"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Attempts"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Content generation step")
+        verbose_name_plural = _("Content generation steps")
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'key'], name='unique_generation_step_per_course'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id}:{self.key} ({self.status})"
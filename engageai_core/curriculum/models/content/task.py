@@ -96,6 +96,15 @@ class Task(models.Model):
     content = models.JSONField(verbose_name=_("Content"))
     # схема задается в engageai_core/curriculum/schemas.py:TASK_CONTENT_SCHEMAS
     content_schema_version = models.CharField(default="v1", verbose_name=_("Content Schema"))
+    # Отпечаток схемы, которой контент уже проверен (curriculum/validation/schema_registry.py):
+    # совпадает с TASK_SCHEMA_REGISTRY.stamp(content_schema_version) — повторная проверка не нужна
+    content_validated_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        editable=False,
+        verbose_name=_("Content validated at schema version")
+    )
     difficulty_cefr = models.CharField(max_length=2, choices=CEFRLevel, verbose_name=_("Difficulty CEFR"))
     learning_objectives = models.ManyToManyField(
         LearningObjective,
@@ -138,6 +147,13 @@ class Task(models.Model):
 
     def save(self, *args, **kwargs):
         """Автоматическая установка порядка при создании"""
+        # Изменение контента или схемы сбрасывает отметку о проверке
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"content", "content_schema_version"} & set(update_fields):
+            self.content_validated_version = ""
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | {"content_validated_version"}
+
         if not self.pk and self.order == 0:
             # Получаем максимальный order в этом уроке и добавляем 1
             max_order = Task.objects.filter(lesson=self.lesson).aggregate(
@@ -27,11 +27,21 @@ class TaskMedia(models.Model):
     - file: путь к файлу
     - media_type: тип контента
     - order: порядок, если файлов несколько
+    - synthesis_key: ключ TTS-кэша (ai.tts.service.SpeechRequest.key) для синтезированного аудио;
+      одинаковые фразы разных заданий ссылаются на один файл кэша
     """
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='media_files', verbose_name=_("Task"))
     file = models.FileField(upload_to='task_media/', verbose_name=_("File"))
     media_type = models.CharField(max_length=20, choices=MediaType, verbose_name=_("Media Type"))
     order = models.PositiveSmallIntegerField(default=0, verbose_name=_("Order"))
+    synthesis_key = models.CharField(
+        max_length=64,
+        blank=True,
+        default="",
+        db_index=True,
+        verbose_name=_("TTS cache key"),
+        help_text=_("SHA-256 текста, голоса и скорости синтезированного аудио")
+    )
 
     class Meta:
         verbose_name = _("Task Media")
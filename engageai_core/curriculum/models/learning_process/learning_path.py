@@ -7,7 +7,9 @@ class LearningPath(models.Model):
     """
     Персонализированный учебный путь студента в рамках зачисления.
 
-    структура узла в nodes
+    Узлы пути хранятся строками LearningPathNode (path_nodes) с позицией и статусом,
+    прогресс — в LearningPathProgress (progress); изменяются через LearningPathNodeService.
+    export_nodes() возвращает путь в прежнем JSON-формате — структура узла:
         {
             "node_id": "remedial-grammar-B1-02-9f3a2c",
             "lesson_id": null,
@@ -98,37 +100,10 @@ class LearningPath(models.Model):
         verbose_name=_("Тип пути")
     )
 
-    # JSON-структура пути: список узлов с условиями
-    nodes = models.JSONField(
-        verbose_name=_("Узлы пути"),
-        default=list,
-        help_text=_("""
-        Пример структуры:
-        [
-            {
-                "node_id": "remedial-grammar-B1-02-9f3a2c",
-                "lesson_id": null,
-                "learning_objective": "grammar-B1-02",
-                "title": "Повтор: Past Simple vs Present Perfect",
-                "type": "remedial",
-                "status": "locked",
-                "prerequisites": ["lesson-42"],
-                "created_at": "2026-02-04T10:12:00Z",
-                "completed_at": null,
-                "metadata": {
-                    "source": "auto",
-                    "trigger": "multiple_failures"
-                }
-            },
-            ...
-        ]
-        """)
-    )
-
     current_node_index = models.PositiveIntegerField(
         default=0,
         verbose_name=_("Индекс текущего узла"),
-        help_text=_("Позиция в массиве nodes")
+        help_text=_("Позиция (position) текущего узла в path_nodes")
     )
 
     generated_at = models.DateTimeField(
@@ -158,13 +133,16 @@ class LearningPath(models.Model):
 
     @property
     def current_node(self):
-        """Текущий узел для удобства в сервисах и views"""
-        if self.nodes and self.current_node_index < len(self.nodes):
-            return self.nodes[self.current_node_index]
-        return None
+        """Текущий узел (словарь в формате export_nodes) для удобства в сервисах и views"""
+        node = self.path_nodes.filter(position=self.current_node_index).first()
+        return node.as_dict() if node else None
+
+    def export_nodes(self) -> list:
+        """Узлы пути в прежнем JSON-формате LearningPath.nodes"""
+        return [node.as_dict() for node in self.path_nodes.order_by("position")]
 
     def advance_to_next_node(self):
         """Переход к следующему узлу после завершения урока"""
-        if self.current_node_index + 1 < len(self.nodes):
+        if self.path_nodes.filter(position__gt=self.current_node_index).exists():
             self.current_node_index += 1
-            self.save(update_fields=["current_node_index", "updated_at"])
\ No newline at end of file
+            self.save(update_fields=["current_node_index", "updated_at"])
@@ -0,0 +1,190 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+
+from curriculum.models.learning_process.learning_path import LearningPath
+
+
+class NodeType(models.TextChoices):
+    CORE = ("core", _("Основной урок курса"))
+    REMEDIAL = ("remedial", _("Повтор / восстановление"))
+    DIAGNOSTIC = ("diagnostic", _("Проверка уровня"))
+    PRACTICE = ("practice", _("Практика без теории"))
+
+
+class NodeStatus(models.TextChoices):
+    LOCKED = ("locked", _("Недоступен"))
+    UNLOCKED = ("unlocked", _("Доступен"))
+    IN_PROGRESS = ("in_progress", _("Текущий активный узел"))
+    COMPLETED = ("completed", _("Завершён"))
+    SKIPPED = ("skipped", _("Пропущен"))
+    RECOMMENDED = ("recommended", _("Рекомендован"))
+
+
+class LearningPathNode(models.Model):
+    """
+    Узел учебного пути (бывший элемент LearningPath.nodes).
+
+    position — порядковый номер узла в пути (с 0), LearningPath.current_node_index
+    указывает на position текущего узла. При вставке remedial-узлов позиции
+    последующих узлов сдвигаются одним UPDATE, поэтому уникальность позиции
+    поддерживает LearningPathNodeService, а не ограничение БД.
+
+    Ключи прежнего JSON-формата, для которых нет колонок (reason, estimated_minutes,
+    submitted_at и т.п.), хранятся в extra; as_dict() собирает узел в прежнем формате.
+    """
+
+    learning_path = models.ForeignKey(
+        LearningPath,
+        on_delete=models.CASCADE,
+        related_name="path_nodes",
+        verbose_name=_("Учебный путь")
+    )
+    position = models.PositiveIntegerField(verbose_name=_("Позиция в пути"))
+    node_id = models.CharField(max_length=255, verbose_name=_("Идентификатор узла"))
+    lesson = models.ForeignKey(
+        "Lesson",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="path_nodes",
+        verbose_name=_("Урок"),
+        help_text=_("Пусто для виртуальных узлов (remedial, diagnostic, practice)")
+    )
+    learning_objective = models.CharField(max_length=100, blank=True, default="", verbose_name=_("Учебная цель"))
+    title = models.CharField(max_length=255, blank=True, default="", verbose_name=_("Название"))
+    node_type = models.CharField(
+        max_length=20,
+        choices=NodeType,
+        default=NodeType.CORE,
+        verbose_name=_("Тип узла")
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=NodeStatus,
+        default=NodeStatus.LOCKED,
+        verbose_name=_("Статус")
+    )
+    prerequisites = models.JSONField(default=list, blank=True, verbose_name=_("Предусловия (node_id)"))
+    triggers = models.JSONField(default=list, blank=True, verbose_name=_("Триггеры"))
+    metadata = models.JSONField(default=dict, blank=True, verbose_name=_("Метаданные"))
+    extra = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("Дополнительные поля"),
+        help_text=_("Ключи узла без отдельной колонки: reason, estimated_minutes, submitted_at и т.п.")
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Добавлен в путь"))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Завершён"))
+
+    # Ключи as_dict(), хранящиеся в колонках; остальные ключи узла идут в extra
+    COLUMN_KEYS = (
+        "node_id", "lesson_id", "learning_objective", "title", "type", "status",
+        "prerequisites", "triggers", "created_at", "completed_at", "metadata",
+    )
+
+    class Meta:
+        verbose_name = _("Узел учебного пути")
+        verbose_name_plural = _("Узлы учебного пути")
+        ordering = ["learning_path", "position"]
+        constraints = [
+            models.UniqueConstraint(fields=["learning_path", "node_id"], name="unique_node_id_per_learning_path"),
+        ]
+        indexes = [
+            models.Index(fields=["learning_path", "position"]),
+            models.Index(fields=["learning_path", "status"]),
+            models.Index(fields=["learning_path", "node_type", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.learning_path_id}#{self.position} {self.node_id} ({self.status})"
+
+    @classmethod
+    def from_dict(cls, learning_path, position: int, data: dict) -> "LearningPathNode":
+        """Несохранённый узел из словаря прежнего JSON-формата"""
+        return cls(
+            learning_path=learning_path,
+            position=position,
+            node_id=str(data.get("node_id") or f"node-{position}"),
+            lesson_id=data.get("lesson_id"),
+            learning_objective=data.get("learning_objective") or "",
+            title=data.get("title") or "",
+            node_type=data.get("type") or NodeType.CORE,
+            status=data.get("status") or NodeStatus.LOCKED,
+            prerequisites=data.get("prerequisites") or [],
+            triggers=data.get("triggers") or [],
+            metadata=data.get("metadata") or {},
+            extra={key: value for key, value in data.items() if key not in cls.COLUMN_KEYS},
+            created_at=_parse_datetime(data.get("created_at")) or timezone.now(),
+            completed_at=_parse_datetime(data.get("completed_at")),
+        )
+
+    def as_dict(self) -> dict:
+        """Узел в прежнем JSON-формате LearningPath.nodes"""
+        return {
+            **self.extra,
+            "node_id": self.node_id,
+            "lesson_id": self.lesson_id,
+            "learning_objective": self.learning_objective or None,
+            "title": self.title,
+            "type": self.node_type,
+            "status": self.status,
+            "prerequisites": self.prerequisites,
+            "triggers": self.triggers,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "metadata": self.metadata,
+        }
+
+
+class LearningPathProgress(models.Model):
+    """
+    Материализованный прогресс по учебному пути.
+
+    Пересчитывается LearningPathNodeService в той же транзакции, что и изменение
+    узлов, — чтение прогресса (прогресс-бар урока, история курса) стоит один SELECT
+    по первичному ключу вместо обхода всех узлов.
+    """
+
+    learning_path = models.OneToOneField(
+        LearningPath,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="progress",
+        verbose_name=_("Учебный путь")
+    )
+    total_nodes = models.PositiveIntegerField(default=0, verbose_name=_("Всего узлов"))
+    completed_nodes = models.PositiveIntegerField(default=0, verbose_name=_("Завершено узлов"))
+    core_total = models.PositiveIntegerField(default=0, verbose_name=_("Всего core-уроков"))
+    core_completed = models.PositiveIntegerField(default=0, verbose_name=_("Завершено core-уроков"))
+    current_position = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Позиция текущего узла"))
+    current_core_number = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_("Номер текущего core-урока"),
+        help_text=_("Номер (с 1) первого core-узла в статусе in_progress среди core-узлов")
+    )
+    by_type = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_("По типам узлов"),
+        help_text=_("{'remedial': {'total': 2, 'completed': 1}, ...}")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Прогресс учебного пути")
+        verbose_name_plural = _("Прогресс учебных путей")
+
+    def __str__(self):
+        return f"{self.learning_path_id}: {self.completed_nodes}/{self.total_nodes}"
+
+    def type_stats(self, node_type: str) -> dict:
+        return self.by_type.get(node_type, {"total": 0, "completed": 0})
+
+
+def _parse_datetime(value):
+    if not value or not isinstance(value, str):
+        return value or None
+    return parse_datetime(value)
@@ -0,0 +1,116 @@
+from typing import Tuple
+
+import numpy as np
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from curriculum.validators import SkillDomain
+
+# Фиксированный порядок измерений вектора навыков
+SKILL_DIMENSIONS: Tuple[str, ...] = tuple(SkillDomain.values)
+SKILL_DIM = len(SKILL_DIMENSIONS)
+
+VECTOR_DTYPE = np.dtype("<f4")
+TIME_DTYPE = np.dtype("<i8")
+
+
+def pack_vectors(vectors) -> bytes:
+    """float32[n, SKILL_DIM] (или один вектор) → bytes"""
+    return np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vectors(blob) -> np.ndarray:
+    """bytes → float64[n, SKILL_DIM]"""
+    return np.frombuffer(bytes(blob or b""), dtype=VECTOR_DTYPE).reshape(-1, SKILL_DIM).astype(np.float64)
+
+
+def pack_times(timestamps) -> bytes:
+    """Секунды Unix (int64[n]) → bytes"""
+    return np.ascontiguousarray(timestamps, dtype=TIME_DTYPE).tobytes()
+
+
+def unpack_times(blob) -> np.ndarray:
+    return np.frombuffer(bytes(blob or b""), dtype=TIME_DTYPE).astype(np.int64)
+
+
+class SkillState(models.Model):
+    """
+    Текущие значения навыков зачисления — вектор float32 в порядке SKILL_DIMENSIONS.
+
+    Обновляется SkillEngine после каждого оценённого задания (EMA), одной строкой
+    на зачисление; SkillSnapshot после урока — копия этого вектора.
+    last_assessment_id делает обновление идемпотентным: результаты с меньшим
+    или равным id уже учтены.
+    """
+    enrollment = models.OneToOneField(
+        "Enrollment",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="skill_state",
+        verbose_name=_("Зачисление")
+    )
+    vector = models.BinaryField(verbose_name=_("Вектор навыков"), help_text=_("float32[6] в порядке SkillDomain"))
+    observations = models.PositiveIntegerField(default=0, verbose_name=_("Учтено оценок заданий"))
+    last_assessment_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name=_("Последний учтённый TaskAssessmentResult"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Состояние навыков")
+        verbose_name_plural = _("Состояния навыков")
+
+    def __str__(self):
+        return f"SkillState({self.enrollment_id}, {self.observations})"
+
+    @property
+    def values(self) -> np.ndarray:
+        return unpack_vectors(self.vector)[0]
+
+    def to_dict(self) -> dict:
+        return {skill: round(float(value), 3) for skill, value in zip(SKILL_DIMENSIONS, self.values)}
+
+
+class TrajectoryResolution(models.TextChoices):
+    RAW = ("raw", _("Каждое задание"))
+    DAILY = ("daily", _("Последнее значение за день"))
+
+
+class SkillTrajectory(models.Model):
+    """
+    Блок истории навыков зачисления: points векторов с отметками времени.
+
+    RAW-блоки пополняются после каждого задания (не более SKILL_TRAJECTORY_CHUNK_POINTS
+    точек в блоке); старые RAW-блоки периодически сжимаются в DAILY —
+    остаётся последнее значение за каждый день.
+    """
+    enrollment = models.ForeignKey(
+        "Enrollment",
+        on_delete=models.CASCADE,
+        related_name="skill_trajectory",
+        verbose_name=_("Зачисление")
+    )
+    resolution = models.CharField(
+        max_length=10,
+        choices=TrajectoryResolution,
+        default=TrajectoryResolution.RAW,
+        verbose_name=_("Детализация")
+    )
+    started_at = models.DateTimeField(verbose_name=_("Первая точка"))
+    ended_at = models.DateTimeField(verbose_name=_("Последняя точка"))
+    points = models.PositiveIntegerField(default=0, verbose_name=_("Число точек"))
+    timestamps = models.BinaryField(verbose_name=_("Время точек"), help_text=_("int64[points], секунды Unix"))
+    vectors = models.BinaryField(verbose_name=_("Векторы навыков"), help_text=_("float32[points, 6]"))
+
+    class Meta:
+        verbose_name = _("История навыков")
+        verbose_name_plural = _("История навыков")
+        indexes = [
+            models.Index(fields=["enrollment", "started_at"]),
+            models.Index(fields=["resolution", "ended_at"]),
+        ]
+
+    def __str__(self):
+        return f"SkillTrajectory({self.enrollment_id}, {self.resolution}, {self.points})"
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(секунды Unix int64[points], векторы float64[points, SKILL_DIM])"""
+        return unpack_times(self.timestamps), unpack_vectors(self.vectors)
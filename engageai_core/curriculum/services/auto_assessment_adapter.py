@@ -1,12 +1,15 @@
 import json
 import logging
 
+from django.conf import settings
+
 from curriculum.models.assessment.assessment_result import AssessmentResult
 from curriculum.models.content.response_format import ResponseFormat
 from curriculum.models.content.task import Task
 from curriculum.models.student.student_response import StudentTaskResponse
+from curriculum.services.auto_graders import AUTO_GRADERS, AutoGrader
 from curriculum.services.base_assessment_adapter import AssessmentPort
-from curriculum.validation.task_schemas import TASK_CONTENT_SCHEMAS
+from curriculum.validation.schema_registry import TASK_SCHEMA_REGISTRY, normalize_answer
 from curriculum.validators import SkillDomain
 
 
@@ -18,27 +21,43 @@ class SchemaValidationError(Exception):
 class AutoAssessorAdapter(AssessmentPort):
     """
     Адаптер для автоматической оценки закрытых и полузакрытых заданий.
-    Поддерживает схемы: scq_v1, mcq_v1, short_text_v1.
+    Поддерживает схемы: scq_v1, mcq_v1 и схемы с грейдерами из curriculum.services.auto_graders
+    (short_text_v1, gap_fill_v1, matching_v1, ordering_v1, word_formation_v1).
+    Результат грейдера с уверенностью ниже AUTO_GRADER_CONFIDENCE_THRESHOLD
+    передаётся на оценку LLM (needs_escalation).
     """
 
     SUPPORTED_FORMATS = {
         ResponseFormat.SINGLE_CHOICE: ['scq_v1'],
         ResponseFormat.MULTIPLE_CHOICE: ['mcq_v1'],
-        # ResponseFormat.SHORT_TEXT: ['short_text_v1'],
+        ResponseFormat.SHORT_TEXT: ['short_text_v1', 'gap_fill_v1', 'matching_v1', 'ordering_v1',
+                                    'word_formation_v1'],
     }
 
+    @classmethod
+    def can_assess(cls, task: Task) -> bool:
+        """Задание проверяется автоматически (формат и версия схемы поддерживаются)"""
+        return task.content_schema_version in cls.SUPPORTED_FORMATS.get(task.response_format, ())
+
+    @staticmethod
+    def needs_escalation(result: AssessmentResult) -> bool:
+        """Грейдер не уверен в оценке — задание нужно оценить LLM"""
+        confidence = (result.metadata or {}).get("auto_confidence")
+        return confidence is not None and confidence < settings.AUTO_GRADER_CONFIDENCE_THRESHOLD
+
     def assess_task(self, task: Task, response: StudentTaskResponse) -> AssessmentResult:
         try:
             # 1. Валидация совместимости формата и схемы
             self._validate_format_schema(task)
 
             # 2. Выбор метода оценки
-            if task.response_format == ResponseFormat.SINGLE_CHOICE:
+            grader = AUTO_GRADERS.get(task.content_schema_version)
+            if grader is not None:
+                return self._assess_with_grader(grader, task, response)
+            elif task.response_format == ResponseFormat.SINGLE_CHOICE:
                 return self._assess_single_choice(task, response)
             elif task.response_format == ResponseFormat.MULTIPLE_CHOICE:
                 return self._assess_multiple_choice(task, response)
-            elif task.response_format == ResponseFormat.SHORT_TEXT:
-                return self._assess_short_text(task, response)
             else:
                 return self._neutral_assessment(task)
 
@@ -49,6 +68,37 @@ class AutoAssessorAdapter(AssessmentPort):
             self.logger.error(f"Auto assessment failed for task {task.id}: {str(e)}", exc_info=True)
             return self._neutral_assessment(task, error_tags=["assessment_error"])
 
+    def _assess_with_grader(self, grader: AutoGrader, task: Task, response: StudentTaskResponse) -> AssessmentResult:
+        """Оценка подключаемым грейдером схемы"""
+        outcome = grader.grade(task.content, response.response_text)
+
+        skill_eval = {}
+        for skill in SkillDomain.values:
+            if skill == task.task_type:
+                skill_eval[skill] = {
+                    "score": outcome.score,
+                    "confidence": outcome.confidence,
+                    "evidence": outcome.evidence,
+                }
+            else:
+                skill_eval[skill] = {"score": None, "confidence": None, "evidence": []}
+
+        advice = []
+        if not outcome.is_correct and task.content.get("explanation"):
+            advice.append(task.content["explanation"])
+
+        return AssessmentResult(
+            is_correct=outcome.is_correct,
+            task_id=task.pk,
+            cefr_target="N/A",
+            skill_evaluation=skill_eval,
+            summary={
+                "text": "Правильно" if outcome.is_correct else "Ответ проверен автоматически",
+                "advice": advice,
+            },
+            error_tags=outcome.error_tags,
+            metadata={"grader": grader.schema, "auto_confidence": outcome.confidence, **outcome.details},
+        )
 
     def _validate_format_schema(self, task: Task) -> None:
         """
@@ -59,16 +109,19 @@ class AutoAssessorAdapter(AssessmentPort):
         Этапы валидации:
         1. Проверка, что формат ответа поддерживается автооценщиком.
         2. Проверка, что версия схемы разрешена для данного формата ответа.
-        3. Загрузка определения схемы из TASK_CONTENT_SCHEMAS.
-        4. Проверка наличия всех обязательных полей,
-           определённых схемой, в task.content.
+        3. Если контент уже проверен актуальной версией схемы
+           (Task.content_validated_version) — проверка пропускается.
+        4. Структурная проверка task.content скомпилированной схемой из TASK_SCHEMA_REGISTRY:
+           обязательные поля, типы и границы индексов — то, что читает грейдер.
+        5. Полная проверка validation_rules: при успехе сохраняется отметка, при ошибках
+           задание всё равно оценивается (контент создан до ужесточения правил).
 
         Исключения:
             SchemaValidationError:
                 - если формат ответа не поддерживается
                 - если схема не совместима с форматом ответа
                 - если определение схемы отсутствует
-                - если в task.content отсутствуют обязательные поля
+                - если структура task.content не позволяет оценить ответ
         """
 
         response_format = task.response_format
@@ -86,25 +139,35 @@ class AutoAssessorAdapter(AssessmentPort):
                 f"Schema '{schema_name}' is not supported for response format '{response_format}'"
             )
 
-        # 3. Load schema definition
-        schema_definition = TASK_CONTENT_SCHEMAS.get(schema_name)
-        if not schema_definition:
+        # 3. Already validated by the current schema version
+        if TASK_SCHEMA_REGISTRY.is_validated(task):
+            return
+
+        # 4. Validate the structure the grader reads
+        schema = TASK_SCHEMA_REGISTRY.get(schema_name)
+        if schema is None:
             raise SchemaValidationError(
                 f"Unknown task content schema: '{schema_name}'"
             )
 
-        # 4. Validate required content fields
-        required_fields = schema_definition.get("required", set())
-
-        missing_fields = [
-            field for field in required_fields
-            if field not in task.content
-        ]
-
-        if missing_fields:
+        errors = schema.validate(task.content, structural_only=True)
+        if errors:
             raise SchemaValidationError(
-                f"Missing required fields in task content: {missing_fields}"
+                f"Invalid task content: {'; '.join(errors)}"
+            )
+
+        # 5. Full validation rules: grade anyway, mark as validated only if they pass
+        errors = schema.validate(task.content)
+        if errors:
+            self.logger.warning(
+                f"Task {task.pk} content does not meet schema '{schema_name}' rules "
+                f"(graded anyway): {'; '.join(errors)}"
             )
+            return
+
+        task.content_validated_version = schema.stamp
+        if task.pk:
+            type(task).objects.filter(pk=task.pk).update(content_validated_version=schema.stamp)
 
     def _neutral_assessment(self, task: Task, error_tags=None):
         error_tags = error_tags or []
@@ -177,11 +240,11 @@ class AutoAssessorAdapter(AssessmentPort):
         if not response_text:
             return None
 
-        student_text = response_text.lower()
+        student_text = normalize_answer(response_text)
         options = task.content["options"]
 
         for idx, option in enumerate(options):
-            if student_text == option.lower().strip():
+            if student_text == normalize_answer(option):
                 return idx
 
         raise ValueError(f"Invalid choice: '{response_text}' not found in options")
@@ -262,8 +325,9 @@ class AutoAssessorAdapter(AssessmentPort):
             if isinstance(parsed, list):
                 # список строк → маппинг в индексы
                 if all(isinstance(v, str) for v in parsed):
-                    option_to_index = {opt: i for i, opt in enumerate(options)}
+                    option_to_index = {normalize_answer(opt): i for i, opt in enumerate(options)}
                     for value in parsed:
+                        value = normalize_answer(value)
                         if value not in option_to_index:
                             self.logger.warning(
                                 "Unknown option value in MULTIPLE_CHOICE",
@@ -372,128 +436,3 @@ class AutoAssessorAdapter(AssessmentPort):
                 exc_info=True,
             )
             return self._neutral_assessment(task)
-
-    def _assess_short_text(self, task: Task, response: StudentTaskResponse) -> AssessmentResult:
-        """
-        Оценка задания с кратким текстовым ответом (short_text_v1) в доменном формате AssessmentResult.
-
-        Алгоритм:
-        1. Проверка типа ответа студента
-        2. Приведение к строке и проверка длины
-        3. Сравнение с correct_answers (с учётом case_sensitive)
-        4. Формирование score и evidence
-        5. Формирование skill_evaluation с использованием SkillDomain
-        """
-        content = task.content
-        student_answer = response.response_text
-
-        try:
-            # Пытаемся привести к строке
-            if not isinstance(student_answer, str):
-                student_answer = str(student_answer) if student_answer is not None else ""
-
-            student_answer_stripped = student_answer.strip()
-
-            # пустой ответ → сразу 0 баллов
-            if student_answer_stripped == "":
-                score = 0.0
-                evidence = ["Ответ пустой или состоит только из пробелов"]
-
-                skill_eval = {}
-                for skill in SkillDomain.values:
-                    if skill == task.task_type:
-                        skill_eval[skill] = {
-                            "score": score,
-                            "confidence": 1.0,
-                            "evidence": evidence,
-                        }
-                    else:
-                        skill_eval[skill] = {
-                            "score": None,
-                            "confidence": None,
-                            "evidence": [],
-                        }
-
-                summary = {
-                    "text": "Ответ не предоставлен",
-                    "advice": ["Необходимо ввести ответ в поле."]
-                }
-
-                return AssessmentResult(
-                    is_correct=False,
-                    task_id=task.pk,
-                    cefr_target="N/A",
-                    skill_evaluation=skill_eval,
-                    summary=summary,
-                    error_tags=["empty_response"],
-                    metadata={
-                        "student_answer": student_answer,
-                        "correct_answers": content.get("correct_answers", []),
-                        "case_sensitive": content.get("case_sensitive", False),
-                        "min_length": content.get("min_length", 1),
-                        "max_length": content.get("max_length", 100),
-                    },
-                )
-
-            # Параметры схемы
-            correct_answers = content.get("correct_answers", [])
-            case_sensitive = content.get("case_sensitive", False)
-            min_length = content.get("min_length", 1)
-            max_length = content.get("max_length", 100)
-
-            # Проверка длины ответа
-            answer_length = len(student_answer_stripped)
-            if not (min_length <= answer_length <= max_length):
-                return self._neutral_assessment(task)
-
-            # Проверка совпадения с correct_answers
-            if correct_answers:
-                if not case_sensitive:
-                    student_answer_norm = student_answer_stripped.lower()
-                    correct_norm = [a.lower() for a in correct_answers]
-                else:
-                    student_answer_norm = student_answer_stripped
-                    correct_norm = [a.strip() for a in correct_answers]
-
-                is_correct = student_answer_norm in correct_norm
-                score = 1.0 if is_correct else 0.0
-                evidence = [f"Ответ: {student_answer} — {'✔' if is_correct else '✖'}"]
-            else:
-                # Нет эталонного ответа → нейтральная оценка
-                return self._neutral_assessment(task)
-
-            # skill_evaluation
-            skill_eval = {}
-            for skill in SkillDomain.values:
-                if skill == task.task_type:
-                    skill_eval[skill] = {"score": score, "confidence": 1.0, "evidence": evidence}
-                else:
-                    skill_eval[skill] = {"score": None, "confidence": None, "evidence": []}
-
-            advice = []
-            if not case_sensitive:
-                advice.append("Проверьте регистр и формат ответа.")
-
-            summary = {
-                "text": "Ответ проверен автоматически",
-                "advice": advice
-            }
-
-            return AssessmentResult(
-                is_correct=is_correct,
-                task_id=task.pk,
-                cefr_target="N/A",
-                skill_evaluation=skill_eval,
-                summary=summary,
-                error_tags=[],
-                metadata={
-                    "student_answer": student_answer,
-                    "correct_answers": correct_answers,
-                    "case_sensitive": case_sensitive,
-                    "min_length": min_length,
-                    "max_length": max_length
-                }
-            )
-        except Exception as e:
-            self.logger.error(f"SHORT_TEXT assessment failed for task {task.pk}: {str(e)}")
-            return self._neutral_assessment(task)
@@ -0,0 +1,412 @@
+"""
+Подключаемые детерминированные грейдеры для AutoAssessorAdapter.
+
+Грейдер регистрируется декоратором @register_grader по имени схемы контента
+(Task.content_schema_version) и возвращает GradeOutcome с оценкой и уверенностью.
+Если уверенность ниже settings.AUTO_GRADER_CONFIDENCE_THRESHOLD, задание
+передаётся на оценку LLM (см. AutoAssessorAdapter.needs_escalation).
+
+Сравнение текста (TextMatcher):
+- точное совпадение после normalize_answer — уверенная оценка;
+- ответ — другая форма того же слова по таблицам word_helper.WordForm — уверенная ошибка формы;
+- одна опечатка (расстояние Левенштейна ≤ 1) в одном слове не короче TYPO_MIN_LENGTH,
+  если ответ не является другим словарным словом, — засчитывается как опечатка;
+- любое другое «почти совпадение» (have/has, to/for в словосочетании, stationary/stationery) —
+  низкая уверенность, решение остаётся за LLM.
+"""
+import json
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+from engageai_core.local_cache import ProcessLocalTTLCache
+from curriculum.validation.schema_registry import normalize_answer
+from word_helper.models import Word, WordForm
+
+
+@dataclass(frozen=True)
+class TextMatch:
+    score: float
+    confidence: float
+    matched: Optional[str] = None
+    error_tag: Optional[str] = None
+
+
+@dataclass
+class GradeOutcome:
+    score: float
+    confidence: float
+    is_correct: bool
+    evidence: List[str] = field(default_factory=list)
+    error_tags: List[str] = field(default_factory=list)
+    details: Dict[str, Any] = field(default_factory=dict)
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Расстояние Левенштейна (две строки DP, ответы короткие)"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """1 - нормализованное расстояние редактирования (0.0–1.0)"""
+    longest = max(len(a), len(b))
+    return 1.0 - edit_distance(a, b) / longest if longest else 1.0
+
+
+class WordFormIndex:
+    """Леммы словоформ из word_helper (WordForm.form -> Word.word) с кэшем в памяти процесса"""
+
+    _cache = ProcessLocalTTLCache("word_helper_lemmas", ttl=60 * 60)
+
+    @classmethod
+    def lemmas(cls, text: str) -> FrozenSet[str]:
+        """Базовые слова, формой которых является text (само слово тоже считается своей формой)"""
+        key = normalize_answer(text)
+        if not key or " " in key:
+            return frozenset()
+
+        cached = cls._cache.get(key)
+        if cached is not None:
+            return cached
+
+        words = list(WordForm.objects.filter(form__iexact=key).values_list("word__word", flat=True))
+        words += Word.objects.filter(word__iexact=key).values_list("word", flat=True)
+        lemmas = frozenset(normalize_answer(word) for word in words)
+        cls._cache.set(key, lemmas)
+        return lemmas
+
+    @classmethod
+    def shares_lemma(cls, text: str, other: str) -> bool:
+        own = cls.lemmas(text)
+        return bool(own) and bool(own & (cls.lemmas(other) | {normalize_answer(other)}))
+
+
+class TextMatcher:
+    """Сравнение ответа с допустимыми вариантами с учётом опечаток и словоформ"""
+
+    TYPO_MAX_DISTANCE = 1
+    TYPO_MIN_LENGTH = 5
+    TYPO_CONFIDENCE = 0.9
+    AMBIGUOUS_SIMILARITY = 0.6
+
+    @classmethod
+    def match(cls, answer: str, accepted: Sequence[str], case_sensitive: bool = False) -> TextMatch:
+        answer_norm = normalize_answer(answer, case_sensitive)
+        accepted_norm = [normalize_answer(value, case_sensitive) for value in accepted]
+        if not answer_norm:
+            return TextMatch(score=0.0, confidence=1.0, error_tag="empty_response")
+
+        if answer_norm in accepted_norm:
+            return TextMatch(score=1.0, confidence=1.0, matched=answer_norm)
+
+        # Реальная словоформа того же слова — ошибка формы, а не опечатка
+        for value in accepted_norm:
+            if WordFormIndex.shares_lemma(answer_norm, value):
+                return TextMatch(score=0.0, confidence=0.95, matched=value, error_tag="wrong_form")
+
+        for value in accepted_norm:
+            if cls.is_typo(answer_norm, value):
+                return TextMatch(score=similarity(answer_norm, value), confidence=cls.TYPO_CONFIDENCE,
+                                 matched=value, error_tag="spelling")
+
+        best_value, best_similarity = None, 0.0
+        for value in accepted_norm:
+            ratio = similarity(answer_norm, value)
+            if ratio > best_similarity:
+                best_value, best_similarity = value, ratio
+
+        # Близко, но не опечатка (другая форма глагола, предлог, другое слово) — решает LLM
+        if best_similarity >= cls.AMBIGUOUS_SIMILARITY:
+            return TextMatch(score=0.0, confidence=0.5, matched=best_value, error_tag="near_miss")
+        # Далёкий ответ: ключ может не содержать синонимов, поэтому уверенность не полная
+        return TextMatch(score=0.0, confidence=0.9)
+
+    @classmethod
+    def is_typo(cls, answer: str, value: str) -> bool:
+        """Одна опечатка в одном слове: короткие и служебные слова, словосочетания и словарные слова — не опечатки"""
+        if not (answer.isalpha() and value.isalpha()) or len(value) < cls.TYPO_MIN_LENGTH:
+            return False
+        if edit_distance(answer, value) > cls.TYPO_MAX_DISTANCE:
+            return False
+        # Существующее слово (stationary вместо stationery) — другое слово, а не опечатка
+        return not WordFormIndex.lemmas(answer)
+
+
+class AutoGrader(ABC):
+    """Грейдер одной схемы контента"""
+
+    schema: str
+
+    @abstractmethod
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        pass
+
+    @staticmethod
+    def split_answers(response_text: str) -> List[str]:
+        """Ответ-список: JSON-массив или значения через ';', ',' или перевод строки"""
+        text = (response_text or "").strip()
+        if not text:
+            return []
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, list):
+            return [str(item) for item in parsed]
+
+        separator = "\n" if "\n" in text else ";" if ";" in text else ","
+        return [part.strip() for part in text.split(separator)]
+
+    @staticmethod
+    def parse_index(value: Any, size: int) -> Optional[int]:
+        """Индекс из числа (с 0) или буквы (a = 0)"""
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value if 0 <= value < size else None
+        token = str(value).strip().lower().rstrip(").")
+        if token.isdigit():
+            index = int(token)
+            return index if 0 <= index < size else None
+        if len(token) == 1 and token.isalpha():
+            index = ord(token) - ord("a")
+            return index if 0 <= index < size else None
+        return None
+
+    @classmethod
+    def parse_number(cls, value: Any, size: int) -> Optional[int]:
+        """Индекс из номера, набранного в тексте ответа (с 1: "1" = 0), или буквы (a = 0)"""
+        token = str(value).strip().rstrip(").")
+        if token.isdigit():
+            return cls.parse_index(int(token) - 1, size)
+        return cls.parse_index(token, size)
+
+
+AUTO_GRADERS: Dict[str, AutoGrader] = {}
+
+
+def register_grader(cls):
+    AUTO_GRADERS[cls.schema] = cls()
+    return cls
+
+
+@register_grader
+class ShortTextGrader(AutoGrader):
+    schema = "short_text_v1"
+
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        answer = (response_text or "").strip()
+        if not answer:
+            return GradeOutcome(0.0, 1.0, False, ["Ответ пустой или состоит только из пробелов"], ["empty_response"])
+
+        min_length, max_length = content.get("min_length", 1), content.get("max_length", 100)
+        if not (min_length <= len(answer) <= max_length):
+            # Длина вне ожидаемой — вероятно, развёрнутый ответ: решает LLM
+            return GradeOutcome(0.0, 0.0, False, [f"Длина ответа {len(answer)} вне {min_length}–{max_length}"])
+
+        correct_answers = content.get("correct_answers", [])
+        if not correct_answers:
+            # Нет эталонного ответа — решает LLM
+            return GradeOutcome(0.0, 0.0, False, ["Нет эталонного ответа"])
+
+        match = TextMatcher.match(answer, correct_answers, content.get("case_sensitive", False))
+        is_correct = match.score > 0
+        return GradeOutcome(
+            score=match.score,
+            confidence=match.confidence,
+            is_correct=is_correct,
+            evidence=[f"Ответ: {answer} — {'✔' if is_correct else '✖'}"],
+            error_tags=[match.error_tag] if match.error_tag else [],
+            details={"student_answer": answer, "matched": match.matched},
+        )
+
+
+@register_grader
+class GapFillGrader(AutoGrader):
+    schema = "gap_fill_v1"
+
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        gaps: List[List[str]] = content["gaps"]
+        answers = self.split_answers(response_text)
+        if not answers:
+            return GradeOutcome(0.0, 1.0, False, ["Пропуски не заполнены"], ["empty_response"])
+        if len(answers) != len(gaps):
+            # Не удалось сопоставить ответы с пропусками — решает LLM
+            return GradeOutcome(0.0, 0.0, False, [f"Ответов {len(answers)}, пропусков {len(gaps)}"])
+
+        case_sensitive = content.get("case_sensitive", False)
+        matches = [TextMatcher.match(answer, accepted, case_sensitive) for answer, accepted in zip(answers, gaps)]
+
+        evidence = [
+            f"{index}. {answer} — {'✔' if match.score > 0 else '✖ ' + ' / '.join(accepted)}"
+            for index, (answer, accepted, match) in enumerate(zip(answers, gaps, matches), start=1)
+        ]
+        return GradeOutcome(
+            score=sum(match.score for match in matches) / len(gaps),
+            confidence=min(match.confidence for match in matches),
+            is_correct=all(match.score > 0 for match in matches),
+            evidence=evidence,
+            error_tags=sorted({match.error_tag for match in matches if match.error_tag}),
+            details={"student_answers": answers},
+        )
+
+
+@register_grader
+class MatchingGrader(AutoGrader):
+    schema = "matching_v1"
+
+    _PAIR_RE = re.compile(r"^\s*(\w+)\s*[-–—:=>]+\s*(\w+)\s*$")
+
+    def _parse(self, content: dict, response_text: str) -> Optional[Dict[int, int]]:
+        left_size, right_size = len(content["left"]), len(content["right"])
+        text = (response_text or "").strip()
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+
+        pairs: Dict[int, int] = {}
+        if isinstance(parsed, list):
+            items = list(enumerate(parsed))
+        elif isinstance(parsed, dict):
+            items = list(parsed.items())
+        else:
+            items = []
+            for part in self.split_answers(text):
+                match = self._PAIR_RE.match(part)
+                if not match:
+                    return None
+                # В текстовой форме номера с обеих сторон — с 1: "1-b, 2-a", "1-2, 2-1"
+                items.append(tuple(
+                    int(token) - 1 if token.isdigit() else token
+                    for token in match.group(1, 2)
+                ))
+
+        for left, right in items:
+            left_index = self.parse_index(left, left_size)
+            right_index = self.parse_index(right, right_size)
+            if left_index is None or right_index is None:
+                return None
+            pairs[left_index] = right_index
+        return pairs
+
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        if not (response_text or "").strip():
+            return GradeOutcome(0.0, 1.0, False, ["Пары не указаны"], ["empty_response"])
+
+        pairs = self._parse(content, response_text)
+        if pairs is None:
+            return GradeOutcome(0.0, 0.0, False, ["Не удалось разобрать пары"])
+
+        expected: List[int] = content["pairs"]
+        correct = [left for left, right in enumerate(expected) if pairs.get(left) == right]
+        evidence = [
+            f"{content['left'][left]} → {content['right'][right]} — {'✔' if expected[left] == right else '✖'}"
+            for left, right in sorted(pairs.items())
+            if left < len(expected)
+        ]
+        return GradeOutcome(
+            score=len(correct) / len(expected),
+            confidence=1.0,
+            is_correct=len(correct) == len(expected),
+            evidence=evidence,
+            details={"student_pairs": pairs},
+        )
+
+
+@register_grader
+class OrderingGrader(AutoGrader):
+    schema = "ordering_v1"
+
+    def _parse(self, content: dict, response_text: str) -> Optional[List[int]]:
+        items: List[str] = content["items"]
+        normalized_items = {normalize_answer(item): index for index, item in enumerate(items)}
+
+        text = (response_text or "").strip()
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            parsed = None
+        # В JSON-списке индексы с 0, в тексте номера с 1: "2, 1, 3, 4"
+        parse = self.parse_index if isinstance(parsed, list) else self.parse_number
+
+        order = []
+        for value in self.split_answers(text):
+            # Сначала текст элемента: элементы вида "I" или "a" не должны читаться как индексы
+            index = normalized_items.get(normalize_answer(value))
+            if index is None:
+                index = parse(value, len(items))
+            if index is None:
+                return None
+            order.append(index)
+        return order
+
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        if not (response_text or "").strip():
+            return GradeOutcome(0.0, 1.0, False, ["Порядок не указан"], ["empty_response"])
+
+        expected: List[int] = content["correct_order"]
+        order = self._parse(content, response_text)
+        if order is None or sorted(order) != sorted(expected):
+            return GradeOutcome(0.0, 0.0, False, ["Не удалось разобрать порядок элементов"])
+
+        # Частичный балл — доля пар элементов в правильном относительном порядке (Кендалл)
+        position = {item: index for index, item in enumerate(order)}
+        total_pairs = len(expected) * (len(expected) - 1) // 2
+        concordant = sum(
+            1
+            for i in range(len(expected))
+            for j in range(i + 1, len(expected))
+            if position[expected[i]] < position[expected[j]]
+        )
+        items = content["items"]
+        return GradeOutcome(
+            score=concordant / total_pairs if total_pairs else 1.0,
+            confidence=1.0,
+            is_correct=order == expected,
+            evidence=[f"Порядок: {' | '.join(items[index] for index in order)}"],
+            details={"student_order": order},
+        )
+
+
+@register_grader
+class WordFormationGrader(AutoGrader):
+    schema = "word_formation_v1"
+
+    def grade(self, content: dict, response_text: str) -> GradeOutcome:
+        answer = (response_text or "").strip()
+        if not answer:
+            return GradeOutcome(0.0, 1.0, False, ["Ответ не предоставлен"], ["empty_response"])
+
+        case_sensitive = content.get("case_sensitive", False)
+        match = TextMatcher.match(answer, content["correct_answers"], case_sensitive)
+
+        error_tags = [match.error_tag] if match.error_tag else []
+        confidence = match.confidence
+        if match.score == 0 and not match.error_tag and WordFormIndex.shares_lemma(answer, content["base_word"]):
+            # Существующая форма базового слова, но не та, что требуется
+            error_tags.append("wrong_form")
+            confidence = 0.95
+
+        is_correct = match.score > 0
+        return GradeOutcome(
+            score=match.score,
+            confidence=confidence,
+            is_correct=is_correct,
+            evidence=[f"{content['base_word']} → {answer} — {'✔' if is_correct else '✖'}"],
+            error_tags=error_tags,
+            details={"student_answer": answer, "matched": match.matched},
+        )
@@ -3,6 +3,7 @@ import logging
 import os
 import sys
 from collections import Counter
+from functools import partial
 from pathlib import Path
 from typing import Optional, List, Dict
 
@@ -17,9 +18,11 @@ import django
 
 django.setup()
 
-from django.db import models
+from django.db import connection, models
+from django.db.models.functions import Greatest, Least
 
 from curriculum.models import Course, Lesson, CourseBalance
+from curriculum.models.content.generation_step import GenerationStepKind, GenerationStepStatus
 from curriculum.models.content.methodological_plan import MethodologicalPlan
 from curriculum.services.content_generation.methodological_plan_loader import MethodologicalPlanLoader, LEVEL_ORDER, \
     SKILL_ORDER
@@ -27,11 +30,23 @@ from curriculum.services.content_generation.methodological_plan_loader import Me
 from curriculum.services.content_generation.course_generator import CourseGenerationService
 from curriculum.services.content_generation.lesson_generator import LessonGenerationService
 from curriculum.services.content_generation.task_generator import TaskGenerationService
+from curriculum.services.content_generation.generation_scheduler import GenerationCheckpointStore, GenerationNode, \
+    GenerationReport, GenerationScheduler
+from curriculum.services.methodological_plan_store import group_units_into_lessons, order_units
+from curriculum.services.task_audio_service import TaskAudioService
 
 logger = logging.getLogger(__name__)
 
+COURSE_STEP = "course"
+
 
 class ContentOrchestrator:
+    """
+    Генерация курса графом шагов (generation_scheduler): курс → уроки → задания → аудио.
+    Уроки не зависят друг от друга и генерируются параллельно; каждый шаг сохраняется
+    в ContentGenerationStep, поэтому resume_course продолжает сборку с места сбоя.
+    """
+
     def __init__(self):
         self.course_generator = CourseGenerationService()
         self.lesson_generator = LessonGenerationService()
@@ -44,27 +59,46 @@ class ContentOrchestrator:
             tasks_per_lesson: Optional[int] = None,
             include_media: bool = True,
             user_id: Optional[int] = None,
+            max_lessons: Optional[int] = None,
     ) -> Course:
         """Генерация полного курса: приоритет методплану, fallback на CourseBalance"""
         logger.info(f"Начата генерация курса по теме: '{theme}'")
 
-        # Шаг 1: Создание курса (без изменений)
+        # Шаг 1: Создание курса — корень графа, дальше курс только достраивается
         course = await self.course_generator.generate(theme=theme, user_id=user_id)
+        await GenerationCheckpointStore(course).save(
+            COURSE_STEP, GenerationStepKind.COURSE, GenerationStepStatus.DONE,
+            result={"course_id": course.pk, "theme": theme},
+        )
         logger.info(f"Курс '{course.title}' создан (ID: {course.pk})")
 
-        # Шаг 2: Генерация уроков по приоритету
-        lessons = await self._generate_lessons_smart(
+        # Шаг 2: Уроки, задания и аудио
+        await self._build_course(
             course=course,
             tasks_per_lesson=tasks_per_lesson,
             include_media=include_media,
-            user_id=user_id
+            user_id=user_id,
+            max_lessons=max_lessons,
         )
+        return course
 
-        logger.info(
-            f"Курс '{course.title}' полностью сгенерирован: "
-            f"{len(lessons)} уроков"
+    async def resume_course(
+            self,
+            course: Course,
+            tasks_per_lesson: Optional[int] = None,
+            include_media: bool = True,
+            user_id: Optional[int] = None,
+            max_lessons: Optional[int] = None,
+    ) -> Course:
+        """Продолжение генерации курса: завершённые шаги берутся из чекпоинтов"""
+        logger.info(f"Возобновление генерации курса '{course.title}' (ID: {course.pk})")
+        await self._build_course(
+            course=course,
+            tasks_per_lesson=tasks_per_lesson,
+            include_media=include_media,
+            user_id=user_id,
+            max_lessons=max_lessons,
         )
-
         return course
 
     async def generate_single_lesson_with_tasks(
@@ -103,151 +137,191 @@ class ContentOrchestrator:
 
         return lesson
 
-    async def _generate_lessons_smart(
+    async def _build_course(
             self,
             course: Course,
-            user_id: int,
-            tasks_per_lesson: Optional[int] = None,
-            include_media: bool = True,
-        ):
-        """Умная генерация с учётом LearningPlan"""
-        # Проверяем, есть ли уже план для курса
-        existing_plan = await sync_to_async(
-            MethodologicalPlan.objects.filter(course=course).first
-        )()
+            tasks_per_lesson: Optional[int],
+            include_media: bool,
+            user_id: Optional[int],
+            max_lessons: Optional[int] = None,
+    ) -> GenerationReport:
+        """Строит граф шагов по плану уроков и выполняет его"""
+        specs = await self._plan_lesson_specs(course)
+        if max_lessons is not None:
+            specs = specs[:max_lessons]
 
-        if existing_plan and not existing_plan.is_complete:
-            logger.info(f"Восстановление генерации: {existing_plan}")
-            return await self._resume_from_learning_plan(course=course, plan=existing_plan, user_id=user_id,
-                                                         include_media=include_media, tasks_per_lesson=tasks_per_lesson)
+        professional_tags = await sync_to_async(
+            lambda: list(course.professional_tags.values_list('description', flat=True))
+        )()
 
-        # Новая генерация
-        return await self._generate_lessons_new_plan(course, user_id=user_id,
-                                                     tasks_per_lesson=tasks_per_lesson, include_media=include_media)
+        nodes = self._build_generation_graph(
+            course=course,
+            specs=specs,
+            professional_tags=professional_tags,
+            tasks_per_lesson=tasks_per_lesson,
+            include_media=include_media,
+            user_id=user_id,
+        )
+        report = await GenerationScheduler(GenerationCheckpointStore(course)).run(nodes)
 
-    async def _generate_lessons_new_plan(
-            self,
-            course: Course,
-            user_id: int,
-            tasks_per_lesson: Optional[int] = None,
-            include_media: bool = True,
-    ):
-        """Новая генерация с сохранением плана"""
-        try:
-            plan_data = await self.plan_loader.load_full_plan()
-            if plan_data['coverage'] > 0.99:
-                await sync_to_async(MethodologicalPlan.objects.create)(
-                    course=course,
-                    plan_data=plan_data['plan'],
-                    total_units=plan_data['total_units'],
-                    levels=self._calc_level_stats(plan_data['plan']),
-                    skills=self._calc_skill_stats(plan_data['plan']),
-                )
-
-                lessons = await self._generate_lessons_from_methodological_plan(
-                    course=course,
-                    plan=plan_data['plan'],
-                    tasks_per_lesson=tasks_per_lesson,
-                    include_media=include_media,
-                    user_id=user_id,
-                )
+        if report.ok:
+            if max_lessons is None:
                 await self._mark_plan_complete(course)
-                return lessons
-
-        except Exception as e:
-            logger.warning(f"Методплан недоступен: {e}")
+            logger.info(f"Курс '{course.title}' полностью сгенерирован: {len(specs)} уроков")
+        else:
+            logger.warning(
+                f"Курс '{course.title}' сгенерирован не полностью: ошибок {len(report.failed)}, "
+                f"пропущено {len(report.skipped)} шагов — продолжение через resume_course",
+                extra={"course_id": course.pk, "failed": report.failed, "skipped": report.skipped}
+            )
+        return report
+
+    async def _plan_lesson_specs(self, course: Course) -> List[Dict]:
+        """План уроков курса: по методплану (сохраняется в MethodologicalPlan), иначе по CourseBalance"""
+        plan = await MethodologicalPlan.objects.filter(course=course).afirst()
+
+        if plan is None:
+            try:
+                plan_data = await self.plan_loader.load_full_plan()
+                if plan_data['coverage'] > 0.99:
+                    plan = await sync_to_async(MethodologicalPlan.objects.create)(
+                        course=course,
+                        plan_data=plan_data['plan'],
+                        total_units=plan_data['total_units'],
+                        levels=self._calc_level_stats(plan_data['plan']),
+                        skills=self._calc_skill_stats(plan_data['plan']),
+                    )
+            except Exception as e:
+                logger.warning(f"Методплан недоступен: {e}")
+
+        if plan is not None:
+            return self._lesson_specs_from_plan(plan.plan_data)
 
         # Fallback
-        return await self._generate_lessons_for_course(
-            course=course, num_lessons=60, tasks_per_lesson=tasks_per_lesson,
-            include_media=include_media, user_id=user_id
-        )
+        course_balance = await CourseBalance.objects.aget(course=course)
+        return self._lesson_specs_from_balance(course_balance, num_lessons=60)
 
-    async def _resume_from_learning_plan(
+    def _build_generation_graph(
             self,
             course: Course,
-            plan: MethodologicalPlan,
+            specs: List[Dict],
+            professional_tags: List[str],
             tasks_per_lesson: Optional[int],
             include_media: bool,
-            user_id:int):
-        """Продолжение генерации с места сбоя"""
-        logger.info(f"Возобновление: урок {plan.last_lesson_order + 1}")
-
-        # Загружаем план из БД
-        plan_dict = plan.plan_data
-        lessons = []
-        current_order = plan.last_lesson_order + 1
-
-        # Находим, с какого уровня продолжить
-        start_level = self._find_resume_level(plan_dict, plan.generated_units)
-
-        professional_tags = await sync_to_async(
-            lambda: list(course.professional_tags.values_list('description', flat=True))
-        )()
-
-        for level in LEVEL_ORDER:
-            if level < start_level:
-                continue
+            user_id: Optional[int],
+    ) -> List[GenerationNode]:
+        """lesson:N → tasks:N → media:N для каждого урока; цепочки уроков независимы"""
+        nodes = []
+        for spec in specs:
+            lesson_key = f"lesson:{spec['order']}"
+            tasks_key = f"tasks:{spec['order']}"
+            nodes.append(GenerationNode(
+                key=lesson_key,
+                kind=GenerationStepKind.LESSON,
+                run=partial(self._run_lesson_step, course, spec, professional_tags, user_id),
+            ))
+            nodes.append(GenerationNode(
+                key=tasks_key,
+                kind=GenerationStepKind.TASKS,
+                depends_on=(lesson_key,),
+                run=partial(self._run_tasks_step, lesson_key, spec, tasks_per_lesson, include_media, user_id),
+            ))
+            if include_media:
+                nodes.append(GenerationNode(
+                    key=f"media:{spec['order']}",
+                    kind=GenerationStepKind.MEDIA,
+                    depends_on=(tasks_key,),
+                    run=partial(self._run_media_step, tasks_key),
+                ))
+        return nodes
+
+    async def _run_lesson_step(
+            self,
+            course: Course,
+            spec: Dict,
+            professional_tags: List[str],
+            user_id: Optional[int],
+            deps: Dict[str, dict],
+    ) -> dict:
+        # Урок мог быть создан до сбоя, не успевшего записать чекпоинт
+        lesson = await Lesson.objects.filter(course=course, order=spec["order"]).afirst()
+        if lesson is None:
+            lesson = await self.lesson_generator.generate(
+                course=course,
+                order=spec["order"],
+                level=spec["level"],
+                skill_focus=spec["skill_focus"],
+                theme_tags=professional_tags,
+                methodological_tags=spec["methodological_tags"],
+                user_id=user_id,
+            )
+            if spec["methodological_tags"]:
+                await self._record_plan_progress(course, spec)
+
+        logger.debug(
+            f"Урок {spec['order']} ({spec['level']}): {len(spec['methodological_tags'] or [])} юнитов, "
+            f"skills: {spec['skill_focus']}"
+        )
+        return {"lesson_id": lesson.pk}
 
-            units_for_level = self._get_ordered_units_for_level(plan_dict[level])
-            lesson_groups = self._group_units_into_lessons(units_for_level)
-
-            # for methodological_tags in lesson_groups:
-            #     lesson = await self.lesson_generator.generate(
-            #         course=course,
-            #         order=current_order,
-            #         level=level,
-            #         skill_focus=skill_focus,
-            #         theme_tags=professional_tags,
-            #         methodological_tags=methodological_tags,
-            #         user_id=user_id,
-            #     )
-
-            for group_idx, methodological_tags in enumerate(lesson_groups, 1):
-                # Определяем параметры урока
-                first_unit = methodological_tags[0]
-                level = first_unit['cefr_level']
-                skill_focus = list({unit['skill_domain'] for unit in methodological_tags})
-
-                # Генерация урока с methodological_tags
-                lesson = await self.lesson_generator.generate(
-                    course=course,
-                    order=current_order,
-                    level=level,
-                    skill_focus=skill_focus,
-                    theme_tags=professional_tags,
-                    methodological_tags=methodological_tags,
-                    user_id=user_id,
-                )
-                # # Сохраняем в metadata
-                # lesson.metadata['methodological_tags'] = methodological_tags
-                # await sync_to_async(lesson.save)()
-
-                lessons.append(lesson)
-                current_order += 1
-
-                # Обновляем прогресс
-                plan.generated_units += len(methodological_tags)
-                plan.last_lesson_order = lesson.order
-                await sync_to_async(plan.save)()
-
-                # Генерация заданий
-                tasks_per_lesson = tasks_per_lesson or (5 if level in ["A2", "B1"] else 6)
-                await self.task_generator.generate(
-                    lesson=lesson,
-                    tasks_per_lesson=tasks_per_lesson,
-                    include_media=include_media,
-                    user_id=user_id,
-                )
-
-                logger.debug(
-                    f"Урок {current_order - 1} ({level}): {len(methodological_tags)} юнитов, "
-                    f"skills: {skill_focus}"
-                )
-
-        await self._mark_plan_complete(course)
-        logger.info(f"Методплан догенерирован: {len(lessons)} уроков")
-        return lessons
+    async def _run_tasks_step(
+            self,
+            lesson_key: str,
+            spec: Dict,
+            tasks_per_lesson: Optional[int],
+            include_media: bool,
+            user_id: Optional[int],
+            deps: Dict[str, dict],
+    ) -> dict:
+        lesson = await Lesson.objects.aget(pk=deps[lesson_key]["lesson_id"])
+
+        # Задания урока уже есть (созданы до сбоя или до появления чекпоинтов) — не дублируем,
+        # но аудио заданий, оставшихся без TaskMedia, передаём шагу синтеза
+        existing_ids = await sync_to_async(lambda: list(lesson.tasks.values_list("pk", flat=True)))()
+        if existing_ids:
+            media_requests = []
+            if include_media:
+                media_requests = await sync_to_async(self.task_generator.pending_media_requests)(lesson)
+            return {"task_ids": existing_ids, "media_requests": media_requests}
+
+        media_requests = []
+        tasks = await self.task_generator.generate(
+            lesson=lesson,
+            tasks_per_lesson=tasks_per_lesson or (5 if spec["level"] in ["A2", "B1"] else 6),
+            include_media=include_media,
+            user_id=user_id,
+            media_requests=media_requests,
+        )
+        if not tasks:
+            raise ValueError(f"Для урока {lesson.pk} не создано ни одного задания")
+        return {"task_ids": [task.pk for task in tasks], "media_requests": media_requests}
+
+    async def _run_media_step(self, tasks_key: str, deps: Dict[str, dict]) -> dict:
+        items = deps[tasks_key].get("media_requests") or []
+        if not items:
+            return {"media_count": 0}
+
+        # Синтез блокирующий — в отдельном потоке, чтобы не задерживать запросы к БД остальных шагов
+        created, failed = await sync_to_async(self._attach_audio, thread_sensitive=False)(items)
+        if failed:
+            raise RuntimeError(f"Не синтезировано {len(failed)} из {len(items)} фраз")
+        return {"media_count": created}
+
+    @staticmethod
+    def _attach_audio(items: List[Dict]):
+        try:
+            return TaskAudioService.attach_audio(items)
+        finally:
+            connection.close()
+
+    @sync_to_async
+    def _record_plan_progress(self, course: Course, spec: Dict):
+        """Прогресс методплана (для статистики; возобновление идёт по чекпоинтам)"""
+        MethodologicalPlan.objects.filter(course=course).update(
+            generated_units=Least(models.F("generated_units") + len(spec["methodological_tags"]),
+                                  models.F("total_units")),
+            last_lesson_order=Greatest(models.F("last_lesson_order"), spec["order"]),
+        )
 
     async def _mark_plan_complete(self, course: Course):
         """Отметить план завершённым"""
@@ -260,16 +334,6 @@ class ContentOrchestrator:
             generated_units=models.F("total_units"),
         )
 
-    def _find_resume_level(self, plan_dict: Dict, generated_units: int) -> str:
-        """Определяет уровень для возобновления"""
-        cumulative = 0
-        for level in LEVEL_ORDER:
-            level_units = sum(len(skill_units) for skill_units in plan_dict.get(level, {}).values())
-            if cumulative + level_units > generated_units:
-                return level
-            cumulative += level_units
-        return LEVEL_ORDER[-1]
-
     def _calc_level_stats(self, plan: Dict) -> Dict:
         stats = {}
         for level, skills in plan.items():
@@ -283,23 +347,9 @@ class ContentOrchestrator:
                 skill_count[skill_name] = skill_count.get(skill_name, 0) + len(units)
         return skill_count
 
-    async def _generate_lessons_from_methodological_plan(
-            self,
-            course: Course,
-            plan: Dict[str, Dict[str, List[Dict]]],
-            tasks_per_lesson: Optional[int],
-            include_media: bool,
-            user_id: Optional[int] = None,
-    ) -> List[Lesson]:
-        """Генерация уроков строго по методологическому плану"""
-        lessons = []
-        current_order = 1  # Начинаем с 1
-
-        # Получаем профессиональные теги
-        professional_tags = await sync_to_async(
-            lambda: list(course.professional_tags.values_list('description', flat=True))
-        )()
-
+    def _lesson_specs_from_plan(self, plan: Dict[str, Dict[str, List[Dict]]]) -> List[Dict]:
+        """Уроки строго по методологическому плану: уровни по порядку, 1-3 юнита на урок"""
+        specs = []
         for level in LEVEL_ORDER:
             if level not in plan:
                 logger.warning(f"Уровень {level} отсутствует в плане")
@@ -307,154 +357,42 @@ class ContentOrchestrator:
 
             # Собираем все юниты уровня в правильном порядке
             units_for_level = self._get_ordered_units_for_level(plan[level])
-
-            if not units_for_level:
-                continue
-
-            logger.info(f"Генерация уроков уровня {level}: {len(units_for_level)} юнитов")
-
-            # Группируем юниты в уроки (1-3 юнита на урок)
-            lesson_groups = self._group_units_into_lessons(units_for_level)
-
-            for group_idx, methodological_tags in enumerate(lesson_groups, 1):
-                # Определяем параметры урока
-                first_unit = methodological_tags[0]
-                level = first_unit['cefr_level']
-                skill_focus = list({unit['skill_domain'] for unit in methodological_tags})
-
-                # Генерация урока с methodological_tags
-                lesson = await self.lesson_generator.generate(
-                    course=course,
-                    order=current_order,
-                    level=level,
-                    skill_focus=skill_focus,
-                    theme_tags=professional_tags,
-                    methodological_tags=methodological_tags,
-                    user_id=user_id,
-                )
-
-                # # Сохраняем methodological_tags в metadata для восстановления
-                # lesson.metadata['methodological_tags'] = methodological_tags
-                # await sync_to_async(lesson.save)()
-
-                lessons.append(lesson)
-                current_order += 1
-
-                # Генерация заданий
-                tasks_per_lesson = tasks_per_lesson or (5 if level in ["A2", "B1"] else 6)
-                await self.task_generator.generate(
-                    lesson=lesson,
-                    tasks_per_lesson=tasks_per_lesson,
-                    include_media=include_media,
-                    user_id=user_id,
-                )
-
-                logger.debug(
-                    f"Урок {current_order - 1} ({level}): {len(methodological_tags)} юнитов, "
-                    f"skills: {skill_focus}"
-                )
-
-                if current_order > 3:  # TODO временная заглушка
-                    return lessons
-
-        logger.info(f"Методплан завершен: {len(lessons)} уроков")
-        return lessons
+            for methodological_tags in self._group_units_into_lessons(units_for_level):
+                specs.append({
+                    "order": len(specs) + 1,
+                    "level": methodological_tags[0]['cefr_level'],
+                    "skill_focus": sorted({unit['skill_domain'] for unit in methodological_tags}),
+                    "methodological_tags": methodological_tags,
+                })
+        return specs
 
     def _get_ordered_units_for_level(self, level_plan: Dict[str, List[Dict]]) -> List[Dict]:
         """Собирает все юниты уровня в порядке: skill_order + order_in_level"""
-        all_units = []
-        for skill in SKILL_ORDER:
-            if skill in level_plan:
-                units = level_plan[skill]
-                units.sort(key=lambda x: x.get('order_in_level', float('inf')))
-                all_units.extend(units)
-        return all_units
+        return order_units(level_plan)
 
     def _group_units_into_lessons(self, units: List[Dict], max_per_lesson: int = 3) -> List[List[Dict]]:
-        """Группирует юниты в уроки: 1-3 юнита, разнообразие skills"""
-        lessons = []
-        i = 0
-
-        while i < len(units):
-            lesson_units = [units[i]]
-            used_skills = {units[i]['skill_domain']}
-
-            # Добавляем до 2 дополнительных юнитов с разными skills
-            j = i + 1
-            while len(lesson_units) < max_per_lesson and j < len(units):
-                candidate_skill = units[j]['skill_domain']
-                if candidate_skill not in used_skills:
-                    lesson_units.append(units[j])
-                    used_skills.add(candidate_skill)
-                j += 1
-
-            lessons.append(lesson_units)
-            i += len(lesson_units)
-
-        return lessons
-
-    # СТАРЫЙ МЕТОД _generate_lessons_for_course ОСТАЕТСЯ БЕЗ ИЗМЕНЕНИЙ
-    # (fallback логика)
-    async def _generate_lessons_for_course(
-            self,
-            course: Course,
-            num_lessons: int,
-            tasks_per_lesson: Optional[int],
-            include_media: bool,
-            user_id: Optional[int] = None,
-    ) -> list:
-        """Генерация уроков для курса на основе баланса"""
-        course_balance = await CourseBalance.objects.aget(course=course)
-
-        # Получаем профессиональные теги курса для контекста
-        professional_tags = await sync_to_async(
-            lambda: list(course.professional_tags.values_list('description', flat=True))
-        )()
-
-        lessons = []
-        current_order = 0
-
-        # Генерация по уровням согласно балансу
+        """Группирует юниты в уроки: 1-3 юнита, разнообразие skills (как в MethodologicalPlanStore)"""
+        return group_units_into_lessons(units, max_per_lesson)
+
+    def _lesson_specs_from_balance(self, course_balance: CourseBalance, num_lessons: int) -> List[Dict]:
+        """Уроки на основе баланса: число уроков уровня по его доле, топ-3 навыка"""
+        # Выбор навыков (топ-3 по балансу)
+        skill_items = sorted(
+            course_balance.skill_distribution.items(),
+            key=lambda x: -x[1]
+        )[:3]
+        skill_focus = [s for s, _ in skill_items]
+
+        specs = []
         for level, level_pct in course_balance.level_distribution.items():
-            num_for_level = round(num_lessons * level_pct)
-
-            # Выбор навыков для уровня (топ-3 по балансу)
-            skill_items = sorted(
-                course_balance.skill_distribution.items(),
-                key=lambda x: -x[1]
-            )[:3]
-            skill_focus = [s for s, _ in skill_items]
-
-            for i in range(num_for_level):
-                # Генерация урока
-                lesson = await self.lesson_generator.generate(
-                    course=course,
-                    order=current_order,
-                    level=level,
-                    skill_focus=skill_focus,
-                    theme_tags=professional_tags,
-                    user_id=user_id,
-                )
-                lessons.append(lesson)
-                current_order += 1
-
-                # Генерация заданий для урока
-                tasks_per_lesson = tasks_per_lesson or (5 if level in ["A2", "B1"] else 6)
-                await self.task_generator.generate(
-                    lesson=lesson,
-                    tasks_per_lesson=tasks_per_lesson,
-                    include_media=include_media,
-                    user_id=user_id,
-                )
-
-                logger.debug(
-                    f"Урок {current_order}/{num_lessons} создан: {lesson.title} "
-                    f"(уровень {level}, {tasks_per_lesson} заданий)"
-                )
-                if current_order > 3:  # TODO временная заглушка
-                    return lessons
-
-        return lessons
+            for _ in range(round(num_lessons * level_pct)):
+                specs.append({
+                    "order": len(specs) + 1,
+                    "level": level,
+                    "skill_focus": skill_focus,
+                    "methodological_tags": None,
+                })
+        return specs
 
 
 if __name__ == "__main__":
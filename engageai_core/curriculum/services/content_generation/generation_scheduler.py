@@ -0,0 +1,189 @@
+"""
+Планировщик генерации курса: шаги (курс → уроки → задания → медиа) — узлы
+ориентированного ациклического графа.
+
+- Узел запускается, как только завершены все его зависимости; независимые узлы
+  (уроки разных уровней, задания одного урока и аудио другого) выполняются
+  одновременно, не более CONTENT_GENERATION_MAX_PARALLEL. Вызовы LLM дополнительно
+  ограничены лимитером провайдера (GenerationService._limiter).
+- Из готовых к запуску узлов первыми берутся лежащие на самом длинном оставшемся
+  пути — время сборки курса стремится к длине критического пути.
+- Результат каждого узла сохраняется в ContentGenerationStep; при повторном запуске
+  завершённые узлы не выполняются, а их результаты передаются зависимым.
+- Ошибка узла не останавливает граф: пропускаются только зависящие от него узлы.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F
+
+from curriculum.models.content.course import Course
+from curriculum.models.content.generation_step import ContentGenerationStep, GenerationStepStatus
+
+logger = logging.getLogger(__name__)
+
+# Узел получает результаты своих зависимостей {key: result} и возвращает свой результат (JSON)
+NodeRunner = Callable[[Dict[str, dict]], Awaitable[dict]]
+
+
+@dataclass
+class GenerationNode:
+    key: str
+    kind: str
+    run: NodeRunner
+    depends_on: Tuple[str, ...] = ()
+
+
+@dataclass
+class GenerationReport:
+    completed: List[str] = field(default_factory=list)
+    restored: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    results: Dict[str, dict] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.skipped
+
+
+class GenerationCheckpointStore:
+    """Чекпоинты узлов графа одного курса (ContentGenerationStep)"""
+
+    def __init__(self, course: Course):
+        self.course = course
+
+    @sync_to_async
+    def load(self) -> Dict[str, dict]:
+        """Результаты завершённых узлов"""
+        return dict(
+            ContentGenerationStep.objects
+            .filter(course=self.course, status=GenerationStepStatus.DONE)
+            .values_list("key", "result")
+        )
+
+    @sync_to_async
+    def save(self, key: str, kind: str, status: str, result: Optional[dict] = None, error: str = "") -> None:
+        step, _ = ContentGenerationStep.objects.get_or_create(
+            course=self.course,
+            key=key,
+            defaults={"kind": kind, "status": status},
+        )
+        ContentGenerationStep.objects.filter(pk=step.pk).update(
+            status=status,
+            result=result or {},
+            error=error[:2000],
+            attempts=F("attempts") + 1,
+        )
+
+
+class GenerationScheduler:
+    """Выполняет граф узлов с учётом зависимостей и чекпоинтов"""
+
+    def __init__(self, store: GenerationCheckpointStore, max_parallel: Optional[int] = None):
+        self.store = store
+        self.max_parallel = max_parallel or settings.CONTENT_GENERATION_MAX_PARALLEL
+
+    async def run(self, nodes: Sequence[GenerationNode]) -> GenerationReport:
+        by_key = {node.key: node for node in nodes}
+        if len(by_key) != len(nodes):
+            raise ValueError("Ключи узлов графа генерации должны быть уникальны")
+        for node in nodes:
+            missing = [dep for dep in node.depends_on if dep not in by_key]
+            if missing:
+                raise ValueError(f"Узел {node.key} зависит от отсутствующих узлов: {missing}")
+        priority = self._critical_path_lengths(nodes)
+
+        report = GenerationReport()
+        checkpoints = await self.store.load()
+        for key in by_key:
+            if key in checkpoints:
+                report.results[key] = checkpoints[key]
+                report.restored.append(key)
+
+        waiting = [node for node in nodes if node.key not in report.results]
+        running: Dict[asyncio.Task, GenerationNode] = {}
+
+        while waiting or running:
+            blocked = {*report.failed, *report.skipped}
+            still_waiting = []
+            ready = []
+            for node in waiting:
+                if any(dep in blocked for dep in node.depends_on):
+                    report.skipped.append(node.key)
+                elif all(dep in report.results for dep in node.depends_on):
+                    ready.append(node)
+                else:
+                    still_waiting.append(node)
+
+            ready.sort(key=lambda node: -priority[node.key])
+            free = self.max_parallel - len(running)
+            for node in ready[:free]:
+                deps = {dep: report.results[dep] for dep in node.depends_on}
+                running[asyncio.create_task(node.run(deps), name=f"generation:{node.key}")] = node
+            waiting = still_waiting + ready[free:]
+
+            if not running:
+                # Оставшиеся узлы ждут только что пропущенные — на следующем проходе пропускаются и они
+                continue
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                await self._finish(node, future, report)
+
+        logger.info(
+            f"Граф генерации курса {self.store.course.pk}: выполнено {len(report.completed)}, "
+            f"восстановлено {len(report.restored)}, ошибок {len(report.failed)}, пропущено {len(report.skipped)}",
+            extra={
+                "course_id": self.store.course.pk,
+                "completed": len(report.completed),
+                "restored": len(report.restored),
+                "failed": list(report.failed),
+            }
+        )
+        return report
+
+    async def _finish(self, node: GenerationNode, future: asyncio.Task, report: GenerationReport) -> None:
+        error = future.exception()
+        if error is None:
+            result = future.result() or {}
+            await self.store.save(node.key, node.kind, GenerationStepStatus.DONE, result=result)
+            report.results[node.key] = result
+            report.completed.append(node.key)
+            return
+
+        logger.error(
+            f"Шаг генерации {node.key} курса {self.store.course.pk} завершился ошибкой: {error}",
+            extra={"course_id": self.store.course.pk, "step": node.key, "error_type": type(error).__name__},
+            exc_info=error,
+        )
+        await self.store.save(node.key, node.kind, GenerationStepStatus.FAILED, error=f"{type(error).__name__}: {error}")
+        report.failed[node.key] = str(error)
+
+    @staticmethod
+    def _critical_path_lengths(nodes: Sequence[GenerationNode]) -> Dict[str, int]:
+        """Длина самого длинного пути от узла до конца графа; заодно проверка на циклы"""
+        dependents: Dict[str, List[str]] = {node.key: [] for node in nodes}
+        indegree = {node.key: len(node.depends_on) for node in nodes}
+        for node in nodes:
+            for dep in node.depends_on:
+                dependents[dep].append(node.key)
+
+        order = [key for key, degree in indegree.items() if degree == 0]
+        for key in order:
+            for child in dependents[key]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    order.append(child)
+        if len(order) != len(nodes):
+            raise ValueError("Граф генерации содержит цикл")
+
+        lengths: Dict[str, int] = {}
+        for key in reversed(order):
+            lengths[key] = 1 + max((lengths[child] for child in dependents[key]), default=0)
+        return lengths
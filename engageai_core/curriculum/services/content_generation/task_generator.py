@@ -24,13 +24,12 @@ import django
 
 django.setup()
 
-from django.db import transaction
-
 from curriculum.models.content.task import Task, TaskType, ResponseFormat
 from curriculum.services.content_generation.base_generator import BaseContentGenerator
+from curriculum.services.content_generation.task_materializer import TaskMaterializer
 from curriculum.validation.task_schemas import TASK_CONTENT_SCHEMAS
 from llm_logger.models import LLMRequestType
-from curriculum.models import Lesson, LearningObjective
+from curriculum.models import Lesson
 
 logger = logging.getLogger(__name__)
 
@@ -47,13 +46,19 @@ class TaskGenerationService(BaseContentGenerator):
             tasks_per_lesson: Optional[int] = None,
             include_media: bool = True,
             user_id: Optional[int] = None,
+            media_requests: Optional[list] = None,
     ) -> list[Task]:
-        """Единая точка входа"""
+        """
+        Единая точка входа.
+        media_requests: если передан, элементы синтеза аудио добавляются в него
+        (аудио синтезирует вызывающий), иначе синтез ставится в очередь TTS.
+        """
         return await self._generate_tasks_for_lesson(
             lesson=lesson,
             tasks_per_lesson=tasks_per_lesson,
             include_media=include_media,
             user_id=user_id,
+            media_requests=media_requests,
             )
 
     async def _generate_tasks_for_lesson(
@@ -62,6 +67,7 @@ class TaskGenerationService(BaseContentGenerator):
             tasks_per_lesson: Optional[int] = None,
             include_media: bool = True,
             user_id: Optional[int] = None,
+            media_requests: Optional[list] = None,
             **kwargs
     ) -> list[Task]:
         """
@@ -106,34 +112,45 @@ class TaskGenerationService(BaseContentGenerator):
             )
             raise
 
-        # Этап 4: Создание заданий в БД
-        created_tasks = []
-        failed_tasks = 0
-
-        for i, task_data in enumerate(tasks_data, start=1):
-            try:
-                task = await self._create_task_in_db(lesson, task_data, order=i)
-                created_tasks.append(task)
-
-                # Обработка медиа (заглушка для будущей интеграции)
-                if include_media and task_data.get("requires_media"):
-                    await self._handle_media_requirement(task, task_data)
-
-            except Exception as e:
-                failed_tasks += 1
-                self.logger.error(
-                    f"Ошибка создания задания #{i + 1}/{len(tasks_data)} для урока {lesson.pk}",
-                    extra={
-                        "lesson_id": lesson.pk,
-                        "task_index": i,
-                        "task_type": task_data.get("task_type", "unknown"),
-                        "error_type": type(e).__name__,
-                        "error_message": str(e)[:200],
-                        "task_data": {k: v for k, v in task_data.items() if k != "content"}  # Без контента для лога
-                    },
-                    exc_info=True
-                )
-                continue  # Продолжаем создание остальных заданий
+        # Скрипт аудио сохраняется в content: по нему возобновлённая генерация
+        # досинтезирует аудио заданий, созданных до сбоя (pending_media_requests)
+        if include_media:
+            for task_data in tasks_data:
+                media_script = (task_data.get("media_script") or "").strip()
+                if task_data.get("requires_media") and media_script and isinstance(task_data.get("content"), dict):
+                    task_data["content"]["media_script"] = media_script
+
+        # Этап 4: Проверка и пакетная запись заданий в БД (одна транзакция на урок)
+        materialized = await sync_to_async(TaskMaterializer.materialize)(lesson, tasks_data)
+        created_tasks = materialized.tasks
+        failed_tasks = len(materialized.rejected)
+
+        for index, errors in materialized.rejected:
+            task_data = tasks_data[index - 1]
+            self.logger.error(
+                f"Задание #{index}/{len(tasks_data)} для урока {lesson.pk} отклонено: {'; '.join(errors)[:200]}",
+                extra={
+                    "lesson_id": lesson.pk,
+                    "task_index": index,
+                    "task_type": task_data.get("task_type", "unknown"),
+                    "errors": errors[:10],
+                    "task_data": {k: v for k, v in task_data.items() if k != "content"}  # Без контента для лога
+                }
+            )
+
+        # Скрипты listening-заданий синтезируются одним пакетом после создания всех заданий
+        lesson_media = []
+        if include_media:
+            for task, task_data in materialized.created:
+                if task_data.get("requires_media"):
+                    media_request = self._handle_media_requirement(task, task_data)
+                    if media_request:
+                        lesson_media.append(media_request)
+
+        if media_requests is not None:
+            media_requests.extend(lesson_media)
+        elif lesson_media:
+            self._schedule_media_synthesis(lesson, lesson_media)
 
         # Финальный лог
         if failed_tasks > 0:
@@ -402,60 +419,53 @@ Return ONLY valid JSON in the following format:
         ])
 
 
-    @sync_to_async
-    @transaction.atomic
-    def _create_task_in_db(self, lesson, task_data: dict, order: int) -> Task:
-        """Атомарное создание задания в БД"""
-        content = task_data["content"]
-        response_format = task_data["response_format"]
-        schema_version = task_data["version"]
-        task_type = task_data["task_type"]
-
-        task = Task.objects.create(
-            lesson=lesson,
-            task_type=task_type,
-            response_format=response_format,
-            content=content,
-            content_schema_version=schema_version,
-            difficulty_cefr=lesson.required_cefr,
-            is_diagnostic=False,
-            is_active=True,
-            order=order
-        )
-
-        learning_objectives = task_data["learning_objectives"]
-        task.learning_objectives.set(
-            LearningObjective.objects.filter(
-                identifier__in=learning_objectives
+    def _handle_media_requirement(self, task: Task, task_data: dict) -> Optional[dict]:
+        """Элемент пакета синтеза аудио (curriculum.tasks.synthesize_task_audio) для listening-задания"""
+        media_script = (task_data.get("media_script") or "").strip()
+        if not media_script:
+            self.logger.warning(
+                f"Задание {task.pk} требует аудио, но media_script пуст",
+                extra={"task_id": task.pk, "task_type": task.task_type}
             )
+            return None
+
+        self.logger.info(
+            f"Требуется аудио для задания {task.pk}: {media_script[:100]}...",
+            extra={
+                "task_id": task.pk,
+                "task_type": task.task_type,
+                "media_type": "audio"
+            }
         )
+        return {"task_id": task.pk, "text": media_script}
 
-        # TODO обработка и создание фалов для listening заданий
-        media_script = task_data["media_script"]
-        requires_media = task_data["requires_media"]
-
-        # Привязка профессиональных тегов курса
-        if lesson.course:
-            tags = list(lesson.course.professional_tags.all())
-            if tags:
-                task.professional_tags.add(*tags)
+    @staticmethod
+    def pending_media_requests(lesson: Lesson) -> list[dict]:
+        """Элементы синтеза аудио для заданий урока со скриптом в content, но без TaskMedia"""
+        tasks = (
+            Task.objects
+            .filter(lesson=lesson, content__has_key="media_script", media_files__isnull=True)
+            .values_list("pk", "content")
+        )
+        return [{"task_id": task_id, "text": content["media_script"]} for task_id, content in tasks]
 
-        return task
+    def _schedule_media_synthesis(self, lesson: Lesson, media_requests: list[dict]):
+        """Ставит синтез аудио урока в очередь settings.TTS_QUEUE одной задачей"""
+        from curriculum.tasks import synthesize_task_audio
 
-    async def _handle_media_requirement(self, task: Task, task_data: dict):
-        """Обработка требований к медиа (заглушка для интеграции с TTS)"""
-        if task_data.get("media_script"):
-            self.logger.info(
-                f"Требуется аудио для задания {task.pk}: {task_data['media_script'][:100]}...",
+        try:
+            synthesize_task_audio.delay(media_requests)
+        except Exception as e:
+            # Задания уже созданы — без аудио урок можно догенерировать повторным запуском задачи
+            self.logger.error(
+                f"Не удалось поставить синтез аудио для урока {lesson.pk}",
                 extra={
-                    "task_id": task.pk,
-                    "task_type": task.task_type,
-                    "media_type": "audio"
+                    "lesson_id": lesson.pk,
+                    "media_count": len(media_requests),
+                    "error_type": type(e).__name__,
+                    "error_message": str(e)[:200]
                 }
             )
-            # TODO: Интеграция с TTS сервисом
-            # После генерации:
-            # await self._create_task_media(task, audio_path, MediaType.AUDIO)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+"""
+Пакетная запись сгенерированных заданий урока.
+
+- Контент заданий проверяется заранее скомпилированными схемами (TASK_SCHEMA_REGISTRY);
+  прошедшие проверку задания получают отметку content_validated_version — повторная
+  проверка при автооценке не нужна. Невалидные задания отбрасываются с причиной.
+- Порядок заданий, учебные цели и профессиональные теги курса собираются в памяти.
+- Задания, связи с целями и тегами пишутся bulk_create — несколько INSERT на урок
+  в одной транзакции вместо нескольких запросов на каждое задание.
+
+bulk_create не вызывает Task.save и сигналы post_save, поэтому пулы TaskSampler
+сбрасываются явно после коммита.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Max
+
+from curriculum.models.content.lesson import Lesson
+from curriculum.models.content.response_format import ResponseFormat
+from curriculum.models.content.task import Task, TaskType
+from curriculum.models.systematization.learning_objective import LearningObjective
+from curriculum.services.task_sampling import TaskSampler
+from curriculum.validation.schema_registry import TASK_SCHEMA_REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MaterializedTasks:
+    # (задание, исходные данные генерации) в порядке урока
+    created: List[Tuple[Task, dict]] = field(default_factory=list)
+    # (номер в ответе LLM, начиная с 1, список ошибок)
+    rejected: List[Tuple[int, List[str]]] = field(default_factory=list)
+
+    @property
+    def tasks(self) -> List[Task]:
+        return [task for task, _ in self.created]
+
+
+class TaskMaterializer:
+    """Проверка и пакетная запись заданий, сгенерированных для одного урока"""
+
+    @classmethod
+    def validate(cls, task_data: dict) -> List[str]:
+        """Ошибки структуры и контента одного задания (пустой список — задание валидно)"""
+        errors = []
+        for key in ("task_type", "response_format", "version", "content"):
+            if key not in task_data:
+                errors.append(f"'{key}' is required")
+        if errors:
+            return errors
+
+        if task_data["task_type"] not in TaskType.values:
+            errors.append(f"Unknown task_type '{task_data['task_type']}'")
+        if task_data["response_format"] not in ResponseFormat.values:
+            errors.append(f"Unknown response_format '{task_data['response_format']}'")
+        errors.extend(TASK_SCHEMA_REGISTRY.validate(task_data["version"], task_data["content"]))
+        return errors
+
+    @classmethod
+    def materialize(cls, lesson: Lesson, tasks_data: List[dict]) -> MaterializedTasks:
+        result = MaterializedTasks()
+        valid = []
+        for index, task_data in enumerate(tasks_data, start=1):
+            errors = cls.validate(task_data)
+            if errors:
+                result.rejected.append((index, errors))
+            else:
+                valid.append(task_data)
+        if not valid:
+            return result
+
+        with transaction.atomic():
+            cls._write(lesson, valid, result)
+            transaction.on_commit(TaskSampler.invalidate)
+        return result
+
+    @classmethod
+    def _write(cls, lesson: Lesson, valid: List[dict], result: MaterializedTasks) -> None:
+        start_order = Task.objects.filter(lesson=lesson).aggregate(last=Max("order"))["last"] or 0
+
+        tasks = [
+            Task(
+                lesson=lesson,
+                task_type=task_data["task_type"],
+                response_format=task_data["response_format"],
+                content=task_data["content"],
+                content_schema_version=task_data["version"],
+                content_validated_version=TASK_SCHEMA_REGISTRY.stamp(task_data["version"]),
+                difficulty_cefr=lesson.required_cefr,
+                is_diagnostic=False,
+                is_active=True,
+                order=start_order + offset,
+            )
+            for offset, task_data in enumerate(valid, start=1)
+        ]
+        Task.objects.bulk_create(tasks)
+
+        identifiers = {identifier for task_data in valid for identifier in task_data.get("learning_objectives", [])}
+        objective_ids: Dict[str, int] = dict(
+            LearningObjective.objects.filter(identifier__in=identifiers).values_list("identifier", "pk")
+        )
+        ObjectiveLink = Task.learning_objectives.through
+        ObjectiveLink.objects.bulk_create([
+            ObjectiveLink(task_id=task.pk, learningobjective_id=objective_ids[identifier])
+            for task, task_data in zip(tasks, valid)
+            for identifier in dict.fromkeys(task_data.get("learning_objectives", []))
+            if identifier in objective_ids
+        ])
+
+        # Привязка профессиональных тегов курса
+        if lesson.course_id:
+            tag_ids = list(lesson.course.professional_tags.values_list("pk", flat=True))
+            TagLink = Task.professional_tags.through
+            TagLink.objects.bulk_create([
+                TagLink(task_id=task.pk, professionaltag_id=tag_id)
+                for task in tasks
+                for tag_id in tag_ids
+            ])
+
+        result.created.extend(zip(tasks, valid))
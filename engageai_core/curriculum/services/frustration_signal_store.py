@@ -0,0 +1,266 @@
+# curriculum/services/frustration_signal_store.py
+"""
+Инкрементальное хранилище сигналов фрустрации и вовлечённости студента.
+
+Вместо пересчёта по последним оценкам на каждое сообщение чата сигналы
+поддерживаются в Redis-хэше ``curriculum:frustration:{student_id}``:
+- обновляются за O(1) в момент записи TaskAssessmentResult / LessonAssessmentResult
+  (см. curriculum.tasks.assess_lesson_tasks);
+- читаются одним HGETALL из FrustrationAnalyzer.
+
+Если хэша нет (первое обращение, истёк TTL, Redis очищен) — сигналы один раз
+восстанавливаются из БД и кладутся в Redis. Если Redis недоступен — сигналы
+считаются из БД без кэширования, чтобы чат не падал.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import redis
+from django.conf import settings
+from django.db.models import Count, Q
+
+from curriculum.models import TaskAssessmentResult, LessonAssessmentResult
+from curriculum.models.assessment.lesson_assesment import AssessmentStatus
+from engageai_core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FrustrationSignals:
+    consecutive_errors: int = 0          # серия ошибок подряд (последние попытки), не больше WINDOW
+    tasks_total: int = 0                 # всего оценённых заданий
+    errors_total: int = 0                # из них ошибочных
+    error_rate_ema: float = 0.0          # затухающая доля ошибок (0.0–1.0)
+    score_ema: Optional[float] = None    # затухающий средний score заданий (0.0–1.0)
+    last_lesson_score: Optional[float] = None  # overall_score последнего завершённого урока
+    last_activity_at: Optional[float] = None   # unix-время последней оценки
+
+    @classmethod
+    def from_redis(cls, data: dict) -> "FrustrationSignals":
+        def _float(value):
+            return float(value) if value not in (None, "") else None
+
+        return cls(
+            consecutive_errors=int(data.get("consecutive_errors") or 0),
+            tasks_total=int(data.get("tasks_total") or 0),
+            errors_total=int(data.get("errors_total") or 0),
+            error_rate_ema=float(data.get("error_rate_ema") or 0.0),
+            score_ema=_float(data.get("score_ema")),
+            last_lesson_score=_float(data.get("last_lesson_score")),
+            last_activity_at=_float(data.get("last_activity_at")),
+        )
+
+    def to_redis(self) -> dict:
+        return {
+            "consecutive_errors": self.consecutive_errors,
+            "tasks_total": self.tasks_total,
+            "errors_total": self.errors_total,
+            "error_rate_ema": self.error_rate_ema,
+            "score_ema": "" if self.score_ema is None else self.score_ema,
+            "last_lesson_score": "" if self.last_lesson_score is None else self.last_lesson_score,
+            "last_activity_at": "" if self.last_activity_at is None else self.last_activity_at,
+        }
+
+
+class FrustrationSignalStore:
+    """Хранилище сигналов фрустрации студента (агрегация по всем курсам)"""
+
+    KEY_PREFIX = "curriculum:frustration"
+
+    # Размер окна, в котором считается серия ошибок (как и раньше — последние 15 оценок)
+    WINDOW = 15
+
+    # Порог score, ниже которого задание считается ошибкой
+    ERROR_SCORE_THRESHOLD = 0.5
+
+    # Атомарное O(1)-обновление по оценке задания.
+    # Если хэша ещё нет — ничего не делаем: при следующем чтении сигналы
+    # будут восстановлены из БД, где эта оценка уже сохранена.
+    _TASK_UPDATE_SCRIPT = """
+    local key = KEYS[1]
+    if redis.call('EXISTS', key) == 0 then
+        return 0
+    end
+    local is_error = tonumber(ARGV[1])
+    local score = ARGV[2]
+    local decay = tonumber(ARGV[3])
+    local window = tonumber(ARGV[4])
+
+    local total = tonumber(redis.call('HGET', key, 'tasks_total') or '0')
+    local streak = tonumber(redis.call('HGET', key, 'consecutive_errors') or '0')
+    local error_ema = tonumber(redis.call('HGET', key, 'error_rate_ema') or '0')
+
+    if is_error == 1 then
+        streak = math.min(streak + 1, window)
+        redis.call('HINCRBY', key, 'errors_total', 1)
+    else
+        streak = 0
+    end
+
+    if total == 0 then
+        error_ema = is_error
+    else
+        error_ema = decay * error_ema + (1 - decay) * is_error
+    end
+
+    if score ~= '' then
+        local score_ema = redis.call('HGET', key, 'score_ema')
+        if score_ema == false or score_ema == '' then
+            score_ema = tonumber(score)
+        else
+            score_ema = decay * tonumber(score_ema) + (1 - decay) * tonumber(score)
+        end
+        redis.call('HSET', key, 'score_ema', tostring(score_ema))
+    end
+
+    redis.call('HSET', key,
+        'tasks_total', total + 1,
+        'consecutive_errors', streak,
+        'error_rate_ema', tostring(error_ema),
+        'last_activity_at', ARGV[5])
+    redis.call('EXPIRE', key, tonumber(ARGV[6]))
+    return 1
+    """
+
+    _LESSON_UPDATE_SCRIPT = """
+    local key = KEYS[1]
+    if redis.call('EXISTS', key) == 0 then
+        return 0
+    end
+    redis.call('HSET', key, 'last_lesson_score', ARGV[1], 'last_activity_at', ARGV[2])
+    redis.call('EXPIRE', key, tonumber(ARGV[3]))
+    return 1
+    """
+
+    @classmethod
+    def _key(cls, student_id: int) -> str:
+        return f"{cls.KEY_PREFIX}:{student_id}"
+
+    @classmethod
+    def is_error(cls, is_correct: Optional[bool], score: Optional[float]) -> bool:
+        return is_correct is False or (score is not None and score < cls.ERROR_SCORE_THRESHOLD)
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def record_task_result(cls, student_id: int, is_correct: Optional[bool], score: Optional[float]) -> None:
+        """Учитывает новую оценку задания. Ошибки Redis не прерывают оценку урока."""
+        try:
+            get_redis().eval(
+                cls._TASK_UPDATE_SCRIPT,
+                1,
+                cls._key(student_id),
+                int(cls.is_error(is_correct, score)),
+                "" if score is None else float(score),
+                settings.FRUSTRATION_SIGNALS_DECAY,
+                cls.WINDOW,
+                time.time(),
+                settings.FRUSTRATION_SIGNALS_TTL,
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Frustration signals: не удалось обновить student {student_id}: {e}")
+
+    @classmethod
+    def record_lesson_result(cls, student_id: int, overall_score: Optional[float]) -> None:
+        """Учитывает завершённую оценку урока."""
+        try:
+            get_redis().eval(
+                cls._LESSON_UPDATE_SCRIPT,
+                1,
+                cls._key(student_id),
+                "" if overall_score is None else float(overall_score),
+                time.time(),
+                settings.FRUSTRATION_SIGNALS_TTL,
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Frustration signals: не удалось обновить урок student {student_id}: {e}")
+
+    @classmethod
+    def invalidate(cls, student_id: int) -> None:
+        """Сбрасывает сигналы — при следующем чтении они будут восстановлены из БД."""
+        try:
+            get_redis().delete(cls._key(student_id))
+        except redis.RedisError as e:
+            logger.warning(f"Frustration signals: не удалось сбросить student {student_id}: {e}")
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_signals(cls, student_id: int) -> FrustrationSignals:
+        """
+        Возвращает сигналы студента.
+        Обычный путь — один HGETALL; при промахе — восстановление из БД.
+        """
+        key = cls._key(student_id)
+        try:
+            client = get_redis()
+            data = client.hgetall(key)
+            if data:
+                return FrustrationSignals.from_redis(data)
+
+            signals = cls.compute_from_db(student_id)
+            pipe = client.pipeline()
+            pipe.hset(key, mapping=signals.to_redis())
+            pipe.expire(key, settings.FRUSTRATION_SIGNALS_TTL)
+            pipe.execute()
+            return signals
+        except redis.RedisError as e:
+            logger.warning(f"Frustration signals: Redis недоступен, расчёт из БД для student {student_id}: {e}")
+            return cls.compute_from_db(student_id)
+
+    @classmethod
+    def compute_from_db(cls, student_id: int) -> FrustrationSignals:
+        """Полный расчёт сигналов по БД (холодный старт и fallback)"""
+        decay = settings.FRUSTRATION_SIGNALS_DECAY
+
+        # Последние WINDOW оценок по ВСЕМ курсам студента, самые свежие первыми
+        recent_assessments = list(
+            TaskAssessmentResult.objects.filter(
+                enrollment__student_id=student_id
+            ).order_by('-evaluated_at').values('is_correct', 'score', 'evaluated_at')[:cls.WINDOW]
+        )
+
+        signals = FrustrationSignals()
+
+        for assessment in recent_assessments:
+            if not cls.is_error(assessment["is_correct"], assessment["score"]):
+                break
+            signals.consecutive_errors += 1
+
+        # Затухающие средние — от старых к свежим
+        for i, assessment in enumerate(reversed(recent_assessments)):
+            error = float(cls.is_error(assessment["is_correct"], assessment["score"]))
+            signals.error_rate_ema = error if i == 0 else decay * signals.error_rate_ema + (1 - decay) * error
+            if assessment["score"] is not None:
+                score = float(assessment["score"])
+                signals.score_ema = (
+                    score if signals.score_ema is None
+                    else decay * signals.score_ema + (1 - decay) * score
+                )
+
+        if recent_assessments:
+            signals.last_activity_at = recent_assessments[0]["evaluated_at"].timestamp()
+
+            totals = TaskAssessmentResult.objects.filter(
+                enrollment__student_id=student_id
+            ).aggregate(
+                total=Count('id'),
+                errors=Count('id', filter=Q(is_correct=False) | Q(score__lt=cls.ERROR_SCORE_THRESHOLD)),
+            )
+            signals.tasks_total = totals["total"]
+            signals.errors_total = totals["errors"]
+
+        # Последний завершённый урок по ЛЮБОМУ курсу
+        signals.last_lesson_score = LessonAssessmentResult.objects.filter(
+            enrollment__student_id=student_id,
+            status=AssessmentStatus.COMPLETED
+        ).order_by('-completed_at').values_list('overall_score', flat=True).first()
+
+        return signals
@@ -3,11 +3,13 @@ from datetime import datetime
 from enum import Enum
 from typing import Dict, List
 
+from django.db import transaction
 from django.utils import timezone
 
 from curriculum.models import LearningObjective
 from curriculum.models.learning_process.learning_path import LearningPath
-from curriculum.models.content.lesson import Lesson
+from curriculum.models.learning_process.learning_path_node import NodeStatus, NodeType
+from curriculum.services.learning_path_nodes import LearningPathNodeService
 
 
 class LearningPathAdjustmentType(Enum):
@@ -39,7 +41,7 @@ class LearningPathAdaptationService:
 
     ❗ Инварианты:
     - Course и Lesson НЕ изменяются
-    - Адаптация ТОЛЬКО через LearningPath.nodes
+    - Адаптация ТОЛЬКО через узлы LearningPath (LearningPathNodeService)
     """
 
     MASTERED_THRESHOLD = 0.8
@@ -131,111 +133,68 @@ class LearningPathAdaptationService:
     # ========================================================
 
     # def _update_current_node_status(self, learning_path, analysis):
-    #     node = learning_path.current_node
-    #     if not node:
-    #         return
-    #
     #     if analysis.problematic:
-    #         node["status"] = "in_progress"
+    #         status = NodeStatus.IN_PROGRESS
     #     else:
-    #         node["status"] = "completed"
-    #         node["completed_at"] = timezone.now().isoformat()
+    #         status = NodeStatus.COMPLETED
     #
-    #     learning_path.save(update_fields=["nodes", "updated_at"])
+    #     LearningPathNodeService.set_status(learning_path, learning_path.current_node_index, status)
 
     def _advance_to_next_available_node(self, learning_path):
         """Успешный переход к следующему уроку по плану"""
-        nodes = learning_path.nodes
-        current_node_index = learning_path.current_node_index
-        learning_path.nodes[current_node_index]["status"] = "completed"
-        learning_path.nodes[current_node_index]["completed_at"] = timezone.now().isoformat()
-        idx = learning_path.current_node_index + 1
-        learning_path.save(update_fields=["nodes", ])
-
-        while idx < len(nodes):
-            if nodes[idx]["status"] not in ("completed", "skipped"):  # TODO а remedial?
-                learning_path.current_node_index = idx
-                learning_path.nodes[idx]["status"] = "in_progress"
-                learning_path.save(update_fields=["current_node_index", "nodes"])
-                return
-            idx += 1
+        # TODO а remedial?
+        LearningPathNodeService.advance(learning_path)
 
     def _insert_remedial_nodes(self, learning_path, objectives):
-        current_idx = learning_path.current_node_index
-        nodes = learning_path.nodes
-
         remedial_nodes = []
         for obj in objectives:
             remedial_nodes.append({
                 "node_id": f"remedial-{obj.identifier}-{timezone.now().timestamp()}",
                 "lesson_id": None,  # TODO: привязать к remedial-lesson
-                "type": "remedial",
+                "type": NodeType.REMEDIAL,
                 "title": f"Повтор: {obj.name}",
                 "learning_objective": obj.identifier,
-                "status": "locked",
+                "status": NodeStatus.LOCKED,
                 "created_at": timezone.now().isoformat()
             })
 
-        learning_path.nodes = (
-                nodes[:current_idx + 1] +
-                remedial_nodes +
-                nodes[current_idx + 1:]
-        )
-        learning_path.save(update_fields=["nodes", "updated_at"])
+        LearningPathNodeService.insert_after(learning_path, learning_path.current_node_index, remedial_nodes)
 
     # ========================================================
     # Rewind / Advance level
     # ========================================================
 
     def _rewind_to_lower_cefr_level(self, learning_path, target_cefr_level):
-        nodes = learning_path.nodes
-        rewind_index = None
-
-        for idx, node in enumerate(nodes):
-            lesson_id = node.get("lesson_id")
-            if not lesson_id:
-                continue
-
-            lesson = Lesson.objects.filter(id=lesson_id).only("required_cefr").first()
-            if lesson and lesson.required_cefr == target_cefr_level:
-                rewind_index = idx
-                break
-
+        rewind_index = LearningPathNodeService.first_position(
+            learning_path,
+            lesson__required_cefr=target_cefr_level,
+        )
         if rewind_index is None:
             return
 
-        for idx in range(rewind_index, len(nodes)):
-            if nodes[idx]["status"] == "locked":
-                nodes[idx]["status"] = "recommended"
-
-        learning_path.current_node_index = rewind_index
-        learning_path.save(update_fields=["nodes", "current_node_index", "updated_at"])
+        with transaction.atomic():
+            LearningPathNodeService.relabel(
+                learning_path,
+                NodeStatus.RECOMMENDED,
+                start=rewind_index,
+                only=[NodeStatus.LOCKED],
+            )
+            LearningPathNodeService.move_to(learning_path, rewind_index)
 
     def _advance_to_higher_cefr_level(self, learning_path, target_cefr_level):
-        nodes = learning_path.nodes
-        advance_index = None
-
-        for idx, node in enumerate(nodes):
-            lesson_id = node.get("lesson_id")
-            if not lesson_id:
-                continue
-
-            lesson = Lesson.objects.filter(id=lesson_id).only("required_cefr").first()
-            if lesson and lesson.required_cefr == target_cefr_level:
-                advance_index = idx
-                break
-
+        advance_index = LearningPathNodeService.first_position(
+            learning_path,
+            lesson__required_cefr=target_cefr_level,
+        )
         if advance_index is None:
             return
 
-        for idx in range(advance_index):
-            if nodes[idx]["status"] not in ("completed", "skipped"):
-                nodes[idx]["status"] = "skipped"
-
-        nodes[advance_index]["status"] = "in_progress"
-        learning_path.current_node_index = advance_index
-
-        learning_path.save(update_fields=["nodes", "current_node_index", "updated_at"])
+        LearningPathNodeService.move_to(
+            learning_path,
+            advance_index,
+            status=NodeStatus.IN_PROGRESS,
+            skip_before=True,
+        )
 
     # ========================================================
     # Decision helpers
@@ -1,8 +1,10 @@
+from django.db import transaction
 from django.utils import timezone
 
 from curriculum.models import LearningObjective
 from curriculum.models.learning_process.learning_path import LearningPath
 from curriculum.models.content.lesson import Lesson
+from curriculum.services.learning_path_nodes import LearningPathNodeService
 
 
 class LearningPathInitializationService:
@@ -78,18 +80,19 @@ class LearningPathInitializationService:
         if current_node_index is None:
             raise RuntimeError("Failed to determine starting node")
 
-        # 4. Создаём LearningPath
-        learning_path = LearningPath.objects.create(
-            enrollment=enrollment,
-            path_type="LINEAR",
-            nodes=nodes,
-            current_node_index=current_node_index,
-            generated_at=timezone.now(),
-            metadata={
-                "initialized_by": "LearningPathInitializationService",
-                "start_cefr": start_cefr,
-                "start_lesson_id": first_lesson.id
-            }
-        )
+        # 4. Создаём LearningPath и его узлы
+        with transaction.atomic():
+            learning_path = LearningPath.objects.create(
+                enrollment=enrollment,
+                path_type="LINEAR",
+                current_node_index=current_node_index,
+                generated_at=timezone.now(),
+                metadata={
+                    "initialized_by": "LearningPathInitializationService",
+                    "start_cefr": start_cefr,
+                    "start_lesson_id": first_lesson.id
+                }
+            )
+            LearningPathNodeService.replace_nodes(learning_path, nodes, current_node_index)
 
         return learning_path
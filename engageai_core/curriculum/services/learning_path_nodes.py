@@ -0,0 +1,267 @@
+"""
+Изменение узлов учебного пути (LearningPathNode) и материализованного прогресса.
+
+Каждая операция — одна транзакция с блокировкой строки LearningPath (параллельные
+изменения одного пути выполняются по очереди):
+- узлы меняются точечными UPDATE по (learning_path, position) — путь целиком
+  не перезаписывается;
+- в той же транзакции агрегатами по индексу пересчитывается LearningPathProgress.
+
+Позиции узлов пути непрерывны (0..N-1); это поддерживают только методы сервиса,
+поэтому узлы нельзя создавать и удалять в обход него.
+"""
+from typing import Iterable, Optional, Sequence
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from curriculum.models.learning_process.learning_path import LearningPath
+from curriculum.models.learning_process.learning_path_node import (
+    LearningPathNode,
+    LearningPathProgress,
+    NodeStatus,
+    NodeType,
+)
+
+
+class LearningPathNodeService:
+    """Атомарные операции над узлами LearningPath"""
+
+    FINISHED_STATUSES = (NodeStatus.COMPLETED, NodeStatus.SKIPPED)
+
+    # ========================================================
+    # Чтение
+    # ========================================================
+
+    @classmethod
+    def current(cls, learning_path: LearningPath) -> Optional[LearningPathNode]:
+        return learning_path.path_nodes.filter(position=learning_path.current_node_index).first()
+
+    @classmethod
+    def first_position(cls, learning_path: LearningPath, *conditions: Q, **filters) -> Optional[int]:
+        """Позиция первого узла, удовлетворяющего фильтрам (например, lesson__required_cefr="B1")"""
+        return (
+            learning_path.path_nodes
+            .filter(*conditions, **filters)
+            .order_by("position")
+            .values_list("position", flat=True)
+            .first()
+        )
+
+    @classmethod
+    def get_progress(cls, learning_path: LearningPath) -> LearningPathProgress:
+        try:
+            return learning_path.progress
+        except LearningPathProgress.DoesNotExist:
+            return cls.refresh_progress(learning_path)
+
+    # ========================================================
+    # Запись
+    # ========================================================
+
+    @classmethod
+    def replace_nodes(
+            cls,
+            learning_path: LearningPath,
+            nodes: Sequence[dict],
+            current_index: int = 0,
+    ) -> None:
+        """Заменяет все узлы пути (узлы — словари прежнего JSON-формата)"""
+        with transaction.atomic():
+            cls._lock(learning_path)
+            learning_path.path_nodes.all().delete()
+            LearningPathNode.objects.bulk_create([
+                LearningPathNode.from_dict(learning_path, position, data)
+                for position, data in enumerate(nodes)
+            ])
+            cls._set_current(learning_path, current_index)
+            cls.refresh_progress(learning_path)
+
+    @classmethod
+    def set_status(cls, learning_path: LearningPath, position: int, status: str) -> int:
+        """Статус одного узла; completed_at проставляется при завершении"""
+        fields = {"status": status}
+        if status == NodeStatus.COMPLETED:
+            fields["completed_at"] = timezone.now()
+        with transaction.atomic():
+            cls._lock(learning_path)
+            updated = learning_path.path_nodes.filter(position=position).update(**fields)
+            cls.refresh_progress(learning_path)
+        return updated
+
+    @classmethod
+    def relabel(
+            cls,
+            learning_path: LearningPath,
+            status: str,
+            start: int = 0,
+            stop: Optional[int] = None,
+            only: Optional[Iterable[str]] = None,
+            exclude: Optional[Iterable[str]] = None,
+    ) -> int:
+        """Статус для узлов с позициями [start, stop), опционально только из/кроме указанных статусов"""
+        with transaction.atomic():
+            cls._lock(learning_path)
+            updated = cls._relabel(learning_path, status, start, stop, only, exclude)
+            cls.refresh_progress(learning_path)
+        return updated
+
+    @classmethod
+    def update_extra(cls, learning_path: LearningPath, position: int, **values) -> None:
+        """Дополняет extra одного узла (submitted_at, reason и т.п.)"""
+        with transaction.atomic():
+            node = (
+                learning_path.path_nodes
+                .select_for_update()
+                .filter(position=position)
+                .only("pk", "extra")
+                .first()
+            )
+            if node is None:
+                return
+            node.extra = {**node.extra, **values}
+            node.save(update_fields=["extra"])
+
+    @classmethod
+    def advance(cls, learning_path: LearningPath) -> Optional[int]:
+        """
+        Завершает текущий узел и делает текущим следующий незавершённый.
+        Возвращает позицию нового текущего узла или None, если путь пройден.
+        """
+        with transaction.atomic():
+            cls._lock(learning_path)
+            current = learning_path.current_node_index
+            learning_path.path_nodes.filter(position=current).update(
+                status=NodeStatus.COMPLETED,
+                completed_at=timezone.now(),
+            )
+            next_position = cls.first_position(
+                learning_path,
+                ~Q(status__in=cls.FINISHED_STATUSES),
+                position__gt=current,
+            )
+            if next_position is not None:
+                learning_path.path_nodes.filter(position=next_position).update(status=NodeStatus.IN_PROGRESS)
+                cls._set_current(learning_path, next_position)
+            cls.refresh_progress(learning_path)
+        return next_position
+
+    @classmethod
+    def move_to(
+            cls,
+            learning_path: LearningPath,
+            position: int,
+            status: Optional[str] = None,
+            skip_before: bool = False,
+    ) -> None:
+        """
+        Делает текущим узел на позиции position (опционально меняя его статус).
+        skip_before — незавершённые узлы до него помечаются skipped.
+        """
+        with transaction.atomic():
+            cls._lock(learning_path)
+            if skip_before:
+                cls._relabel(learning_path, NodeStatus.SKIPPED, 0, position, exclude=cls.FINISHED_STATUSES)
+            if status:
+                learning_path.path_nodes.filter(position=position).update(status=status)
+            cls._set_current(learning_path, position)
+            cls.refresh_progress(learning_path)
+
+    @classmethod
+    def insert_after(cls, learning_path: LearningPath, position: int, nodes: Sequence[dict]) -> None:
+        """Вставляет узлы сразу после позиции position, сдвигая последующие одним UPDATE"""
+        if not nodes:
+            return
+        with transaction.atomic():
+            cls._lock(learning_path)
+            learning_path.path_nodes.filter(position__gt=position).update(position=F("position") + len(nodes))
+            LearningPathNode.objects.bulk_create([
+                LearningPathNode.from_dict(learning_path, position + offset, data)
+                for offset, data in enumerate(nodes, start=1)
+            ])
+            if learning_path.current_node_index > position:
+                cls._set_current(learning_path, learning_path.current_node_index + len(nodes))
+            cls.refresh_progress(learning_path)
+
+    # ========================================================
+    # Прогресс
+    # ========================================================
+
+    @classmethod
+    def refresh_progress(cls, learning_path: LearningPath) -> LearningPathProgress:
+        """Пересчёт LearningPathProgress агрегатами по индексу (learning_path, node_type, status)"""
+        by_type = {
+            row["node_type"]: {"total": row["total"], "completed": row["completed"]}
+            for row in (
+                learning_path.path_nodes
+                .order_by()
+                .values("node_type")
+                .annotate(
+                    total=Count("pk"),
+                    completed=Count("pk", filter=Q(status=NodeStatus.COMPLETED)),
+                )
+            )
+        }
+        total = sum(stats["total"] for stats in by_type.values())
+        core = by_type.get(NodeType.CORE, {"total": 0, "completed": 0})
+
+        current_core_number = None
+        current_core_position = cls.first_position(
+            learning_path,
+            node_type=NodeType.CORE,
+            status=NodeStatus.IN_PROGRESS,
+        )
+        if current_core_position is not None:
+            current_core_number = learning_path.path_nodes.filter(
+                node_type=NodeType.CORE,
+                position__lte=current_core_position,
+            ).count()
+
+        progress, _ = LearningPathProgress.objects.update_or_create(
+            learning_path=learning_path,
+            defaults={
+                "total_nodes": total,
+                "completed_nodes": sum(stats["completed"] for stats in by_type.values()),
+                "core_total": core["total"],
+                "core_completed": core["completed"],
+                "current_position": learning_path.current_node_index if learning_path.current_node_index < total else None,
+                "current_core_number": current_core_number,
+                "by_type": by_type,
+            },
+        )
+        learning_path.progress = progress
+        return progress
+
+    # ========================================================
+    # Helpers
+    # ========================================================
+
+    @staticmethod
+    def _lock(learning_path: LearningPath) -> None:
+        """Блокирует строку пути до конца транзакции и перечитывает current_node_index"""
+        learning_path.current_node_index = (
+            LearningPath.objects
+            .select_for_update()
+            .filter(pk=learning_path.pk)
+            .values_list("current_node_index", flat=True)
+            .get()
+        )
+
+    @staticmethod
+    def _set_current(learning_path: LearningPath, position: int) -> None:
+        now = timezone.now()
+        LearningPath.objects.filter(pk=learning_path.pk).update(current_node_index=position, updated_at=now)
+        learning_path.current_node_index = position
+        learning_path.updated_at = now
+
+    @staticmethod
+    def _relabel(learning_path, status, start=0, stop=None, only=None, exclude=None) -> int:
+        nodes = learning_path.path_nodes.filter(position__gte=start)
+        if stop is not None:
+            nodes = nodes.filter(position__lt=stop)
+        if only is not None:
+            nodes = nodes.filter(status__in=list(only))
+        if exclude is not None:
+            nodes = nodes.exclude(status__in=list(exclude))
+        return nodes.update(status=status)
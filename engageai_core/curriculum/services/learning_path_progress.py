@@ -1,3 +1,6 @@
+from curriculum.services.learning_path_nodes import LearningPathNodeService
+
+
 class LearningPathProgressService:
     """
     Расчёт пользовательского прогресса по LearningPath.
@@ -10,33 +13,13 @@ class LearningPathProgressService:
         - completed
         - current
         - total
-        """
-
-        nodes = learning_path.nodes
-
-        core_nodes = [
-            node for node in nodes
-            if node["type"] == "core"
-        ]
 
-        total = len(core_nodes)
-
-        completed = [
-            node for node in core_nodes
-            if node["status"] == "completed"
-        ]
-
-        current = next(
-            (node for node in core_nodes if node["status"] == "in_progress"),
-            None
-        )
-
-        current_number = None
-        if current:
-            current_number = core_nodes.index(current) + 1
+        Значения берутся из материализованного LearningPathProgress.
+        """
+        progress = LearningPathNodeService.get_progress(learning_path)
 
         return {
-            "completed_lessons": len(completed),
-            "current_lesson_number": current_number,
-            "total_lessons": total
+            "completed_lessons": progress.core_completed,
+            "current_lesson_number": progress.current_core_number,
+            "total_lessons": progress.core_total
         }
@@ -0,0 +1,282 @@
+"""
+Буферизованная запись LessonEventLog.
+
+LessonEventService.create_event не пишет в БД в потоке запроса: событие
+(с моментом возникновения в timestamp) после коммита текущей транзакции
+добавляется в Redis-поток settings.LESSON_EVENT_STREAM — один XADD.
+
+Периодическая задача flush_lesson_events читает поток группой потребителей
+и пишет события пачками:
+- bulk_create — обычные пачки до LESSON_EVENT_FLUSH_BATCH событий;
+- COPY (engageai_core.pg_copy) — если накопилось от LESSON_EVENT_COPY_THRESHOLD
+  событий (догон после простоя записывающего).
+XACK — только после коммита записи: события упавшего записывающего (или при
+недоступной БД — OperationalError и т.п. пробрасываются, пачка не подтверждается)
+остаются в pending и через LESSON_EVENT_CLAIM_IDLE_SECONDS забираются повторно
+(XAUTOCLAIM). Отбрасываются только события с ошибками уровня строки (IntegrityError,
+DataError). Доставка «хотя бы один раз»: при падении между коммитом и XACK событие
+может записаться дважды.
+
+Если Redis недоступен, события пишутся в БД сразу, как раньше, по тем же правилам:
+при недоступной БД ошибка пробрасывается вызывающему, а не теряется молча.
+bulk_create и COPY не вызывают save(), поэтому duration_minutes для COMPLETE
+считается при записи пачки — по START из той же пачки или из БД.
+"""
+import json
+import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DataError, IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from curriculum.models.learning_process.lesson_event_log import LessonEventLog, LessonEventType
+from engageai_core.pg_copy import copy_models
+from engageai_core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LessonEventBuffer:
+    """Очередь событий урока в Redis-потоке и их пакетная запись в LessonEventLog"""
+
+    GROUP = "lesson-event-writers"
+    FIELD = "event"
+    FLUSH_LOCK = "curriculum:lesson_events:flush"
+    COPY_FIELDS = (
+        "student", "enrollment", "lesson", "event_type", "timestamp", "channel",
+        "duration_minutes", "metadata", "created_at", "updated_at",
+    )
+
+    # ------------------------------------------------------------------
+    # Постановка в очередь
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def record(cls, events: Sequence[LessonEventLog]) -> None:
+        """Несохранённые события: в очередь при LESSON_EVENT_BUFFERED, иначе bulk_create сразу"""
+        if settings.LESSON_EVENT_BUFFERED:
+            cls.enqueue(events)
+        else:
+            LessonEventLog.objects.bulk_create(events)
+
+    @classmethod
+    def enqueue(cls, events: Sequence[LessonEventLog]) -> None:
+        """
+        Ставит несохранённые события в поток после коммита текущей транзакции
+        (вне транзакции — сразу). Откат транзакции отменяет и события.
+        """
+        events = list(events)
+        if events:
+            transaction.on_commit(lambda: cls._publish(events))
+
+    @classmethod
+    def _publish(cls, events: List[LessonEventLog]) -> None:
+        try:
+            pipe = get_redis().pipeline()
+            for event in events:
+                pipe.xadd(
+                    settings.LESSON_EVENT_STREAM,
+                    {cls.FIELD: cls._serialize(event)},
+                    maxlen=settings.LESSON_EVENT_STREAM_MAXLEN,
+                    approximate=True,
+                )
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Lesson events: Redis недоступен, {len(events)} событий записываются сразу: {e}")
+            cls._write_safely(events)
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def flush(cls, max_seconds: Optional[float] = None) -> int:
+        """
+        Записывает накопленные события пачками, пока поток не опустеет
+        (или не истечёт max_seconds). Возвращает число записанных событий.
+        Одновременно работает один записывающий (Redis-блокировка): пока идёт
+        предыдущий запуск, следующие сразу возвращают 0 и не занимают воркер.
+        """
+        client = get_redis()
+        # Таймаут блокировки продлевается на каждой пачке; упавший держатель освобождает её сам
+        lock = client.lock(cls.FLUSH_LOCK, timeout=settings.LESSON_EVENT_CLAIM_IDLE_SECONDS)
+        if not lock.acquire(blocking=False):
+            logger.debug("Lesson events: запись уже выполняется другим процессом")
+            return 0
+        try:
+            return cls._flush(client, max_seconds, lock)
+        finally:
+            try:
+                lock.release()
+            except redis.exceptions.LockError:
+                pass
+
+    @classmethod
+    def _flush(cls, client: redis.Redis, max_seconds: Optional[float], lock) -> int:
+        stream = settings.LESSON_EVENT_STREAM
+        cls._ensure_group(client)
+        consumer = f"{socket.gethostname()}-{os.getpid()}"
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+
+        written = 0
+        while deadline is None or time.monotonic() < deadline:
+            lock.reacquire()
+            backlog = client.xlen(stream)
+            count = max(settings.LESSON_EVENT_FLUSH_BATCH, settings.LESSON_EVENT_COPY_THRESHOLD) \
+                if backlog >= settings.LESSON_EVENT_COPY_THRESHOLD else settings.LESSON_EVENT_FLUSH_BATCH
+
+            entries = cls._claim_stale(client, consumer, count) or cls._read_new(client, consumer, count)
+            if not entries:
+                break
+
+            events = [cls._deserialize(fields) for _, fields in entries if fields]
+            cls._write_safely(events)
+            entry_ids = [entry_id for entry_id, _ in entries]
+            pipe = client.pipeline()
+            pipe.xack(stream, cls.GROUP, *entry_ids)
+            pipe.xdel(stream, *entry_ids)
+            pipe.execute()
+            written += len(events)
+
+        if written:
+            logger.info(f"Lesson events: записано {written}")
+        return written
+
+    @classmethod
+    def _write_safely(cls, events: List[LessonEventLog]) -> None:
+        """
+        Пишет пачку; если пачка отклонена из-за данных строки (например, зачисление
+        уже удалено), пишет события по одному и пропускает только ошибочные — иначе
+        одна битая запись останавливала бы весь поток. Ошибки соединения и прочие
+        OperationalError пробрасываются: события остаются в очереди.
+        """
+        try:
+            cls._write(events)
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"Lesson events: пачка из {len(events)} не записана ({e}), запись по одному")
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        LessonEventLog.objects.bulk_create([event])
+                except (IntegrityError, DataError) as event_error:
+                    logger.error(
+                        f"Lesson events: событие {event.event_type} enrollment {event.enrollment_id} "
+                        f"отброшено: {event_error}"
+                    )
+
+    @classmethod
+    def _write(cls, events: List[LessonEventLog]) -> None:
+        if not events:
+            return
+        cls._fill_durations(events)
+        with transaction.atomic():
+            if len(events) >= settings.LESSON_EVENT_COPY_THRESHOLD:
+                now = timezone.now()
+                for event in events:
+                    event.created_at = event.updated_at = now
+                copy_models(LessonEventLog, cls.COPY_FIELDS, events)
+            else:
+                LessonEventLog.objects.bulk_create(events)
+
+    @staticmethod
+    def _fill_durations(events: List[LessonEventLog]) -> None:
+        """duration_minutes для COMPLETE — от последнего START того же урока (как LessonEventLog.save)"""
+        completes = [
+            event for event in events
+            if event.event_type == LessonEventType.COMPLETE
+            and event.duration_minutes is None
+            and event.lesson_id is not None
+        ]
+        if not completes:
+            return
+
+        starts: Dict[Tuple[int, int, int], list] = defaultdict(list)
+        for event in events:
+            if event.event_type == LessonEventType.START:
+                starts[(event.student_id, event.enrollment_id, event.lesson_id)].append(event.timestamp)
+        for student_id, enrollment_id, lesson_id, moment in (
+                LessonEventLog.objects
+                .filter(
+                    event_type=LessonEventType.START,
+                    enrollment_id__in={event.enrollment_id for event in completes},
+                    lesson_id__in={event.lesson_id for event in completes},
+                )
+                .values_list("student_id", "enrollment_id", "lesson_id", "timestamp")
+        ):
+            starts[(student_id, enrollment_id, lesson_id)].append(moment)
+
+        for event in completes:
+            earlier = [
+                moment for moment in starts.get((event.student_id, event.enrollment_id, event.lesson_id), ())
+                if moment <= event.timestamp
+            ]
+            if earlier:
+                event.duration_minutes = round((event.timestamp - max(earlier)).total_seconds() / 60, 2)
+
+    # ------------------------------------------------------------------
+    # Redis
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _ensure_group(cls, client: redis.Redis) -> None:
+        """Группа создаётся при первом запуске (и заново, если поток удалили вместе с Redis-данными)"""
+        try:
+            client.xgroup_create(settings.LESSON_EVENT_STREAM, cls.GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @classmethod
+    def _read_new(cls, client: redis.Redis, consumer: str, count: int) -> list:
+        response = client.xreadgroup(cls.GROUP, consumer, {settings.LESSON_EVENT_STREAM: ">"}, count=count)
+        return response[0][1] if response else []
+
+    @classmethod
+    def _claim_stale(cls, client: redis.Redis, consumer: str, count: int) -> list:
+        """Записи, которые прочитал, но не подтвердил упавший записывающий"""
+        response = client.xautoclaim(
+            settings.LESSON_EVENT_STREAM,
+            cls.GROUP,
+            consumer,
+            min_idle_time=settings.LESSON_EVENT_CLAIM_IDLE_SECONDS * 1000,
+            start_id="0-0",
+            count=count,
+        )
+        return response[1]
+
+    @staticmethod
+    def _serialize(event: LessonEventLog) -> str:
+        return json.dumps({
+            "student_id": event.student_id,
+            "enrollment_id": event.enrollment_id,
+            "lesson_id": event.lesson_id,
+            "event_type": event.event_type,
+            "channel": event.channel,
+            "timestamp": event.timestamp.isoformat(),
+            "duration_minutes": event.duration_minutes,
+            "metadata": event.metadata or {},
+        }, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    @classmethod
+    def _deserialize(cls, fields: dict) -> LessonEventLog:
+        data = json.loads(fields[cls.FIELD])
+        duration = data.get("duration_minutes")
+        return LessonEventLog(
+            student_id=data["student_id"],
+            enrollment_id=data["enrollment_id"],
+            lesson_id=data.get("lesson_id"),
+            event_type=data["event_type"],
+            channel=data.get("channel") or "WEB",
+            timestamp=parse_datetime(data["timestamp"]),
+            duration_minutes=Decimal(str(duration)) if duration is not None else None,
+            metadata=data.get("metadata") or {},
+        )
@@ -0,0 +1,148 @@
+"""
+Помесячное секционирование LessonEventLog по timestamp (PostgreSQL, PARTITION BY RANGE).
+
+Необязательно: convert() запускается вручную (команда lesson_event_partitions --convert)
+в окно обслуживания — таблица заблокирована на время переноса строк. После конвертации:
+- первичный ключ — (id, timestamp): PostgreSQL требует ключ секционирования во всех
+  уникальных ограничениях; для Django pk по-прежнему id;
+- индексы и внешние ключи прежней таблицы воссоздаются на родительской таблице под теми
+  же именами — PostgreSQL сам создаёт их в каждой секции, запросы по (student, -timestamp)
+  и (event_type, timestamp) за период читают только нужные месяцы;
+- секции {table}_pYYYYMM создаются на LESSON_EVENT_PARTITIONS_AHEAD месяцев вперёд
+  (ежедневная задача ensure_lesson_event_partitions); строки вне секций попадают в {table}_default.
+
+Старые месяцы удаляются целиком (DETACH PARTITION + DROP TABLE) вместо DELETE.
+Миграции, меняющие таблицу, после конвертации нужно проверять вручную.
+"""
+import logging
+from datetime import date, datetime, timezone as dt_timezone
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from curriculum.models.learning_process.lesson_event_log import LessonEventLog
+
+logger = logging.getLogger(__name__)
+
+
+class LessonEventPartitions:
+    """Секции таблицы LessonEventLog"""
+
+    @staticmethod
+    def table() -> str:
+        return LessonEventLog._meta.db_table
+
+    @classmethod
+    def is_partitioned(cls) -> bool:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+                [cls.table()],
+            )
+            return cursor.fetchone()[0]
+
+    @classmethod
+    def convert(cls, ahead: Optional[int] = None) -> List[str]:
+        """Переводит таблицу на помесячные секции с переносом строк. Возвращает имена созданных секций"""
+        if cls.is_partitioned():
+            return cls.ensure(ahead)
+
+        table = cls.table()
+        legacy = f"{table}_legacy"
+        quote = connection.ops.quote_name
+        timestamp = quote(LessonEventLog._meta.get_field("timestamp").column)
+        pk = quote(LessonEventLog._meta.pk.column)
+        sequence = f"{table}_{LessonEventLog._meta.pk.column}_seq"
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+            # Определения до переименования ссылаются на исходное имя — после удаления
+            # старой таблицы они создают индексы и ключи уже на секционированной
+            cursor.execute(
+                "SELECT pg_get_indexdef(x.indexrelid) FROM pg_index x "
+                "WHERE x.indrelid = %s::regclass AND NOT x.indisprimary",
+                [table],
+            )
+            indexes = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'f'",
+                [table],
+            )
+            foreign_keys = cursor.fetchall()
+            cursor.execute(f"SELECT min({timestamp}), max({timestamp}) FROM {quote(table)}")
+            first, last = cursor.fetchone()
+            now = timezone.now()
+
+            cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+            cursor.execute(
+                f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+                f"INCLUDING STORAGE) PARTITION BY RANGE ({timestamp})"
+            )
+            created = cls._create_partitions(cursor, first or now, max(last or now, now), ahead)
+            cursor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+            cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}")
+            cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY ({pk}, {timestamp})")
+            for definition in indexes:
+                cursor.execute(definition)
+            for name, definition in foreign_keys:
+                cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+            cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{pk}")
+            cursor.execute(f"SELECT setval(%s, COALESCE(max({pk}), 0) + 1, false) FROM {quote(table)}", [sequence])
+            cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {pk} SET DEFAULT nextval(%s::regclass)", [sequence])
+
+        logger.info(f"{table}: секционирование по месяцам, создано секций: {len(created)}")
+        return created
+
+    @classmethod
+    def ensure(cls, ahead: Optional[int] = None) -> List[str]:
+        """Создаёт недостающие секции с текущего месяца на ahead месяцев вперёд; без секционирования — ничего"""
+        if not cls.is_partitioned():
+            return []
+        now = timezone.now()
+        with transaction.atomic(), connection.cursor() as cursor:
+            created = cls._create_partitions(cursor, now, now, ahead)
+        if created:
+            logger.info(f"{cls.table()}: созданы секции {', '.join(created)}")
+        return created
+
+    @classmethod
+    def _create_partitions(cls, cursor, first: datetime, last: datetime, ahead: Optional[int]) -> List[str]:
+        """Секции с месяца first по месяц last + ahead включительно (границы — по UTC)"""
+        ahead = settings.LESSON_EVENT_PARTITIONS_AHEAD if ahead is None else ahead
+        quote = connection.ops.quote_name
+        table = cls.table()
+
+        start = cls._month(first.astimezone(dt_timezone.utc).date())
+        stop = cls._shift(cls._month(last.astimezone(dt_timezone.utc).date()), ahead + 1)
+        created = []
+        while start < stop:
+            end = cls._shift(start, 1)
+            name = f"{table}_p{start:%Y%m}"
+            cursor.execute("SELECT to_regclass(%s) IS NULL", [name])
+            if cursor.fetchone()[0]:
+                cursor.execute(
+                    f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                    [cls._utc(start), cls._utc(end)],
+                )
+                created.append(name)
+            start = end
+        return created
+
+    @staticmethod
+    def _month(day: date) -> date:
+        return day.replace(day=1)
+
+    @staticmethod
+    def _shift(month: date, months: int) -> date:
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    @staticmethod
+    def _utc(day: date) -> datetime:
+        return datetime(day.year, day.month, day.day, tzinfo=dt_timezone.utc)
@@ -1,4 +1,7 @@
+from django.conf import settings
+
 from curriculum.models.learning_process.lesson_event_log import LessonEventLog, LessonEventType
+from curriculum.services.lesson_event_buffer import LessonEventBuffer
 from curriculum.services.skill_update_service import SkillUpdateService
 
 
@@ -12,10 +15,23 @@ class LessonEventService:
     def create_event(student, enrollment, lesson, event_type: str, channel="WEB", metadata=None):
         """
         Создаёт событие и автоматически рассчитывает duration для COMPLETE.
+
+        При LESSON_EVENT_BUFFERED событие ставится в очередь LessonEventBuffer
+        и записывается в БД пачкой позже — возвращается несохранённый экземпляр (pk = None).
         """
         metadata = metadata or {}
 
-        event = LessonEventLog.objects.create(
+        if not settings.LESSON_EVENT_BUFFERED:
+            return LessonEventLog.objects.create(
+                student=student,
+                enrollment=enrollment,
+                lesson=lesson,
+                event_type=event_type,
+                channel=channel,
+                metadata=metadata
+            )
+
+        event = LessonEventLog(
             student=student,
             enrollment=enrollment,
             lesson=lesson,
@@ -23,6 +39,7 @@ class LessonEventService:
             channel=channel,
             metadata=metadata
         )
+        LessonEventBuffer.enqueue([event])
 
         # Автоматический расчёт duration и обновление LearningPath
         # if event_type == LessonEventType.COMPLETE:
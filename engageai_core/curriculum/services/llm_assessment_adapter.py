@@ -1,7 +1,7 @@
 import asyncio
 import json
 import logging
-from typing import Type, TypeVar, Optional, Dict, Any, Union
+from typing import Type, TypeVar, Optional, Dict, Any, List, Tuple, Union
 
 from asgiref.sync import async_to_sync
 
@@ -40,12 +40,48 @@ SYSTEM_PROMPT = """
 Никаких пояснений вне JSON. Только JSON.
 """
 
+BATCH_SYSTEM_PROMPT = """
+Вы — эксперт по оценке английского языка по шкале CEFR. Вам даны несколько заданий одного урока
+с ответами студента, у каждого задания есть item_id. Оцените КАЖДЫЙ ответ независимо от остальных
+**только по навыкам, проверяемым этим заданием**. Используйте шкалу 0.0–1.0. Если навык не проверялся — укажите null.
+
+Верните ТОЛЬКО валидный JSON по схеме, по одному элементу items на каждый item_id:
+{
+  "items": [
+    {
+      "item_id": "item_id задания из запроса",
+      "is_correct": True|False правильный или неправильный ответ
+      "skill_evaluation": {
+        "grammar": {"score": число|null, "confidence": число|null, "evidence": []},
+        "vocabulary": {"score": число|null, "confidence": число|null, "evidence": []},
+        "reading": {"score": число|null, "confidence": число|null, "evidence": []},
+        "listening": {"score": число|null, "confidence": число|null, "evidence": []},
+        "writing": {"score": число|null, "confidence": число|null, "evidence": []},
+        "speaking": {"score": число|null, "confidence": число|null, "evidence": []}
+      },
+      "summary": {
+        "text": "1–3 предложения, роль наставника с объяснениями",
+        "advice": ["практический совет", "..."]
+      }
+    }
+  ]
+}
+Никаких пояснений вне JSON. Только JSON.
+"""
+
 
 class LLMAssessmentAdapter(AssessmentPort):
     """
-    Адаптер для оценки с использованием LLM через llm_factory
+    Адаптер для оценки с использованием LLM через llm_factory.
+
+    Пакетный режим (assess_many): ответы одного урока группируются по BATCH_SIZE в один
+    запрос с BATCH_SYSTEM_PROMPT — описание урока и системный промпт передаются один раз
+    на пакет. Элементы пакета, не прошедшие валидацию (нет в ответе, неверная структура,
+    оценки вне 0.0–1.0), переоцениваются по одному обычным запросом.
     """
 
+    BATCH_SIZE = 5
+
     def __init__(self):
         # Используем глобальный экземпляр llm_factory
         self.llm = llm_factory
@@ -53,59 +89,245 @@ class LLMAssessmentAdapter(AssessmentPort):
     def assess_task(self, task: Task, response: Union[StudentTaskResponse, TestAnswer]) -> AssessmentResult:
         """Assess a single task with LLM"""
         try:
-            user_message = self._build_user_message(task, response)
-            if isinstance(response, StudentTaskResponse):
-                lesson = task.lesson
-                course = lesson.course
-                user = response.student.user
-                context = {
-                    "course_id": course.pk,
-                    "lesson_id": lesson.pk,
-                    "task_id": task.pk,
-                    "user_id": user.id,
-                    "request_type": LLMRequestType.TASK_REVIEW,
-                }
-            else:  # TestAnswer
-                user = response.question.session.user
-                test_session = response.question.session
-                task = response.question.task
-                context = {
-                    "test_session_id": test_session.pk,
-                    "task_id": task.pk,
-                    "user_id": user.id,
-                    "request_type": LLMRequestType.TEST_TASK_REVIEW,
-                }
+            task, request = self.build_request(task, response)
+        except Exception as exc:
+            self.logger.error(f"LLM assessment failed: {exc}")
+            return self._neutral_result(task)
 
-            print(user_message)
+        return async_to_sync(self.assess_request_async)(task, request)
 
-            result = self._safe_llm_call(
-                system_prompt=SYSTEM_PROMPT,
-                user_message=user_message,
-                temperature=0.2,
-                context=context,
-                response_format=dict
+    def assess_many(
+            self,
+            items: List[Tuple[Task, Union[StudentTaskResponse, TestAnswer]]],
+            batched: bool = True,
+    ) -> List[AssessmentResult]:
+        """
+        Оценивает несколько заданий в одном event loop.
+        Запросы подготавливаются синхронно (ORM), затем уходят к провайдеру одновременно —
+        число параллельных запросов ограничивает лимитер GenerationService (LLMConfig.max_concurrency).
+        При batched=True ответы одного урока объединяются в пакеты по BATCH_SIZE.
+        Порядок результатов совпадает с порядком items.
+        """
+        prepared = []
+        for task, response in items:
+            try:
+                prepared.append(self.build_request(task, response))
+            except Exception as exc:
+                self.logger.error(f"LLM assessment failed: {exc}")
+                prepared.append((task, None))
+
+        batches = self._build_batches(items, prepared) if batched else []
+        batched_indexes = {index for indexes, _ in batches for index in indexes}
+
+        async def run() -> List[AssessmentResult]:
+            results: List[Optional[AssessmentResult]] = [None] * len(prepared)
+
+            singles = [index for index in range(len(prepared)) if index not in batched_indexes]
+            single_results, batch_results = await asyncio.gather(
+                asyncio.gather(*(
+                    self.assess_request_async(*prepared[index]) if prepared[index][1] is not None
+                    else self._neutral_async(prepared[index][0])
+                    for index in singles
+                )),
+                asyncio.gather(*(
+                    self._assess_batch_async([prepared[index] for index in indexes], request)
+                    for indexes, request in batches
+                )),
             )
 
-            print(f"\n{result=}\n")
+            for index, result in zip(singles, single_results):
+                results[index] = result
+            for (indexes, _), group_results in zip(batches, batch_results):
+                for index, result in zip(indexes, group_results):
+                    results[index] = result
+            return results
 
-            return self._parse_llm_response(payload=result, task=task)
+        return async_to_sync(run)() if prepared else []
+
+    def _build_batches(
+            self,
+            items: List[Tuple[Task, Union[StudentTaskResponse, TestAnswer]]],
+            prepared: List[Tuple[Task, Optional[Dict[str, Any]]]],
+    ) -> List[Tuple[List[int], Dict[str, Any]]]:
+        """
+        Группирует ответы уроков в пакеты: [(индексы items, запрос пакета)].
+        В пакеты попадают только StudentTaskResponse; группы из одного ответа остаются одиночными.
+        """
+        by_lesson: Dict[int, List[int]] = {}
+        for index, (task, response) in enumerate(items):
+            if isinstance(response, StudentTaskResponse) and prepared[index][1] is not None:
+                by_lesson.setdefault(task.lesson_id, []).append(index)
+
+        batches = []
+        for indexes in by_lesson.values():
+            for start in range(0, len(indexes), self.BATCH_SIZE):
+                chunk = indexes[start:start + self.BATCH_SIZE]
+                if len(chunk) < 2:
+                    continue
+                try:
+                    batches.append((chunk, self._build_batch_request([items[index] for index in chunk])))
+                except Exception as exc:
+                    self.logger.error(f"LLM batch preparation failed: {exc}")
+        return batches
+
+    def _build_batch_request(self, items: List[Tuple[Task, StudentTaskResponse]]) -> Dict[str, Any]:
+        """Один запрос на несколько ответов урока; item_id — порядковый номер в пакете"""
+        task, response = items[0]
+        lesson = task.lesson
+        user_message = "Оцените ответы ученика\n" + self._build_lesson_block(lesson)
+        for item_id, (task, response) in enumerate(items, start=1):
+            user_message += f"\nЗадание item_id={item_id}:\n" + self._build_task_block(task, response)
+
+        return {
+            "system_prompt": BATCH_SYSTEM_PROMPT,
+            "user_message": user_message,
+            "temperature": 0.2,
+            "context": {
+                "course_id": lesson.course_id,
+                "lesson_id": lesson.pk,
+                "user_id": response.student.user.id,
+                "request_type": LLMRequestType.TASK_REVIEW,
+            },
+        }
+
+    async def _assess_batch_async(
+            self,
+            prepared: List[Tuple[Task, Dict[str, Any]]],
+            request: Dict[str, Any],
+    ) -> List[AssessmentResult]:
+        """Пакетная оценка с переоценкой по одному только тех элементов, что не прошли валидацию"""
+        try:
+            payload = await self._safe_llm_call_async(response_format=dict, **request)
+            items = payload.get("items")
         except Exception as exc:
-            self.logger.error(f"LLM assessment failed: {exc}")
+            self.logger.error(f"LLM batch assessment failed: {exc}")
+            items = None
+
+        by_id = {
+            str(item.get("item_id")): item
+            for item in (items if isinstance(items, list) else [])
+            if isinstance(item, dict)
+        }
+
+        results: List[Optional[AssessmentResult]] = [
+            self._parse_batch_item(by_id.get(str(item_id)), task)
+            for item_id, (task, _) in enumerate(prepared, start=1)
+        ]
+
+        failed = [index for index, result in enumerate(results) if result is None]
+        if failed:
+            self.logger.warning(
+                f"LLM batch: {len(failed)} из {len(prepared)} элементов не прошли валидацию, переоценка по одному"
+            )
+            regraded = await asyncio.gather(*(self.assess_request_async(*prepared[index]) for index in failed))
+            for index, result in zip(failed, regraded):
+                results[index] = result
+
+        return results
+
+    def _parse_batch_item(self, item: Optional[Dict[str, Any]], task: Task) -> Optional[AssessmentResult]:
+        """Строгая валидация элемента пакета: None, если элемент нужно переоценить"""
+        if not item or not isinstance(item.get("is_correct"), bool):
+            return None
+        if not isinstance(item.get("skill_evaluation"), dict) or not isinstance(item.get("summary"), dict):
+            return None
+
+        payload = {key: value for key, value in item.items() if key != "item_id"}
+        try:
             return AssessmentResult(
-                is_correct=False,
+                is_correct=payload["is_correct"],
                 task_id=task.pk,
                 cefr_target=task.difficulty_cefr,
-                skill_evaluation={
-                    skill: {"score": 0.5, "confidence": 0.5, "evidence": []}
-                    for skill in ["grammar", "vocabulary", "reading", "listening", "writing", "speaking"]
-                },
-                summary={"text": "No valid assessment could be generated.", "advice": []},
-                metadata={"error": "invalid_llm_response", }
+                skill_evaluation=self.normalize_skill_evaluation(payload["skill_evaluation"]),
+                summary=payload["summary"],
+                metadata={"raw_llm": payload, "batched": True}
             )
+        except (ValueError, TypeError):
+            return None
+
+    def build_request(
+            self,
+            task: Task,
+            response: Union[StudentTaskResponse, TestAnswer]
+    ) -> Tuple[Task, Dict[str, Any]]:
+        """
+        Синхронная часть оценки: промпт и контекст логирования (обращается к ORM).
+        Возвращает (task, request); для TestAnswer task берётся из вопроса теста.
+        """
+        user_message = self._build_user_message(task, response)
+        if isinstance(response, StudentTaskResponse):
+            lesson = task.lesson
+            course = lesson.course
+            user = response.student.user
+            context = {
+                "course_id": course.pk,
+                "lesson_id": lesson.pk,
+                "task_id": task.pk,
+                "user_id": user.id,
+                "request_type": LLMRequestType.TASK_REVIEW,
+            }
+        else:  # TestAnswer
+            user = response.question.session.user
+            test_session = response.question.session
+            task = response.question.task
+            context = {
+                "test_session_id": test_session.pk,
+                "task_id": task.pk,
+                "user_id": user.id,
+                "request_type": LLMRequestType.TEST_TASK_REVIEW,
+            }
+
+        return task, {
+            "system_prompt": SYSTEM_PROMPT,
+            "user_message": user_message,
+            "temperature": 0.2,
+            "context": context,
+        }
+
+    async def assess_request_async(self, task: Task, request: Dict[str, Any]) -> AssessmentResult:
+        """Асинхронная часть оценки: запрос к LLM и разбор ответа (без обращений к ORM)"""
+        try:
+            result = await self._safe_llm_call_async(response_format=dict, **request)
+            return self._parse_llm_response(payload=result, task=task)
+        except Exception as exc:
+            self.logger.error(f"LLM assessment failed: {exc}")
+            return self._neutral_result(task)
+
+    async def _neutral_async(self, task: Task) -> AssessmentResult:
+        return self._neutral_result(task)
+
+    @staticmethod
+    def _neutral_result(task: Task) -> AssessmentResult:
+        return AssessmentResult(
+            is_correct=False,
+            task_id=task.pk,
+            cefr_target=task.difficulty_cefr,
+            skill_evaluation={
+                skill: {"score": 0.5, "confidence": 0.5, "evidence": []}
+                for skill in ["grammar", "vocabulary", "reading", "listening", "writing", "speaking"]
+            },
+            summary={"text": "No valid assessment could be generated.", "advice": []},
+            metadata={"error": "invalid_llm_response", }
+        )
 
     def _build_user_message(self, task: Task, response: StudentTaskResponse) -> str:
-        lesson = task.lesson
+        return (
+            "\nОцените ответ ученика\n"
+            + self._build_lesson_block(task.lesson)
+            + "\nОцениваемое задание:\n"
+            + self._build_task_block(task, response)
+        )
 
+    @staticmethod
+    def _build_lesson_block(lesson) -> str:
+        return f"""
+Урок:
+Lesson title: {lesson.title}
+Lesson description: {lesson.description}
+Lesson CEFR level: {lesson.required_cefr}
+"""
+
+    def _build_task_block(self, task: Task, response: StudentTaskResponse) -> str:
         task_schema_info = self._get_task_schema_info(task.content_schema_version)
         if task_schema_info:
             task_schema_info = "Дополнительная информация по заданию:\n" + task_schema_info
@@ -119,24 +341,14 @@ class LLMAssessmentAdapter(AssessmentPort):
         if not student_response or not student_response.strip():
             student_response = "[No valid student response provided]"
 
-        prompt = f"""
-Оцените ответ ученика
-        
-Урок:
-Lesson title: {lesson.title}
-Lesson description: {lesson.description}
-Lesson CEFR level: {lesson.required_cefr}
-
-Оцениваемое задание:
-CEFR level: {task.difficulty_cefr}
+        return f"""CEFR level: {task.difficulty_cefr}
 Content: {task.content}
 
 {task_schema_info}
 
 Ответ студента:
 {student_response}
-        """
-        return prompt
+"""
 
     def _get_task_schema_info(self, schema_name: str) -> str:
         """
@@ -168,8 +380,22 @@ Content: {task.content}
         """
         Безопасный вызов LLM с обработкой ошибок и логированием.
         """
+        return async_to_sync(self._safe_llm_call_async)(
+            system_prompt=system_prompt,
+            user_message=user_message,
+            response_format=response_format,
+            temperature=temperature,
+            context=context
+        )
+
+    async def _safe_llm_call_async(self,
+                                   system_prompt: str,
+                                   user_message: str,
+                                   response_format: Type[T],
+                                   temperature: Optional[float] = None,
+                                   context: Optional[dict] = None) -> T:
         try:
-            result = async_to_sync(self.llm.generate_json_response)(
+            result = await self.llm.generate_json_response(
                 system_prompt=system_prompt,
                 user_message=user_message,
                 temperature=temperature,
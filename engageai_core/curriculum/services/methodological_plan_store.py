@@ -0,0 +1,234 @@
+"""
+Методологический план в памяти процесса.
+
+Фикстуры fixtures/learning_objectives/{level}_{skill}.json читаются и проверяются один раз
+на процесс; дальше план отдаётся из памяти (PlanSnapshot), а время изменения файлов
+сверяется не чаще раза в METHODOLOGICAL_PLAN_RELOAD_INTERVAL секунд — изменённые
+фикстуры подхватываются без перезапуска.
+
+Снимок неизменяем и заменяется целиком, поэтому читатели не блокируются.
+В снимке заранее посчитаны:
+- юниты по (уровень, навык) в порядке order_in_level и по identifier;
+- разбиение юнитов на уроки (1-3 юнита разных навыков) и номер урока каждой цели —
+  то же разбиение использует ContentOrchestrator при генерации курса по плану.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+FIXTURES_PATH = BASE_DIR / "fixtures" / "learning_objectives"
+
+SKILL_ORDER = ["grammar", "vocabulary", "reading", "listening", "writing", "speaking"]
+LEVEL_ORDER: List[str] = ["A2", "B1", "B2", "C1"]
+
+REQUIRED_UNIT_FIELDS = ("identifier", "name", "cefr_level", "skill_domain")
+
+
+def order_units(level_plan: Mapping[str, Sequence[dict]]) -> List[dict]:
+    """Юниты уровня в порядке: SKILL_ORDER, затем order_in_level"""
+    units = []
+    for skill in SKILL_ORDER:
+        if skill in level_plan:
+            units.extend(sorted(level_plan[skill], key=lambda unit: unit.get('order_in_level', float('inf'))))
+    return units
+
+
+def group_units_into_lessons(units: Sequence[dict], max_per_lesson: int = 3) -> List[List[dict]]:
+    """Группирует юниты в уроки: 1-3 юнита, разнообразие skills"""
+    lessons = []
+    i = 0
+
+    while i < len(units):
+        lesson_units = [units[i]]
+        used_skills = {units[i]['skill_domain']}
+
+        # Добавляем до 2 дополнительных юнитов с разными skills
+        j = i + 1
+        while len(lesson_units) < max_per_lesson and j < len(units):
+            candidate_skill = units[j]['skill_domain']
+            if candidate_skill not in used_skills:
+                lesson_units.append(units[j])
+                used_skills.add(candidate_skill)
+            j += 1
+
+        lessons.append(lesson_units)
+        i += len(lesson_units)
+
+    return lessons
+
+
+@dataclass(frozen=True)
+class PlanSnapshot:
+    """Неизменяемый снимок методплана"""
+    units: Mapping[str, Mapping[str, Tuple[dict, ...]]]
+    by_identifier: Mapping[str, dict]
+    lessons: Tuple[Tuple[dict, ...], ...]
+    lesson_by_objective: Mapping[str, int]
+    mtimes: Mapping[str, Optional[float]]
+    missing_files: Tuple[str, ...] = ()
+    total_units: int = 0
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def file_coverage(self) -> float:
+        """Доля найденных файлов фикстур"""
+        return 1 - len(self.missing_files) / len(self.mtimes) if self.mtimes else 0.0
+
+    def plan(self) -> Dict[str, Dict[str, List[dict]]]:
+        """План в формате MethodologicalPlan.plan_data: {level: {skill: [units]}} (новые списки)"""
+        return {level: {skill: list(units) for skill, units in skills.items()} for level, skills in self.units.items()}
+
+
+class MethodologicalPlanStore:
+    """Методплан процесса: загрузка фикстур, проверка, индексы и горячая перезагрузка по mtime"""
+
+    _snapshot: Optional[PlanSnapshot] = None
+    _checked_at: float = 0.0
+    _lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Поиск
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def objective(cls, identifier: str) -> Optional[dict]:
+        return cls.snapshot().by_identifier.get(identifier)
+
+    @classmethod
+    def units(cls, level: str, skill: str) -> Tuple[dict, ...]:
+        return cls.snapshot().units.get(level, {}).get(skill, ())
+
+    @classmethod
+    def lesson_for_objective(cls, identifier: str) -> Optional[int]:
+        """Номер урока (с 1) курса по методплану, в котором проходится цель"""
+        return cls.snapshot().lesson_by_objective.get(identifier)
+
+    @classmethod
+    def lesson_objectives(cls, lesson_order: int) -> Tuple[dict, ...]:
+        lessons = cls.snapshot().lessons
+        return lessons[lesson_order - 1] if 0 < lesson_order <= len(lessons) else ()
+
+    # ------------------------------------------------------------------
+    # Загрузка
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def snapshot(cls) -> PlanSnapshot:
+        """Актуальный снимок; файлы перечитываются только если изменились"""
+        snapshot = cls._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - cls._checked_at < settings.METHODOLOGICAL_PLAN_RELOAD_INTERVAL:
+            return snapshot
+
+        with cls._lock:
+            if cls._snapshot is None or cls._read_mtimes() != cls._snapshot.mtimes:
+                cls._snapshot = cls._load()
+            cls._checked_at = time.monotonic()
+            return cls._snapshot
+
+    @classmethod
+    def reload(cls) -> PlanSnapshot:
+        with cls._lock:
+            cls._snapshot = cls._load()
+            cls._checked_at = time.monotonic()
+            return cls._snapshot
+
+    @staticmethod
+    def _file_path(level: str, skill: str) -> Path:
+        return FIXTURES_PATH / f"{level.lower()}_{skill}.json"
+
+    @classmethod
+    def _read_mtimes(cls) -> Dict[str, Optional[float]]:
+        mtimes = {}
+        for level in LEVEL_ORDER:
+            for skill in SKILL_ORDER:
+                path = cls._file_path(level, skill)
+                try:
+                    mtimes[str(path)] = os.stat(path).st_mtime
+                except OSError:
+                    mtimes[str(path)] = None
+        return mtimes
+
+    @classmethod
+    def _load(cls) -> PlanSnapshot:
+        mtimes = cls._read_mtimes()
+        units: Dict[str, Dict[str, Tuple[dict, ...]]] = {}
+        by_identifier: Dict[str, dict] = {}
+        missing = []
+
+        for level in LEVEL_ORDER:
+            units[level] = {}
+            for skill in SKILL_ORDER:
+                path = cls._file_path(level, skill)
+                if mtimes[str(path)] is None:
+                    missing.append(str(path))
+                    units[level][skill] = ()
+                    continue
+
+                valid = []
+                for unit in cls._read_file(path):
+                    if unit.get('cefr_level') != level or unit.get('skill_domain') != skill:
+                        continue
+                    if any(not unit.get(key) for key in REQUIRED_UNIT_FIELDS):
+                        logger.warning(f"{path}: юнит без обязательных полей {REQUIRED_UNIT_FIELDS}: {unit}")
+                        continue
+                    if unit['identifier'] in by_identifier:
+                        logger.warning(f"{path}: повторный identifier {unit['identifier']} пропущен")
+                        continue
+                    by_identifier[unit['identifier']] = unit
+                    valid.append(unit)
+
+                valid.sort(key=lambda unit: unit.get('order_in_level', float('inf')))
+                units[level][skill] = tuple(valid)
+
+        lessons = []
+        for level in LEVEL_ORDER:
+            lessons.extend(tuple(group) for group in group_units_into_lessons(order_units(units[level])))
+        lesson_by_objective = {
+            unit['identifier']: order
+            for order, group in enumerate(lessons, start=1)
+            for unit in group
+        }
+
+        total_units = len(by_identifier)
+        logger.info(f"Методплан загружен: {total_units} юнитов из {len(mtimes) - len(missing)} файлов")
+        if missing:
+            logger.warning(f"Отсутствуют файлы: {missing}")
+
+        return PlanSnapshot(
+            units=MappingProxyType({level: MappingProxyType(skills) for level, skills in units.items()}),
+            by_identifier=MappingProxyType(by_identifier),
+            lessons=tuple(lessons),
+            lesson_by_objective=MappingProxyType(lesson_by_objective),
+            mtimes=MappingProxyType(mtimes),
+            missing_files=tuple(missing),
+            total_units=total_units,
+        )
+
+    @staticmethod
+    def _read_file(path: Path) -> List[dict]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Ошибка JSON в {path}: {e}")
+            return []
+        except OSError as e:
+            logger.error(f"Ошибка загрузки {path}: {e}")
+            return []
+
+        if not isinstance(data, list):
+            logger.error(f"{path}: ожидается список юнитов")
+            return []
+        return [unit for unit in data if isinstance(unit, dict)]
@@ -1,7 +1,9 @@
 import json
+from django.db import transaction
 from django.utils import timezone
 from curriculum.models.learning_process.learning_path import LearningPath
 from curriculum.models.content.lesson import Lesson
+from curriculum.services.learning_path_nodes import LearningPathNodeService
 from users.models import CEFRLevel
 
 
@@ -97,20 +99,21 @@ class PathGenerationService:
                 })
 
             # Создаём или обновляем путь
-            path, created = LearningPath.objects.update_or_create(
-                enrollment=enrollment,
-                defaults={
-                    "path_type": "PERSONALIZED",
-                    "nodes": nodes,
-                    "current_node_index": 0,
-                    "generated_at": timezone.now(),
-                    "metadata": {
-                        "generated_by": "gpt-4o-mini",
-                        "context_summary": context,
-                        "prompt_version": "v2"
+            with transaction.atomic():
+                path, created = LearningPath.objects.update_or_create(
+                    enrollment=enrollment,
+                    defaults={
+                        "path_type": "PERSONALIZED",
+                        "current_node_index": 0,
+                        "generated_at": timezone.now(),
+                        "metadata": {
+                            "generated_by": "gpt-4o-mini",
+                            "context_summary": context,
+                            "prompt_version": "v2"
+                        }
                     }
-                }
-            )
+                )
+                LearningPathNodeService.replace_nodes(path, nodes, 0)
             return path
 
         except Exception as e:
@@ -206,16 +209,17 @@ class PathGenerationService:
             })
 
         # Обновляем путь
-        path, _ = LearningPath.objects.update_or_create(
-            enrollment=enrollment,
-            defaults={
-                "path_type": "LINEAR",
-                "nodes": nodes,
-                "current_node_index": completed_count,  # Начать с первого unlocked
-                "generated_at": timezone.now(),
-                "metadata": {"generated_by": "fallback_linear", "reason": "AI unavailable"}
-            }
-        )
+        with transaction.atomic():
+            path, _ = LearningPath.objects.update_or_create(
+                enrollment=enrollment,
+                defaults={
+                    "path_type": "LINEAR",
+                    "current_node_index": completed_count,  # Начать с первого unlocked
+                    "generated_at": timezone.now(),
+                    "metadata": {"generated_by": "fallback_linear", "reason": "AI unavailable"}
+                }
+            )
+            LearningPathNodeService.replace_nodes(path, nodes, completed_count)
         return path
 
     @staticmethod
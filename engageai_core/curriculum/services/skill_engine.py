@@ -0,0 +1,457 @@
+"""
+Векторный расчёт навыков студентов.
+
+Навыки зачисления — вектор фиксированной размерности (SKILL_DIMENSIONS). Все расчёты
+идут над матрицами numpy сразу для многих зачислений:
+- ema_step: шаг экспоненциального сглаживания
+      new = prev + alpha * weight * (score - prev)
+  weight — уверенность оценки навыка (0 — навык в задании не оценивался);
+  при weight = 1 это прежняя формула alpha * score + (1 - alpha) * prev;
+- replay: последовательность шагов для матрицы (зачисления × задания × навыки),
+  цикл идёт по номеру задания, а не по студентам;
+- skill_deltas: разница снимков и среднее по навыкам.
+
+SkillEngine применяет это к данным:
+- apply_task_results — после каждой оценки заданий обновляет SkillState (одна строка
+  на зачисление) и дописывает точки в RAW-блок SkillTrajectory;
+- snapshot — SkillSnapshot урока как копия текущего вектора, без пересчёта;
+- recompute — пересчёт состояния и истории по всем TaskAssessmentResult (backfill);
+  для всей когорты с отчётом о расхождениях — skill_replay.SkillReplay;
+- compact — сжатие старых RAW-блоков истории в DAILY.
+
+Шаг на задание SKILL_TASK_ALPHA меньше урочного SkillUpdateService.SMOOTHING_ALPHA:
+при 0.3 три задания урока по навыку дают суммарный вес 1 - 0.7³ ≈ 0.66 — как прежний
+шаг по агрегированной оценке урока.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from curriculum.models.assessment.task_assessment import TaskAssessmentResult
+from curriculum.models.student.enrollment import Enrollment
+from curriculum.models.student.skill_snapshot import SkillSnapshot
+from curriculum.models.student.skill_state import (
+    SKILL_DIM,
+    SKILL_DIMENSIONS,
+    SkillState,
+    SkillTrajectory,
+    TrajectoryResolution,
+    pack_times,
+    pack_vectors,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SKILL_VALUE = 0.5
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# ==========================================================
+# Векторные операции
+# ==========================================================
+
+def _to_float(value) -> Optional[float]:
+    if isinstance(value, str):
+        value = value.replace(",", ".")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def feedback_matrix(feedbacks: Sequence[Mapping]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Оценки навыков {skill: {"score", "confidence"} | None} → (scores, weights) формы (n, SKILL_DIM).
+    Вес — confidence (1.0, если не указана), 0 — навык не оценивался.
+    """
+    scores = np.zeros((len(feedbacks), SKILL_DIM))
+    weights = np.zeros((len(feedbacks), SKILL_DIM))
+    for row, feedback in enumerate(feedbacks):
+        for col, skill in enumerate(SKILL_DIMENSIONS):
+            data = feedback.get(skill)
+            if not isinstance(data, dict):
+                continue
+            score = _to_float(data.get("score"))
+            if score is None:
+                continue
+            confidence = _to_float(data.get("confidence"))
+            scores[row, col] = score
+            weights[row, col] = 1.0 if confidence is None else confidence
+    np.clip(scores, 0.0, 1.0, out=scores)
+    np.clip(weights, 0.0, 1.0, out=weights)
+    return scores, weights
+
+
+def ema_step(prev: np.ndarray, scores: np.ndarray, weights: np.ndarray, alpha: float) -> np.ndarray:
+    """Шаг экспоненциального сглаживания для матрицы (n, SKILL_DIM)"""
+    return prev + (alpha * weights) * (scores - prev)
+
+
+def replay(initial: np.ndarray, scores: np.ndarray, weights: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Последовательные шаги EMA: initial (n, D), scores/weights (n, m, D) → состояния после каждого шага (n, m, D).
+    Зачисления с меньшим числом заданий дополнены нулевыми весами — их состояние не меняется.
+    """
+    state = np.array(initial, dtype=np.float64)
+    history = np.empty_like(scores)
+    for step in range(scores.shape[1]):
+        state = ema_step(state, scores[:, step], weights[:, step], alpha)
+        history[:, step] = state
+    return history
+
+
+def replay_feedback(initial: np.ndarray, sequences: Sequence[Sequence[Mapping]], alpha: float) -> np.ndarray:
+    """Оценки навыков заданий по зачислениям (списки skill_evaluation) → история состояний (n, max m, D)"""
+    matrices = [feedback_matrix(sequence) for sequence in sequences]
+    scores = _pad([scores for scores, _ in matrices])
+    weights = _pad([weights for _, weights in matrices])
+    return replay(initial, scores, weights, alpha)
+
+
+def skill_deltas(pre: np.ndarray, post: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(post - pre, среднее изменение по навыкам) для матриц (n, SKILL_DIM)"""
+    delta = np.asarray(post, dtype=np.float64) - np.asarray(pre, dtype=np.float64)
+    return delta, delta.mean(axis=-1)
+
+
+def vector_to_dict(vector: np.ndarray) -> Dict[str, float]:
+    return {skill: round(float(value), 3) for skill, value in zip(SKILL_DIMENSIONS, vector)}
+
+
+def snapshot_vector(snapshot: SkillSnapshot) -> np.ndarray:
+    return np.array([getattr(snapshot, skill) for skill in SKILL_DIMENSIONS], dtype=np.float64)
+
+
+def _pad(sequences: Sequence[np.ndarray]) -> np.ndarray:
+    """Список матриц (m_i, D) → (n, max m_i, D) с нулями в хвостах"""
+    depth = max((len(sequence) for sequence in sequences), default=0)
+    padded = np.zeros((len(sequences), depth, SKILL_DIM))
+    for row, sequence in enumerate(sequences):
+        padded[row, :len(sequence)] = sequence
+    return padded
+
+
+def _epoch_seconds(moments: Iterable[datetime]) -> np.ndarray:
+    return np.array([int(moment.timestamp()) for moment in moments], dtype=np.int64)
+
+
+def _from_epoch(seconds: int) -> datetime:
+    return datetime.fromtimestamp(int(seconds), tz=dt_timezone.utc)
+
+
+# ==========================================================
+# Сервис
+# ==========================================================
+
+class SkillEngine:
+    """Состояние и история навыков зачислений"""
+
+    @classmethod
+    def apply_task_results(cls, assessments: Sequence[TaskAssessmentResult]) -> int:
+        """
+        Учитывает оценки заданий (любых зачислений) одним проходом.
+        Возвращает число учтённых оценок; уже учтённые пропускаются.
+        """
+        by_enrollment: Dict[int, List[TaskAssessmentResult]] = defaultdict(list)
+        for assessment in sorted(assessments, key=lambda item: item.pk):
+            by_enrollment[assessment.enrollment_id].append(assessment)
+        if not by_enrollment:
+            return 0
+
+        with transaction.atomic():
+            states = cls._lock_states(list(by_enrollment))
+
+            enrollment_ids, sequences = [], []
+            for enrollment_id, items in by_enrollment.items():
+                last_id = states[enrollment_id].last_assessment_id or 0
+                fresh = [item for item in items if item.pk > last_id]
+                if fresh:
+                    enrollment_ids.append(enrollment_id)
+                    sequences.append(fresh)
+            if not sequences:
+                return 0
+
+            initial = np.vstack([states[enrollment_id].values for enrollment_id in enrollment_ids])
+            history = replay_feedback(
+                initial,
+                [[(item.structured_feedback or {}).get("skill_evaluation") or {} for item in sequence]
+                 for sequence in sequences],
+                settings.SKILL_TASK_ALPHA,
+            )
+
+            now = timezone.now()
+            points = {}
+            for row, (enrollment_id, sequence) in enumerate(zip(enrollment_ids, sequences)):
+                state = states[enrollment_id]
+                state.vector = pack_vectors(history[row, len(sequence) - 1])
+                state.observations += len(sequence)
+                state.last_assessment_id = sequence[-1].pk
+                state.updated_at = now
+                points[enrollment_id] = (
+                    _epoch_seconds(item.evaluated_at or now for item in sequence),
+                    history[row, :len(sequence)],
+                )
+
+            SkillState.objects.bulk_update(
+                [states[enrollment_id] for enrollment_id in enrollment_ids],
+                ["vector", "observations", "last_assessment_id", "updated_at"],
+            )
+            cls._append_trajectory(points)
+
+        return sum(len(sequence) for sequence in sequences)
+
+    @classmethod
+    def state(cls, enrollment_id: int) -> SkillState:
+        state = SkillState.objects.filter(enrollment_id=enrollment_id).first()
+        if state is None:
+            with transaction.atomic():
+                state = cls._lock_states([enrollment_id])[enrollment_id]
+        return state
+
+    @classmethod
+    def snapshot(
+            cls,
+            enrollment: Enrollment,
+            lesson=None,
+            context: str = "POST_LESSON",
+            metadata: Optional[dict] = None,
+    ) -> SkillSnapshot:
+        """SkillSnapshot с текущими значениями навыков зачисления"""
+        values = cls.state(enrollment.pk).to_dict()
+        return SkillSnapshot.objects.create(
+            student_id=enrollment.student_id,
+            enrollment=enrollment,
+            associated_lesson=lesson,
+            snapshot_context=context,
+            skills=values,
+            metadata=metadata or {},
+            **values,
+        )
+
+    @classmethod
+    def history(cls, enrollment_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Вся история навыков зачисления: (секунды Unix, векторы) по возрастанию времени"""
+        chunks = SkillTrajectory.objects.filter(enrollment_id=enrollment_id).order_by("started_at", "pk")
+        arrays = [chunk.arrays() for chunk in chunks]
+        if not arrays:
+            return np.empty(0, dtype=np.int64), np.empty((0, SKILL_DIM))
+        times = np.concatenate([times for times, _ in arrays])
+        vectors = np.concatenate([vectors for _, vectors in arrays])
+        order = np.argsort(times, kind="stable")
+        return times[order], vectors[order]
+
+    # ------------------------------------------------------------------
+    # Пакетные операции
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def recompute(cls, enrollment_ids: Sequence[int]) -> int:
+        """
+        Пересчитывает SkillState и историю зачислений заново от базового снимка
+        (самого раннего SkillSnapshot, обычно PLACEMENT) по всем TaskAssessmentResult.
+        Возвращает число учтённых оценок.
+        """
+        enrollment_ids = list(dict.fromkeys(enrollment_ids))
+        if not enrollment_ids:
+            return 0
+
+        baseline = cls.baseline_vectors(enrollment_ids, earliest=True)
+        rows: Dict[int, List[Tuple[int, datetime, dict]]] = defaultdict(list)
+        for enrollment_id, pk, evaluated_at, feedback in (
+                TaskAssessmentResult.objects
+                .filter(enrollment_id__in=enrollment_ids)
+                .order_by("enrollment_id", "pk")
+                .values_list("enrollment_id", "pk", "evaluated_at", "structured_feedback")
+                .iterator(chunk_size=2000)
+        ):
+            rows[enrollment_id].append((pk, evaluated_at, (feedback or {}).get("skill_evaluation") or {}))
+
+        initial = np.vstack([baseline[enrollment_id] for enrollment_id in enrollment_ids])
+        history = replay_feedback(
+            initial,
+            [[feedback for _, _, feedback in rows[enrollment_id]] for enrollment_id in enrollment_ids],
+            settings.SKILL_TASK_ALPHA,
+        )
+
+        now = timezone.now()
+        states, points = [], {}
+        for row, enrollment_id in enumerate(enrollment_ids):
+            sequence = rows[enrollment_id]
+            final = history[row, len(sequence) - 1] if sequence else initial[row]
+            states.append(SkillState(
+                enrollment_id=enrollment_id,
+                vector=pack_vectors(final),
+                observations=len(sequence),
+                last_assessment_id=sequence[-1][0] if sequence else None,
+                updated_at=now,
+            ))
+            if sequence:
+                points[enrollment_id] = (
+                    _epoch_seconds(evaluated_at or now for _, evaluated_at, _ in sequence),
+                    history[row, :len(sequence)],
+                )
+
+        with transaction.atomic():
+            list(SkillState.objects.select_for_update().filter(enrollment_id__in=enrollment_ids).values_list("pk"))
+            SkillState.objects.bulk_create(
+                states,
+                update_conflicts=True,
+                unique_fields=["enrollment"],
+                update_fields=["vector", "observations", "last_assessment_id", "updated_at"],
+            )
+            SkillTrajectory.objects.filter(enrollment_id__in=enrollment_ids).delete()
+            SkillTrajectory.objects.bulk_create([
+                chunk
+                for enrollment_id, (times, vectors) in points.items()
+                for chunk in cls.build_chunks(enrollment_id, times, vectors, TrajectoryResolution.RAW)
+            ])
+
+        return sum(len(sequence) for sequence in rows.values())
+
+    @classmethod
+    def compact(cls, older_than: Optional[timedelta] = None, batch_size: int = 200) -> Tuple[int, int]:
+        """
+        Сжимает RAW-блоки, закончившиеся раньше older_than назад, в DAILY-блоки
+        (последнее значение за сутки UTC). Возвращает (точек было, точек стало).
+        """
+        older_than = older_than or timedelta(days=settings.SKILL_TRAJECTORY_COMPACT_AFTER_DAYS)
+        cutoff = timezone.now() - older_than
+        before = after = 0
+
+        enrollment_ids = list(
+            SkillTrajectory.objects
+            .filter(resolution=TrajectoryResolution.RAW, ended_at__lt=cutoff)
+            .order_by("enrollment_id")
+            .values_list("enrollment_id", flat=True)
+            .distinct()
+        )
+        for start in range(0, len(enrollment_ids), batch_size):
+            batch = enrollment_ids[start:start + batch_size]
+            with transaction.atomic():
+                # Блокировка состояний останавливает дозапись в блоки этих зачислений
+                list(SkillState.objects.select_for_update().filter(enrollment_id__in=batch).values_list("pk"))
+                chunks: Dict[int, List[SkillTrajectory]] = defaultdict(list)
+                for chunk in (
+                        SkillTrajectory.objects
+                        .filter(enrollment_id__in=batch, resolution=TrajectoryResolution.RAW, ended_at__lt=cutoff)
+                        .order_by("enrollment_id", "started_at", "pk")
+                ):
+                    chunks[chunk.enrollment_id].append(chunk)
+
+                compacted = []
+                for enrollment_id, raw_chunks in chunks.items():
+                    times = np.concatenate([chunk.arrays()[0] for chunk in raw_chunks])
+                    vectors = np.concatenate([chunk.arrays()[1] for chunk in raw_chunks])
+                    order = np.argsort(times, kind="stable")
+                    times, vectors = times[order], vectors[order]
+
+                    days = times // SECONDS_PER_DAY
+                    last_of_day = np.flatnonzero(np.append(days[1:] != days[:-1], True))
+                    before += len(times)
+                    after += len(last_of_day)
+                    compacted.extend(cls.build_chunks(
+                        enrollment_id, times[last_of_day], vectors[last_of_day], TrajectoryResolution.DAILY
+                    ))
+
+                SkillTrajectory.objects.filter(
+                    pk__in=[chunk.pk for raw_chunks in chunks.values() for chunk in raw_chunks]
+                ).delete()
+                SkillTrajectory.objects.bulk_create(compacted)
+
+        if before:
+            logger.info(f"История навыков сжата: {before} → {after} точек, зачислений: {len(enrollment_ids)}")
+        return before, after
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _lock_states(cls, enrollment_ids: Sequence[int]) -> Dict[int, SkillState]:
+        """SkillState зачислений под блокировкой; отсутствующие создаются из последнего снимка"""
+        states = {
+            state.enrollment_id: state
+            for state in SkillState.objects.select_for_update().filter(enrollment_id__in=enrollment_ids)
+        }
+        missing = [enrollment_id for enrollment_id in enrollment_ids if enrollment_id not in states]
+        if missing:
+            baseline = cls.baseline_vectors(missing)
+            SkillState.objects.bulk_create(
+                [SkillState(enrollment_id=enrollment_id, vector=pack_vectors(baseline[enrollment_id]))
+                 for enrollment_id in missing],
+                ignore_conflicts=True,
+            )
+            states.update({
+                state.enrollment_id: state
+                for state in SkillState.objects.select_for_update().filter(enrollment_id__in=missing)
+            })
+        return states
+
+    @staticmethod
+    def baseline_vectors(enrollment_ids: Sequence[int], earliest: bool = False) -> Dict[int, np.ndarray]:
+        """Вектор последнего (earliest — первого) SkillSnapshot зачисления, иначе DEFAULT_SKILL_VALUE"""
+        baseline = {enrollment_id: np.full(SKILL_DIM, DEFAULT_SKILL_VALUE) for enrollment_id in enrollment_ids}
+        snapshots = (
+            SkillSnapshot.objects
+            .filter(enrollment_id__in=enrollment_ids)
+            .order_by("enrollment_id", "snapshot_at" if earliest else "-snapshot_at")
+            .distinct("enrollment_id")
+            .values_list("enrollment_id", *SKILL_DIMENSIONS)
+        )
+        for enrollment_id, *values in snapshots:
+            baseline[enrollment_id] = np.array(values, dtype=np.float64)
+        return baseline
+
+    @classmethod
+    def _append_trajectory(cls, points: Mapping[int, Tuple[np.ndarray, np.ndarray]]) -> None:
+        """Дописывает точки в открытые RAW-блоки (вызывать под блокировкой SkillState)"""
+        capacity = settings.SKILL_TRAJECTORY_CHUNK_POINTS
+        open_chunks = {
+            chunk.enrollment_id: chunk
+            for chunk in (
+                SkillTrajectory.objects
+                .filter(enrollment_id__in=list(points), resolution=TrajectoryResolution.RAW)
+                .order_by("enrollment_id", "-started_at")
+                .distinct("enrollment_id")
+            )
+        }
+
+        to_update, to_create = [], []
+        for enrollment_id, (times, vectors) in points.items():
+            chunk = open_chunks.get(enrollment_id)
+            if chunk is not None and chunk.points < capacity:
+                free = capacity - chunk.points
+                old_times, old_vectors = chunk.arrays()
+                cls._fill(chunk, np.concatenate([old_times, times[:free]]), np.concatenate([old_vectors, vectors[:free]]))
+                to_update.append(chunk)
+                times, vectors = times[free:], vectors[free:]
+            to_create.extend(cls.build_chunks(enrollment_id, times, vectors, TrajectoryResolution.RAW))
+
+        if to_update:
+            SkillTrajectory.objects.bulk_update(to_update, ["timestamps", "vectors", "points", "started_at", "ended_at"])
+        SkillTrajectory.objects.bulk_create(to_create)
+
+    @classmethod
+    def build_chunks(cls, enrollment_id: int, times: np.ndarray, vectors: np.ndarray, resolution: str) -> List[SkillTrajectory]:
+        """Несохранённые блоки истории по SKILL_TRAJECTORY_CHUNK_POINTS точек"""
+        capacity = settings.SKILL_TRAJECTORY_CHUNK_POINTS
+        chunks = []
+        for start in range(0, len(times), capacity):
+            chunk = SkillTrajectory(enrollment_id=enrollment_id, resolution=resolution)
+            cls._fill(chunk, times[start:start + capacity], vectors[start:start + capacity])
+            chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _fill(chunk: SkillTrajectory, times: np.ndarray, vectors: np.ndarray) -> None:
+        chunk.timestamps = pack_times(times)
+        chunk.vectors = pack_vectors(vectors)
+        chunk.points = len(times)
+        chunk.started_at = _from_epoch(times.min())
+        chunk.ended_at = _from_epoch(times.max())
@@ -0,0 +1,469 @@
+"""
+Офлайн-пересчёт навыков когорты — после смены SKILL_TASK_ALPHA или правил учёта
+оценок навыков (feedback_matrix), без повторного прогона уроков через assess_lesson_tasks.
+
+Пересчёт идёт в три этапа:
+1. run — зачисления делятся на шарды, шарды считаются в процессах-воркерах
+   (ProcessPoolExecutor, fork). Воркер читает TaskAssessmentResult и события
+   ASSESSMENT_COMPLETE из LessonEventLog порциями по ключу (pk > последнего
+   прочитанного), проигрывает EMA векторно (skill_engine.replay_feedback) и пишет
+   результат через COPY в UNLOGGED-таблицы подготовки: состояния, блоки истории,
+   снимки уроков. Там же воркер сравнивает результат с текущими SkillState и SkillSnapshot.
+2. ReplayReport — сколько состояний и снимков изменится, среднее и максимальное |Δ|
+   по навыкам; рабочие таблицы к этому моменту не тронуты.
+3. commit — одной транзакцией переносит подготовленные данные в рабочие таблицы,
+   discard — удаляет таблицы подготовки.
+
+Снимок POST_LESSON урока — состояние на момент последнего события ASSESSMENT_COMPLETE
+урока (снимок делается сразу после него); если события нет — после последней оценки
+задания урока. Зачисления, получившие новые оценки за время пересчёта, при commit
+пропускаются: их состояние уже новее подготовленного — такие зачисления нужно
+пересчитать повторно.
+"""
+import logging
+import math
+import multiprocessing
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from curriculum.models.assessment.task_assessment import TaskAssessmentResult
+from curriculum.models.learning_process.lesson_event_log import LessonEventLog, LessonEventType
+from curriculum.models.student.enrollment import Enrollment
+from curriculum.models.student.skill_snapshot import SkillSnapshot
+from curriculum.models.student.skill_state import (
+    SKILL_DIM,
+    SKILL_DIMENSIONS,
+    SkillState,
+    SkillTrajectory,
+    TrajectoryResolution,
+    pack_vectors,
+    unpack_vectors,
+)
+from curriculum.services.skill_engine import SkillEngine, replay_feedback
+from engageai_core.pg_copy import copy_rows
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CONTEXT = "POST_LESSON"
+# Значения снимков округляются до 0.001 — меньшие расхождения изменением не считаются
+CHANGE_TOLERANCE = 5e-4
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def keyset_chunks(queryset, fields: Sequence[str], chunk_size: int) -> Iterator[List[tuple]]:
+    """
+    Строки values_list("pk", *fields) порциями по возрастанию pk.
+    Каждая порция — WHERE pk > последнего ORDER BY pk LIMIT chunk_size:
+    в отличие от OFFSET стоимость порции не растёт к концу выборки.
+    """
+    last_pk = None
+    while True:
+        page = queryset.order_by("pk")
+        if last_pk is not None:
+            page = page.filter(pk__gt=last_pk)
+        rows = list(page.values_list("pk", *fields)[:chunk_size])
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def _micros(moment: datetime) -> int:
+    return (moment - _EPOCH) // _MICROSECOND
+
+
+# ==========================================================
+# Таблицы подготовки
+# ==========================================================
+
+@dataclass(frozen=True)
+class ReplayTables:
+    """UNLOGGED-таблицы одного пересчёта: не пишутся в WAL и удаляются после commit/discard"""
+
+    run_id: str
+
+    STATE_COLUMNS = ("enrollment_id", "vector", "observations", "last_assessment_id", "updated_at")
+    TRAJECTORY_COLUMNS = ("enrollment_id", "resolution", "started_at", "ended_at", "points", "timestamps", "vectors")
+    SNAPSHOT_COLUMNS = ("enrollment_id", "student_id", "lesson_id", "snapshot_at", *SKILL_DIMENSIONS)
+
+    @property
+    def state(self) -> str:
+        return f"skill_replay_{self.run_id}_state"
+
+    @property
+    def trajectory(self) -> str:
+        return f"skill_replay_{self.run_id}_trajectory"
+
+    @property
+    def snapshots(self) -> str:
+        return f"skill_replay_{self.run_id}_snapshots"
+
+    def create(self) -> None:
+        quote = connection.ops.quote_name
+        skills = ", ".join(f"{skill} double precision NOT NULL" for skill in SKILL_DIMENSIONS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {quote(self.state)} ("
+                f"enrollment_id bigint PRIMARY KEY, vector bytea NOT NULL, observations integer NOT NULL, "
+                f"last_assessment_id bigint, updated_at timestamptz NOT NULL, "
+                f"applied boolean NOT NULL DEFAULT false)"
+            )
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {quote(self.trajectory)} ("
+                f"enrollment_id bigint NOT NULL, resolution varchar(10) NOT NULL, "
+                f"started_at timestamptz NOT NULL, ended_at timestamptz NOT NULL, points integer NOT NULL, "
+                f"timestamps bytea NOT NULL, vectors bytea NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE {quote(self.snapshots)} ("
+                f"enrollment_id bigint NOT NULL, student_id bigint NOT NULL, lesson_id bigint NOT NULL, "
+                f"snapshot_at timestamptz NOT NULL, {skills}, PRIMARY KEY (enrollment_id, lesson_id))"
+            )
+
+    def drop(self) -> None:
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for table in (self.state, self.trajectory, self.snapshots):
+                cursor.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+
+
+# ==========================================================
+# Отчёт
+# ==========================================================
+
+@dataclass
+class ReplayReport:
+    """Расхождения пересчитанных навыков с текущими; складывается по шардам"""
+
+    enrollments: int = 0
+    assessments: int = 0
+    events: int = 0
+    states_changed: int = 0
+    snapshots_compared: int = 0
+    snapshots_changed: int = 0
+    snapshots_new: int = 0
+    # Сумма (новое - текущее) итоговых состояний — средний сдвиг навыка по когорте
+    state_shift: np.ndarray = field(default_factory=lambda: np.zeros(SKILL_DIM))
+    # Сумма и максимум |новое - текущее| по сравнённым снимкам уроков
+    snapshot_abs_sum: np.ndarray = field(default_factory=lambda: np.zeros(SKILL_DIM))
+    snapshot_abs_max: np.ndarray = field(default_factory=lambda: np.zeros(SKILL_DIM))
+
+    def merge(self, other: "ReplayReport") -> "ReplayReport":
+        for name in (
+                "enrollments", "assessments", "events", "states_changed",
+                "snapshots_compared", "snapshots_changed", "snapshots_new",
+        ):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.state_shift = self.state_shift + other.state_shift
+        self.snapshot_abs_sum = self.snapshot_abs_sum + other.snapshot_abs_sum
+        self.snapshot_abs_max = np.maximum(self.snapshot_abs_max, other.snapshot_abs_max)
+        return self
+
+    def skill_rows(self) -> List[Tuple[str, float, float, float]]:
+        """(навык, среднее |Δ| снимков, максимум |Δ| снимков, средний сдвиг итогового состояния)"""
+        compared = max(self.snapshots_compared, 1)
+        enrollments = max(self.enrollments, 1)
+        return [
+            (
+                skill,
+                float(self.snapshot_abs_sum[col] / compared),
+                float(self.snapshot_abs_max[col]),
+                float(self.state_shift[col] / enrollments),
+            )
+            for col, skill in enumerate(SKILL_DIMENSIONS)
+        ]
+
+
+# ==========================================================
+# Воркер
+# ==========================================================
+
+@dataclass(frozen=True)
+class ShardJob:
+    tables: ReplayTables
+    enrollment_ids: Tuple[int, ...]
+    alpha: float
+    batch_size: int
+    chunk_size: int
+
+
+def run_shard(job: ShardJob) -> ReplayReport:
+    """Точка входа процесса-воркера: пересчёт шарда пачками по batch_size зачислений"""
+    report = ReplayReport()
+    try:
+        for start in range(0, len(job.enrollment_ids), job.batch_size):
+            report.merge(_replay_batch(job, list(job.enrollment_ids[start:start + job.batch_size])))
+    finally:
+        connections.close_all()
+    return report
+
+
+def _replay_batch(job: ShardJob, batch: List[int]) -> ReplayReport:
+    report = ReplayReport(enrollments=len(batch))
+
+    results: Dict[int, List[tuple]] = defaultdict(list)
+    for rows in keyset_chunks(
+            TaskAssessmentResult.objects.filter(enrollment_id__in=batch),
+            ("enrollment_id", "evaluated_at", "task__lesson_id", "structured_feedback"),
+            job.chunk_size,
+    ):
+        for pk, enrollment_id, evaluated_at, lesson_id, feedback in rows:
+            results[enrollment_id].append((pk, evaluated_at, lesson_id, (feedback or {}).get("skill_evaluation") or {}))
+        report.assessments += len(rows)
+
+    # Момент снимка урока: последнее ASSESSMENT_COMPLETE (у урока их два — SYSTEM и WEB)
+    snapshot_points: Dict[int, Dict[int, datetime]] = defaultdict(dict)
+    for rows in keyset_chunks(
+            LessonEventLog.objects.filter(
+                enrollment_id__in=batch,
+                event_type=LessonEventType.ASSESSMENT_COMPLETE,
+                lesson__isnull=False,
+            ),
+            ("enrollment_id", "lesson_id", "timestamp"),
+            job.chunk_size,
+    ):
+        for _, enrollment_id, lesson_id, moment in rows:
+            points = snapshot_points[enrollment_id]
+            points[lesson_id] = max(moment, points.get(lesson_id, moment))
+        report.events += len(rows)
+
+    existing = {
+        (enrollment_id, lesson_id): np.array(values, dtype=np.float64)
+        for enrollment_id, lesson_id, *values in (
+            SkillSnapshot.objects
+            .filter(enrollment_id__in=batch, snapshot_context=SNAPSHOT_CONTEXT, associated_lesson__isnull=False)
+            .values_list("enrollment_id", "associated_lesson_id", *SKILL_DIMENSIONS)
+        )
+    }
+    current = {
+        enrollment_id: unpack_vectors(vector)[0]
+        for enrollment_id, vector in (
+            SkillState.objects.filter(enrollment_id__in=batch).values_list("enrollment_id", "vector")
+        )
+    }
+    students = dict(Enrollment.objects.filter(pk__in=batch).values_list("pk", "student_id"))
+
+    # Снимки без события завершения оценки — после последней оценки задания урока
+    for (enrollment_id, lesson_id) in existing:
+        if lesson_id in snapshot_points[enrollment_id]:
+            continue
+        moments = [
+            evaluated_at for _, evaluated_at, result_lesson_id, _ in results[enrollment_id]
+            if result_lesson_id == lesson_id and evaluated_at is not None
+        ]
+        if moments:
+            snapshot_points[enrollment_id][lesson_id] = max(moments)
+
+    baseline = SkillEngine.baseline_vectors(batch, earliest=True)
+    initial = np.vstack([baseline[enrollment_id] for enrollment_id in batch])
+    history = replay_feedback(
+        initial,
+        [[feedback for *_, feedback in results[enrollment_id]] for enrollment_id in batch],
+        job.alpha,
+    )
+
+    now = timezone.now()
+    state_rows, trajectory_rows, snapshot_rows = [], [], []
+    for row, enrollment_id in enumerate(batch):
+        sequence = results[enrollment_id]
+        vectors = history[row, :len(sequence)]
+        final = vectors[-1] if sequence else initial[row]
+
+        state_rows.append((
+            enrollment_id, pack_vectors(final), len(sequence), sequence[-1][0] if sequence else None, now,
+        ))
+        old = current.get(enrollment_id)
+        if old is None or np.abs(final - old).max() > CHANGE_TOLERANCE:
+            report.states_changed += 1
+        if old is not None:
+            report.state_shift += final - old
+
+        moments = np.array([_micros(evaluated_at or now) for _, evaluated_at, _, _ in sequence], dtype=np.int64)
+        if sequence:
+            for chunk in SkillEngine.build_chunks(enrollment_id, moments // 1_000_000, vectors, TrajectoryResolution.RAW):
+                trajectory_rows.append(tuple(getattr(chunk, column) for column in ReplayTables.TRAJECTORY_COLUMNS))
+
+        points = snapshot_points.get(enrollment_id)
+        if not points:
+            continue
+        lesson_ids = list(points)
+        values = np.tile(initial[row], (len(lesson_ids), 1))
+        if sequence:
+            # Оценки идут по pk; время по pk может не возрастать — ищем по накопленному максимуму
+            steps = np.searchsorted(
+                np.maximum.accumulate(moments),
+                np.array([_micros(points[lesson_id]) for lesson_id in lesson_ids], dtype=np.int64),
+                side="right",
+            ) - 1
+            reached = steps >= 0
+            values[reached] = vectors[steps[reached]]
+        values = np.round(values, 3)
+
+        for lesson_id, vector in zip(lesson_ids, values):
+            snapshot_rows.append((enrollment_id, students[enrollment_id], lesson_id, points[lesson_id], *vector.tolist()))
+            old = existing.get((enrollment_id, lesson_id))
+            if old is None:
+                report.snapshots_new += 1
+                continue
+            delta = np.abs(vector - old)
+            report.snapshots_compared += 1
+            report.snapshots_changed += int(delta.max() > CHANGE_TOLERANCE)
+            report.snapshot_abs_sum += delta
+            report.snapshot_abs_max = np.maximum(report.snapshot_abs_max, delta)
+
+    copy_rows(job.tables.state, ReplayTables.STATE_COLUMNS, state_rows)
+    copy_rows(job.tables.trajectory, ReplayTables.TRAJECTORY_COLUMNS, trajectory_rows)
+    copy_rows(job.tables.snapshots, ReplayTables.SNAPSHOT_COLUMNS, snapshot_rows)
+    return report
+
+
+# ==========================================================
+# Пересчёт
+# ==========================================================
+
+class SkillReplay:
+    """
+    Пересчёт навыков набора зачислений: run() → ReplayReport → commit() или discard().
+
+        replay = SkillReplay(enrollment_ids, alpha=0.25)
+        report = replay.run()
+        replay.commit() if report.states_changed else replay.discard()
+    """
+
+    # Шардов на воркер: мелкие шарды выравнивают нагрузку, если у зачислений разное число оценок
+    SHARDS_PER_WORKER = 4
+
+    def __init__(
+            self,
+            enrollment_ids: Sequence[int],
+            alpha: Optional[float] = None,
+            workers: Optional[int] = None,
+            batch_size: int = 200,
+            chunk_size: int = 5000,
+    ):
+        self.enrollment_ids = sorted(set(enrollment_ids))
+        self.alpha = settings.SKILL_TASK_ALPHA if alpha is None else alpha
+        self.workers = max(1, workers or settings.SKILL_REPLAY_WORKERS)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.tables = ReplayTables(uuid.uuid4().hex[:12])
+        self.report: Optional[ReplayReport] = None
+
+    def run(self) -> ReplayReport:
+        """Считает навыки в таблицы подготовки; рабочие таблицы не меняются"""
+        self.tables.create()
+        try:
+            jobs = [
+                ShardJob(self.tables, tuple(shard), self.alpha, self.batch_size, self.chunk_size)
+                for shard in self._shards()
+            ]
+            report = ReplayReport()
+            if self.workers == 1 or len(jobs) <= 1:
+                for job in jobs:
+                    report.merge(run_shard(job))
+            else:
+                # Открытые соединения нельзя наследовать через fork: воркеры открывают свои
+                connections.close_all()
+                with ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("fork"),
+                ) as pool:
+                    for shard_report in pool.map(run_shard, jobs):
+                        report.merge(shard_report)
+        except BaseException:
+            self.discard()
+            raise
+
+        self.report = report
+        logger.info(
+            f"Пересчёт навыков {self.tables.run_id}: зачислений {report.enrollments}, "
+            f"оценок {report.assessments}, изменится состояний {report.states_changed}, "
+            f"снимков {report.snapshots_changed} (+{report.snapshots_new} новых)"
+        )
+        return report
+
+    def commit(self) -> Tuple[int, int]:
+        """
+        Переносит результат в SkillState, SkillTrajectory и SkillSnapshot одной транзакцией.
+        Возвращает (применено зачислений, пропущено из-за новых оценок).
+        """
+        if self.report is None:
+            raise RuntimeError("Пересчёт не выполнен: сначала вызовите run()")
+
+        quote = connection.ops.quote_name
+        state, trajectory, snapshots = (
+            quote(self.tables.state), quote(self.tables.trajectory), quote(self.tables.snapshots)
+        )
+        state_table = quote(SkillState._meta.db_table)
+        trajectory_table = quote(SkillTrajectory._meta.db_table)
+        snapshot_table = quote(SkillSnapshot._meta.db_table)
+        state_columns = ", ".join(ReplayTables.STATE_COLUMNS)
+        trajectory_columns = ", ".join(ReplayTables.TRAJECTORY_COLUMNS)
+        skill_columns = ", ".join(SKILL_DIMENSIONS)
+        skills_json = ", ".join(f"'{skill}', n.{skill}" for skill in SKILL_DIMENSIONS)
+        skill_updates = ", ".join(f"{skill} = EXCLUDED.{skill}" for skill in SKILL_DIMENSIONS)
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Состояние зачисления, получившего новые оценки во время пересчёта, не перезаписываем
+                cursor.execute(
+                    f"WITH applied AS ("
+                    f"  INSERT INTO {state_table} ({state_columns})"
+                    f"  SELECT {state_columns} FROM {state}"
+                    f"  ON CONFLICT (enrollment_id) DO UPDATE SET"
+                    f"    vector = EXCLUDED.vector, observations = EXCLUDED.observations,"
+                    f"    last_assessment_id = EXCLUDED.last_assessment_id, updated_at = EXCLUDED.updated_at"
+                    f"  WHERE COALESCE({state_table}.last_assessment_id, 0) <= COALESCE(EXCLUDED.last_assessment_id, 0)"
+                    f"  RETURNING enrollment_id"
+                    f") "
+                    f"UPDATE {state} s SET applied = TRUE FROM applied a WHERE s.enrollment_id = a.enrollment_id"
+                )
+                applied = cursor.rowcount
+
+                cursor.execute(
+                    f"DELETE FROM {trajectory_table} t USING {state} s "
+                    f"WHERE s.applied AND t.enrollment_id = s.enrollment_id"
+                )
+                cursor.execute(
+                    f"INSERT INTO {trajectory_table} ({trajectory_columns}) "
+                    f"SELECT {', '.join(f'r.{column}' for column in ReplayTables.TRAJECTORY_COLUMNS)} "
+                    f"FROM {trajectory} r JOIN {state} s ON s.enrollment_id = r.enrollment_id AND s.applied"
+                )
+                cursor.execute(
+                    f"INSERT INTO {snapshot_table} (student_id, enrollment_id, associated_lesson_id, snapshot_context,"
+                    f"  {skill_columns}, skills, snapshot_at, metadata) "
+                    f"SELECT n.student_id, n.enrollment_id, n.lesson_id, %s,"
+                    f"  {', '.join(f'n.{skill}' for skill in SKILL_DIMENSIONS)}, jsonb_build_object({skills_json}),"
+                    f"  n.snapshot_at, jsonb_build_object('source', 'replay', 'replay_run', %s::text) "
+                    f"FROM {snapshots} n JOIN {state} s ON s.enrollment_id = n.enrollment_id AND s.applied "
+                    f"ON CONFLICT (enrollment_id, associated_lesson_id) DO UPDATE SET"
+                    f"  {skill_updates}, skills = EXCLUDED.skills,"
+                    f"  metadata = {snapshot_table}.metadata || jsonb_build_object('replay_run', %s::text)",
+                    [SNAPSHOT_CONTEXT, self.tables.run_id, self.tables.run_id],
+                )
+        finally:
+            self.discard()
+
+        skipped = len(self.enrollment_ids) - applied
+        logger.info(f"Пересчёт навыков {self.tables.run_id} применён: {applied} зачислений, пропущено {skipped}")
+        return applied, skipped
+
+    def discard(self) -> None:
+        self.tables.drop()
+
+    def _shards(self) -> List[List[int]]:
+        count = self.workers * self.SHARDS_PER_WORKER
+        size = max(1, math.ceil(len(self.enrollment_ids) / count))
+        return [self.enrollment_ids[start:start + size] for start in range(0, len(self.enrollment_ids), size)]
@@ -1,6 +1,15 @@
+import numpy as np
 from django.utils import timezone
 from curriculum.models.student.skill_snapshot import SkillSnapshot
 from curriculum.models.student.skill_delta import SkillDelta
+from curriculum.services.skill_engine import (
+    SKILL_DIMENSIONS,
+    ema_step,
+    feedback_matrix,
+    skill_deltas,
+    snapshot_vector,
+    vector_to_dict,
+)
 
 
 class SkillUpdateService:
@@ -41,16 +50,9 @@ class SkillUpdateService:
             return None
 
         # 3. Расчёт delta
-        deltas = {}
-        all_skills = set(pre_snapshot.skills.keys()) | set(post_snapshot.skills.keys())
-
-        for skill in all_skills:
-            pre_val = pre_snapshot.skills.get(skill, 0.0)
-            post_val = post_snapshot.skills.get(skill, 0.0)
-            deltas[skill] = round(post_val - pre_val, 3)
-
-        if deltas:
-            deltas['overall'] = round(sum(deltas.values()) / len(deltas), 3)
+        delta, overall = skill_deltas(snapshot_vector(pre_snapshot), snapshot_vector(post_snapshot))
+        deltas = vector_to_dict(delta)
+        deltas['overall'] = round(float(overall), 3)
 
         # 4. Сохранение delta
         delta_obj, created = SkillDelta.objects.update_or_create(
@@ -110,23 +112,11 @@ class SkillUpdateService:
                 for skill, data in lesson_feedback.items()
             }
 
-        deltas = {}
-        alpha = cls.SMOOTHING_ALPHA
-
-        for skill_name in ["grammar", "vocabulary", "listening", "reading", "writing", "speaking"]:
-            lesson_score_data = lesson_feedback.get(skill_name)
-
-            if lesson_score_data is None:
-                # Навык не оценивался — оставляем предыдущее значение
-                prev_value = getattr(pre_snapshot, skill_name, 0.0)
-                deltas[skill_name] = prev_value
-                continue
-
-            lesson_score = lesson_score_data["score"]
-            prev_value = getattr(pre_snapshot, skill_name, 0.0)
-
-            # Экспоненциальное сглаживание
-            new_value = (alpha * lesson_score) + ((1 - alpha) * prev_value)
-            deltas[skill_name] = round(new_value, 3)
-
-        return deltas
+        # Вес 1 — навык оценивался в уроке (confidence здесь не учитывается), 0 — остаётся прежнее значение
+        scores, _ = feedback_matrix([lesson_feedback])
+        evaluated = np.array([
+            isinstance(lesson_feedback.get(skill), dict) and lesson_feedback[skill].get("score") is not None
+            for skill in SKILL_DIMENSIONS
+        ], dtype=np.float64)
+        new_values = ema_step(snapshot_vector(pre_snapshot), scores[0], evaluated, cls.SMOOTHING_ALPHA)
+        return vector_to_dict(new_values)
@@ -0,0 +1,162 @@
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+
+from curriculum.models.assessment.assessment_result import AssessmentResult
+from curriculum.models.assessment.task_assessment import TaskAssessmentResult
+from curriculum.models.content.lesson import Lesson
+from curriculum.models.learning_process.lesson_event_log import LessonEventLog, LessonEventType
+from curriculum.models.student.enrollment import Enrollment
+from curriculum.models.student.student_response import StudentTaskResponse
+from curriculum.services.auto_assessment_adapter import AutoAssessorAdapter
+from curriculum.services.frustration_signal_store import FrustrationSignalStore
+from curriculum.services.lesson_event_buffer import LessonEventBuffer
+from curriculum.services.llm_assessment_adapter import LLMAssessmentAdapter
+from curriculum.services.skill_engine import SkillEngine
+from curriculum.services.transcription_service import ResponseTranscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class LessonTaskAssessmentEngine:
+    """
+    Оценка всех заданий урока за один проход.
+
+    0. Голосовые ответы без транскрипта распознаются одним пакетом (ResponseTranscriptionService).
+    1. Детерминированно проверяемые задания (AutoAssessorAdapter.can_assess)
+       оцениваются сразу в процессе; неуверенные оценки грейдеров уходят в LLM.
+    2. Остальные задания уходят в LLM конкурентно (LLMAssessmentAdapter.assess_many),
+       параллелизм ограничен лимитером провайдера — время оценки урока определяется
+       самым долгим запросом, а не суммой запросов.
+    3. TaskAssessmentResult сохраняются bulk_create в одной транзакции; там же SkillEngine
+       обновляет навыки по каждому заданию, а события TASK_ASSESSMENT_COMPLETE после коммита
+       уходят в очередь LessonEventBuffer.
+    """
+
+    def __init__(
+            self,
+            auto_adapter: Optional[AutoAssessorAdapter] = None,
+            llm_adapter: Optional[LLMAssessmentAdapter] = None,
+    ):
+        self.auto_adapter = auto_adapter or AutoAssessorAdapter()
+        self.llm_adapter = llm_adapter or LLMAssessmentAdapter()
+
+    def assess(
+            self,
+            enrollment: Enrollment,
+            lesson: Lesson,
+            responses: Iterable[StudentTaskResponse],
+            event_metadata: Optional[Dict] = None,
+            channel: str = "WEB",
+            on_progress: Optional[Callable[[int, int], None]] = None,
+            on_partial_transcript: Optional[Callable[[StudentTaskResponse, str], None]] = None,
+    ) -> List[TaskAssessmentResult]:
+        """
+        Оценивает ещё не оценённые ответы и возвращает созданные TaskAssessmentResult.
+
+        Args:
+            event_metadata: общие поля metadata событий (node_id, path_type, reason, type);
+                task_id и task_assessment_id добавляются для каждого задания
+            on_progress: callback(оценено, всего) — вызывается после авто- и после LLM-этапа
+            on_partial_transcript: callback(ответ, текст) — частичный транскрипт длинного
+                голосового ответа по мере распознавания сегментов
+        """
+        responses = list(responses)
+        total = len(responses)
+        # Один ответ — одна оценка: уже оценённые ответы пропускаются
+        pending = [resp for resp in responses if not hasattr(resp, "assessment")]
+        done = total - len(pending)
+
+        ResponseTranscriptionService.transcribe_responses(pending, on_partial=on_partial_transcript)
+
+        auto_items = [resp for resp in pending if AutoAssessorAdapter.can_assess(resp.task)]
+        llm_items = [resp for resp in pending if not AutoAssessorAdapter.can_assess(resp.task)]
+
+        graded: List[Tuple[StudentTaskResponse, AssessmentResult]] = []
+
+        for resp in auto_items:
+            result = self.auto_adapter.assess_task(resp.task, resp)
+            if self.auto_adapter.needs_escalation(result):
+                # Грейдер не уверен — оценивает LLM
+                llm_items.append(resp)
+                continue
+            graded.append((resp, result))
+            done += 1
+        if on_progress and auto_items:
+            on_progress(done, total)
+
+        if llm_items:
+            llm_results = self.llm_adapter.assess_many([(resp.task, resp) for resp in llm_items])
+            graded.extend(zip(llm_items, llm_results))
+            done += len(llm_items)
+            if on_progress:
+                on_progress(done, total)
+
+        if not graded:
+            return []
+
+        task_assessments = self._persist(enrollment, lesson, graded, event_metadata or {}, channel)
+
+        # Redis-сигналы — вне транзакции: их ошибки не должны откатывать оценки
+        for task_assessment in task_assessments:
+            FrustrationSignalStore.record_task_result(
+                student_id=enrollment.student_id,
+                is_correct=task_assessment.is_correct,
+                score=task_assessment.score,
+            )
+
+        logger.info(
+            f"Enrollment {enrollment.pk}, урок {lesson.pk}: оценено {len(task_assessments)} заданий "
+            f"(auto={len(graded) - len(llm_items)}, llm={len(llm_items)})"
+        )
+        return task_assessments
+
+    @staticmethod
+    def _persist(
+            enrollment: Enrollment,
+            lesson: Lesson,
+            graded: List[Tuple[StudentTaskResponse, AssessmentResult]],
+            event_metadata: Dict,
+            channel: str,
+    ) -> List[TaskAssessmentResult]:
+        """Сохраняет результаты одной транзакцией (PostgreSQL возвращает PK из bulk_create); события — после коммита"""
+        task_assessments = [
+            TaskAssessmentResult(
+                enrollment=enrollment,
+                task=resp.task,
+                response=resp,
+                is_correct=result.is_correct,
+                score=TaskAssessmentResult.calc_task_score(result=result),
+                feedback=result.summary.get("text", ""),
+                structured_feedback={
+                    "skill_evaluation": result.skill_evaluation,
+                    "summary": result.summary,
+                    "error_tags": result.error_tags,
+                    "metadata": result.metadata,
+                },
+            )
+            for resp, result in graded
+        ]
+
+        with transaction.atomic():
+            TaskAssessmentResult.objects.bulk_create(task_assessments)
+            LessonEventBuffer.record([
+                LessonEventLog(
+                    student=enrollment.student,
+                    enrollment=enrollment,
+                    lesson=lesson,
+                    event_type=LessonEventType.TASK_ASSESSMENT_COMPLETE,
+                    channel=channel,
+                    metadata={
+                        **event_metadata,
+                        "task_id": task_assessment.task_id,
+                        "task_assessment_id": task_assessment.pk,
+                    },
+                )
+                for task_assessment in task_assessments
+            ])
+            # Навыки обновляются по каждому заданию в той же транзакции, что и оценки
+            SkillEngine.apply_task_results(task_assessments)
+
+        return task_assessments
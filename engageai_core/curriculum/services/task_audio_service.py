@@ -0,0 +1,80 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import Max
+
+from ai.tts.service import SpeechRequest, SpeechSynthesisService
+from curriculum.models.content.task_media import MediaType, TaskMedia
+
+logger = logging.getLogger(__name__)
+
+
+class TaskAudioService:
+    """
+    Аудио для listening-заданий: скрипты пакета синтезируются одним вызовом
+    SpeechSynthesisService.synthesize_many (кэш фраз в хранилище), к заданиям
+    прикрепляются TaskMedia, ссылающиеся на файл кэша, — файл не копируется.
+
+    Элемент пакета: {"task_id": int, "text": str, "voice"?: str, "speed"?: float}.
+    Повторный запуск не дублирует медиа: задание с тем же synthesis_key пропускается.
+    """
+
+    @classmethod
+    def attach_audio(
+            cls,
+            items: Iterable[Dict],
+            service: Optional[SpeechSynthesisService] = None,
+    ) -> Tuple[int, List[Dict]]:
+        """Возвращает (число созданных TaskMedia, элементы, которые не удалось синтезировать)"""
+        items = [item for item in items if item.get("text")]
+        if not items:
+            return 0, []
+
+        requests = [SpeechRequest.build(item["text"], item.get("voice"), item.get("speed")) for item in items]
+        task_ids = {item["task_id"] for item in items}
+
+        attached = set(
+            TaskMedia.objects
+            .filter(task_id__in=task_ids)
+            .exclude(synthesis_key="")
+            .values_list("task_id", "synthesis_key")
+        )
+        pending = []
+        for item, request in zip(items, requests):
+            if (item["task_id"], request.key) not in attached:
+                attached.add((item["task_id"], request.key))
+                pending.append((item, request))
+        if not pending:
+            return 0, []
+
+        results = (service or SpeechSynthesisService()).synthesize_many([request for _, request in pending])
+
+        next_order = dict(
+            TaskMedia.objects
+            .filter(task_id__in=task_ids)
+            .values("task_id")
+            .annotate(last=Max("order"))
+            .values_list("task_id", "last")
+        )
+        media, failed = [], []
+        for (item, request), result in zip(pending, results):
+            if not result.ok:
+                logger.error(f"Аудио для задания {item['task_id']} не синтезировано: {result.error}")
+                failed.append(item)
+                continue
+
+            order = next_order.get(item["task_id"])
+            order = 0 if order is None else order + 1
+            next_order[item["task_id"]] = order
+
+            task_media = TaskMedia(
+                task_id=item["task_id"],
+                media_type=MediaType.AUDIO,
+                order=order,
+                synthesis_key=result.key,
+            )
+            task_media.file.name = result.storage_name
+            media.append(task_media)
+
+        TaskMedia.objects.bulk_create(media)
+        return len(media), failed
@@ -0,0 +1,177 @@
+"""
+Случайный выбор заданий без ORDER BY RANDOM().
+
+Пулы id активных заданий хранятся в общем кэше Django (Redis) по уровню CEFR,
+внутри уровня — по паре (навык task_type, формат ответа response_format).
+Выборка без возвращения делается в Python (random.sample) по объединению
+подходящих пулов. Уровни, в которых заданий больше TASK_POOL_MAX_SIZE, не
+кэшируются списком id: для них выборка идёт через TABLESAMPLE BERNOULLI без
+сортировки всей таблицы.
+
+Пулы сбрасываются при сохранении/удалении Task (curriculum/signals.py) через
+счётчик поколения, после bulk-операций нужно вызвать TaskSampler.invalidate().
+"""
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from curriculum.models.content.task import Task
+
+logger = logging.getLogger(__name__)
+
+
+class TaskSampler:
+    """Случайные задания по (уровень, навык, формат) с постоянным временем выборки"""
+
+    GENERATION_KEY = "task_pool:generation"
+    # Запас для TABLESAMPLE: фильтры по навыку/формату/исключениям отсекают часть строк
+    TABLESAMPLE_OVERSAMPLE = 4.0
+
+    # ------------------------------------------------------------------
+    # Пулы
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Сбрасывает все пулы (новое поколение ключей)"""
+        try:
+            cache.incr(cls.GENERATION_KEY)
+        except ValueError:
+            cache.set(cls.GENERATION_KEY, 1, None)
+
+    @classmethod
+    def _pool_key(cls, generation: int, level: str) -> str:
+        return f"task_pool:{generation}:{level}"
+
+    @staticmethod
+    def _group_key(skill: str, response_format: str) -> str:
+        return f"{skill}|{response_format}"
+
+    @classmethod
+    def _get_pools(cls, levels: Sequence[str]) -> Dict[str, dict]:
+        """
+        {уровень: {"size": n, "groups": {"навык|формат": [id, ...]}}};
+        для больших уровней "groups" отсутствует (выборка через TABLESAMPLE).
+        """
+        generation = cache.get_or_set(cls.GENERATION_KEY, 1, None)
+        keys = {level: cls._pool_key(generation, level) for level in levels}
+        cached = cache.get_many(list(keys.values()))
+
+        pools = {}
+        for level, key in keys.items():
+            pool = cached.get(key)
+            if pool is None:
+                pool = cls._build_pool(level)
+                cache.set(key, pool, settings.TASK_POOL_TTL)
+            pools[level] = pool
+        return pools
+
+    @classmethod
+    def _build_pool(cls, level: str) -> dict:
+        queryset = Task.objects.filter(is_active=True, difficulty_cefr=level)
+        size = queryset.count()
+        if size > settings.TASK_POOL_MAX_SIZE:
+            return {"size": size}
+
+        groups: Dict[str, List[int]] = {}
+        for task_id, skill, response_format in queryset.values_list("id", "task_type", "response_format"):
+            groups.setdefault(cls._group_key(skill, response_format), []).append(task_id)
+        return {"size": size, "groups": groups}
+
+    # ------------------------------------------------------------------
+    # Выборка
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def sample_ids(
+            cls,
+            levels: Iterable[str],
+            k: int,
+            skills: Optional[Iterable[str]] = None,
+            formats: Optional[Iterable[str]] = None,
+            exclude_ids: Iterable[int] = (),
+    ) -> List[int]:
+        """До k случайных различных id активных заданий (в случайном порядке)"""
+        levels = list(dict.fromkeys(levels))
+        skills = set(skills) if skills else None
+        formats = set(formats) if formats else None
+        exclude = set(exclude_ids)
+        if k <= 0 or not levels:
+            return []
+
+        pools = cls._get_pools(levels)
+
+        candidates: List[int] = []
+        large_levels: List[str] = []
+        for level, pool in pools.items():
+            if "groups" not in pool:
+                large_levels.append(level)
+                continue
+            for group, ids in pool["groups"].items():
+                skill, response_format = group.split("|", 1)
+                if (skills is None or skill in skills) and (formats is None or response_format in formats):
+                    candidates.extend(task_id for task_id in ids if task_id not in exclude)
+
+        if large_levels:
+            large_size = sum(pools[level]["size"] for level in large_levels)
+            candidates.extend(cls._tablesample_ids(large_levels, large_size, k, skills, formats, exclude))
+
+        return random.sample(candidates, min(k, len(candidates)))
+
+    @classmethod
+    def sample_tasks(cls, levels: Iterable[str], k: int, **filters) -> List[Task]:
+        """Задания по sample_ids одним запросом; устаревшие id пула отбрасываются"""
+        ids = cls.sample_ids(levels, k, **filters)
+        if not ids:
+            return []
+        tasks = Task.objects.filter(id__in=ids, is_active=True).select_related("lesson").in_bulk()
+        return [tasks[task_id] for task_id in ids if task_id in tasks]
+
+    @classmethod
+    def pick_one(cls, levels: Iterable[str], **filters) -> Optional[Task]:
+        tasks = cls.sample_tasks(levels, 1, **filters)
+        return tasks[0] if tasks else None
+
+    @classmethod
+    def _tablesample_ids(
+            cls,
+            levels: List[str],
+            size: int,
+            k: int,
+            skills: Optional[set],
+            formats: Optional[set],
+            exclude: set,
+    ) -> List[int]:
+        """
+        Fallback для больших уровней: строки читаются TABLESAMPLE BERNOULLI без сортировки.
+        Процент выборки растёт, пока не наберётся k кандидатов (или не дойдёт до 100).
+        """
+        conditions = ["is_active", "difficulty_cefr = ANY(%s)"]
+        params: List = [levels]
+        if skills is not None:
+            conditions.append("task_type = ANY(%s)")
+            params.append(list(skills))
+        if formats is not None:
+            conditions.append("response_format = ANY(%s)")
+            params.append(list(formats))
+        if exclude:
+            conditions.append("NOT (id = ANY(%s))")
+            params.append(list(exclude))
+
+        sql = (
+            f"SELECT id FROM {Task._meta.db_table} TABLESAMPLE BERNOULLI (%s) "
+            f"WHERE {' AND '.join(conditions)}"
+        )
+
+        percent = min(100.0, 100.0 * k * cls.TABLESAMPLE_OVERSAMPLE / max(size, 1))
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [percent, *params])
+                ids = [row[0] for row in cursor.fetchall()]
+            if len(ids) >= k or percent >= 100.0:
+                return ids
+            percent = min(100.0, percent * 4)
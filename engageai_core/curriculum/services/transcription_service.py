@@ -0,0 +1,69 @@
+import logging
+import os
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from ai.stt.service import TranscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseTranscriptionService:
+    """
+    Транскрипты голосовых ответов (StudentTaskResponse, TestAnswer — поля audio_file/transcript).
+    Все ответы пакета распознаются одним вызовом TranscriptionService.transcribe_many
+    (кэш по содержимому, склейка коротких клипов, параллельные сегменты длинных записей),
+    транскрипты сохраняются bulk_update.
+
+    Пока длинная запись распознаётся, её частичный транскрипт доступен через get_partial
+    и передаётся в on_partial — так ход распознавания виден в статусе оценки.
+    """
+
+    ERROR_PLACEHOLDER = "[Ошибка транскрипции]"
+    PARTIAL_KEY = "transcript_partial:{label}:{pk}"
+
+    @classmethod
+    def transcribe_responses(
+            cls,
+            responses: Iterable,
+            service: Optional[TranscriptionService] = None,
+            on_partial: Optional[Callable[[object, str], None]] = None,
+    ) -> int:
+        """Заполняет transcript у ответов с аудио без транскрипта. Возвращает число обработанных"""
+        pending = [resp for resp in responses if resp.audio_file and not resp.transcript]
+        if not pending:
+            return 0
+
+        items = []
+        for resp in pending:
+            with resp.audio_file.open("rb") as fh:
+                items.append((fh.read(), os.path.basename(resp.audio_file.name)))
+
+        def handle_partial(index: int, text: str) -> None:
+            resp = pending[index]
+            cache.set(cls._partial_key(resp), text, settings.STT_TIMEOUT)
+            if on_partial:
+                on_partial(resp, text)
+
+        results = (service or TranscriptionService()).transcribe_many(items, on_partial=handle_partial)
+
+        for resp, result in zip(pending, results):
+            # Даже при ошибке сохраняем метку, чтобы не блокировать оценку
+            resp.transcript = result.text if result.ok else cls.ERROR_PLACEHOLDER
+            if not result.ok:
+                logger.error(f"Ошибка транскрипции {type(resp).__name__} {resp.pk}: {result.error}")
+
+        type(pending[0]).objects.bulk_update(pending, ["transcript"])
+        cache.delete_many([cls._partial_key(resp) for resp in pending])
+        return len(pending)
+
+    @classmethod
+    def get_partial(cls, response) -> Optional[str]:
+        """Частичный транскрипт ответа, который ещё распознаётся (None — нет или уже готов)"""
+        return cache.get(cls._partial_key(response))
+
+    @classmethod
+    def _partial_key(cls, response) -> str:
+        return cls.PARTIAL_KEY.format(label=response._meta.label_lower, pk=response.pk)
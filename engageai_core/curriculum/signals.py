@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from curriculum.models.content.task import Task
+from curriculum.services.task_sampling import TaskSampler
+
+# Поля Task, от которых зависят пулы случайного выбора
+TASK_POOL_FIELDS = {"is_active", "difficulty_cefr", "task_type", "response_format"}
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_pools(sender, instance, update_fields=None, **kwargs):
+    """Сброс пулов TaskSampler при изменении состава или атрибутов заданий"""
+    if update_fields and not (set(update_fields) & TASK_POOL_FIELDS):
+        return
+    TaskSampler.invalidate()
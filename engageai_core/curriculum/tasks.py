@@ -1,15 +1,13 @@
 import json
-import os
-import time
 
 from celery_progress.backend import ProgressRecorder
 
-import requests
 from asgiref.sync import async_to_sync
-from celery import shared_task, chain, group
+from celery import shared_task, chain
 from celery.exceptions import SoftTimeLimitExceeded
 import logging
 
+from django.conf import settings
 from django.db import IntegrityError
 from django.utils import timezone
 
@@ -19,81 +17,87 @@ from curriculum.models.assessment.task_assessment import TaskAssessmentResult
 from curriculum.models.content.lesson import Lesson
 from curriculum.models.learning_process.lesson_event_log import LessonEventType
 from curriculum.models.student.enrollment import Enrollment
-from curriculum.models.student.skill_snapshot import SkillSnapshot
 from curriculum.models.student.student_response import StudentTaskResponse
-from curriculum.services.auto_assessment_adapter import AutoAssessorAdapter
+from curriculum.services.frustration_signal_store import FrustrationSignalStore
 from curriculum.services.learning_objective_evaluation import LearningObjectiveEvaluationService
 from curriculum.services.learning_path_adaptation import LearningPathAdaptationService, LessonOutcomeContext, \
     LearningPathAdjustmentType
+from curriculum.services.learning_path_nodes import LearningPathNodeService
+from curriculum.services.lesson_event_buffer import LessonEventBuffer
+from curriculum.services.lesson_event_partitions import LessonEventPartitions
 from curriculum.services.lesson_event_service import LessonEventService
-from curriculum.services.llm_assessment_adapter import LLMAssessmentAdapter
-from curriculum.services.skill_update_service import SkillUpdateService
+from curriculum.services.task_assessment_engine import LessonTaskAssessmentEngine
+from curriculum.services.transcription_service import ResponseTranscriptionService
+from curriculum.services.skill_engine import SkillEngine
+from curriculum.services.task_audio_service import TaskAudioService
 from llm_logger.models import LLMRequestType
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
+@shared_task(bind=True)
 def transcribe_response(self, response_id: int) -> int:
     """
     Транскрибирует один StudentTaskResponse с аудио.
     Возвращает ID ответа (для совместимости с group).
     """
+    transcribe_responses([response_id])
+    return response_id
 
-    try:
-        response = StudentTaskResponse.objects.get(id=response_id)
 
-        if not response.audio_file or response.transcript:
-            return response_id  # уже есть транскрипт или нет аудио
+@shared_task
+def transcribe_responses(response_ids: list) -> list:
+    """
+    Транскрибирует пакет StudentTaskResponse с аудио одним вызовом TranscriptionService:
+    короткие ответы склеиваются в общие запросы, повторы берутся из кэша.
+    Возвращает ID ответов.
+    """
+    ResponseTranscriptionService.transcribe_responses(
+        StudentTaskResponse.objects.filter(id__in=response_ids)
+    )
+    return list(response_ids)
 
-        # Открываем файл
-        audio_content = response.audio_file.read()
 
-        # Определяем MIME
-        ext = os.path.splitext(response.audio_file.name)[1].lower()
-        mime_map = {
-            '.wav': 'audio/wav', '.mp3': 'audio/mpeg', '.m4a': 'audio/mp4',
-            '.ogg': 'audio/ogg', '.flac': 'audio/flac', '.webm': 'audio/webm'
-        }
-        content_type = mime_map.get(ext, 'audio/wav')
+@shared_task(bind=True, max_retries=3, default_retry_delay=30, acks_late=True)
+def synthesize_task_audio(self, items: list) -> int:
+    """
+    Синтезирует аудио listening-заданий пакетом и прикрепляет TaskMedia
+    (очередь settings.TTS_QUEUE). items: [{"task_id", "text", "voice"?, "speed"?}].
+    Фразы адресуются ключом кэша, поэтому повтор задачи безопасен;
+    повторяются только элементы, которые не удалось синтезировать.
+    """
+    created, failed = TaskAudioService.attach_audio(items)
+    if failed:
+        logger.warning(f"TTS: {len(failed)} из {len(items)} фраз не синтезированы, повтор")
+        raise self.retry(args=[failed])
+    return created
 
-        files = {
-            'file': (os.path.basename(response.audio_file.name), audio_content, content_type)
-        }
-        data = {
-            'model': 'whisper-1',
-            'language': 'en',  # или динамически определяйте, если нужно
-            'response_format': 'text'
-        }
 
-        whisper_response = requests.post(
-            "http://localhost:8000/v1/audio/transcriptions",  # или через env переменную
-            files=files,
-            data=data,
-            timeout=120
-        )
+@shared_task
+def compact_skill_trajectory() -> dict:
+    """
+    Периодическое сжатие истории навыков: RAW-блоки старше
+    SKILL_TRAJECTORY_COMPACT_AFTER_DAYS сводятся к одной точке в день.
+    """
+    before, after = SkillEngine.compact()
+    return {"points_before": before, "points_after": after}
 
-        if whisper_response.status_code == 200:
-            response.transcript = whisper_response.text.strip()
-        else:
-            response.transcript = "[Ошибка транскрипции]"
-            logger.error(f"Whisper error {whisper_response.status_code}: {whisper_response.text}")
 
-        response.save(update_fields=['transcript'])
-        logger.info(f"Transcribed response {response_id}")
+@shared_task
+def flush_lesson_events() -> int:
+    """
+    Запись накопленных событий уроков из Redis-потока в LessonEventLog
+    (запускается beat каждые LESSON_EVENT_FLUSH_INTERVAL секунд).
+    Работает не дольше десяти периодов; пока идёт запуск, следующие сразу завершаются
+    (блокировка в LessonEventBuffer.flush), а не дождавшиеся воркера истекают в брокере.
+    """
+    return LessonEventBuffer.flush(max_seconds=settings.LESSON_EVENT_FLUSH_INTERVAL * 10)
 
-        return response_id
 
-    except Exception as e:
-        logger.error(f"Error transcribing response {response_id}: {str(e)}", exc_info=True)
-        # Даже при ошибке сохраняем метку, чтобы не блокировать оценку
-        try:
-            resp = StudentTaskResponse.objects.get(id=response_id)
-            resp.transcript = "[Ошибка транскрипции]"
-            resp.save(update_fields=['transcript'])
-        except:
-            pass
-        return response_id
+@shared_task
+def ensure_lesson_event_partitions() -> list:
+    """Заранее создаёт помесячные секции LessonEventLog (если таблица секционирована)"""
+    return LessonEventPartitions.ensure()
 
 
 @shared_task
@@ -102,32 +106,30 @@ def launch_full_assessment(enrollment_id: int):
     Оркестратор: запускает транскрипцию (если нужно) → затем основную оценку.
     """
     try:
-        enrollment = Enrollment.objects.get(id=enrollment_id)
+        enrollment = Enrollment.objects.select_related('learning_path').get(id=enrollment_id)
+        lesson_id = enrollment.learning_path.current_node.get("lesson_id")
 
         # Находим ответы с аудио, у которых ещё нет транскрипта
         responses_needing_transcription = StudentTaskResponse.objects.filter(
-            student=enrollment.student,
-            task__lesson=enrollment.current_lesson,
+            enrollment=enrollment,
+            task__lesson_id=lesson_id,
             audio_file__isnull=False,
             transcript__in=['', None]
-        ).values_list('id', flat=True)
+        ).exclude(audio_file='').values_list('id', flat=True)
 
         response_ids = list(responses_needing_transcription)
 
         if response_ids:
             logger.info(f"Need to transcribe {len(response_ids)} audio responses before assessment")
 
-            # Параллельно транскрибируем все аудио
-            transcription_job = group(transcribe_response.s(resp_id) for resp_id in response_ids)
-
-            # После завершения всех — запускаем оценку
+            # Все аудио урока — одним пакетом, после него — оценка
             workflow = chain(
-                transcription_job,
-                assess_lesson_tasks.s(enrollment_id)  # передаём enrollment_id дальше
+                transcribe_responses.si(response_ids),
+                assess_lesson_tasks.si(enrollment_id, lesson_id)
             )
         else:
             logger.info("No audio to transcribe — starting assessment directly")
-            workflow = assess_lesson_tasks.s(enrollment_id)
+            workflow = assess_lesson_tasks.si(enrollment_id, lesson_id)
 
         result = workflow.apply_async()
         return result.id
@@ -142,7 +144,7 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
     """
     Полная асинхронная оценка урока.
     1. Находит текущий урок по LearningPath
-    2. Оценивает каждое задание (auto или LLM)
+    2. Оценивает задания: auto в процессе, LLM конкурентно (LessonTaskAssessmentEngine)
     3. Сохраняет результаты в TaskAssessmentResult
     4. Считает общий score и итоговое резюме LLM
     5. Сохраняет в LessonAssessmentResult
@@ -151,7 +153,6 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
     8. Переходит к следующему узлу (если нет remedial)
     """
     progress_recorder = ProgressRecorder(self)
-    current_assessment = 0
 
     enrollment = Enrollment.objects.select_related('student', 'course', 'learning_path').get(id=enrollment_id)
 
@@ -159,9 +160,11 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
     current_node = enrollment.learning_path.current_node
 
     learning_path = enrollment.learning_path
-    current_index = learning_path.current_node_index
-    learning_path.nodes[current_index]["submitted_at"] = timezone.now().isoformat()
-    learning_path.save(update_fields=["nodes"])
+    LearningPathNodeService.update_extra(
+        learning_path,
+        learning_path.current_node_index,
+        submitted_at=timezone.now().isoformat(),
+    )
 
     lesson = Lesson.objects.get(id=assessed_lesson_id)
 
@@ -181,65 +184,29 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
         if not responses:
             raise ValueError("Нет ответов для оценки")
 
-        total_tasks = len(responses)
-
-        auto_adapter = AutoAssessorAdapter()
-        llm_adapter = LLMAssessmentAdapter()
-
-        task_count = responses.count()
-        task_assessments = []
-
-        for i, resp in enumerate(responses, start=1):
-            task = resp.task
-            if not hasattr(resp, "assessment"):
-                # Пропуск уже оцененных задач уже отвеченных задач
-                # для варианта одна задача - один ответ
-
-                if task.response_format in AutoAssessorAdapter.SUPPORTED_FORMATS:
-                    result = auto_adapter.assess_task(task, resp)
-                else:
-                    result = llm_adapter.assess_task(task, resp)
-
-                score = TaskAssessmentResult.calc_task_score(result=result)
-                task_assessment = TaskAssessmentResult.objects.create(
-                    enrollment=enrollment,
-                    task=task,
-                    response=resp,
-                    is_correct=result.is_correct,
-                    score=score,
-                    feedback=result.summary.get("text", ""),
-                    structured_feedback={
-                        "skill_evaluation": result.skill_evaluation,
-                        "summary": result.summary,
-                        "error_tags": result.error_tags,
-                        "metadata": result.metadata,
-                    },
-                )
-
-                task_assessments.append(task_assessment)
-
-                # Логируем оценку задания
-                LessonEventService.create_event(
-                    student=enrollment.student,
-                    enrollment=enrollment,
-                    lesson=lesson,
-                    event_type=LessonEventType.TASK_ASSESSMENT_COMPLETE,
-                    channel="WEB",
-                    metadata={
-                        "node_id": current_node["node_id"],
-                        "path_type": enrollment.learning_path.path_type,
-                        "task_id": task.id,
-                        "task_assessment_id": task_assessment.id,
-                        "reason": current_node.get("reason", ""),
-                        "type": current_node.get("type", "core")
-                    }
-                )
-            current_assessment += 1
-            progress_recorder.set_progress(
-                i,
-                total_tasks,
-                description=f"Оценено {i}/{total_tasks} заданий"
-            )
+        # Авто-оценка в процессе, LLM-оценка конкурентно, сохранение одной транзакцией
+        task_assessments = LessonTaskAssessmentEngine().assess(
+            enrollment=enrollment,
+            lesson=lesson,
+            responses=responses,
+            event_metadata={
+                "node_id": current_node["node_id"],
+                "path_type": enrollment.learning_path.path_type,
+                "reason": current_node.get("reason", ""),
+                "type": current_node.get("type", "core")
+            },
+            channel="WEB",
+            on_progress=lambda done, total: progress_recorder.set_progress(
+                done,
+                total,
+                description=f"Оценено {done}/{total} заданий"
+            ),
+            on_partial_transcript=lambda resp, text: progress_recorder.set_progress(
+                0,
+                len(responses),
+                description=f"Распознаётся голосовой ответ: «…{text[-120:]}»"
+            ),
+        )
 
         progress_recorder.set_progress(
             1,
@@ -362,6 +329,10 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
         lesson_result.status = AssessmentStatus.COMPLETED
         lesson_result.completed_at = timezone.now()
         lesson_result.save()
+        FrustrationSignalStore.record_lesson_result(
+            student_id=enrollment.student_id,
+            overall_score=overall_score,
+        )
 
         # Создаём событие завершения оценки
         LessonEventService.create_event(
@@ -373,7 +344,7 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
             metadata={
                 # "node_id": current_node["node_id"],
                 "lesson_id": assessed_lesson_id,
-                "tasks_evaluated": task_count,
+                "tasks_evaluated": len(responses),
                 "job_id": self.request.id
             }
         )
@@ -381,30 +352,12 @@ def assess_lesson_tasks(self, enrollment_id, assessed_lesson_id):
         # ======================
         # 5. Создаем снимок навыков
         # ======================
-        pre_snapshot = SkillSnapshot.objects.filter(
-            enrollment=enrollment,
-            snapshot_context__in=["POST_LESSON", "PLACEMENT"],
-        ).order_by("-snapshot_at").first()
-
-        # Рассчитываем новые значения навыков
-        new_skill_values = SkillUpdateService.calculate_skill_deltas(
-            pre_snapshot=pre_snapshot,
-            lesson_feedback=lesson_skill_feedback
-        )
-
-        # Создаем новый снимок
-        skill_snapshot = SkillSnapshot.objects.create(
-            student=enrollment.student,
-            enrollment=enrollment,
-            associated_lesson=lesson,
-            snapshot_context="POST_LESSON",
-            grammar=new_skill_values["grammar"],
-            vocabulary=new_skill_values["vocabulary"],
-            listening=new_skill_values["listening"],
-            reading=new_skill_values["reading"],
-            writing=new_skill_values["writing"],
-            speaking=new_skill_values["speaking"],
-            skills=new_skill_values,  # Для удобства в JSON
+        # Значения навыков уже обновлены по каждому заданию (SkillEngine.apply_task_results
+        # в LessonTaskAssessmentEngine) — снимок копирует текущий вектор
+        skill_snapshot = SkillEngine.snapshot(
+            enrollment,
+            lesson,
+            context="POST_LESSON",
             metadata={
                 "source": "lesson_assessment",
                 "lesson_id": lesson.id,
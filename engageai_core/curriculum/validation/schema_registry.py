@@ -0,0 +1,224 @@
+"""
+Реестр скомпилированных схем контента заданий.
+
+Каждая схема из TASK_CONTENT_SCHEMAS один раз (при импорте модуля, т.е. при старте
+приложения — см. CurriculumConfig.ready) превращается в список проверок-замыканий:
+правила validation_rules больше не интерпретируются при каждой оценке.
+
+Проверок два уровня: полная (генерация, импорт, материализация заданий) и структурная
+(structural_only=True) — только то, что читает грейдер при оценке: обязательные поля,
+типы и границы индексов. Длины, количества и диапазоны при оценке не проверяются,
+чтобы ужесточение правил не лишало оценки задания, созданные раньше.
+
+У каждой схемы есть отпечаток (stamp) "<имя схемы>:<хэш определения>". Он сохраняется
+в Task.content_validated_version после успешной проверки: задания с актуальным
+отпечатком повторно не проверяются, а изменение определения схемы меняет хэш и
+автоматически инвалидирует все отметки.
+"""
+import hashlib
+import json
+import re
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional
+
+from curriculum.validation.task_schemas import TASK_CONTENT_SCHEMAS
+
+# Проверка поля: (content, value) -> текст ошибки или None
+FieldCheck = Callable[[dict, Any], Optional[str]]
+
+_TYPES = {
+    "str": str,
+    "int": int,
+    "bool": bool,
+    "list": list,
+}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_answer(value: Any, case_sensitive: bool = False) -> str:
+    """
+    Нормализация ответа и ключа для сравнения: NFKC, схлопывание пробелов,
+    без учёта регистра (casefold), если схема не требует обратного.
+    """
+    text = unicodedata.normalize("NFKC", "" if value is None else str(value))
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text if case_sensitive else text.casefold()
+
+
+def _is_type(value: Any, type_name: str) -> bool:
+    expected = _TYPES.get(type_name)
+    if expected is None:
+        return True
+    # bool — подкласс int, но для схем это разные типы
+    if expected is int and isinstance(value, bool):
+        return False
+    return isinstance(value, expected)
+
+
+def _compile_reference(reference: str) -> Callable[[dict], Optional[int]]:
+    """
+    "options.length - 1" -> функция, вычисляющая границу по content.
+    Поддерживаются выражения вида "<поле>.length[ - N]".
+    """
+    match = re.fullmatch(r"\s*(\w+)\.length\s*(?:-\s*(\d+))?\s*", reference)
+    if not match:
+        raise ValueError(f"Unsupported schema reference: '{reference}'")
+    field, offset = match.group(1), int(match.group(2) or 0)
+
+    def bound(content: dict) -> Optional[int]:
+        target = content.get(field)
+        return len(target) - offset if isinstance(target, (list, str)) else None
+
+    return bound
+
+
+def _compile_rule(field: str, rule: Dict[str, Any], structural_only: bool = False) -> List[FieldCheck]:
+    checks: List[FieldCheck] = []
+    type_name = rule.get("type")
+
+    if type_name:
+        def check_type(content, value, type_name=type_name):
+            if not _is_type(value, type_name):
+                return f"'{field}' must be {type_name}"
+        checks.append(check_type)
+
+    if type_name == "list":
+        item_type = rule.get("item_type")
+        if item_type:
+            def check_items(content, value, item_type=item_type):
+                if not all(_is_type(item, item_type) for item in value):
+                    return f"'{field}' items must be {item_type}"
+            checks.append(check_items)
+
+        min_items, max_items = rule.get("min_items"), rule.get("max_items")
+        if not structural_only and (min_items is not None or max_items is not None):
+            def check_count(content, value, min_items=min_items, max_items=max_items):
+                if min_items is not None and len(value) < min_items:
+                    return f"'{field}' must have at least {min_items} items"
+                if max_items is not None and len(value) > max_items:
+                    return f"'{field}' must have at most {max_items} items"
+            checks.append(check_count)
+
+    if type_name == "str" and not structural_only:
+        min_length, max_length = rule.get("min_length"), rule.get("max_length")
+        if min_length is not None or max_length is not None:
+            def check_length(content, value, min_length=min_length, max_length=max_length):
+                if min_length is not None and len(value) < min_length:
+                    return f"'{field}' must be at least {min_length} characters"
+                if max_length is not None and len(value) > max_length:
+                    return f"'{field}' must be at most {max_length} characters"
+            checks.append(check_length)
+
+    if type_name == "int" and not structural_only:
+        minimum, maximum = rule.get("min"), rule.get("max")
+        if minimum is not None or maximum is not None:
+            def check_range(content, value, minimum=minimum, maximum=maximum):
+                if minimum is not None and value < minimum:
+                    return f"'{field}' must be >= {minimum}"
+                if maximum is not None and value > maximum:
+                    return f"'{field}' must be <= {maximum}"
+            checks.append(check_range)
+
+    reference = rule.get("reference")
+    if reference:
+        bound = _compile_reference(reference)
+        # Для списка индексов граница — длина (индексы строго меньше),
+        # для числа — максимум включительно ("options.length - 1", "correct_indices.length")
+        is_list = type_name == "list"
+
+        def check_reference(content, value, bound=bound, is_list=is_list):
+            limit = bound(content)
+            if limit is None:
+                return None
+            maximum = limit - 1 if is_list else limit
+            values = value if is_list else [value]
+            if any(isinstance(item, int) and item > maximum for item in values):
+                return f"'{field}' is out of range ({reference})"
+        checks.append(check_reference)
+
+    return checks
+
+
+class CompiledSchema:
+    """Скомпилированная схема: обязательные поля и проверки полей"""
+
+    def __init__(self, name: str, definition: Dict[str, Any]):
+        self.name = name
+        self.definition = definition
+        self.required = frozenset(definition.get("required", ()))
+        self.response_format = definition.get("response_format")
+        self.stamp = f"{name}:{self._fingerprint(definition)}"
+        self._checks: List[tuple] = self._compile(definition)
+        self._structural_checks: List[tuple] = self._compile(definition, structural_only=True)
+
+    @staticmethod
+    def _compile(definition: Dict[str, Any], structural_only: bool = False) -> List[tuple]:
+        return [
+            (field, check)
+            for field, rule in definition.get("validation_rules", {}).items()
+            for check in _compile_rule(field, rule, structural_only)
+        ]
+
+    @staticmethod
+    def _fingerprint(definition: Dict[str, Any]) -> str:
+        payload = {
+            "required": definition.get("required", ()),
+            "validation_rules": definition.get("validation_rules", {}),
+        }
+        raw = json.dumps(
+            payload,
+            sort_keys=True,
+            default=lambda value: sorted(value) if isinstance(value, (set, frozenset)) else str(value)
+        )
+        return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+    def validate(self, content: Any, structural_only: bool = False) -> List[str]:
+        """
+        Возвращает список ошибок (пустой — контент валиден).
+        structural_only — только проверки, нужные грейдеру (см. описание модуля)
+        """
+        if not isinstance(content, dict):
+            return ["content must be an object"]
+
+        errors = [f"Missing required field '{field}'" for field in sorted(self.required) if field not in content]
+        failed = set()
+        for field, check in (self._structural_checks if structural_only else self._checks):
+            # После первой ошибки поля (например, неверного типа) остальные его проверки пропускаются
+            if field not in content or field in failed:
+                continue
+            error = check(content, content[field])
+            if error:
+                errors.append(error)
+                failed.add(field)
+        return errors
+
+
+class TaskSchemaRegistry:
+    """Реестр CompiledSchema по имени версии схемы (scq_v1, mcq_v1, short_text_v1, …)"""
+
+    def __init__(self, schemas: Dict[str, Dict[str, Any]]):
+        self._schemas: Dict[str, CompiledSchema] = {
+            name: CompiledSchema(name, definition) for name, definition in schemas.items()
+        }
+
+    def get(self, name: str) -> Optional[CompiledSchema]:
+        return self._schemas.get(name)
+
+    def stamp(self, name: str) -> Optional[str]:
+        schema = self._schemas.get(name)
+        return schema.stamp if schema else None
+
+    def is_validated(self, task) -> bool:
+        """Контент задания уже проверен актуальной версией своей схемы"""
+        stamp = self.stamp(task.content_schema_version)
+        return bool(stamp) and task.content_validated_version == stamp
+
+    def validate(self, name: str, content: Any) -> List[str]:
+        schema = self._schemas.get(name)
+        if schema is None:
+            return [f"Unknown task content schema: '{name}'"]
+        return schema.validate(content)
+
+
+TASK_SCHEMA_REGISTRY = TaskSchemaRegistry(TASK_CONTENT_SCHEMAS)
@@ -151,6 +151,152 @@ TASK_CONTENT_SCHEMAS = {
             "max_length": 10
         },
     },
+    "gap_fill_v1": {
+        "name": "Gap Fill v1",
+        # Новые автопроверяемые схемы пока создаются вручную (админка, create_course)
+        "is_generation_enabled": False,
+        "response_format": ResponseFormat.SHORT_TEXT,
+        "supported_skills": {
+            "grammar", "vocabulary"
+        },
+        "required": {"prompt", "gaps"},
+        "optional": {"case_sensitive", "explanation"},
+        "validation_rules": {
+            "prompt": {
+                "type": "str",
+                "min_length": 5
+            },
+            "gaps": {
+                "type": "list",
+                "item_type": "list",   # Для каждого пропуска — список допустимых ответов
+                "min_items": 1,
+                "max_items": 20
+            },
+            "case_sensitive": {
+                "type": "bool",
+                "default": False
+            }
+        },
+        "description": "Текст с пропусками (___). Ответ — слова для пропусков по порядку через запятую, "
+                       "точку с запятой или с новой строки",
+        "example": {
+            "prompt": "She ___ (work) here since 2019 and ___ (lead) the team now.",
+            "gaps": [["has worked", "has been working"], ["leads", "is leading"]],
+            "explanation": "Present Perfect for duration up to now, Present Simple/Continuous for the present."
+        }
+    },
+    "matching_v1": {
+        "name": "Matching v1",
+        "is_generation_enabled": False,
+        "response_format": ResponseFormat.SHORT_TEXT,
+        "supported_skills": {
+            "vocabulary", "reading"
+        },
+        "required": {"prompt", "left", "right", "pairs"},
+        "optional": {"explanation"},
+        "validation_rules": {
+            "prompt": {
+                "type": "str",
+                "min_length": 5
+            },
+            "left": {
+                "type": "list",
+                "item_type": "str",
+                "min_items": 2,
+                "max_items": 15
+            },
+            "right": {
+                "type": "list",
+                "item_type": "str",
+                "min_items": 2,
+                "max_items": 15
+            },
+            "pairs": {
+                "type": "list",
+                "item_type": "int",
+                "min_items": 2,
+                "reference": "right.length"  # pairs[i] — индекс элемента right для left[i]
+            }
+        },
+        "description": "Сопоставление элементов двух списков. Ответ — пары вида '1-b, 2-a' (номера с 1) "
+                       "или JSON-список индексов right для каждого элемента left",
+        "example": {
+            "prompt": "Match the terms with their definitions.",
+            "left": ["deadline", "stakeholder", "milestone"],
+            "right": ["a person with an interest in a project", "a significant point in a project", "the latest time to finish"],
+            "pairs": [2, 0, 1]
+        }
+    },
+    "ordering_v1": {
+        "name": "Ordering v1",
+        "is_generation_enabled": False,
+        "response_format": ResponseFormat.SHORT_TEXT,
+        "supported_skills": {
+            "grammar", "reading"
+        },
+        "required": {"prompt", "items", "correct_order"},
+        "optional": {"explanation"},
+        "validation_rules": {
+            "prompt": {
+                "type": "str",
+                "min_length": 5
+            },
+            "items": {
+                "type": "list",
+                "item_type": "str",
+                "min_items": 2,
+                "max_items": 15
+            },
+            "correct_order": {
+                "type": "list",
+                "item_type": "int",
+                "min_items": 2,
+                "reference": "items.length"  # Перестановка индексов items
+            }
+        },
+        "description": "Расстановка элементов в правильном порядке. Ответ — номера items через запятую "
+                       "(с 1) или JSON-список индексов (с 0) / текстов элементов",
+        "example": {
+            "prompt": "Put the words in the correct order.",
+            "items": ["usually", "I", "at 9", "start work"],
+            "correct_order": [1, 0, 3, 2]
+        }
+    },
+    "word_formation_v1": {
+        "name": "Word Formation v1",
+        "is_generation_enabled": False,
+        "response_format": ResponseFormat.SHORT_TEXT,
+        "supported_skills": {
+            "grammar", "vocabulary"
+        },
+        "required": {"prompt", "base_word", "correct_answers"},
+        "optional": {"case_sensitive", "explanation"},
+        "validation_rules": {
+            "prompt": {
+                "type": "str",
+                "min_length": 5
+            },
+            "base_word": {
+                "type": "str",
+                "min_length": 1
+            },
+            "correct_answers": {
+                "type": "list",
+                "item_type": "str",
+                "min_items": 1
+            },
+            "case_sensitive": {
+                "type": "bool",
+                "default": False
+            }
+        },
+        "description": "Образование нужной формы слова от базового слова",
+        "example": {
+            "prompt": "The project was a great ___ (succeed).",
+            "base_word": "succeed",
+            "correct_answers": ["success"]
+        }
+    },
     "free_text_v1": {
         "name": "Free Text Response v1",
         "is_generation_enabled": True,
@@ -251,7 +251,6 @@ class EnrollCourseView(LoginRequiredMixin, View):
                     enrollment=enrollment
                 )
                 print(learning_path)
-                print(learning_path.nodes)
                 print(learning_path.current_node)
 
                 # Логирование события зачисления
@@ -264,7 +263,7 @@ class EnrollCourseView(LoginRequiredMixin, View):
                     metadata={
                         "course_id": course.id,
                         "course_title": course.title,
-                        "nodes_count": len(learning_path.nodes)
+                        "nodes_count": learning_path.progress.total_nodes
                     }
                 )
         except Exception as exc:
@@ -28,6 +28,7 @@ from ..models.learning_process.lesson_event_log import LessonEventType
 from ..models.student.skill_snapshot import SkillSnapshot
 from ..models.student.student_response import StudentTaskResponse
 from ..services.learning_path_adaptation import LearningPathAdaptationService
+from ..services.learning_path_nodes import LearningPathNodeService
 from ..services.learning_path_progress import LearningPathProgressService
 from ..services.lesson_assessment_service import LessonAssessmentService
 from ..services.lesson_event_service import LessonEventService
@@ -60,9 +61,7 @@ class LearningSessionView(LoginRequiredMixin, ChatContextMixin, TemplateView):
 
         if current_node.get("status") != "in_progress":
             learning_path = enrollment.learning_path
-            current_node_index = enrollment.learning_path.current_node_index
-            learning_path.nodes[current_node_index]["status"] = "in_progress"
-            learning_path.save(update_fields=['nodes', ])
+            LearningPathNodeService.set_status(learning_path, learning_path.current_node_index, "in_progress")
             # Логируем начало урока (если ещё не было в эту сессию)
             LessonEventService.create_event(
                 student=enrollment.student,
@@ -183,7 +182,7 @@ class LearningSessionView(LoginRequiredMixin, ChatContextMixin, TemplateView):
         return enrollment
 
     def _get_current_lesson_and_node(self, enrollment):
-        if not hasattr(enrollment, 'learning_path') or not enrollment.learning_path.nodes:
+        if not hasattr(enrollment, 'learning_path'):
             raise Http404("Учебный путь не инициализирован")
 
         current_node = enrollment.learning_path.current_node
@@ -335,35 +334,21 @@ class LearningSessionView(LoginRequiredMixin, ChatContextMixin, TemplateView):
         - progress_details.total_lessons: общее количество уроков (без preview-нод)
         - learning_state.current_lesson.order: порядковый номер текущего урока
         """
-        if not learning_path.nodes:
+        progress = LearningPathNodeService.get_progress(learning_path)
+        if not progress.total_nodes:
             return {
                 "progress_percent": 0,
                 "total_lessons": 0,
                 "current_lesson": 0
             }
 
-        # Фильтруем только учебные ноды (исключаем preview и служебные)
-        lesson_nodes = [
-            node for node in learning_path.nodes
-        ]
-
         # 1. Общий прогресс по всем нодам (включая preview)
-        completed_count = sum(1 for n in learning_path.nodes if n["status"] == "completed")
-        total_nodes = len(learning_path.nodes)
+        completed_count = progress.completed_nodes
+        total_nodes = progress.total_nodes
         progress_percent = round((completed_count / total_nodes) * 100, 1) if total_nodes else 0
 
-        # 2. Порядковый номер текущего урока среди учебных материалов
-        try:
-            current_index = next(
-                i for i, node in enumerate(lesson_nodes)
-                if node.get("id") == current_node.get("id")
-            )
-            current_order = current_index + 1  # нумерация с 1
-        except StopIteration:
-            current_order = 1  # если не найден - считаем первым
-
-        # 3. Общее количество учебных уроков
-        total_lessons = len(lesson_nodes)
+        # 2. Порядковый номер текущего урока (нумерация с 1)
+        current_order = (progress.current_position or 0) + 1
 
         return {
             "progress_percent": progress_percent,
@@ -430,13 +415,15 @@ class LessonHistoryView(LoginRequiredMixin, ChatContextMixin, DetailView):
         learning_path = getattr(enrollment, 'learning_path', None)
 
         # 3. Находим текущий узел для получения времени
-        current_node = None
-        print(learning_path.nodes)
-        if learning_path and learning_path.nodes:
-            for node in learning_path.nodes:
-                if node.get('lesson_id') == lesson.id and node.get('status') == 'completed':
-                    current_node = node
-                    break
+        lesson_node = None
+        if learning_path:
+            lesson_node = (
+                learning_path.path_nodes
+                .filter(lesson_id=lesson.id, status="completed")
+                .order_by("position")
+                .first()
+            )
+        current_node = lesson_node.as_dict() if lesson_node else None
         if current_node:
             # 4. Получаем ответы студента с оценками одним запросом
             student_responses = (
@@ -480,11 +467,8 @@ class LessonHistoryView(LoginRequiredMixin, ChatContextMixin, DetailView):
 
             # 8. Рассчитываем время занятия
             duration = None
-            if current_node and current_node.get('completed_at'):
-                from datetime import datetime
-                completed_at = datetime.fromisoformat(current_node['completed_at'].replace('Z', '+00:00'))
-                created_at = datetime.fromisoformat(current_node['created_at'].replace('Z', '+00:00'))
-                duration = completed_at - created_at
+            if lesson_node.completed_at:
+                duration = lesson_node.completed_at - lesson_node.created_at
 
             # ============================================
             # 9. ПОЛУЧАЕМ СНИМКИ НАВЫКОВ
@@ -625,7 +609,9 @@ class CourseHistoryView(LoginRequiredMixin, ChatContextMixin, DetailView):
         # Получаем учебный путь
         learning_path = getattr(enrollment, 'learning_path', None)
 
-        if not learning_path or not learning_path.nodes:
+        path_progress = LearningPathNodeService.get_progress(learning_path) if learning_path else None
+
+        if not path_progress or not path_progress.total_nodes:
             context["enrollment"] = enrollment
             context["learning_path"] = None
             context["progress"] = None
@@ -638,27 +624,15 @@ class CourseHistoryView(LoginRequiredMixin, ChatContextMixin, DetailView):
             if progress_data['total_lessons'] > 0 else 0
         )
 
-        # Статистика по типам узлов
-        nodes = learning_path.nodes
+        # Статистика по типам узлов — из материализованного прогресса
+        core_stats = path_progress.type_stats('core')
+        remedial_stats = path_progress.type_stats('remedial')
+        diagnostic_stats = path_progress.type_stats('diagnostic')
 
-        core_nodes = [n for n in nodes if n.get('type') == 'core']
-        remedial_nodes = [n for n in nodes if n.get('type') == 'remedial']
-        diagnostic_nodes = [n for n in nodes if n.get('type') == 'diagnostic']
-
-        core_stats = {
-            'total': len(core_nodes),
-            'completed': len([n for n in core_nodes if n.get('status') == 'completed'])
-        }
-
-        remedial_stats = {
-            'total': len(remedial_nodes),
-            'completed': len([n for n in remedial_nodes if n.get('status') == 'completed'])
-        }
-
-        diagnostic_stats = {
-            'total': len(diagnostic_nodes),
-            'completed': len([n for n in diagnostic_nodes if n.get('status') == 'completed'])
-        }
+        nodes = learning_path.export_nodes()
+        # Позиции узлов непрерывны — текущий узел берётся из уже выгруженного списка
+        current_index = learning_path.current_node_index
+        current_node = nodes[current_index] if current_index < len(nodes) else None
 
         completed_lesson_ids = [
             node['lesson_id']
@@ -791,7 +765,7 @@ class CourseHistoryView(LoginRequiredMixin, ChatContextMixin, DetailView):
             "core_stats": core_stats,
             "remedial_stats": remedial_stats,
             "diagnostic_stats": diagnostic_stats,
-            "current_node": learning_path.current_node,
+            "current_node": current_node,
             "skill_snapshot": skill_snapshot,
             "initial_skill_snapshot": initial_skill_snapshot,
             "skill_comparisons": skill_comparisons,
@@ -841,8 +815,7 @@ class CheckLessonAssessmentView(LoginRequiredMixin, ChatContextMixin, View):
         if is_ajax:
             return JsonResponse(assessment_status)
 
-        current_node_index = enrollment.learning_path.current_node_index
-        current_node = enrollment.learning_path.nodes[current_node_index]
+        current_node = enrollment.learning_path.current_node
         current_lesson = Lesson.objects.get(id=current_node.get("lesson_id"))
 
         l_service = self.learning_path_progress_service
@@ -25,9 +25,24 @@ app.autodiscover_tasks()
 #     # initialize_splitter_registry()
 #     pass
 
+# Периодическая очистка зависших миниатюр больше не нужна: chat.tasks.generate_image_variants
+# идемпотентна и подтверждается после выполнения (acks_late)
 app.conf.beat_schedule = {
-    'cleanup-stale-thumbnail-tasks': {
-        'task': 'chat.tasks.cleanup_stale_thumbnail_tasks',
-        'schedule': crontab(minute='*/720'),  # Каждые 720 минут
+    # Сжатие старой истории навыков (curriculum.services.skill_engine.SkillEngine.compact)
+    'compact-skill-trajectory': {
+        'task': 'curriculum.tasks.compact_skill_trajectory',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    # Пакетная запись событий уроков из Redis-потока (curriculum.services.lesson_event_buffer)
+    # Запуски, не взятые воркером за период, истекают — при остановленном воркере они не копятся
+    'flush-lesson-events': {
+        'task': 'curriculum.tasks.flush_lesson_events',
+        'schedule': float(os.getenv('LESSON_EVENT_FLUSH_INTERVAL', '5')),
+        'options': {'expires': float(os.getenv('LESSON_EVENT_FLUSH_INTERVAL', '5'))},
+    },
+    # Секции LessonEventLog на следующие месяцы (curriculum.services.lesson_event_partitions)
+    'ensure-lesson-event-partitions': {
+        'task': 'curriculum.tasks.ensure_lesson_event_partitions',
+        'schedule': crontab(hour=4, minute=0),
     },
 }
\ No newline at end of file
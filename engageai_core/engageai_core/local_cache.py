@@ -0,0 +1,105 @@
+"""
+Кэш в памяти процесса с TTL для горячих путей (разрешение ассистента, чата, telegram-пользователя).
+
+Локальный словарь избавляет от запросов в БД на каждое сообщение. Инвалидация:
+- в процессе, где изменилась модель, — после коммита транзакции (transaction.on_commit
+  в receivers chat/signals.py, users/signals.py): до коммита другой процесс прочитал бы
+  и закэшировал старую строку;
+- в остальных процессах — через счётчик поколения в общем кэше Django (Redis, settings.CACHES):
+  процесс сверяет поколение не чаще раза в sync_interval секунд и при расхождении очищает себя.
+Итоговая устарелость данных между процессами ограничена sync_interval, внутри процесса — нулевая.
+"""
+import copy
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+from django.core.cache import cache
+
+
+class ProcessLocalTTLCache:
+    """Потокобезопасный TTL-кэш в памяти процесса с межпроцессной инвалидацией по поколению"""
+
+    _MISSING = object()
+
+    def __init__(self, name: str, ttl: int = 300, maxsize: int = 10000, sync_interval: int = 5):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.sync_interval = sync_interval
+        self._data: dict = {}
+        self._lock = threading.Lock()
+        self._generation = None
+        self._synced_at = 0.0
+
+    @property
+    def _generation_key(self) -> str:
+        return f"local_cache:{self.name}:generation"
+
+    def _sync_generation(self) -> None:
+        """Сверяет поколение с общим кэшем; при смене поколения очищает локальные записи"""
+        now = time.monotonic()
+        if now - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = now
+        try:
+            generation = cache.get(self._generation_key)
+        except Exception:
+            # Общий кэш недоступен — полагаемся только на TTL
+            return
+        if generation != self._generation:
+            with self._lock:
+                self._data.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает копию закэшированного значения (модели не разделяются между запросами)"""
+        self._sync_generation()
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is self._MISSING:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+        return copy.copy(value)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._evict()
+            self._data[key] = (copy.copy(value), time.monotonic() + (ttl or self.ttl))
+
+    def _evict(self) -> None:
+        """Удаляет просроченные записи, а при их отсутствии — самую старую"""
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._data.items() if expires_at < now]
+        for key in expired:
+            del self._data[key]
+        if not expired and self._data:
+            del self._data[next(iter(self._data))]
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """
+        Инвалидация по сигналу модели: локально — ключ (или всё), в других процессах — всё,
+        через увеличение поколения в общем кэше.
+        """
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+        try:
+            try:
+                generation = cache.incr(self._generation_key)
+            except ValueError:
+                generation = 1
+                cache.set(self._generation_key, generation, None)
+            self._generation = generation
+        except Exception:
+            pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
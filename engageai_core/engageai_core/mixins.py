@@ -1,14 +1,44 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import status
 from rest_framework.response import Response
 from django.conf import settings
 
 from chat.services.interfaces.exceptions import AuthenticationError, UserNotFoundError
+from engageai_core.local_cache import ProcessLocalTTLCache
 from utils.setup_logger import setup_logger
 
 core_api_logger = setup_logger(name=__file__, log_dir="logs/core_api", log_file="core_api.log")
 
+# Кэш telegram_id -> User для TelegramUserResolverMixin; инвалидируется сигналами в users/signals.py
+telegram_user_cache = ProcessLocalTTLCache("telegram_user", ttl=settings.RESOLUTION_CACHE_TTL)
+
+
+def build_bot_auth_indexes(internal_bots: dict) -> tuple[dict, dict]:
+    """
+    Строит словари для O(1)-аутентификации ботов вместо перебора settings.INTERNAL_BOTS:
+    - по Bearer-токену: token -> (bot_id, bot_config)
+    - по X-Internal-Key: key -> (bot_id, bot_config)
+    При совпадении значений у нескольких ботов побеждает первый (как при переборе).
+    """
+    token_index = {}
+    key_index = {}
+    for name, config in internal_bots.items():
+        if isinstance(config, dict):
+            if config.get("token"):
+                token_index.setdefault(config["token"], (name, config))
+            if config.get("key"):
+                key_index.setdefault(config["key"], (name, config))
+        else:  # обратная совместимость: значение — сам ключ
+            token_index.setdefault(config, (name, {"key": config, "token": config}))
+            key_index.setdefault(config, (name, {"key": config}))
+    return token_index, key_index
+
+
+# settings.INTERNAL_BOTS собирается из окружения один раз при старте
+BOT_TOKEN_INDEX, BOT_KEY_INDEX = build_bot_auth_indexes(settings.INTERNAL_BOTS)
+
 #
 # class BotAuthenticationMixin:
 #     """
@@ -103,20 +133,7 @@ class BotAuthenticationMixin:
 
     def _authenticate_bearer(self, request, token, ip, path, *args, **kwargs):
         """Аутентификация через Bearer Token"""
-        bot_id = None
-        bot_config = None
-
-        for name, config in settings.INTERNAL_BOTS.items():
-            if isinstance(config, dict):
-                bot_token = config.get("token")
-                if bot_token == token:
-                    bot_id = name
-                    bot_config = config
-                    break
-            elif config == token:  # обратная совместимость
-                bot_id = name
-                bot_config = {"key": config, "token": config}
-                break
+        bot_id, bot_config = BOT_TOKEN_INDEX.get(token, (None, None))
 
         if not bot_id:
             core_api_logger.error(
@@ -139,15 +156,7 @@ class BotAuthenticationMixin:
 
     def _authenticate_x_internal(self, request, key, ip, path, *args, **kwargs):
         """Аутентификация через X-Internal-Key (старый метод)"""
-        bot_id = None
-        bot_config = None
-
-        for name, config in settings.INTERNAL_BOTS.items():
-            config_key = config.get("key") if isinstance(config, dict) else config
-            if config_key == key:
-                bot_id = name
-                bot_config = config if isinstance(config, dict) else {"key": config}
-                break
+        bot_id, bot_config = BOT_KEY_INDEX.get(key, (None, None))
 
         if not bot_id:
             core_api_logger.error(
@@ -214,12 +223,15 @@ class TelegramUserResolverMixin:
             raise UserNotFoundError("Missing 'user_telegram_id' in request", status_code=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # Поиск активного пользователя по telegram_id
-            User = get_user_model()
-            user = User.objects.select_related("profile", "telegram_profile").get(
-                telegram_profile__telegram_id=str(telegram_id),
-                is_active=True
-            )
+            # Поиск активного пользователя по telegram_id (сначала в кэше процесса)
+            user = telegram_user_cache.get(str(telegram_id))
+            if user is None:
+                User = get_user_model()
+                user = User.objects.select_related("profile", "telegram_profile").get(
+                    telegram_profile__telegram_id=str(telegram_id),
+                    is_active=True
+                )
+                telegram_user_cache.set(str(telegram_id), user)
 
             core_api_logger.info(
                 f"{bot_tag} User resolved: ID={user.id}, "
@@ -235,3 +247,20 @@ class TelegramUserResolverMixin:
             )
             raise UserNotFoundError(f"No active user found for telegram_id={telegram_id}",
                                     status_code=status.HTTP_404_NOT_FOUND)
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+    LoginRequiredMixin для нативных async-представлений.
+
+    Стандартный LoginRequiredMixin обращается к ленивому request.user, что в
+    async-контексте приводит к синхронному запросу в БД (SynchronousOnlyOperation).
+    Здесь пользователь загружается через request.auser() и кладётся обратно
+    в request.user, чтобы дальнейший код (шаблоны, сервисы) не ходил в БД повторно.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super().dispatch(request, *args, **kwargs)
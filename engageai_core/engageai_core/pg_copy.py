@@ -0,0 +1,101 @@
+"""
+Массовая запись строк в PostgreSQL через COPY ... FROM STDIN (psycopg2 copy_expert).
+
+COPY в десятки раз быстрее INSERT/bulk_create на больших объёмах: строки уходят
+одним потоком CSV без разбора SQL на каждую пачку. Строки кодируются в CSV
+с csv.QUOTE_NOTNULL: все значения в кавычках, кроме None — в формате CSV
+PostgreSQL незакавыченное пустое значение означает NULL, а "" — пустую строку.
+
+Значения:
+- bytes / memoryview → bytea в hex-формате (\\x...);
+- dict / list → JSON;
+- datetime / date → ISO 8601;
+- bool → t / f.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterable, Optional, Sequence
+
+from django.db import connections
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+def encode_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\x" + bytes(value).hex()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def copy_rows(
+        table: str,
+        columns: Sequence[str],
+        rows: Iterable[Sequence],
+        using: str = "default",
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+) -> int:
+    """
+    Записывает строки (кортежи значений в порядке columns) в таблицу table.
+    Поток режется на части по chunk_rows строк, чтобы буфер не рос без ограничений.
+    Возвращает число записанных строк. Транзакцию задаёт вызывающий код.
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    sql = (
+        f"COPY {quote(table)} ({', '.join(quote(column) for column in columns)}) "
+        f"FROM STDIN WITH (FORMAT csv)"
+    )
+
+    total = 0
+    buffer: Optional[io.StringIO] = None
+    writer = None
+    pending = 0
+
+    with connection.cursor() as cursor:
+        for row in rows:
+            if buffer is None:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n")
+            writer.writerow([encode_value(value) for value in row])
+            pending += 1
+            if pending >= chunk_rows:
+                total += _flush(cursor, sql, buffer, pending)
+                buffer, pending = None, 0
+        if buffer is not None and pending:
+            total += _flush(cursor, sql, buffer, pending)
+    return total
+
+
+def copy_models(model, fields: Sequence[str], objects: Iterable, using: str = "default", **kwargs) -> int:
+    """
+    copy_rows для несохранённых экземпляров модели: значения берутся по attname полей
+    (для ForeignKey — *_id). save(), сигналы и auto_now не вызываются — такие поля
+    нужно заполнить заранее.
+    """
+    connection = connections[using]
+    model_fields = [model._meta.get_field(name) for name in fields]
+    rows = (
+        # JSONField отдаёт обёртку psycopg2 (Json) — берём исходное значение
+        [getattr(value, "adapted", value)
+         for value in (field.get_db_prep_save(getattr(obj, field.attname), connection) for field in model_fields)]
+        for obj in objects
+    )
+    return copy_rows(model._meta.db_table, [field.column for field in model_fields], rows, using=using, **kwargs)
+
+
+def _flush(cursor, sql: str, buffer: io.StringIO, pending: int) -> int:
+    buffer.seek(0)
+    # copy_expert не обёрнут Django: ошибки psycopg2 переводятся в django.db (IntegrityError, ...)
+    with cursor.db.wrap_database_errors:
+        cursor.copy_expert(sql, buffer)
+    return pending
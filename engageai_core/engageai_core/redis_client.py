@@ -0,0 +1,34 @@
+"""
+Общий синхронный Redis-клиент Django-ядра.
+
+Клиент создаётся лениво, один на процесс (после fork воркера gunicorn/celery
+пул соединений создаётся заново), и работает с БД ``settings.DJANGO_REDIS_URL``.
+"""
+import os
+import threading
+
+import redis
+from django.conf import settings
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_redis() -> redis.Redis:
+    """Возвращает Redis-клиент текущего процесса."""
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = redis.Redis.from_url(
+                    settings.DJANGO_REDIS_URL,
+                    decode_responses=True,
+                    socket_timeout=2,
+                    socket_connect_timeout=2,
+                    health_check_interval=30,
+                )
+                _client_pid = pid
+    return _client
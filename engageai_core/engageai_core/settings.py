@@ -149,6 +149,20 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Загрузка медиа из Telegram (chat.services.interfaces.media_ingestion_service)
+TELEGRAM_MEDIA_MAX_SIZE = int(os.getenv('TELEGRAM_MEDIA_MAX_SIZE', 20 * 1024 * 1024))  # лимит Bot API на getFile
+TELEGRAM_MEDIA_CHUNK_SIZE = int(os.getenv('TELEGRAM_MEDIA_CHUNK_SIZE', 256 * 1024))
+TELEGRAM_API_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_API_CONNECT_TIMEOUT', 5))
+TELEGRAM_API_READ_TIMEOUT = float(os.getenv('TELEGRAM_API_READ_TIMEOUT', 30))
+# Недокачанные файлы (докачка через Range при повторе задачи); лучше на одном разделе с MEDIA_ROOT
+MEDIA_PARTIAL_ROOT = os.getenv('MEDIA_PARTIAL_ROOT', os.path.join(BASE_DIR, 'media_partial'))
+
+# Производные изображения по запросу (chat:media-variant)
+IMAGE_VARIANT_SIZES = (150, 320, 640, 1024, 1280)
+# Отдача файлов через nginx: location MEDIA_ACCEL_REDIRECT_PREFIX { internal; alias MEDIA_ROOT; }
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', 'False').lower() in ('true', '1', 'yes')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected_media/')
+
 # ПОЧТА
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = os.getenv("EMAIL_HOST")
@@ -164,9 +178,10 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 REDIS_HOST = os.getenv('REDIS_HOST', '127.0.0.1')
 REDIS_PORT = os.getenv('REDIS_PORT', '6379')
 DJANGO_REDIS_DB_ID = os.getenv('DJANGO_REDIS_DB_ID', '0')
+DJANGO_REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{DJANGO_REDIS_DB_ID}'
 
-CELERY_BROKER_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{DJANGO_REDIS_DB_ID}'
-CELERY_RESULT_BACKEND = f'redis://{REDIS_HOST}:{REDIS_PORT}/{DJANGO_REDIS_DB_ID}'
+CELERY_BROKER_URL = DJANGO_REDIS_URL
+CELERY_RESULT_BACKEND = DJANGO_REDIS_URL
 
 # КРИТИЧЕСКИ ВАЖНЫЕ НАСТРОЙКИ
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
@@ -181,6 +196,114 @@ CELERY_ACCEPT_CONTENT = ['json']
 # Таймзона
 CELERY_TIMEZONE = 'Europe/Moscow'
 
+# Маршрутизация задач по очередям
+CHAT_JOBS_QUEUE = 'chat_jobs'
+# CPU-ёмкая обработка изображений — отдельный prefork-пул по числу ядер (supervisor_configs/celery_images.conf)
+IMAGE_PIPELINE_QUEUE = 'images'
+# Синтез речи для заданий — отдельный воркер, ограниченный числом соединений к Piper (supervisor_configs/celery_tts.conf)
+TTS_QUEUE = 'tts'
+CELERY_TASK_ROUTES = {
+    'chat.tasks.process_chat_message_job': {'queue': CHAT_JOBS_QUEUE},
+    'chat.tasks.generate_image_variants': {'queue': IMAGE_PIPELINE_QUEUE},
+    'curriculum.tasks.synthesize_task_audio': {'queue': TTS_QUEUE},
+}
+
+# Фоновый режим веб-чата: AiChatView ставит оркестрацию в очередь и сразу возвращает job id
+CHAT_JOB_MODE = os.getenv('CHAT_JOB_MODE', 'False').lower() in ('true', '1', 'yes')
+
+# Оценка пакета ответов теста (assessment.services.assessment_service.schedule_packet_evaluation):
+# заявка на оценку старше стольких секунд считается брошенной и ставится заново
+ASSESSMENT_EVALUATION_TIMEOUT = int(os.getenv('ASSESSMENT_EVALUATION_TIMEOUT', '600'))
+
+# Инкрементальное хранилище сигналов фрустрации (curriculum.services.frustration_signal_store)
+FRUSTRATION_SIGNALS_TTL = int(os.getenv('FRUSTRATION_SIGNALS_TTL', str(60 * 60 * 24 * 30)))  # 30 дней
+FRUSTRATION_SIGNALS_DECAY = float(os.getenv('FRUSTRATION_SIGNALS_DECAY', '0.8'))
+
+# Автогрейдеры (curriculum.services.auto_graders): ниже этой уверенности задание оценивает LLM
+AUTO_GRADER_CONFIDENCE_THRESHOLD = float(os.getenv('AUTO_GRADER_CONFIDENCE_THRESHOLD', '0.85'))
+
+# Генерация курса графом шагов (curriculum.services.content_generation.generation_scheduler):
+# сколько шагов (урок, задания урока, аудио) выполняется одновременно; вызовы LLM ограничены ещё и лимитером провайдера
+CONTENT_GENERATION_MAX_PARALLEL = int(os.getenv('CONTENT_GENERATION_MAX_PARALLEL', '8'))
+
+# Методплан в памяти процесса (curriculum.services.methodological_plan_store): как часто сверять mtime фикстур
+METHODOLOGICAL_PLAN_RELOAD_INTERVAL = float(os.getenv('METHODOLOGICAL_PLAN_RELOAD_INTERVAL', '5'))
+
+# Навыки (curriculum.services.skill_engine): шаг EMA на одно оценённое задание
+SKILL_TASK_ALPHA = float(os.getenv('SKILL_TASK_ALPHA', '0.3'))
+# История навыков: точек в блоке; RAW-блоки старше COMPACT_AFTER_DAYS сжимаются до одной точки в день
+SKILL_TRAJECTORY_CHUNK_POINTS = int(os.getenv('SKILL_TRAJECTORY_CHUNK_POINTS', '256'))
+SKILL_TRAJECTORY_COMPACT_AFTER_DAYS = int(os.getenv('SKILL_TRAJECTORY_COMPACT_AFTER_DAYS', '30'))
+# Офлайн-пересчёт навыков когорты (curriculum.services.skill_replay): процессов-воркеров по умолчанию
+SKILL_REPLAY_WORKERS = int(os.getenv('SKILL_REPLAY_WORKERS', '4'))
+
+# События уроков (curriculum.services.lesson_event_buffer): запись через Redis-поток пачками;
+# False — сразу в БД, как раньше
+LESSON_EVENT_BUFFERED = os.getenv('LESSON_EVENT_BUFFERED', 'True').lower() in ('true', '1', 'yes')
+LESSON_EVENT_STREAM = os.getenv('LESSON_EVENT_STREAM', 'curriculum:lesson_events')
+# Верхняя граница длины потока (приблизительная), если записывающий долго не работает
+LESSON_EVENT_STREAM_MAXLEN = int(os.getenv('LESSON_EVENT_STREAM_MAXLEN', '1000000'))
+# Период задачи flush_lesson_events (сек) и размер пачки bulk_create; от COPY_THRESHOLD событий — COPY
+LESSON_EVENT_FLUSH_INTERVAL = float(os.getenv('LESSON_EVENT_FLUSH_INTERVAL', '5'))
+LESSON_EVENT_FLUSH_BATCH = int(os.getenv('LESSON_EVENT_FLUSH_BATCH', '500'))
+LESSON_EVENT_COPY_THRESHOLD = int(os.getenv('LESSON_EVENT_COPY_THRESHOLD', '5000'))
+# Неподтверждённые события упавшего записывающего забираются повторно через столько секунд
+LESSON_EVENT_CLAIM_IDLE_SECONDS = int(os.getenv('LESSON_EVENT_CLAIM_IDLE_SECONDS', '300'))
+# Помесячные секции LessonEventLog (curriculum.services.lesson_event_partitions): на сколько месяцев вперёд
+LESSON_EVENT_PARTITIONS_AHEAD = int(os.getenv('LESSON_EVENT_PARTITIONS_AHEAD', '2'))
+
+# Пулы id заданий для случайного выбора (curriculum.services.task_sampling)
+TASK_POOL_TTL = int(os.getenv('TASK_POOL_TTL', str(60 * 60)))
+# Уровни с большим числом заданий выбираются через TABLESAMPLE, а не списком id
+TASK_POOL_MAX_SIZE = int(os.getenv('TASK_POOL_MAX_SIZE', '20000'))
+
+# Распознавание речи (ai.stt): faster-whisper-server из stt_service/compose.yaml
+STT_SERVER_URL = os.getenv('STT_SERVER_URL', 'http://localhost:8010')
+STT_MODEL = os.getenv('STT_MODEL', 'base')
+STT_LANGUAGE = os.getenv('STT_LANGUAGE', 'en')
+STT_TIMEOUT = float(os.getenv('STT_TIMEOUT', '120'))
+STT_MAX_CONNECTIONS = int(os.getenv('STT_MAX_CONNECTIONS', '4'))
+STT_FFMPEG_BINARY = os.getenv('STT_FFMPEG_BINARY', 'ffmpeg')
+# Клипы короче STT_BATCH_MAX_CLIP_SECONDS склеиваются в один запрос длиной до STT_BATCH_MAX_SECONDS
+STT_BATCH_MAX_CLIP_SECONDS = float(os.getenv('STT_BATCH_MAX_CLIP_SECONDS', '20'))
+STT_BATCH_MAX_SECONDS = float(os.getenv('STT_BATCH_MAX_SECONDS', '90'))
+STT_BATCH_GAP_SECONDS = float(os.getenv('STT_BATCH_GAP_SECONDS', '1.0'))
+STT_CACHE_TTL = int(os.getenv('STT_CACHE_TTL', str(60 * 60 * 24 * 30)))  # 30 дней
+# VAD (ai.stt.vad): паузы короче MIN_SILENCE не режут речь, длинные сжимаются до KEEP_PAUSE
+STT_VAD_MIN_SILENCE = float(os.getenv('STT_VAD_MIN_SILENCE', '0.5'))
+STT_VAD_PADDING = float(os.getenv('STT_VAD_PADDING', '0.2'))
+STT_VAD_KEEP_PAUSE = float(os.getenv('STT_VAD_KEEP_PAUSE', '0.3'))
+# Длинные ответы распознаются параллельно перекрывающимися сегментами
+STT_SEGMENT_SECONDS = float(os.getenv('STT_SEGMENT_SECONDS', '30'))
+STT_SEGMENT_OVERLAP = float(os.getenv('STT_SEGMENT_OVERLAP', '2.0'))
+
+# Синтез речи (ai.tts): wyoming-piper из tts_service/docker-compose.yml; silent — тишина вместо речи (тесты)
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'wyoming')  # wyoming | http | silent
+TTS_WYOMING_HOST = os.getenv('TTS_WYOMING_HOST', 'localhost')
+TTS_WYOMING_PORT = int(os.getenv('TTS_WYOMING_PORT', '10200'))
+TTS_SERVER_URL = os.getenv('TTS_SERVER_URL', 'http://localhost:5000')
+TTS_VOICE = os.getenv('TTS_VOICE', 'en_US-lessac-medium')
+TTS_SPEED = float(os.getenv('TTS_SPEED', '1.0'))
+TTS_TIMEOUT = float(os.getenv('TTS_TIMEOUT', '60'))
+TTS_MAX_CONNECTIONS = int(os.getenv('TTS_MAX_CONNECTIONS', '4'))
+# Каталог контентно-адресуемого кэша фраз в хранилище медиа
+TTS_STORAGE_PREFIX = os.getenv('TTS_STORAGE_PREFIX', 'tts_cache')
+
+# Кэш Django (Redis): статистика истории чатов, поколения локальных кэшей (engageai_core.local_cache)
+DJANGO_CACHE_REDIS_DB_ID = os.getenv('DJANGO_CACHE_REDIS_DB_ID', '2')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/{DJANGO_CACHE_REDIS_DB_ID}',
+        'KEY_PREFIX': 'engageai',
+        'TIMEOUT': 300,
+    }
+}
+
+# TTL кэшей разрешения ассистента / чата / telegram-пользователя в памяти процесса (сек)
+RESOLUTION_CACHE_TTL = int(os.getenv('RESOLUTION_CACHE_TTL', '300'))
+
 # Настройка авторизации обращений ботов в DRF
 INTERNAL_BOTS = {
     key.replace("BOT_SYSTEM_KEY_", ""): value
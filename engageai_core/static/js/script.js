@@ -645,3 +645,30 @@ function world_helper() {
     enableWordHover();
 }
 
+
+
+// Фоновый режим чата (CHAT_JOB_MODE): сервер вернул job_id и progress_url —
+// опрашиваем статус задачи django-celery-progress до завершения и отдаём её result.
+// Обычный синхронный ответ возвращается без изменений.
+function waitForChatJob(data, pollInterval = 1000) {
+    if (!data || !data.job_id || !data.progress_url) {
+        return Promise.resolve(data);
+    }
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(data.progress_url, {headers: {"X-Requested-With": "XMLHttpRequest"}})
+                .then(response => response.json())
+                .then(status => {
+                    if (!status.complete) {
+                        setTimeout(poll, pollInterval);
+                    } else if (status.success) {
+                        resolve(status.result);
+                    } else {
+                        reject(new Error("Не удалось получить ответ AI"));
+                    }
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
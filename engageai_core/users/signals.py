@@ -1,11 +1,31 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
-from users.models import Student
+from engageai_core.mixins import telegram_user_cache
+from users.models import Student, Profile, TelegramProfile
 
 
 @receiver(post_save, sender=User)
 def create_student_profile(sender, instance, created, **kwargs):
     if created:
         Student.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_telegram_user_cache_for_user(sender, instance, created=False, update_fields=None, **kwargs):
+    """Сброс кэша TelegramUserResolverMixin при изменении пользователя (кроме обновления last_login)"""
+    if created or (update_fields and set(update_fields) <= {"last_login"}):
+        return
+    # После коммита: иначе другой процесс успеет перечитать и закэшировать старую строку
+    transaction.on_commit(telegram_user_cache.invalidate)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=TelegramProfile)
+@receiver(post_delete, sender=TelegramProfile)
+def invalidate_telegram_user_cache(sender, instance, **kwargs):
+    transaction.on_commit(telegram_user_cache.invalidate)
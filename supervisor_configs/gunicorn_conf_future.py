@@ -10,15 +10,19 @@ from dotenv import load_dotenv
 load_dotenv('/home/bo/projects/engageAI_v2/.env')
 
 
-# Автоматический расчет воркеров для Channels
+# Автоматический расчет воркеров для ASGI
 def calculate_workers():
-    """Оптимизация под WebSocket-нагрузку"""
+    """
+    Оптимизация под долгие AI-запросы и WebSocket-нагрузку.
+
+    Async-воркер не блокируется на ожидании LLM (AiChatView — нативное async-представление),
+    поэтому сотни одновременных чатов обслуживаются несколькими процессами:
+    достаточно одного процесса на ядро, ограничение задаёт worker_connections.
+    """
     cpu_cores = multiprocessing.cpu_count()
 
-    # Для WebSocket лучше меньше воркеров, но больше соединений на воркер
     if os.getenv('DJANGO_ENV') == 'production':
-        # Формула: (ядра * 1.5) + 1 для баланса CPU/RAM
-        return max(2, int(cpu_cores * 1.5) + 1)
+        return max(2, int(os.getenv('GUNICORN_WORKERS', cpu_cores)))
     return 2  # Для staging/testing
 
 